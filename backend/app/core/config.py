@@ -1,5 +1,5 @@
 import os
-from typing import List, Union
+from typing import List, Optional, Union
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from pydantic import field_validator
 
@@ -49,6 +49,61 @@ class Settings(BaseSettings):
     CHUNK_SIZE: int = 64 * 1024 * 1024  # 64MB chunks for multipart
     STREAMING_CHUNK_SIZE: int = 1 * 1024 * 1024  # 1MB chunks for streaming downloads
     HASH_CHUNK_SIZE: int = 8 * 1024  # 8KB chunks for hash calculation
+    RANGED_READ_BLOCK_SIZE: int = 256 * 1024  # Block size of ranged (header-only) reads from MinIO
+    RANGED_READ_CACHE_BLOCKS: int = 16  # Blocks kept per open ranged reader
+
+    # Background processing
+    BACKGROUND_WORKERS: int = 2  # Worker threads for ingest-time tasks
+    DERIVATIVES_ENABLED: bool = True  # Generate missing ECO-MiC derivatives after master upload
+    DEFER_RAW_METADATA: bool = True  # Extract only MIX fields during upload, full raw_metadata in the background
+    CONTENT_MEMO_ENABLED: bool = True  # Reuse metadata/derivatives of content already processed (by SHA256)
+
+    # Maintenance jobs (metadata backfill)
+    JOB_WORKERS: int = 1  # Concurrent maintenance jobs in the API process
+    BACKFILL_BATCH_SIZE: int = 200  # DocumentFile rows per keyset page / checkpoint
+    BACKFILL_WORKERS: int = 4  # Parallel extractions within a batch
+    BACKFILL_MAX_FILES_PER_SECOND: float = 20.0  # Throttle to protect online traffic (0 = unlimited)
+    JOB_STALE_AFTER_SECONDS: int = 900  # A running job without progress this long is orphaned (its process died) and may be resumed
+
+    # RAW processing
+    RAW_MEMORY_BUDGET_BYTES: int = 2 * 1024 * 1024 * 1024  # 2GB shared by concurrent RAW decodes
+    RAW_BUDGET_WAIT_SECONDS: float = 30.0  # Max wait for budget on request paths before refusing (503)
+    RAW_SPILL_DIR: Optional[str] = None  # Directory for RAW spill files (default: system temp dir)
+
+    # METS export
+    METS_STREAM_BATCH_SIZE: int = 500  # DocumentFile rows fetched per server-side cursor round trip
+    METS_STREAM_CHUNK_SIZE: int = 64 * 1024  # Bytes buffered before each chunk of a streamed METS response
+    METS_EXPORT_PROCESSES: int = 2  # Worker processes rendering batch METS exports (0 = render in threads)
+    METS_EXPORT_BATCH_SIZE: int = 50  # Documents loaded per PostgreSQL/MongoDB round trip in batch exports
+    METS_EXPORT_MAX_DOCUMENTS: int = 10000  # Document IDs accepted by one batch export request
+    METS_CACHE_ENABLED: bool = True  # Serve repeat exports/validations from rendered METS (memory + MinIO)
+    METS_CACHE_MEMORY_BYTES: int = 64 * 1024 * 1024  # In-process LRU budget for rendered METS
+    METS_CACHE_MAX_ENTRY_BYTES: int = 32 * 1024 * 1024  # Larger renderings are streamed but not cached
+
+    # METS import (bulk creation of documents from existing METS files)
+    METS_IMPORT_BATCH_SIZE: int = 200  # Documents created per PostgreSQL commit / MongoDB insert_many
+    METS_IMPORT_PROCESSES: int = 0  # Worker processes parsing METS files (0 = one thread; parsing stops after the dmdSec, so writes usually dominate)
+
+    # Document lists
+    MONGO_LOAD_BATCH_SIZE: int = 1000  # METS documents fetched per $in query by batched loaders
+
+    # Metadata CSV export
+    CSV_EXPORT_BATCH_SIZE: int = 500  # Rows per PostgreSQL page / MongoDB $in query, written to the response page by page
+
+    # METS validation (local XSD + ECO-MiC profile first, remote Cineca API optional)
+    METS_XSD_DIR: Optional[str] = None  # Extra schemas (e.g. MODS/MIX/METSRights XSDs) searched before the bundled ones
+    METS_REMOTE_VALIDATION: bool = False  # Also submit locally valid METS to the remote validation API
+    METS_VALIDATION_API_URL: str = "https://validavmetsecomic.prod.os01.ocp.cineca.it/api/v1/checkmetsecomic/files"
+    METS_VALIDATION_TIMEOUT: float = 30.0  # Seconds per remote validation request
+    METS_VALIDATION_HTTP2: bool = True  # Negotiate HTTP/2 with the remote API (requires the h2 package)
+    METS_VALIDATION_MAX_CONNECTIONS: int = 10  # Pooled connections to the remote API
+    METS_VALIDATION_KEEPALIVE_EXPIRY: float = 60.0  # Seconds an idle pooled connection is kept open
+    METS_VALIDATION_CACHE_TTL: int = 3600  # Seconds a remote result is reused for identical XML (0 = no cache)
+    METS_VALIDATION_CACHE_MAX_ENTRIES: int = 512  # Remote results kept in memory
+    METS_VALIDATE_ON_CHANGE: bool = True  # Validate in the background after a document's metadata or images change
+    METS_VALIDATION_DEBOUNCE_SECONDS: float = 10.0  # Wait for edits to settle before validating a changed document
+    METS_VALIDATION_JOB_BATCH_SIZE: int = 100  # Documents per checkpoint of a bulk validation job
+    METS_VALIDATION_JOB_CONCURRENCY: int = 4  # Documents validated concurrently by a bulk validation job
 
 
 settings = Settings()
@@ -2,5 +2,9 @@ from .base import Base
 from .user import User
 from .file import File, FileChunk
 from .document import Document, DocumentFile
+from .content_memo import ContentMemo
+from .job import Job
+from .document_validation import DocumentValidation
+from .document_summary import DocumentSummary
 
-__all__ = ["Base", "User", "File", "FileChunk", "Document", "DocumentFile"]
\ No newline at end of file
+__all__ = ["Base", "User", "File", "FileChunk", "Document", "DocumentFile", "ContentMemo", "Job", "DocumentValidation", "DocumentSummary"]
\ No newline at end of file
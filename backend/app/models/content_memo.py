@@ -0,0 +1,31 @@
+from sqlalchemy import Column, Integer, String, DateTime, Text, UniqueConstraint
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.sql import func
+from app.models.base import Base
+
+
+class ContentMemo(Base):
+    """
+    Results computed from file content, keyed by content digest
+
+    Lets ingest paths reuse the metadata extraction, placeholder and
+    derivatives of content that was already processed (re-uploaded masters,
+    shared color targets, ICC profiles) instead of recomputing them.
+    """
+    __tablename__ = "content_memos"
+    __table_args__ = (
+        UniqueConstraint("content_hash", "extractor_version", name="uq_content_memos_hash_version"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    content_hash = Column(String(64), nullable=False, index=True)  # SHA256 of the file (File.file_hash)
+    extractor_version = Column(String(20), nullable=False)  # image_metadata.EXTRACTOR_VERSION
+
+    # Full extract_image_metadata output (MIX fields + raw_metadata), JSON-serialized
+    image_metadata = Column(JSONB, nullable=True)
+    placeholder = Column(Text, nullable=True)
+    # Export derivatives generated from this content: {category: {object_name, file_hash, ...}}
+    derivatives = Column(JSONB, nullable=True)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
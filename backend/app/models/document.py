@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, Index
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -26,7 +26,14 @@ class Document(Base):
 
     # Relationships
     owner = relationship("User", back_populates="documents")
-    document_files = relationship("DocumentFile", back_populates="document", cascade="all, delete-orphan")
+    document_files = relationship(
+        "DocumentFile", back_populates="document", cascade="all, delete-orphan", order_by="DocumentFile.id"
+    )
+
+    __table_args__ = (
+        # Owner's documents newest first, keyset-paginated on (created_at, id)
+        Index('ix_documents_owner_created_id', owner_id, created_at.desc(), id.desc()),
+    )
 
 
 class DocumentFile(Base):
@@ -73,9 +80,19 @@ class DocumentFile(Base):
     # Comprehensive metadata storage (JSONB) - stores ALL extracted metadata
     # This includes DNG-specific tags, EXIF data, and any other metadata
     raw_metadata = Column(JSONB, nullable=True)
+    # Full raw_metadata extraction state: "pending", "complete" or "failed" (None for non-images)
+    metadata_status = Column(String(20), nullable=True)
+
+    # Low-quality image placeholder (tiny data URI) shown while previews load
+    placeholder = Column(Text, nullable=True)
 
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     # Relationships
     document = relationship("Document", back_populates="document_files")
     file = relationship("File")
+
+    __table_args__ = (
+        # A document's files in sequence order: file counts and cover placeholders of list pages
+        Index('ix_document_files_document_sequence', document_id, sequence_number, id),
+    )
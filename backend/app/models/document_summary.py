@@ -0,0 +1,45 @@
+from sqlalchemy import Column, Integer, BigInteger, Boolean, String, DateTime, Text, ForeignKey, Index
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.sql import func
+from app.models.base import Base
+
+
+class DocumentSummary(Base):
+    """
+    List read model of a document
+
+    Everything the document list needs in one row: the key METS fields
+    (copied from the document data on create/update, so listing does not
+    read MongoDB) and the file statistics of document_files (recomputed
+    whenever files are attached). Written in the same PostgreSQL transaction
+    as the document and file rows it summarizes.
+    """
+    __tablename__ = "document_summaries"
+
+    document_id = Column(Integer, ForeignKey("documents.id", ondelete="CASCADE"), primary_key=True)
+    owner_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    logical_id = Column(String(255), nullable=False)
+
+    # Key METS fields (MongoDB)
+    title = Column(Text, nullable=True)
+    archive_name = Column(Text, nullable=True)
+    document_type = Column(String(255), nullable=True)
+    total_pages = Column(Integer, nullable=True)
+    # False until the METS fields were copied (rows created from PostgreSQL alone)
+    mets_synced = Column(Boolean, nullable=False, default=False, server_default='false')
+
+    # File statistics (document_files)
+    file_count = Column(Integer, nullable=False, default=0)
+    total_bytes = Column(BigInteger, nullable=False, default=0)
+    category_counts = Column(JSONB, nullable=True)  # e.g. {"master": 12, "export_high": 12}
+    cover_file_id = Column(Integer, nullable=True)  # First file with a placeholder, in sequence order
+    cover_placeholder = Column(Text, nullable=True)
+
+    # Same values as the document's (now() is the transaction time in PostgreSQL)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        # Owner's documents newest first, keyset-paginated on (created_at, document_id)
+        Index('ix_document_summaries_owner_created_id', owner_id, created_at.desc(), document_id.desc()),
+    )
@@ -0,0 +1,31 @@
+from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.sql import func
+from app.models.base import Base
+
+
+class DocumentValidation(Base):
+    """
+    Latest METS ECO-MiC validation verdict of a document
+
+    Kept apart from the documents table so that recording a verdict does not
+    bump Document.updated_at (and with it the METS render cache key). The
+    verdict applies to the METS XML whose SHA256 is xml_hash; exports reuse it
+    while the rendered XML is unchanged. mets_cache_key records the rendering
+    inputs, so status checks can tell whether the verdict is current without
+    rendering the XML.
+    """
+    __tablename__ = "document_validations"
+
+    document_id = Column(Integer, ForeignKey("documents.id", ondelete="CASCADE"), primary_key=True)
+    status = Column(String(20), nullable=False)  # valid, invalid, error
+    xml_hash = Column(String(64), nullable=True)  # SHA256 of the validated METS XML
+    mets_cache_key = Column(String(64), nullable=True)  # METS render cache key of the validated XML
+    engine = Column(String(20), nullable=True)  # "local" or "local+remote"
+
+    errors = Column(JSONB, nullable=True)  # Validation errors in the UI format (id, type, description, tag, location)
+    warnings = Column(JSONB, nullable=True)
+    summary = Column(Text, nullable=True)  # Human-readable verdict, or the failure when status is "error"
+
+    validated_at = Column(DateTime(timezone=True), nullable=True)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
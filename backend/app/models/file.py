@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey, Text, BigInteger
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey, Text, BigInteger, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.models.base import Base
@@ -26,6 +26,14 @@ class File(Base):
     # Relationship
     owner = relationship("User", back_populates="files")
 
+    __table_args__ = (
+        # Owner's completed uploads newest first, keyset-paginated on (created_at, id)
+        Index(
+            'ix_files_owner_created_id', owner_id, created_at.desc(), id.desc(),
+            postgresql_where=(upload_completed == True)
+        ),
+    )
+
 
 class FileChunk(Base):
     """File chunk model for multipart uploads"""
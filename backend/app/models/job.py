@@ -0,0 +1,34 @@
+from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.sql import func
+from app.models.base import Base
+
+
+class Job(Base):
+    """
+    Long-running background job with persisted progress
+
+    The checkpoint is committed together with each processed batch, so an
+    interrupted job resumes where it stopped instead of starting over.
+    """
+    __tablename__ = "jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    job_type = Column(String(50), nullable=False, index=True)  # e.g., "metadata_backfill"
+    status = Column(String(20), nullable=False, default="queued")  # queued, running, interrupted, cancelled, completed, failed
+    owner_id = Column(Integer, ForeignKey("users.id"), nullable=True)  # None for jobs started from the CLI
+
+    params = Column(JSONB, nullable=True)  # Job options (batch size, workers, throttling, scope)
+    checkpoint = Column(JSONB, nullable=True)  # Resume position, e.g., {"last_id": 1234}
+
+    # Progress counters
+    total = Column(Integer, nullable=True)
+    processed = Column(Integer, nullable=False, default=0)
+    succeeded = Column(Integer, nullable=False, default=0)
+    failed = Column(Integer, nullable=False, default=0)
+    error = Column(Text, nullable=True)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
@@ -1,20 +1,24 @@
 from typing import List, Dict, Optional
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Query
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Query, Request, Response
 from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
+from pymongo.errors import PyMongoError
 from datetime import date
 
+from app.core.config import settings
 from app.core.database import get_db
 from app.models.user import User
 from app.models.document import Document
 from app.schemas.document import (
-    DocumentCreate, DocumentUpdate, DocumentDetail, DocumentListItem, DocumentUpload
+    DocumentCreate, DocumentUpdate, DocumentDetail, DocumentListItem, DocumentUpload, DocumentValidationResponse
 )
-from app.services.document import DocumentService
+from app.services.document import DOCUMENT_LIST_CURSOR, DocumentService
 from app.services.mets_validation import METSValidationService
-from app.services.mongodb import mongodb_service, get_mongodb
+from app.services.mongodb import SEARCH_TOTAL_EXACT, mongodb_service, get_mongodb
+from app.utils.cursor import NEXT_CURSOR_HEADER, InvalidCursor, next_cursor
 from app.utils.mets_generator_ecomic import METSEcoMicGenerator
+from app.utils.sprite_sheet import DEFAULT_COLUMNS, DEFAULT_TILE_SIZE, DEFAULT_TILES_PER_PAGE, MAX_TILES_PER_PAGE
 from app.routes.auth import get_current_user
 
 router = APIRouter()
@@ -53,6 +57,30 @@ class FolderUploadResult(BaseModel):
     total_files: int = 0
 
 
+class DocumentSelection(BaseModel):
+    document_ids: Optional[List[int]] = None
+    # Search filters (as in /search), used when document_ids is not given
+    q: Optional[str] = None
+    logical_id: Optional[str] = None
+    archive: Optional[str] = None
+    date_from: Optional[date] = None
+    date_to: Optional[date] = None
+    schema_version: Optional[str] = None
+
+    def search_filters(self) -> Dict[str, str]:
+        """The given search filters, dates as ISO strings (as stored in METS)"""
+        filters = self.dict(include={'logical_id', 'archive', 'date_from', 'date_to', 'schema_version'}, exclude_none=True)
+        for key in ('date_from', 'date_to'):
+            if key in filters:
+                filters[key] = filters[key].isoformat()
+        return filters
+
+
+class METSBatchExportRequest(DocumentSelection):
+    # METS without indentation whitespace (smaller archive, same content)
+    compact: bool = False
+
+
 class METSValidationRequest(BaseModel):
     document_id: int
 
@@ -88,6 +116,7 @@ class METSValidationResult(BaseModel):
     valid: bool
     response: dict
     errors: List[dict]
+    warnings: List[dict] = []
     summary: str
 
 
@@ -157,6 +186,7 @@ async def upload_document(
 
 @router.get("/search")
 async def search_documents(
+    response: Response,
     q: Optional[str] = Query(None, description="Full-text search query"),
     logical_id: Optional[str] = Query(None, description="Filter by logical ID (partial match)"),
     archive: Optional[str] = Query(None, description="Filter by archive name (partial match)"),
@@ -165,6 +195,11 @@ async def search_documents(
     schema_version: Optional[str] = Query(None, description="Filter by METS schema version (1.1 or 1.2)"),
     page: int = Query(1, ge=1, description="Page number"),
     size: int = Query(20, ge=1, le=100, description="Page size"),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor of the previous page (replaces page)"),
+    total: str = Query(
+        SEARCH_TOTAL_EXACT, pattern="^(exact|none)$",
+        description="Total count: exact or none"
+    ),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
@@ -179,8 +214,13 @@ async def search_documents(
     - **schema_version**: Filter by METS ECO-MiC version (1.1 or 1.2)
     - **page**: Page number (1-indexed)
     - **size**: Number of results per page (max 100)
+    - **cursor**: `X-Next-Cursor` header of the previous page; stays fast on deep
+      pages and stable while documents are added (use instead of **page**)
+    - **total**: `exact` (default) or `none` (no total and pages: only the page is read)
 
-    Returns paginated results with relevance scoring for text searches.
+    Returns paginated results with relevance scoring for text searches. As in
+    the document and file lists, the cursor of the next page is returned in
+    the X-Next-Cursor header (absent on the last page).
     """
 
     # Build filters dictionary
@@ -200,46 +240,46 @@ async def search_documents(
     skip = (page - 1) * size
 
     # Perform MongoDB search
-    mongo_result = await mongodb_service.search_documents(
-        owner_id=current_user.id,
-        query=q,
-        filters=filters,
-        skip=skip,
-        limit=size
-    )
+    try:
+        mongo_result = await mongodb_service.search_documents(
+            owner_id=current_user.id,
+            query=q,
+            filters=filters,
+            skip=skip,
+            limit=size,
+            cursor=cursor,
+            total=total
+        )
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except PyMongoError:
+        raise HTTPException(status_code=503, detail="Search is temporarily unavailable")
 
     mets_docs = mongo_result['items']
-    total = mongo_result['total']
+
+    total_count = mongo_result['total']
+    # Calculate total pages (unknown without a total)
+    total_pages = None if total_count is None else (total_count + size - 1) // size
 
     if not mets_docs:
         return {
             "documents": [],
-            "total": 0,
+            "total": total_count,
             "page": page,
             "size": size,
-            "pages": 0
+            "pages": total_pages
         }
 
-    # Fetch PostgreSQL data for matched documents
-    logical_ids = [doc['logical_id'] for doc in mets_docs]
-    pg_docs = db.query(Document).filter(
-        Document.logical_id.in_(logical_ids),
-        Document.owner_id == current_user.id
-    ).all()
-
-    # Create lookup map
-    pg_docs_map = {doc.logical_id: doc for doc in pg_docs}
+    # Fetch PostgreSQL data for matched documents (file counts and covers in the same query)
+    pg_rows = DocumentService.get_search_rows(db, current_user.id, [doc['logical_id'] for doc in mets_docs])
 
     # Merge MongoDB metadata with PostgreSQL platform data
     results = []
     for mets_doc in mets_docs:
-        pg_doc = pg_docs_map.get(mets_doc['logical_id'])
-        if pg_doc:
-            # Count files
-            file_count = len(pg_doc.document_files) if hasattr(pg_doc, 'document_files') else 0
-
+        pg_row = pg_rows.get(mets_doc['logical_id'])
+        if pg_row:
             results.append({
-                "id": pg_doc.id,
+                "id": pg_row.id,
                 "logical_id": mets_doc['logical_id'],
                 "title": mets_doc.get('title', ''),
                 "description": mets_doc.get('description', ''),
@@ -247,18 +287,19 @@ async def search_documents(
                 "archive_name": mets_doc.get('archive', {}).get('name', ''),
                 "fund_name": mets_doc.get('archive', {}).get('fund_name', ''),
                 "schema_version": mets_doc.get('schema_version', ''),
-                "created_at": pg_doc.created_at,
-                "updated_at": pg_doc.updated_at,
-                "file_count": file_count,
+                "created_at": pg_row.created_at,
+                "updated_at": pg_row.updated_at,
+                "file_count": pg_row.file_count,
+                "cover_file_id": pg_row.cover_file_id,
+                "cover_placeholder": pg_row.cover_placeholder,
                 "search_score": mets_doc.get('search_score', 0) if q else None
             })
 
-    # Calculate total pages
-    total_pages = (total + size - 1) // size if total > 0 else 0
-
+    if mongo_result['next_cursor']:
+        response.headers[NEXT_CURSOR_HEADER] = mongo_result['next_cursor']
     return {
         "documents": results,
-        "total": total,
+        "total": total_count,
         "page": page,
         "size": size,
         "pages": total_pages
@@ -267,14 +308,28 @@ async def search_documents(
 
 @router.get("/", response_model=List[DocumentListItem])
 async def get_documents(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor of the previous page (replaces skip)"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """Get list of documents"""
+    """
+    Get list of documents, newest first
+
+    The cursor of the next page is returned in the X-Next-Cursor header
+    (absent on the last page).
+    """
     service = DocumentService(db)
-    return await service.get_documents(current_user.id, skip, limit)
+    try:
+        items = await service.get_documents(current_user.id, skip, limit, cursor=cursor)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    next_page = next_cursor(DOCUMENT_LIST_CURSOR, items, limit, lambda item: (item.created_at, item.id))
+    if next_page:
+        response.headers[NEXT_CURSOR_HEADER] = next_page
+    return items
 
 
 @router.get("/{document_id}", response_model=DocumentDetail)
@@ -362,25 +417,57 @@ async def delete_document(
 
 @router.post("/export/csv")
 async def export_metadata_csv(
-    request: BatchDeleteRequest,
+    request: DocumentSelection,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """Export metadata for multiple documents as CSV"""
+    """
+    Export metadata for multiple documents as CSV, streamed page by page
+
+    Select documents either by **document_ids** or by the search filters of
+    `/search` (**q**, **logical_id**, **archive**, **date_from**, **date_to**,
+    **schema_version**); with neither, all of your documents are exported.
+    """
     service = DocumentService(db)
-    return await service.export_metadata_csv(request.document_ids, current_user.id)
+    return await service.export_metadata_csv(
+        current_user.id,
+        document_ids=request.document_ids,
+        query=request.q,
+        filters=request.search_filters()
+    )
 
 
-# TEMPORARILY DISABLED - Needs refactoring for dual-database architecture
-# @router.post("/export/mets")
-# async def export_multiple_mets_xml(
-#     request: BatchDeleteRequest,
-#     db: Session = Depends(get_db),
-#     current_user: User = Depends(get_current_user)
-# ):
-#     """Export METS XML for multiple documents as ZIP archive"""
-#     service = DocumentService(db)
-#     return service.export_multiple_mets_xml(request.document_ids, current_user.id)
+@router.post("/export/mets")
+async def export_multiple_mets_xml(
+    request: METSBatchExportRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Export METS XML for multiple documents as a ZIP archive, streamed entry by entry
+
+    Select documents either by **document_ids** or by the search filters of
+    `/search` (**q**, **logical_id**, **archive**, **date_from**, **date_to**,
+    **schema_version**). Exported METS is not validated; set **compact** to
+    leave out the indentation whitespace.
+    """
+    filters = request.search_filters()
+    if request.document_ids is None and not (request.q or filters):
+        raise HTTPException(status_code=400, detail="Provide document_ids or at least one search filter")
+    if request.document_ids is not None and len(request.document_ids) > settings.METS_EXPORT_MAX_DOCUMENTS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.METS_EXPORT_MAX_DOCUMENTS} documents can be exported at once"
+        )
+
+    service = DocumentService(db)
+    return await service.export_multiple_mets_xml(
+        current_user.id,
+        document_ids=request.document_ids,
+        query=request.q,
+        filters=filters,
+        compact=request.compact
+    )
 
 
 @router.get("/{document_id}/export/mets")
@@ -393,6 +480,13 @@ async def export_mets_xml(
     """
     Export METS XML for a document.
 
+    With validate=false the XML is streamed section by section as it is
+    rendered (or straight from the render cache). The default validate=true
+    holds the complete XML in memory before the first byte is sent, because
+    the ECO-MiC checks need the whole document; the render cache is still
+    used, so repeat exports of an unchanged document are not re-rendered or
+    re-validated. Use validate=false to export very large documents.
+
     Args:
         document_id: Document ID to export
         validate: Whether to validate METS against ECO-MiC 1.1 before export (default: True)
@@ -412,7 +506,7 @@ async def export_single_document_csv(
 ):
     """Export CSV metadata for a single document"""
     service = DocumentService(db)
-    return await service.export_metadata_csv([document_id], current_user.id)
+    return await service.export_metadata_csv(current_user.id, document_ids=[document_id])
 
 
 # TEMPORARILY DISABLED - Needs refactoring for dual-database architecture
@@ -474,6 +568,122 @@ async def upload_document_image(
     return await service.upload_document_image(document_id, file, current_user.id)
 
 
+@router.get("/{document_id}/sprites")
+async def get_document_sprite_map(
+    document_id: int,
+    per_page: int = Query(DEFAULT_TILES_PER_PAGE, ge=1, le=MAX_TILES_PER_PAGE, description="Tiles per sprite sheet"),
+    tile_size: int = Query(DEFAULT_TILE_SIZE, ge=32, le=400, description="Tile edge in pixels"),
+    columns: int = Query(DEFAULT_COLUMNS, ge=1, le=50, description="Tiles per sprite row"),
+    file_category: Optional[str] = Query(None, description="Only include files of this category"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Get the coordinate map of a document's grid sprite sheets.
+
+    Tiles are in sequence_number order, one file per page unless file_category
+    is given; fetch each page's image from /{document_id}/sprites/{page} with
+    the same layout parameters. Layouts whose sheets would exceed 16383 px per
+    side (the WebP/AVIF limit) are rejected with 400.
+    """
+    service = DocumentService(db)
+    return await service.get_document_sprite_map(
+        document_id, current_user.id,
+        per_page=per_page, tile_size=tile_size, columns=columns, file_category=file_category
+    )
+
+
+@router.get("/{document_id}/sprites/{page}")
+async def get_document_sprite(
+    document_id: int,
+    page: int,
+    request: Request,
+    per_page: int = Query(DEFAULT_TILES_PER_PAGE, ge=1, le=MAX_TILES_PER_PAGE),
+    tile_size: int = Query(DEFAULT_TILE_SIZE, ge=32, le=400),
+    columns: int = Query(DEFAULT_COLUMNS, ge=1, le=50),
+    file_category: Optional[str] = Query(None),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Get one sprite sheet image (WebP/AVIF/JPEG negotiated via Accept) for a document grid"""
+    if page < 1:
+        raise HTTPException(status_code=400, detail="Page must be at least 1")
+
+    service = DocumentService(db)
+    return await service.get_document_sprite(
+        document_id, current_user.id,
+        page=page, per_page=per_page, tile_size=tile_size, columns=columns,
+        file_category=file_category, accept=request.headers.get("accept")
+    )
+
+
+@router.post("/{document_id}/derivatives", status_code=202)
+async def generate_document_derivatives(
+    document_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Queue generation of missing export_high/export_low derivatives for a document's masters"""
+    from app.services.derivatives import schedule_derivatives
+
+    document = db.query(Document).filter(
+        Document.id == document_id,
+        Document.owner_id == current_user.id
+    ).first()
+    if not document:
+        raise HTTPException(status_code=404, detail="Document not found")
+
+    if not schedule_derivatives(document.id):
+        raise HTTPException(status_code=409, detail="Derivative generation is disabled")
+
+    return {"message": "Derivative generation queued", "document_id": document.id}
+
+
+@router.post("/{document_id}/metadata", status_code=202)
+async def extract_document_metadata(
+    document_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Queue full raw_metadata extraction for a document's pending and failed files"""
+    from app.services.metadata import schedule_metadata_extraction
+
+    document = db.query(Document).filter(
+        Document.id == document_id,
+        Document.owner_id == current_user.id
+    ).first()
+    if not document:
+        raise HTTPException(status_code=404, detail="Document not found")
+
+    schedule_metadata_extraction(document.id, retry_failed=True)
+    return {"message": "Metadata extraction queued", "document_id": document.id}
+
+
+@router.get("/{document_id}/validation", response_model=DocumentValidationResponse)
+async def get_document_validation_verdict(
+    document_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Stored METS validation verdict of a document (from background validation or the last export)"""
+    from app.services.validation_jobs import get_document_validation
+
+    document = db.query(Document).filter(
+        Document.id == document_id,
+        Document.owner_id == current_user.id
+    ).first()
+    if not document:
+        raise HTTPException(status_code=404, detail="Document not found")
+
+    verdict = get_document_validation(db, document.id)
+    if not verdict:
+        raise HTTPException(status_code=404, detail="Document has not been validated yet")
+
+    response = DocumentValidationResponse.model_validate(verdict)
+    response.current = await DocumentService(db).is_validation_current(document, verdict)
+    return response
+
+
 @router.post("/images/batch", response_model=BatchImageUploadResult)
 async def batch_upload_images(
     files: List[UploadFile] = File(...),
@@ -1,15 +1,16 @@
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File as FastAPIFile, Form
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File as FastAPIFile, Form, Query, Request, Response
 from sqlalchemy.orm import Session
 from app.core.database import get_db
 from app.routes.auth import get_current_user
-from app.services.file import FileService
+from app.services.file import FILE_LIST_CURSOR, FileService
 from app.models.user import User
 from app.models.file import File
 from app.schemas.file import (
     FileUploadResponse, FileResponse, ChunkUploadRequest, 
     ChunkUploadResponse, CompleteUploadRequest
 )
+from app.utils.cursor import NEXT_CURSOR_HEADER, InvalidCursor, next_cursor
 import logging
 
 logger = logging.getLogger(__name__)
@@ -96,15 +97,27 @@ async def upload_single_file(
 
 @router.get("/", response_model=List[FileResponse])
 async def list_files(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor of the previous page (replaces skip)"),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """List user files"""
+    """
+    List user files, newest first
+
+    The cursor of the next page is returned in the X-Next-Cursor header
+    (absent on the last page).
+    """
     try:
-        files = file_service.get_user_files(db, current_user.id, skip, limit)
+        files = file_service.get_user_files(db, current_user.id, skip, limit, cursor=cursor)
+        next_page = next_cursor(FILE_LIST_CURSOR, files, limit, lambda file: (file.created_at, file.id))
+        if next_page:
+            response.headers[NEXT_CURSOR_HEADER] = next_page
         return [FileResponse.model_validate(file) for file in files]
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error listing files: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail="Error listing files")
@@ -130,12 +143,22 @@ async def download_file(
 @router.get("/{file_id}/stream")
 async def stream_file(
     file_id: int,
+    request: Request,
+    thumbnail: bool = Query(True, description="Serve a generated preview instead of the original for DNG files"),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """Stream file content directly"""
+    """Stream file content directly (supports Range / If-Range for partial downloads)"""
     try:
-        return await file_service.stream_file(db, file_id, current_user.id)
+        return await file_service.stream_file(
+            db,
+            file_id,
+            current_user.id,
+            thumbnail=thumbnail,
+            range_header=request.headers.get("range"),
+            if_range=request.headers.get("if-range"),
+            accept=request.headers.get("accept")
+        )
     except HTTPException:
         raise
     except Exception as e:
@@ -143,6 +166,30 @@ async def stream_file(
         raise HTTPException(status_code=500, detail="Error streaming file")
 
 
+@router.get("/{file_id}/preview")
+async def get_file_preview(
+    file_id: int,
+    request: Request,
+    tier: str = Query("viewer", description="Preview tier: 'grid' (small tiles) or 'viewer' (full preview)"),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Get a resized image preview, negotiated to AVIF/WebP/JPEG via the Accept header"""
+    try:
+        return await file_service.get_preview(
+            db,
+            file_id,
+            current_user.id,
+            tier=tier,
+            accept=request.headers.get("accept")
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error generating preview: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Error generating preview")
+
+
 @router.get("/{file_id}", response_model=FileResponse)
 async def get_file(
     file_id: int,
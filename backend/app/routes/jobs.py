@@ -0,0 +1,125 @@
+from typing import List
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+from app.core.database import get_db
+from app.routes.auth import get_current_user
+from app.models.job import Job
+from app.models.user import User
+from app.schemas.job import JobResponse, MetadataBackfillRequest, METSValidationJobRequest
+from app.services.backfill import (
+    JOB_CANCELLED, JOB_COMPLETED, JOB_FAILED, JOB_QUEUED,
+    can_resume, create_backfill_job, is_job_active, mark_job_cancelled, schedule_backfill_job
+)
+from app.services.validation_jobs import (
+    JOB_TYPE_METS_VALIDATION, create_validation_job, schedule_validation_job
+)
+import logging
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/jobs", tags=["jobs"])
+
+
+def _get_user_job(db: Session, job_id: int, user_id: int) -> Job:
+    job = db.query(Job).filter(Job.id == job_id, Job.owner_id == user_id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+def _schedule(job: Job):
+    """Start a job on the runner for its type"""
+    if job.job_type == JOB_TYPE_METS_VALIDATION:
+        schedule_validation_job(job.id)
+    else:
+        schedule_backfill_job(job.id)
+
+
+@router.post("/metadata-backfill", response_model=JobResponse, status_code=202)
+async def start_metadata_backfill(
+    request: MetadataBackfillRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Start a backfill of technical metadata for the current user's document files"""
+    job = create_backfill_job(
+        db,
+        owner_id=current_user.id,
+        batch_size=request.batch_size,
+        workers=request.workers,
+        max_files_per_second=request.max_files_per_second,
+        force=request.force
+    )
+    schedule_backfill_job(job.id)
+    return job
+
+
+@router.post("/mets-validation", response_model=JobResponse, status_code=202)
+async def start_mets_validation(
+    request: METSValidationJobRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Validate many documents in the background; poll the job for progress and read verdicts per document"""
+    job = create_validation_job(db, owner_id=current_user.id, document_ids=request.document_ids)
+    schedule_validation_job(job.id)
+    return job
+
+
+@router.get("", response_model=List[JobResponse])
+async def list_jobs(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """List the current user's jobs, newest first"""
+    return db.query(Job).filter(Job.owner_id == current_user.id).order_by(Job.id.desc()).limit(100).all()
+
+
+@router.get("/{job_id}", response_model=JobResponse)
+async def get_job(
+    job_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Get job status and progress"""
+    return _get_user_job(db, job_id, current_user.id)
+
+
+@router.post("/{job_id}/cancel", response_model=JobResponse)
+async def cancel_job(
+    job_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Cancel a job; a running job stops after its current batch"""
+    job = _get_user_job(db, job_id, current_user.id)
+    if job.status in (JOB_COMPLETED, JOB_FAILED, JOB_CANCELLED):
+        raise HTTPException(status_code=409, detail=f"Job is already {job.status}")
+    mark_job_cancelled(db, job)
+    db.refresh(job)
+    return job
+
+
+@router.post("/{job_id}/resume", response_model=JobResponse, status_code=202)
+async def resume_job(
+    job_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Resume an interrupted, cancelled or failed job from its checkpoint
+
+    A job still "running" without progress for JOB_STALE_AFTER_SECONDS (its
+    process died) can be resumed too.
+    """
+    job = _get_user_job(db, job_id, current_user.id)
+    if is_job_active(job.id):
+        raise HTTPException(status_code=409, detail="Job is still running; wait for it to stop before resuming")
+    if not can_resume(job):
+        raise HTTPException(status_code=409, detail=f"Job cannot be resumed while {job.status}")
+    job.status = JOB_QUEUED
+    job.finished_at = None
+    db.commit()
+    db.refresh(job)
+    _schedule(job)
+    return job
@@ -38,6 +38,10 @@ class DocumentFileSchema(BaseModel):
 
     # Complete DNG/EXIF metadata (all extracted tags)
     raw_metadata: Optional[Dict[str, Any]] = None
+    metadata_status: Optional[str] = None
+
+    # Low-quality image placeholder (data URI)
+    placeholder: Optional[str] = None
 
     # Include file information
     filename: Optional[str] = None
@@ -250,6 +254,10 @@ class DocumentListItem(BaseModel):
     # Computed fields
     file_count: int = 0
 
+    # Placeholder of the first image file (data URI) for grid covers
+    cover_file_id: Optional[int] = None
+    cover_placeholder: Optional[str] = None
+
     class Config:
         from_attributes = True
 
@@ -335,6 +343,22 @@ class DocumentDetail(BaseModel):
         from_attributes = True
 
 
+class DocumentValidationResponse(BaseModel):
+    """Stored METS validation verdict of a document"""
+    document_id: int
+    status: str  # valid, invalid, error
+    xml_hash: Optional[str] = None
+    engine: Optional[str] = None
+    errors: List[dict] = []
+    warnings: List[dict] = []
+    summary: Optional[str] = None
+    validated_at: Optional[datetime] = None
+    current: Optional[bool] = None  # Whether the verdict applies to the document's current METS XML
+
+    class Config:
+        from_attributes = True
+
+
 class DocumentUpload(BaseModel):
     """
     Schema for document upload with metadata
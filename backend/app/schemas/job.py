@@ -0,0 +1,37 @@
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from pydantic import BaseModel, Field
+
+
+class MetadataBackfillRequest(BaseModel):
+    """Options of a metadata backfill job (defaults come from settings)"""
+    batch_size: Optional[int] = Field(None, ge=1, le=5000)
+    workers: Optional[int] = Field(None, ge=1, le=32)
+    max_files_per_second: Optional[float] = Field(None, ge=0)
+    force: bool = False  # Re-extract every image, not only rows with missing metadata
+
+
+class METSValidationJobRequest(BaseModel):
+    """Documents to validate in bulk (None = all of the user's documents)"""
+    document_ids: Optional[List[int]] = Field(None, max_length=100000)
+
+
+class JobResponse(BaseModel):
+    """Background job status and progress"""
+    id: int
+    job_type: str
+    status: str
+    params: Optional[Dict[str, Any]] = None
+    checkpoint: Optional[Dict[str, Any]] = None
+    total: Optional[int] = None
+    processed: int = 0
+    succeeded: int = 0
+    failed: int = 0
+    error: Optional[str] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
@@ -0,0 +1,341 @@
+"""
+Metadata Backfill - Checkpointed bulk extraction for existing document files
+
+Rows ingested before technical metadata was extracted (empty MIX columns, no
+raw_metadata) are processed in keyset-paginated batches. Each batch is
+extracted in parallel from MinIO through ranged reads, written back with one
+bulk update and committed together with the job checkpoint, so the job can
+be interrupted at any time and resumed without redoing finished batches.
+
+Jobs scheduled in this process are tracked so that one job never gets two
+runners; a job left "running" by a process that died is recognised by its
+missing progress (JOB_STALE_AFTER_SECONDS) and can then be resumed.
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.document import Document, DocumentFile
+from app.models.file import File
+from app.models.job import Job
+from app.services.content_memo import ContentMemoService
+from app.services.metadata import METADATA_COMPLETE, METADATA_FAILED, MIX_COLUMNS
+from app.services.minio import MinIOService
+from app.services.ranged_reader import RangedObjectReader
+from app.services.task_queue import job_queue
+from app.utils.image_metadata import PROFILE_FULL, extract_image_metadata
+
+logger = logging.getLogger(__name__)
+
+JOB_TYPE_METADATA_BACKFILL = 'metadata_backfill'
+
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_INTERRUPTED = 'interrupted'
+JOB_CANCELLED = 'cancelled'
+JOB_COMPLETED = 'completed'
+JOB_FAILED = 'failed'
+
+# States from which a job may be started again (continuing from its checkpoint);
+# a queued job already has a runner waiting (cancel it first to reschedule it)
+RESUMABLE_STATUSES = (JOB_INTERRUPTED, JOB_CANCELLED, JOB_FAILED)
+
+# Jobs scheduled or running in this process
+_active_jobs: Set[int] = set()
+_active_jobs_lock = threading.Lock()
+
+
+def claim_job(job_id: int) -> bool:
+    """Mark a job as scheduled in this process; False if it already has a runner here"""
+    with _active_jobs_lock:
+        if job_id in _active_jobs:
+            return False
+        _active_jobs.add(job_id)
+        return True
+
+
+def release_job(job_id: int):
+    """Forget a job whose runner finished (or never started)"""
+    with _active_jobs_lock:
+        _active_jobs.discard(job_id)
+
+
+def is_job_active(job_id: int) -> bool:
+    """Whether a runner for the job is scheduled or running in this process"""
+    with _active_jobs_lock:
+        return job_id in _active_jobs
+
+
+def is_job_stale(job: Job) -> bool:
+    """A running job whose process stopped committing progress (crashed or killed)"""
+    if job.status != JOB_RUNNING:
+        return False
+    last_progress = job.updated_at or job.started_at
+    if last_progress is None:
+        return True
+    if last_progress.tzinfo is None:
+        last_progress = last_progress.replace(tzinfo=timezone.utc)
+    return (datetime.now(timezone.utc) - last_progress).total_seconds() > settings.JOB_STALE_AFTER_SECONDS
+
+
+def can_resume(job: Job) -> bool:
+    """Whether a job may be started again from its checkpoint"""
+    if is_job_active(job.id):
+        return False
+    return job.status in RESUMABLE_STATUSES or is_job_stale(job)
+
+
+def mark_job_cancelled(db: Session, job: Job):
+    """Cancel a job; a running runner notices at its next batch and stops"""
+    job.status = JOB_CANCELLED
+    job.finished_at = datetime.now(timezone.utc)
+    db.commit()
+
+
+def create_backfill_job(
+    db: Session,
+    owner_id: Optional[int] = None,
+    batch_size: Optional[int] = None,
+    workers: Optional[int] = None,
+    max_files_per_second: Optional[float] = None,
+    force: bool = False
+) -> Job:
+    """
+    Create (but do not start) a metadata backfill job
+
+    Args:
+        db: Database session
+        owner_id: Limit to documents of this user (None = all documents)
+        batch_size: Rows per batch/checkpoint (default BACKFILL_BATCH_SIZE)
+        workers: Parallel extractions (default BACKFILL_WORKERS)
+        max_files_per_second: Throttle (default BACKFILL_MAX_FILES_PER_SECOND, 0 = unlimited)
+        force: Re-extract every image, not only rows with missing metadata
+
+    Returns:
+        The new Job
+    """
+    job = Job(
+        job_type=JOB_TYPE_METADATA_BACKFILL,
+        status=JOB_QUEUED,
+        owner_id=owner_id,
+        params={
+            'owner_id': owner_id,
+            'batch_size': batch_size or settings.BACKFILL_BATCH_SIZE,
+            'workers': workers or settings.BACKFILL_WORKERS,
+            'max_files_per_second': (
+                settings.BACKFILL_MAX_FILES_PER_SECOND if max_files_per_second is None else max_files_per_second
+            ),
+            'force': force
+        },
+        checkpoint={'last_id': 0},
+        processed=0,
+        succeeded=0,
+        failed=0
+    )
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+class MetadataBackfill:
+    """Run one metadata backfill job from its checkpoint"""
+
+    def __init__(self, db: Session, job: Job, should_stop=None):
+        """
+        Args:
+            db: Database session owned by the runner
+            job: Job to run
+            should_stop: Optional callable polled between batches (e.g. on shutdown)
+        """
+        self.db = db
+        self.job = job
+        self.params = job.params or {}
+        self.should_stop = should_stop or (lambda: False)
+        self.minio_service = MinIOService()
+        self.memo_service = ContentMemoService(db)
+
+    def _pending_query(self):
+        """DocumentFile rows (with their File) the job still has to visit"""
+        query = self.db.query(DocumentFile, File).join(
+            File, DocumentFile.file_id == File.id
+        ).filter(File.content_type.like('image/%'))
+
+        if self.params.get('owner_id') is not None:
+            query = query.join(Document, DocumentFile.document_id == Document.id).filter(
+                Document.owner_id == self.params['owner_id']
+            )
+        if not self.params.get('force'):
+            query = query.filter(or_(
+                DocumentFile.raw_metadata.is_(None),
+                DocumentFile.image_width.is_(None)
+            ))
+        return query
+
+    def run(self) -> Job:
+        """
+        Process batches until done, cancelled or asked to stop
+
+        Returns:
+            The job with its final status and counters
+        """
+        job = self.job
+        if job.status == JOB_CANCELLED:
+            # Cancelled while waiting in the queue
+            return job
+        job.status = JOB_RUNNING
+        job.error = None
+        job.started_at = job.started_at or datetime.now(timezone.utc)
+        job.finished_at = None
+        if job.total is None:
+            job.total = self._pending_query().count()
+        self.db.commit()
+        logger.info(f"Metadata backfill job {job.id} started at id > {self._last_id()} ({job.total} rows)")
+
+        batch_size = max(1, int(self.params.get('batch_size') or settings.BACKFILL_BATCH_SIZE))
+        workers = max(1, int(self.params.get('workers') or settings.BACKFILL_WORKERS))
+        max_rate = float(self.params.get('max_files_per_second') or 0)
+
+        try:
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"backfill-{job.id}") as executor:
+                while True:
+                    self.db.refresh(job)
+                    if job.status != JOB_RUNNING:
+                        # Cancelled, or already handed to another runner by a resume
+                        logger.info(f"Metadata backfill job {job.id} stopped: {job.status}")
+                        break
+                    if self.should_stop():
+                        job.status = JOB_INTERRUPTED
+                        self.db.commit()
+                        logger.info(f"Metadata backfill job {job.id} interrupted at id {self._last_id()}")
+                        break
+
+                    rows = self._pending_query().filter(
+                        DocumentFile.id > self._last_id()
+                    ).order_by(DocumentFile.id).limit(batch_size).all()
+                    if not rows:
+                        job.status = JOB_COMPLETED
+                        job.finished_at = datetime.now(timezone.utc)
+                        self.db.commit()
+                        logger.info(
+                            f"Metadata backfill job {job.id} completed: "
+                            f"{job.succeeded} succeeded, {job.failed} failed"
+                        )
+                        break
+
+                    started = time.monotonic()
+                    self._process_batch(executor, rows)
+
+                    # Throttle: never exceed max_rate files per second on average
+                    if max_rate > 0:
+                        remaining = len(rows) / max_rate - (time.monotonic() - started)
+                        if remaining > 0:
+                            time.sleep(remaining)
+
+        except Exception as e:
+            self.db.rollback()
+            job.status = JOB_FAILED
+            job.error = str(e)
+            job.finished_at = datetime.now(timezone.utc)
+            self.db.commit()
+            logger.error(f"Metadata backfill job {job.id} failed: {e}", exc_info=True)
+
+        return job
+
+    def _last_id(self) -> int:
+        return int((self.job.checkpoint or {}).get('last_id') or 0)
+
+    def _process_batch(self, executor: ThreadPoolExecutor, rows: List[Tuple[DocumentFile, File]]):
+        """Extract a batch, bulk-write results and advance the checkpoint in one commit"""
+        results: Dict[int, Optional[Dict[str, Any]]] = {}
+        to_extract = []
+        for doc_file, db_file in rows:
+            memoized = self.memo_service.get_metadata(db_file.file_hash)
+            if memoized:
+                results[doc_file.id] = memoized[0]
+            else:
+                to_extract.append((doc_file.id, db_file.minio_object_name, db_file.file_size))
+
+        for doc_file_id, metadata in executor.map(lambda args: self._extract(*args), to_extract):
+            results[doc_file_id] = metadata
+
+        mappings = []
+        succeeded = 0
+        for doc_file, db_file in rows:
+            metadata = results.get(doc_file.id)
+            if not metadata or not metadata.get('format_name'):
+                mappings.append({'id': doc_file.id, 'metadata_status': METADATA_FAILED})
+                continue
+            # Merged like apply_image_metadata, so keys such as a derivative's
+            # derived_from_* provenance survive a forced re-extraction
+            mapping = {
+                'id': doc_file.id,
+                'metadata_status': METADATA_COMPLETE,
+                'raw_metadata': {**(doc_file.raw_metadata or {}), **(metadata.get('raw_metadata') or {})}
+            }
+            mapping.update({
+                column: metadata[column] for column in MIX_COLUMNS
+                if metadata.get(column) is not None
+            })
+            mappings.append(mapping)
+            self.memo_service.store_metadata(db_file.file_hash, metadata, doc_file.placeholder)
+            succeeded += 1
+
+        self.db.bulk_update_mappings(DocumentFile, mappings)
+        self.job.processed += len(rows)
+        self.job.succeeded += succeeded
+        self.job.failed += len(rows) - succeeded
+        self.job.checkpoint = {'last_id': rows[-1][0].id}
+        self.db.commit()
+        logger.info(
+            f"Metadata backfill job {self.job.id}: {self.job.processed}/{self.job.total} "
+            f"(checkpoint id {rows[-1][0].id})"
+        )
+
+    def _extract(self, doc_file_id: int, object_name: str, size: Optional[int]) -> Tuple[int, Optional[Dict]]:
+        """Full-profile extraction of one stored object through ranged reads (worker thread)"""
+        try:
+            with RangedObjectReader(object_name, self.minio_service, size=size or None) as reader:
+                return doc_file_id, extract_image_metadata(reader, PROFILE_FULL)
+        except Exception as e:
+            logger.warning(f"Backfill could not read {object_name}: {e}")
+            return doc_file_id, None
+
+
+def run_backfill_job(job_id: int, should_stop=None) -> Optional[Job]:
+    """Run a backfill job in its own database session"""
+    db = SessionLocal()
+    try:
+        job = db.query(Job).filter(Job.id == job_id).first()
+        if not job:
+            logger.warning(f"Backfill job {job_id} not found")
+            return None
+        return MetadataBackfill(db, job, should_stop).run()
+    finally:
+        db.close()
+
+
+def schedule_backfill_job(job_id: int):
+    """
+    Run a backfill job on the maintenance job queue of the API process
+
+    Returns:
+        The queued future, or None if the job already has a runner in this process
+    """
+    if not claim_job(job_id):
+        logger.warning(f"Backfill job {job_id} is already scheduled")
+        return None
+    future = job_queue.submit(
+        run_backfill_job, job_id, job_queue.stopping.is_set,
+        key=('job', job_id)
+    )
+    future.add_done_callback(lambda _: release_job(job_id))
+    return future
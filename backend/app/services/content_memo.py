@@ -0,0 +1,106 @@
+"""
+Content Memo Service - Digest-keyed reuse of extraction results
+
+Metadata extraction, placeholders and export derivatives only depend on the
+file content, so they are memoized by SHA256 (File.file_hash) and
+EXTRACTOR_VERSION. Ingest paths that see a known digest reuse the stored
+results instead of recomputing them.
+"""
+import logging
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.content_memo import ContentMemo
+from app.utils.image_metadata import EXTRACTOR_VERSION
+
+logger = logging.getLogger(__name__)
+
+# Metadata values stored as ISO strings in the JSON memo
+DATETIME_FIELDS = ('date_time_created',)
+
+
+class ContentMemoService:
+    """Read and record memoized results for file contents (changes are left for the caller to commit)"""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def get(self, content_hash: Optional[str]) -> Optional[ContentMemo]:
+        """Memo for a content digest at the current extractor version"""
+        if not settings.CONTENT_MEMO_ENABLED or not content_hash:
+            return None
+        return self.db.query(ContentMemo).filter(
+            ContentMemo.content_hash == content_hash,
+            ContentMemo.extractor_version == EXTRACTOR_VERSION
+        ).first()
+
+    def get_metadata(self, content_hash: Optional[str]) -> Optional[Tuple[Dict[str, Any], Optional[str]]]:
+        """
+        Memoized full metadata extraction for a digest
+
+        Args:
+            content_hash: SHA256 of the file content
+
+        Returns:
+            Tuple of (extract_image_metadata output, placeholder), or None if unknown
+        """
+        memo = self.get(content_hash)
+        if not memo or memo.image_metadata is None:
+            return None
+
+        metadata = dict(memo.image_metadata)
+        for field in DATETIME_FIELDS:
+            if metadata.get(field):
+                metadata[field] = datetime.fromisoformat(metadata[field])
+        logger.debug(f"Reusing memoized metadata for content {content_hash[:16]}")
+        return metadata, memo.placeholder
+
+    def store_metadata(self, content_hash: Optional[str], metadata: Dict[str, Any], placeholder: Optional[str] = None):
+        """Record a full-profile extraction result (and placeholder) for a digest"""
+        serialized = {
+            key: value.isoformat() if isinstance(value, datetime) else value
+            for key, value in metadata.items()
+        }
+        memo = self._get_or_create(content_hash)
+        if memo is not None:
+            memo.image_metadata = serialized
+            if placeholder:
+                memo.placeholder = placeholder
+
+    def store_placeholder(self, content_hash: Optional[str], placeholder: str):
+        """Fill in the placeholder of an existing memo that has none"""
+        memo = self.get(content_hash)
+        if memo is not None and not memo.placeholder:
+            memo.placeholder = placeholder
+
+    def get_derivatives(self, content_hash: Optional[str]) -> Dict[str, Dict[str, Any]]:
+        """Export derivatives previously generated from a digest, by category"""
+        memo = self.get(content_hash)
+        return dict(memo.derivatives or {}) if memo else {}
+
+    def store_derivative(self, content_hash: Optional[str], category: str, reference: Dict[str, Any]):
+        """Record the stored object of an export derivative generated from a digest"""
+        memo = self._get_or_create(content_hash)
+        if memo is not None:
+            # Reassign so the JSONB column is flagged as modified
+            memo.derivatives = {**(memo.derivatives or {}), category: reference}
+
+    def _get_or_create(self, content_hash: Optional[str]) -> Optional[ContentMemo]:
+        if not settings.CONTENT_MEMO_ENABLED or not content_hash:
+            return None
+        memo = self.get(content_hash)
+        if memo is not None:
+            return memo
+
+        try:
+            with self.db.begin_nested():
+                memo = ContentMemo(content_hash=content_hash, extractor_version=EXTRACTOR_VERSION)
+                self.db.add(memo)
+        except IntegrityError:
+            # Another worker recorded the same content concurrently
+            memo = self.get(content_hash)
+        return memo
@@ -0,0 +1,212 @@
+"""
+Metadata CSV Export - Whole collections as a streamed CSV
+
+Documents are selected by ID, by a search filter or (neither given) as the
+owner's whole collection. PostgreSQL rows are read in keyset pages
+(id > last id) and the METS fields of each page come from one MongoDB $in
+query projected to the exported fields, so memory depends on the batch size,
+not on the number of documents. Rows are written to the response page by page.
+"""
+import csv
+import io
+import logging
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.document import Document
+from app.services.mets_document import METSDocumentLoader, METSDocumentService
+from app.services.mongodb import mongodb_service
+
+logger = logging.getLogger(__name__)
+
+CSV_HEADER = [
+    # Basic identification
+    'logical_id', 'title', 'description', 'conservative_id', 'conservative_id_authority',
+    # Archive information
+    'archive_name', 'archive_contact', 'fund_name', 'series_name', 'folder_number',
+    # Temporal information
+    'date_from', 'date_to', 'period',
+    # Geographic and contextual information
+    'location', 'language', 'subjects',
+    # Document structure
+    'document_type', 'total_pages',
+    # Rights information
+    'license_url', 'rights_statement',
+    # Technical metadata
+    'image_producer', 'scanner_manufacturer', 'scanner_model',
+    # System fields
+    'created_at'
+]
+
+# METS fields read for the CSV columns (MongoDB projection)
+CSV_METS_FIELDS = (
+    'title', 'description', 'conservative_id', 'conservative_id_authority',
+    'archive.name', 'archive.contact', 'archive.fund_name', 'archive.series_name', 'archive.folder_number',
+    'temporal.date_from', 'temporal.date_to', 'temporal.period',
+    'location', 'language', 'subjects',
+    'physical.document_type', 'physical.total_pages',
+    'rights.license_url', 'rights.rights_statement',
+    'technical.image_producer', 'technical.scanner_manufacturer', 'technical.scanner_model'
+)
+
+# PostgreSQL columns of the exported rows
+_ROW_COLUMNS = (Document.id, Document.logical_id, Document.created_at, Document.mets_document_id)
+
+
+def csv_row(row, mets_doc: Optional[Dict[str, Any]]) -> List[Any]:
+    """CSV values of one document (row with logical_id and created_at, METS document or None)"""
+    mets_doc = mets_doc or {}
+    archive = mets_doc.get('archive') or {}
+    temporal = mets_doc.get('temporal') or {}
+    physical = mets_doc.get('physical') or {}
+    rights = mets_doc.get('rights') or {}
+    technical = mets_doc.get('technical') or {}
+    return [
+        # Basic identification
+        row.logical_id,
+        mets_doc.get('title'),
+        mets_doc.get('description'),
+        mets_doc.get('conservative_id'),
+        mets_doc.get('conservative_id_authority'),
+        # Archive information
+        archive.get('name'),
+        archive.get('contact'),
+        archive.get('fund_name'),
+        archive.get('series_name'),
+        archive.get('folder_number'),
+        # Temporal information
+        temporal.get('date_from'),
+        temporal.get('date_to'),
+        temporal.get('period'),
+        # Geographic and contextual information
+        mets_doc.get('location'),
+        mets_doc.get('language'),
+        mets_doc.get('subjects'),
+        # Document structure
+        physical.get('document_type'),
+        physical.get('total_pages'),
+        # Rights information
+        rights.get('license_url'),
+        rights.get('rights_statement'),
+        # Technical metadata
+        technical.get('image_producer'),
+        technical.get('scanner_manufacturer'),
+        technical.get('scanner_model'),
+        # System fields
+        row.created_at
+    ]
+
+
+async def _load_mets(mets_service: METSDocumentService, rows) -> Dict[str, Dict[str, Any]]:
+    """Exported METS fields of a page of rows (one $in query); empty if MongoDB cannot be read"""
+    try:
+        # A loader per page: exported documents are not kept for the rest of the export
+        return await METSDocumentLoader(mets_service, CSV_METS_FIELDS).load_many(
+            row.mets_document_id for row in rows
+        )
+    except Exception as e:
+        logger.error(f"Error fetching METS for CSV export: {e}")
+        return {}
+
+
+async def _iter_row_batches(
+    db,
+    owner_id: int,
+    document_ids: Optional[List[int]],
+    query: Optional[str],
+    filters: Optional[Dict[str, Any]]
+) -> AsyncIterator[List[Tuple[Any, Optional[Dict[str, Any]]]]]:
+    """Batches of (document row, METS document) pairs of the owner's selected documents"""
+    batch_size = max(1, settings.CSV_EXPORT_BATCH_SIZE)
+    mets_service = METSDocumentService(mongodb_service)
+
+    if document_ids is not None:
+        ids = sorted(set(document_ids))
+        for start in range(0, len(ids), batch_size):
+            rows = db.query(*_ROW_COLUMNS).filter(
+                Document.id.in_(ids[start:start + batch_size]),
+                Document.owner_id == owner_id
+            ).order_by(Document.id).all()
+            mets_docs = await _load_mets(mets_service, rows)
+            yield [(row, mets_docs.get(row.mets_document_id)) for row in rows]
+        return
+
+    if query or filters:
+        # Search filter: METS documents are matched in MongoDB, then joined by logical_id (as in the search route)
+        async for mets_batch in mongodb_service.iter_search_documents(
+            owner_id, query, filters, batch_size, fields=CSV_METS_FIELDS + ('logical_id',)
+        ):
+            mets_by_logical_id = {mets_doc['logical_id']: mets_doc for mets_doc in mets_batch}
+            rows = db.query(*_ROW_COLUMNS).filter(
+                Document.logical_id.in_(list(mets_by_logical_id)),
+                Document.owner_id == owner_id
+            ).order_by(Document.id).all()
+            yield [(row, mets_by_logical_id[row.logical_id]) for row in rows]
+        return
+
+    # Whole collection: keyset pagination (id > last id of the previous page) instead of OFFSET
+    last_id = 0
+    while True:
+        rows = db.query(*_ROW_COLUMNS).filter(
+            Document.owner_id == owner_id,
+            Document.id > last_id
+        ).order_by(Document.id).limit(batch_size).all()
+        if not rows:
+            return
+        last_id = rows[-1].id
+        mets_docs = await _load_mets(mets_service, rows)
+        yield [(row, mets_docs.get(row.mets_document_id)) for row in rows]
+
+
+async def iter_metadata_csv(
+    owner_id: int,
+    document_ids: Optional[List[int]] = None,
+    query: Optional[str] = None,
+    filters: Optional[Dict[str, Any]] = None
+) -> AsyncIterator[bytes]:
+    """
+    Metadata CSV of the owner's selected documents, streamed page by page
+
+    Uses its own database session, since the body is produced after the
+    request handler has returned.
+
+    Args:
+        owner_id: Owner of the documents
+        document_ids: Documents to export; with no IDs and no search, the whole collection
+        query: Full-text search query (when document_ids is None)
+        filters: Search filters as for MongoDBService.search_documents
+
+    Yields:
+        UTF-8 chunks of the CSV, starting with the header row
+    """
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(CSV_HEADER)
+    exported = 0
+    db = SessionLocal()
+    try:
+        async for batch in _iter_row_batches(db, owner_id, document_ids, query, filters):
+            for row, mets_doc in batch:
+                writer.writerow(csv_row(row, mets_doc))
+            exported += len(batch)
+            if output.tell():
+                yield output.getvalue().encode('utf-8')
+                output.seek(0)
+                output.truncate()
+        if output.tell():
+            # Nothing exported: the header only
+            yield output.getvalue().encode('utf-8')
+        logger.info(f"Metadata CSV export for user {owner_id}: {exported} documents")
+    finally:
+        db.close()
+
+
+def export_filename(document_count: Optional[int] = None, logical_id: Optional[str] = None) -> str:
+    """Download name of a CSV export (logical_id for a single document, else a count or a timestamp)"""
+    if logical_id is not None:
+        return f"{logical_id}_metadata.csv"
+    if document_count is not None:
+        return f"documents_metadata_{document_count}_items.csv"
+    return f"documents_metadata_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
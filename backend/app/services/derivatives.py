@@ -0,0 +1,427 @@
+"""
+Derivative Service - Ingest-time generation of ECO-MiC derivatives
+
+When a package only contains masters, the export_high (JPG300) and
+export_low (JPG150) copies are generated here, together with the web preview
+tiers, from a single decode of each master. Work runs on the background
+task queue after the upload request has committed.
+"""
+import hashlib
+import io
+import logging
+import os
+import shutil
+import tempfile
+from contextlib import ExitStack, contextmanager
+from typing import Dict, Iterator, List, Optional
+
+from PIL import Image
+from sqlalchemy.orm import Session, joinedload
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.document import Document, DocumentFile
+from app.models.file import File
+from app.services.content_memo import ContentMemoService
+from app.services.document_summary import refresh_file_stats
+from app.services.metadata import METADATA_COMPLETE
+from app.services.mets_cache import mets_cache
+from app.services.minio import MinIOService
+from app.services.task_queue import task_queue
+from app.utils.file_categorizer import FileCategorizer
+from app.utils.memory_budget import raw_memory_budget
+from app.utils.minio_paths import get_minio_object_path, get_derivative_object_path
+from app.utils.placeholder import create_placeholder
+from app.utils.thumbnail_generator import (
+    PREVIEW_TIERS, estimate_embedded_preview_bytes, estimate_postprocess_bytes,
+    get_thumbnail_generator, is_format_supported
+)
+
+logger = logging.getLogger(__name__)
+
+
+# ECO-MiC export derivatives: long edge in pixels, declared resolution, JPEG quality
+DERIVATIVE_SPECS = {
+    'export_high': {'long_edge': 2400, 'dpi': 300, 'quality': 90},
+    'export_low': {'long_edge': 1200, 'dpi': 150, 'quality': 85},
+}
+
+# Web preview formats rendered at ingest (AVIF is left to on-demand generation)
+PREVIEW_INGEST_FORMATS = ['jpeg', 'webp']
+
+
+class DerivativeService:
+    """Generate missing export derivatives and previews for document masters"""
+
+    def __init__(self, db: Session):
+        self.db = db
+        self.minio_service = MinIOService()
+        self.memo_service = ContentMemoService(db)
+
+    def generate_for_document(self, document_id: int) -> Dict[str, int]:
+        """
+        Generate missing derivatives for every master of a document
+
+        A master is considered covered for a category when the document already
+        has a file of that category with the same base filename (ECO-MiC
+        packages keep page names identical across TIF.Master, JPG300, JPG150).
+
+        Args:
+            document_id: Document ID
+
+        Returns:
+            Dictionary with the number of derivatives created per category
+        """
+        document = self.db.query(Document).options(
+            joinedload(Document.document_files).joinedload(DocumentFile.file)
+        ).filter(Document.id == document_id).first()
+
+        if not document:
+            logger.warning(f"Derivative generation skipped: document {document_id} not found")
+            return {}
+
+        existing = {category: set() for category in DERIVATIVE_SPECS}
+        existing_placeholders = {}
+        masters = []
+        for doc_file in document.document_files:
+            if not doc_file.file:
+                continue
+            stem = os.path.splitext(doc_file.file.filename)[0].lower()
+            if doc_file.file_category in existing:
+                existing[doc_file.file_category].add(stem)
+                existing_placeholders.setdefault(stem, []).append(doc_file.placeholder)
+            elif doc_file.file_category == 'master':
+                masters.append(doc_file)
+
+        created = {category: 0 for category in DERIVATIVE_SPECS}
+        for master in masters:
+            stem = os.path.splitext(master.file.filename)[0].lower()
+            missing = [category for category in DERIVATIVE_SPECS if stem not in existing[category]]
+            if not missing:
+                if not master.placeholder:
+                    # Masters too large for an inline placeholder reuse their page's derivative one
+                    master.placeholder = next(
+                        (placeholder for placeholder in existing_placeholders.get(stem, []) if placeholder),
+                        None
+                    )
+                    refresh_file_stats(self.db, [document.id])
+                    self.db.commit()
+                continue
+
+            try:
+                for category in self._reuse_memoized_exports(document, master, missing):
+                    created[category] += 1
+                    missing.remove(category)
+                if missing:
+                    for category in self._generate_for_master(document, master, missing):
+                        created[category] += 1
+                refresh_file_stats(self.db, [document.id])
+                self.db.commit()
+            except Exception as e:
+                self.db.rollback()
+                logger.error(
+                    f"Derivative generation failed for file {master.file_id} "
+                    f"of document {document_id}: {e}", exc_info=True
+                )
+
+        if any(created.values()):
+            mets_cache.invalidate(document.owner_id, document.id)
+        logger.info(f"Derivatives for document {document_id}: {created}")
+        return created
+
+    def _generate_for_master(
+        self,
+        document: Document,
+        master: DocumentFile,
+        missing: List[str]
+    ) -> List[str]:
+        """Decode a master once and write all missing derivatives and previews"""
+        master_file = master.file
+        spill_dir = tempfile.mkdtemp(prefix='archivia_deriv_')
+        try:
+            source_path = os.path.join(spill_dir, os.path.basename(master_file.filename) or 'master')
+            response = self.minio_service.get_file(master_file.minio_object_name)
+            try:
+                with open(source_path, 'wb') as f:
+                    shutil.copyfileobj(response, f, settings.STREAMING_CHUNK_SIZE)
+            finally:
+                response.close()
+                response.release_conn()
+
+            # The decoded image stays within the RAW memory budget until every output is encoded
+            target_long_edge = max(spec['long_edge'] for spec in DERIVATIVE_SPECS.values())
+            with decode_master(source_path, target_long_edge) as image:
+                if image is None:
+                    logger.warning(f"Could not decode master {master_file.filename}, no derivatives generated")
+                    return []
+
+                if not master.placeholder:
+                    master.placeholder = create_placeholder(image)
+
+                created = []
+                # Largest first, so each smaller derivative is resampled from the previous one
+                for category in sorted(missing, key=lambda c: -DERIVATIVE_SPECS[c]['long_edge']):
+                    image = _fit_long_edge(image, DERIVATIVE_SPECS[category]['long_edge'])
+                    self._store_export(document, master, category, image)
+                    created.append(category)
+
+                self._store_previews(master_file, image)
+                return created
+        finally:
+            shutil.rmtree(spill_dir, ignore_errors=True)
+
+    def _reuse_memoized_exports(
+        self,
+        document: Document,
+        master: DocumentFile,
+        missing: List[str]
+    ) -> List[str]:
+        """Link exports already generated from identical master content instead of re-encoding them"""
+        references = self.memo_service.get_derivatives(master.file.file_hash)
+        if not master.placeholder:
+            memo = self.memo_service.get(master.file.file_hash)
+            master.placeholder = memo.placeholder if memo else None
+
+        reused = []
+        for category in missing:
+            reference = references.get(category)
+            if not reference:
+                continue
+            filename = f"{os.path.splitext(master.file.filename)[0]}.jpg"
+            object_name = get_minio_object_path(document.owner_id, reference['file_hash'], category, filename)
+            try:
+                if not self.minio_service.object_exists(object_name):
+                    self.minio_service.copy_object(reference['object_name'], object_name)
+            except Exception as e:
+                logger.warning(f"Memoized {category} derivative {reference['object_name']} not reusable: {e}")
+                continue
+
+            self._link_export(document, master, category, {**reference, 'object_name': object_name})
+            logger.info(f"Reused {category} derivative {reference['object_name']} for {master.file.filename}")
+            reused.append(category)
+        return reused
+
+    def _store_export(
+        self,
+        document: Document,
+        master: DocumentFile,
+        category: str,
+        image: Image.Image
+    ) -> DocumentFile:
+        """Encode an export JPEG, upload it and link it to the document"""
+        spec = DERIVATIVE_SPECS[category]
+        output = io.BytesIO()
+        save_options = {
+            'quality': spec['quality'],
+            'optimize': True,
+            'progressive': True,
+            'dpi': (spec['dpi'], spec['dpi'])
+        }
+        if image.info.get('icc_profile'):
+            save_options['icc_profile'] = image.info['icc_profile']
+        image.save(output, format='JPEG', **save_options)
+        data = output.getvalue()
+
+        file_hash = hashlib.sha256(data).hexdigest()
+        filename = f"{os.path.splitext(master.file.filename)[0]}.jpg"
+        object_name = get_minio_object_path(document.owner_id, file_hash, category, filename)
+        self.minio_service.put_bytes(object_name, data, 'image/jpeg')
+
+        reference = {
+            'object_name': object_name,
+            'file_hash': file_hash,
+            'file_size': len(data),
+            'image_width': image.width,
+            'image_height': image.height,
+            'icc_embedded': bool(save_options.get('icc_profile'))
+        }
+        self.memo_service.store_derivative(master.file.file_hash, category, reference)
+        doc_file = self._link_export(document, master, category, reference)
+        logger.info(f"Generated {category} derivative {object_name} from {master.file.filename}")
+        return doc_file
+
+    def _link_export(
+        self,
+        document: Document,
+        master: DocumentFile,
+        category: str,
+        reference: Dict
+    ) -> DocumentFile:
+        """Create the File and DocumentFile rows of a stored export derivative"""
+        spec = DERIVATIVE_SPECS[category]
+        filename = f"{os.path.splitext(master.file.filename)[0]}.jpg"
+        db_file = File(
+            filename=filename,
+            original_filename=filename,
+            file_size=reference['file_size'],
+            content_type='image/jpeg',
+            owner_id=document.owner_id,
+            file_hash=reference['file_hash'],
+            minio_object_name=reference['object_name'],
+            bucket_name=settings.MINIO_BUCKET_NAME,
+            upload_completed=True
+        )
+        self.db.add(db_file)
+        self.db.flush()
+
+        doc_file = DocumentFile(
+            document_id=document.id,
+            file_id=db_file.id,
+            file_category=category,
+            file_use=FileCategorizer.get_file_use_from_category(category),
+            file_label=master.file_label,
+            sequence_number=master.sequence_number,
+            checksum_md5=reference['file_hash'],
+            image_width=reference['image_width'],
+            image_height=reference['image_height'],
+            bits_per_sample='8,8,8',
+            samples_per_pixel=3,
+            compression_scheme='JPEG',
+            color_space='RGB' if reference['icc_embedded'] else 'sRGB',
+            sampling_frequency_unit='in.',
+            x_sampling_frequency=spec['dpi'],
+            y_sampling_frequency=spec['dpi'],
+            format_name='image/jpeg',
+            icc_profile_name=master.icc_profile_name if reference['icc_embedded'] else None,
+            raw_metadata={
+                'derived_from_file_id': master.file_id,
+                'derived_from_checksum': master.file.file_hash
+            },
+            metadata_status=METADATA_COMPLETE,
+            placeholder=master.placeholder
+        )
+        self.db.add(doc_file)
+        return doc_file
+
+    def _store_previews(self, master_file: File, image: Image.Image):
+        """Pre-render web preview tiers into the derivative cache"""
+        if not master_file.file_hash:
+            return
+
+        for tier in PREVIEW_TIERS:
+            for output_format in PREVIEW_INGEST_FORMATS:
+                if not is_format_supported(output_format):
+                    continue
+                generator = get_thumbnail_generator(tier, output_format)
+                object_name = get_derivative_object_path(
+                    master_file.owner_id, master_file.file_hash, f"preview_{tier}", generator.extension
+                )
+                try:
+                    result = generator.generate_from_image(image)
+                    if result:
+                        self.minio_service.put_bytes(object_name, result[0], result[1])
+                except Exception as e:
+                    logger.warning(f"Could not store preview {object_name}: {e}")
+
+
+@contextmanager
+def decode_master(path: str, target_long_edge: int) -> Iterator[Optional[Image.Image]]:
+    """
+    Decode a master image to an RGB PIL image large enough for the biggest derivative
+
+    RAW files use the embedded preview when it is large enough, otherwise the
+    sensor data is demosaiced (at half size when that still covers the target).
+    Used as a context manager: a RAW decode keeps its memory reservation until
+    the with-block ends, so the decoded image is counted against the budget
+    while the caller resizes and encodes it.
+
+    Yields:
+        The decoded image, or None if it could not be decoded
+    """
+    if path.lower().endswith(tuple(FileCategorizer.MASTER_EXTENSIONS)):
+        import rawpy
+
+        # Background work queues for memory budget instead of being refused on a timeout
+        with ExitStack() as reservation:
+            with rawpy.imread(path) as raw:
+                decode_size = (target_long_edge, target_long_edge)
+                reservation.enter_context(
+                    raw_memory_budget.reserve(estimate_embedded_preview_bytes(raw, decode_size), timeout=None)
+                )
+                image = _embedded_preview(raw, target_long_edge)
+                if image is None:
+                    # Trade the preview reservation for the (larger) demosaic one
+                    reservation.close()
+                    half_size = max(raw.sizes.width, raw.sizes.height) // 2 >= target_long_edge
+                    reservation.enter_context(
+                        raw_memory_budget.reserve(estimate_postprocess_bytes(raw, half_size), timeout=None)
+                    )
+                    image = Image.fromarray(raw.postprocess(
+                        use_camera_wb=True,
+                        half_size=half_size,
+                        no_auto_bright=True,
+                        output_bps=8
+                    ))
+            yield image
+        return
+
+    try:
+        image = Image.open(path)
+        if image.format == 'JPEG':
+            image.draft('RGB', (target_long_edge, target_long_edge))
+        image = _to_rgb(image)
+    except Exception as e:
+        logger.error(f"Error decoding master {path}: {e}", exc_info=True)
+        image = None
+    yield image
+
+
+def _embedded_preview(raw, target_long_edge: int) -> Optional[Image.Image]:
+    """The RAW file's embedded JPEG preview as RGB, if it covers target_long_edge"""
+    import rawpy
+
+    try:
+        thumb = raw.extract_thumb()
+    except (rawpy.LibRawNoThumbnailError, rawpy.LibRawUnsupportedThumbnailError):
+        return None
+    if thumb.format != rawpy.ThumbFormat.JPEG:
+        return None
+    preview = Image.open(io.BytesIO(thumb.data))
+    if max(preview.size) < target_long_edge:
+        return None
+    preview.draft('RGB', (target_long_edge, target_long_edge))
+    return _to_rgb(preview)
+
+
+def _to_rgb(image: Image.Image) -> Image.Image:
+    """Convert any decoded mode to RGB, keeping the ICC profile"""
+    icc_profile = image.info.get('icc_profile')
+    if image.mode in ('I;16', 'I;16B', 'I;16L', 'I'):
+        image = image.convert('I').point(lambda value: value * (1 / 256)).convert('L')
+    if image.mode in ('RGBA', 'LA', 'P'):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.split()[-1])
+        image = background
+    elif image.mode != 'RGB':
+        image = image.convert('RGB')
+    if icc_profile:
+        image.info['icc_profile'] = icc_profile
+    return image
+
+
+def _fit_long_edge(image: Image.Image, long_edge: int) -> Image.Image:
+    """Downscale so the longest side is at most long_edge (never upscales)"""
+    if max(image.size) <= long_edge:
+        return image
+    icc_profile = image.info.get('icc_profile')
+    resized = image.copy()
+    resized.thumbnail((long_edge, long_edge), Image.Resampling.LANCZOS)
+    if icc_profile:
+        resized.info['icc_profile'] = icc_profile
+    return resized
+
+
+def _run_derivatives(document_id: int):
+    db = SessionLocal()
+    try:
+        DerivativeService(db).generate_for_document(document_id)
+    finally:
+        db.close()
+
+
+def schedule_derivatives(document_id: int):
+    """Queue derivative generation for a document (no-op when disabled)"""
+    if not settings.DERIVATIVES_ENABLED:
+        return None
+    return task_queue.submit(_run_derivatives, document_id, key=('derivatives', document_id))
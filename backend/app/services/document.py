@@ -1,4 +1,4 @@
-import csv
+import asyncio
 import hashlib
 import io
 import logging
@@ -6,16 +6,19 @@ import os
 import tempfile
 import zipfile
 from datetime import datetime
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import func
+from sqlalchemy import func, tuple_
 from fastapi import HTTPException, UploadFile
-from fastapi.responses import StreamingResponse
+from fastapi.responses import Response, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 
 logger = logging.getLogger(__name__)
 
 from app.core.config import settings
 from app.models.document import Document, DocumentFile
+from app.models.document_validation import DocumentValidation
+from app.models.document_summary import DocumentSummary
 from app.models.file import File
 from app.models.user import User
 from app.schemas.document import DocumentCreate, DocumentUpdate, DocumentListItem, DocumentDetail, DocumentUpload
@@ -24,11 +27,40 @@ from app.services.minio import MinIOService
 from app.services.mongodb import mongodb_service
 from app.services.mets_document import METSDocumentService
 from app.services.transaction_coordinator import TransactionCoordinator
-from app.utils.mets_generator_ecomic import METSEcoMicGenerator
+from app.services.derivatives import schedule_derivatives
+from app.services.content_memo import ContentMemoService
+from app.services.document_summary import (
+    add_summary, cover_placeholders, delete_summary, ensure_owner_summaries, fill_mets_fields, refresh_file_stats,
+    sync_document_fields
+)
+from app.services.metadata import (
+    METADATA_COMPLETE, METADATA_PENDING, apply_image_metadata, initial_metadata_status,
+    inline_metadata_profile, schedule_metadata_extraction, schedule_placeholders
+)
+from app.services.mets_cache import mets_cache, mets_cache_key
+from app.services.csv_export import export_filename as export_csv_filename, iter_metadata_csv
+from app.services.mets_export import export_filename, iter_mets_zip
+from app.services.mets_stream import iter_document_mets, stream_document_mets
+from app.services.validation_jobs import (
+    VALIDATION_INVALID, VALIDATION_VALID, mets_xml_hash, schedule_document_validation, validate_document_xml
+)
+from app.utils.cursor import decode_cursor, parse_datetime
 from app.utils.file_validator import validate_file_type_and_size, validate_filename
 from app.utils.image_metadata import extract_image_metadata
 from app.utils.file_categorizer import FileCategorizer
 from app.utils.metadata_parser import MetadataParser
+from app.utils.placeholder import create_placeholder_from_file
+from app.utils.file_utils import calculate_file_set_hash
+from app.utils.memory_budget import MemoryBudgetExceeded
+from app.utils.minio_paths import get_derivative_object_path
+from app.utils.sprite_sheet import (
+    DEFAULT_COLUMNS, DEFAULT_TILE_SIZE, DEFAULT_TILES_PER_PAGE, SPRITE_CATEGORY_PREFERENCE,
+    SPRITE_LAYOUT_VERSION, SpriteTooLarge, check_sprite_size, render_sprite, sprite_layout
+)
+from app.utils.thumbnail_generator import PREVIEW_FORMATS, encode_image, negotiate_preview_format
+
+# Cursor kind of the document list (keyed on created_at, id)
+DOCUMENT_LIST_CURSOR = 'documents'
 
 
 class DocumentService:
@@ -42,14 +74,16 @@ class DocumentService:
         self.mets_service = METSDocumentService(mongodb_service)
         self.coordinator = TransactionCoordinator(db, self.mets_service, self.minio_service)
 
-    async def _convert_to_document_detail(self, document: Document) -> DocumentDetail:
+    async def _convert_to_document_detail(self, document: Document, include_files: bool = True) -> DocumentDetail:
         """
         Convert Document ORM model to DocumentDetail schema.
         Merges platform data (PostgreSQL) with METS metadata (MongoDB).
+
+        With include_files=False, document_files is left empty (and not loaded).
         """
         # Get files from PostgreSQL relationship
         document_files = []
-        for doc_file in document.document_files:
+        for doc_file in (document.document_files if include_files else []):
             file_data = {
                 'id': doc_file.id,
                 'file_id': doc_file.file_id,
@@ -77,6 +111,8 @@ class DocumentService:
                 'scanning_software_name': doc_file.scanning_software_name,
                 'scanning_software_version': doc_file.scanning_software_version,
                 'raw_metadata': doc_file.raw_metadata,
+                'metadata_status': doc_file.metadata_status,
+                'placeholder': doc_file.placeholder,
                 'filename': doc_file.file.filename,
                 'file_size': doc_file.file.file_size,
                 'content_type': doc_file.file.content_type
@@ -84,86 +120,94 @@ class DocumentService:
             document_files.append(file_data)
 
         # Get METS metadata from MongoDB if available
-        mets_data = {}
+        mets_doc = None
         if document.mets_document_id:
             try:
                 mets_doc = await self.mets_service.get_mets_document(document.mets_document_id)
-                if mets_doc:
-                    # Extract METS fields from MongoDB document
-                    mets_data = {
-                        'conservative_id': mets_doc.get('conservative_id'),
-                        'conservative_id_authority': mets_doc.get('conservative_id_authority'),
-                        'title': mets_doc.get('title'),
-                        'description': mets_doc.get('description'),
-                        'type_of_resource': mets_doc.get('type_of_resource'),
-                        'location': mets_doc.get('location'),
-                        'language': mets_doc.get('language'),
-                        'subjects': mets_doc.get('subjects'),
-                        'schema_version': mets_doc.get('schema_version'),
-                    }
-
-                    # Archive fields
-                    if 'archive' in mets_doc and mets_doc['archive']:
-                        archive = mets_doc['archive']
-                        mets_data['archive_name'] = archive.get('name')
-                        mets_data['archive_contact'] = archive.get('contact')
-                        mets_data['fund_name'] = archive.get('fund_name')
-                        mets_data['series_name'] = archive.get('series_name')
-                        mets_data['folder_number'] = archive.get('folder_number')
-
-                    # Temporal fields
-                    if 'temporal' in mets_doc and mets_doc['temporal']:
-                        temporal = mets_doc['temporal']
-                        mets_data['date_from'] = temporal.get('date_from')
-                        mets_data['date_to'] = temporal.get('date_to')
-                        mets_data['period'] = temporal.get('period')
-
-                    # Agents fields
-                    if 'agents' in mets_doc and mets_doc['agents']:
-                        agents = mets_doc['agents']
-                        if 'producer' in agents and agents['producer']:
-                            producer = agents['producer']
-                            mets_data['producer_name'] = producer.get('name')
-                            mets_data['producer_type'] = producer.get('type')
-                            mets_data['producer_role'] = producer.get('role')
-                        if 'creator' in agents and agents['creator']:
-                            creator = agents['creator']
-                            mets_data['creator_name'] = creator.get('name')
-                            mets_data['creator_type'] = creator.get('type')
-                            mets_data['creator_role'] = creator.get('role')
-
-                    # Rights fields
-                    if 'rights' in mets_doc and mets_doc['rights']:
-                        rights = mets_doc['rights']
-                        mets_data['license_url'] = rights.get('license_url')
-                        mets_data['rights_statement'] = rights.get('rights_statement')
-                        mets_data['rights_category'] = rights.get('category')
-                        mets_data['rights_holder'] = rights.get('holder')
-                        mets_data['rights_constraint'] = rights.get('constraint')
-
-                    # Technical fields
-                    if 'technical' in mets_doc and mets_doc['technical']:
-                        technical = mets_doc['technical']
-                        mets_data['image_producer'] = technical.get('image_producer')
-                        mets_data['scanner_manufacturer'] = technical.get('scanner_manufacturer')
-                        mets_data['scanner_model'] = technical.get('scanner_model')
-
-                    # Physical fields
-                    if 'physical' in mets_doc and mets_doc['physical']:
-                        physical = mets_doc['physical']
-                        mets_data['document_type'] = physical.get('document_type')
-                        mets_data['total_pages'] = physical.get('total_pages')
-                        mets_data['physical_form'] = physical.get('physical_form')
-                        mets_data['extent_description'] = physical.get('extent_description')
-
-                    # METS header fields
-                    if 'mets_header' in mets_doc and mets_doc['mets_header']:
-                        mets_header = mets_doc['mets_header']
-                        mets_data['record_status'] = mets_header.get('record_status')
-
             except Exception as e:
                 logger.error(f"Error fetching METS metadata for document {document.id}: {e}", exc_info=True)
 
+        return self._build_document_detail(document, mets_doc, document_files)
+
+    @staticmethod
+    def _build_document_detail(
+        document: Document, mets_doc: Optional[Dict[str, Any]], document_files: List[Dict[str, Any]]
+    ) -> DocumentDetail:
+        """Merge a Document row with its METS document (MongoDB, may be None) into a DocumentDetail"""
+        mets_data = {}
+        if mets_doc:
+            # Extract METS fields from MongoDB document
+            mets_data = {
+                'conservative_id': mets_doc.get('conservative_id'),
+                'conservative_id_authority': mets_doc.get('conservative_id_authority'),
+                'title': mets_doc.get('title'),
+                'description': mets_doc.get('description'),
+                'type_of_resource': mets_doc.get('type_of_resource'),
+                'location': mets_doc.get('location'),
+                'language': mets_doc.get('language'),
+                'subjects': mets_doc.get('subjects'),
+                'schema_version': mets_doc.get('schema_version'),
+            }
+
+            # Archive fields
+            if 'archive' in mets_doc and mets_doc['archive']:
+                archive = mets_doc['archive']
+                mets_data['archive_name'] = archive.get('name')
+                mets_data['archive_contact'] = archive.get('contact')
+                mets_data['fund_name'] = archive.get('fund_name')
+                mets_data['series_name'] = archive.get('series_name')
+                mets_data['folder_number'] = archive.get('folder_number')
+
+            # Temporal fields
+            if 'temporal' in mets_doc and mets_doc['temporal']:
+                temporal = mets_doc['temporal']
+                mets_data['date_from'] = temporal.get('date_from')
+                mets_data['date_to'] = temporal.get('date_to')
+                mets_data['period'] = temporal.get('period')
+
+            # Agents fields
+            if 'agents' in mets_doc and mets_doc['agents']:
+                agents = mets_doc['agents']
+                if 'producer' in agents and agents['producer']:
+                    producer = agents['producer']
+                    mets_data['producer_name'] = producer.get('name')
+                    mets_data['producer_type'] = producer.get('type')
+                    mets_data['producer_role'] = producer.get('role')
+                if 'creator' in agents and agents['creator']:
+                    creator = agents['creator']
+                    mets_data['creator_name'] = creator.get('name')
+                    mets_data['creator_type'] = creator.get('type')
+                    mets_data['creator_role'] = creator.get('role')
+
+            # Rights fields
+            if 'rights' in mets_doc and mets_doc['rights']:
+                rights = mets_doc['rights']
+                mets_data['license_url'] = rights.get('license_url')
+                mets_data['rights_statement'] = rights.get('rights_statement')
+                mets_data['rights_category'] = rights.get('category')
+                mets_data['rights_holder'] = rights.get('holder')
+                mets_data['rights_constraint'] = rights.get('constraint')
+
+            # Technical fields
+            if 'technical' in mets_doc and mets_doc['technical']:
+                technical = mets_doc['technical']
+                mets_data['image_producer'] = technical.get('image_producer')
+                mets_data['scanner_manufacturer'] = technical.get('scanner_manufacturer')
+                mets_data['scanner_model'] = technical.get('scanner_model')
+
+            # Physical fields
+            if 'physical' in mets_doc and mets_doc['physical']:
+                physical = mets_doc['physical']
+                mets_data['document_type'] = physical.get('document_type')
+                mets_data['total_pages'] = physical.get('total_pages')
+                mets_data['physical_form'] = physical.get('physical_form')
+                mets_data['extent_description'] = physical.get('extent_description')
+
+            # METS header fields
+            if 'mets_header' in mets_doc and mets_doc['mets_header']:
+                mets_header = mets_doc['mets_header']
+                mets_data['record_status'] = mets_header.get('record_status')
+
         # Merge platform data (PostgreSQL) with METS metadata (MongoDB)
         return DocumentDetail(
             # Platform fields (PostgreSQL)
@@ -262,6 +306,41 @@ class DocumentService:
         ]
         return content_type.lower() in image_types
 
+    def _extract_ingest_metadata(self, path: str, file_hash: str, filename: str) -> tuple:
+        """
+        Extract technical metadata and placeholder of an ingested image
+
+        Content already processed (same SHA256) reuses the memoized full
+        extraction; otherwise the inline profile runs and, when that profile
+        is the full one, its result is memoized.
+
+        Args:
+            path: Local path of the uploaded file
+            file_hash: SHA256 of the file
+            filename: Original filename
+
+        Returns:
+            Tuple of (metadata dict, placeholder, metadata_status)
+        """
+        memo_service = ContentMemoService(self.db)
+        memoized = memo_service.get_metadata(file_hash)
+        if memoized:
+            metadata, placeholder = memoized
+            return metadata, placeholder or create_placeholder_from_file(path, filename), METADATA_COMPLETE
+
+        metadata = {}
+        try:
+            metadata = extract_image_metadata(path, inline_metadata_profile())
+            logger.info(f"Extracted metadata for {filename}: {metadata}")
+        except Exception as e:
+            logger.error(f"Error extracting metadata from {filename}: {e}", exc_info=True)
+        placeholder = create_placeholder_from_file(path, filename)
+
+        metadata_status = initial_metadata_status(True)
+        if metadata_status == METADATA_COMPLETE and metadata.get('format_name'):
+            memo_service.store_metadata(file_hash, metadata, placeholder)
+        return metadata, placeholder, metadata_status
+
     async def create_document(self, document_data: DocumentCreate, user_id: int) -> Document:
         """
         Create a new document using dual-database architecture.
@@ -298,6 +377,7 @@ class DocumentService:
             )
             self.db.add(document)
             self.db.flush()  # Get ID without committing
+            add_summary(self.db, document, document_data.dict())
             return document.id
 
         # Phase 2: MongoDB operation (METS metadata)
@@ -421,12 +501,12 @@ class DocumentService:
 
             # Extract image metadata if it's an image file
             metadata = {}
+            placeholder = None
+            metadata_status = None
             if self._is_image_file(file.content_type):
-                try:
-                    metadata = extract_image_metadata(tmp_file_path)
-                    logger.info(f"Extracted metadata for {file.filename}: {metadata}")
-                except Exception as e:
-                    logger.error(f"Error extracting metadata from {file.filename}: {e}", exc_info=True)
+                metadata, placeholder, metadata_status = self._extract_ingest_metadata(
+                    tmp_file_path, file_hash, file.filename
+                )
 
             # Get file_use from already-categorized file_category
             file_use = categorizer.get_file_use_from_category(file_category)
@@ -460,12 +540,22 @@ class DocumentService:
                 scanning_software_name=metadata.get('scanning_software_name'),
                 scanning_software_version=metadata.get('scanning_software_version'),
                 # Comprehensive raw metadata (ALL EXIF/DNG tags)
-                raw_metadata=metadata.get('raw_metadata')
+                raw_metadata=metadata.get('raw_metadata'),
+                metadata_status=metadata_status,
+                placeholder=placeholder
             )
 
             self.db.add(doc_file)
+            refresh_file_stats(self.db, [document.id])
             self.db.commit()
 
+            if doc_file.metadata_status == METADATA_PENDING:
+                schedule_metadata_extraction(document.id)
+            if self._is_image_file(file.content_type) and not doc_file.placeholder:
+                schedule_placeholders(document.id)
+            if file_category == 'master':
+                schedule_derivatives(document.id)
+
             return document
 
         except Exception as e:
@@ -483,72 +573,119 @@ class DocumentService:
                 except OSError:
                     pass  # Log but don't fail if cleanup fails
 
-    async def get_documents(self, user_id: int, skip: int = 0, limit: int = 100) -> List[DocumentListItem]:
+    async def get_documents(
+        self,
+        user_id: int,
+        skip: int = 0,
+        limit: int = 100,
+        cursor: Optional[str] = None
+    ) -> List[DocumentListItem]:
+        """
+        Get list of documents for a user, newest first.
+        Reads the document_summaries read model (key METS fields, file count
+        and cover kept in sync on writes): one indexed query, no MongoDB.
+        Documents from before the read model get their summary on the
+        owner's first listing and their METS fields (one batched MongoDB
+        query) on the first page that shows them.
+
+        Args:
+            user_id: Owner of the documents
+            skip: Offset pagination (ignored when a cursor is given)
+            limit: Page size
+            cursor: Keyset pagination: X-Next-Cursor of the previous page
+
+        Raises:
+            InvalidCursor: If the cursor does not belong to this listing
+        """
+        ensure_owner_summaries(self.db, user_id)
+        query = self.db.query(DocumentSummary).filter(
+            DocumentSummary.owner_id == user_id
+        ).order_by(
+            DocumentSummary.created_at.desc(),
+            DocumentSummary.document_id.desc()
+        )
+        if cursor:
+            # Keyset: strictly after the last (created_at, id) of the previous page
+            created_at, last_id = decode_cursor(cursor, DOCUMENT_LIST_CURSOR, (parse_datetime, int))
+            query = query.filter(
+                tuple_(DocumentSummary.created_at, DocumentSummary.document_id) < tuple_(created_at, last_id)
+            )
+        else:
+            query = query.offset(skip)
+
+        summaries = query.limit(limit).all()
+        await fill_mets_fields(self.db, self.mets_service, summaries)
+        return [
+            DocumentListItem(
+                id=summary.document_id,
+                logical_id=summary.logical_id,
+                owner_id=summary.owner_id,
+                created_at=summary.created_at,
+                updated_at=summary.updated_at,
+                title=summary.title,
+                archive_name=summary.archive_name,
+                document_type=summary.document_type,
+                total_pages=summary.total_pages,
+                file_count=summary.file_count,
+                cover_file_id=summary.cover_file_id,
+                cover_placeholder=summary.cover_placeholder
+            )
+            for summary in summaries
+        ]
+
+    @staticmethod
+    def get_cover_placeholders(db: Session, document_ids: List[int]) -> Dict[int, tuple]:
+        """
+        Get the first file placeholder of each document in one query
+
+        Args:
+            db: Database session
+            document_ids: Document IDs on the current page
+
+        Returns:
+            Dictionary mapping document_id to (file_id, placeholder)
+        """
+        return cover_placeholders(db, document_ids)
+
+    @staticmethod
+    def get_search_rows(db: Session, owner_id: int, logical_ids: List[str]) -> Dict[str, Any]:
         """
-        Get list of documents for a user.
-        Merges platform data (PostgreSQL) with key METS fields (MongoDB).
+        Get the platform fields of search results in one query
+
+        File count and cover placeholder come from the document's summary;
+        the owner's missing summaries (documents from before the read model)
+        are created first, like the document list does, so no result reports
+        zero files for lack of a summary.
+
+        Args:
+            db: Database session
+            owner_id: Owner of the documents
+            logical_ids: Logical IDs of the METS documents on the current page
+
+        Returns:
+            Dictionary mapping logical_id to a row with id, created_at, updated_at,
+            file_count, cover_file_id and cover_placeholder
         """
-        # Get platform data from PostgreSQL
-        query = self.db.query(
+        if not logical_ids:
+            return {}
+
+        ensure_owner_summaries(db, owner_id)
+        rows = db.query(
             Document.id,
             Document.logical_id,
-            Document.owner_id,
             Document.created_at,
             Document.updated_at,
-            Document.mets_document_id,
-            func.count(DocumentFile.id).label('file_count')
+            func.coalesce(DocumentSummary.file_count, 0).label('file_count'),
+            DocumentSummary.cover_file_id,
+            DocumentSummary.cover_placeholder
         ).outerjoin(
-            DocumentFile, Document.id == DocumentFile.document_id
+            DocumentSummary, DocumentSummary.document_id == Document.id
         ).filter(
-            Document.owner_id == user_id
-        ).group_by(
-            Document.id,
-            Document.logical_id,
-            Document.owner_id,
-            Document.created_at,
-            Document.updated_at,
-            Document.mets_document_id
-        ).order_by(
-            Document.created_at.desc()
-        ).offset(skip).limit(limit)
-
-        results = query.all()
-
-        # Build document list items, merging MongoDB data
-        items = []
-        for row in results:
-            # Default METS fields
-            title = None
-            archive_name = None
-            document_type = None
-            total_pages = None
-
-            # Fetch METS metadata if available
-            if row.mets_document_id:
-                try:
-                    mets_doc = await self.mets_service.get_mets_document(row.mets_document_id)
-                    if mets_doc:
-                        title = mets_doc.get('title')
-                        document_type = mets_doc.get('physical', {}).get('document_type') if mets_doc.get('physical') else None
-                        total_pages = mets_doc.get('physical', {}).get('total_pages') if mets_doc.get('physical') else None
-                        archive_name = mets_doc.get('archive', {}).get('name') if mets_doc.get('archive') else None
-                except Exception as e:
-                    logger.error(f"Error fetching METS for document {row.id}: {e}")
-
-            items.append(DocumentListItem(
-                id=row.id,
-                logical_id=row.logical_id,
-                owner_id=row.owner_id,
-                created_at=row.created_at,
-                updated_at=row.updated_at,
-                title=title,
-                archive_name=archive_name,
-                document_type=document_type,
-                total_pages=total_pages,
-                file_count=row.file_count
-            ))
-
-        return items
+            Document.logical_id.in_(logical_ids),
+            Document.owner_id == owner_id
+        ).all()
+
+        return {row.logical_id: row for row in rows}
 
     async def get_document(self, document_id: int, user_id: int) -> Optional[DocumentDetail]:
         """
@@ -603,17 +740,19 @@ class DocumentService:
                     structured_mets
                 )
 
-            # Define PostgreSQL timestamp update
-            def update_postgres_timestamp():
-                document.updated_at = datetime.utcnow()
+            # Define PostgreSQL timestamp and summary update
+            def update_postgres():
+                if 'logical_id' in update_dict:
+                    document.updated_at = datetime.utcnow()
                 self.db.flush()
+                sync_document_fields(self.db, document, structured_mets)
 
             # Execute coordinated update
             try:
                 success = await self.coordinator.execute_document_update(
                     mets_id=document.mets_document_id,
                     mets_update_op=update_mets,
-                    postgres_update_op=update_postgres_timestamp if 'logical_id' in update_dict else None
+                    postgres_update_op=update_postgres
                 )
 
                 if not success:
@@ -624,9 +763,13 @@ class DocumentService:
         else:
             # Only platform update or no METS document yet
             if 'logical_id' in update_dict:
+                self.db.flush()
+                sync_document_fields(self.db, document)
                 self.db.commit()
 
         self.db.refresh(document)
+        mets_cache.invalidate(document.owner_id, document.id)
+        schedule_document_validation(document.id)
         return document
 
     async def delete_document(self, document_id: int, user_id: int) -> bool:
@@ -649,8 +792,11 @@ class DocumentService:
             if doc_file.file and doc_file.file.minio_object_name
         ]
 
+        mets_cache.invalidate(document.owner_id, document.id)
+
         # Define PostgreSQL deletion
         def delete_postgres() -> bool:
+            delete_summary(self.db, document.id)
             self.db.delete(document)
             self.db.flush()
             return True
@@ -675,142 +821,60 @@ class DocumentService:
                 except Exception as e:
                     logger.error(f"Error deleting file from MinIO: {e}", exc_info=True)
 
+            delete_summary(self.db, document.id)
             self.db.delete(document)
             self.db.commit()
             return True
 
-    async def export_metadata_csv(self, document_ids: List[int], user_id: int) -> StreamingResponse:
-        """Export metadata for multiple documents as CSV"""
-        # First verify all documents belong to user
-        document_count = self.db.query(Document).filter(
-            Document.id.in_(document_ids),
-            Document.owner_id == user_id
-        ).count()
+    async def export_metadata_csv(
+        self,
+        user_id: int,
+        document_ids: Optional[List[int]] = None,
+        query: Optional[str] = None,
+        filters: Optional[Dict[str, Any]] = None
+    ) -> StreamingResponse:
+        """
+        Export metadata of documents as CSV, streamed page by page.
 
-        if document_count != len(document_ids):
-            logger.warning(f"User {user_id} attempted to access documents they don't own")
-            raise HTTPException(
-                status_code=403,
-                detail="You do not have permission to access some of the requested documents"
-            )
+        Args:
+            user_id: User ID (only the user's documents are exported)
+            document_ids: Documents to export; if None, the documents matching the search
+                (or all of the user's documents when no search is given)
+            query: Full-text search query (with document_ids=None)
+            filters: Search filters (logical_id, archive, date_from, date_to, schema_version)
 
-        documents = self.db.query(Document).filter(
-            Document.id.in_(document_ids),
-            Document.owner_id == user_id
-        ).all()
+        Returns:
+            StreamingResponse with one CSV row per document
 
-        if not documents:
-            raise HTTPException(status_code=404, detail="No documents found")
-
-        # Create CSV in memory
-        output = io.StringIO()
-        writer = csv.writer(output)
-
-        # Write header
-        writer.writerow([
-            # Basic identification
-            'logical_id', 'title', 'description', 'conservative_id', 'conservative_id_authority',
-            # Archive information
-            'archive_name', 'archive_contact', 'fund_name', 'series_name', 'folder_number',
-            # Temporal information
-            'date_from', 'date_to', 'period',
-            # Geographic and contextual information
-            'location', 'language', 'subjects',
-            # Document structure
-            'document_type', 'total_pages',
-            # Rights information
-            'license_url', 'rights_statement',
-            # Technical metadata
-            'image_producer', 'scanner_manufacturer', 'scanner_model',
-            # System fields
-            'created_at'
-        ])
-
-        # Write data - fetch from MongoDB for each document
-        for doc in documents:
-            # Get METS metadata
-            mets_data = {}
-            if doc.mets_document_id:
-                try:
-                    mets_doc = await self.mets_service.get_mets_document(doc.mets_document_id)
-                    if mets_doc:
-                        mets_data = {
-                            'title': mets_doc.get('title'),
-                            'description': mets_doc.get('description'),
-                            'conservative_id': mets_doc.get('conservative_id'),
-                            'conservative_id_authority': mets_doc.get('conservative_id_authority'),
-                            'archive_name': mets_doc.get('archive', {}).get('name') if mets_doc.get('archive') else None,
-                            'archive_contact': mets_doc.get('archive', {}).get('contact') if mets_doc.get('archive') else None,
-                            'fund_name': mets_doc.get('archive', {}).get('fund_name') if mets_doc.get('archive') else None,
-                            'series_name': mets_doc.get('archive', {}).get('series_name') if mets_doc.get('archive') else None,
-                            'folder_number': mets_doc.get('archive', {}).get('folder_number') if mets_doc.get('archive') else None,
-                            'date_from': mets_doc.get('temporal', {}).get('date_from') if mets_doc.get('temporal') else None,
-                            'date_to': mets_doc.get('temporal', {}).get('date_to') if mets_doc.get('temporal') else None,
-                            'period': mets_doc.get('temporal', {}).get('period') if mets_doc.get('temporal') else None,
-                            'location': mets_doc.get('location'),
-                            'language': mets_doc.get('language'),
-                            'subjects': mets_doc.get('subjects'),
-                            'document_type': mets_doc.get('physical', {}).get('document_type') if mets_doc.get('physical') else None,
-                            'total_pages': mets_doc.get('physical', {}).get('total_pages') if mets_doc.get('physical') else None,
-                            'license_url': mets_doc.get('rights', {}).get('license_url') if mets_doc.get('rights') else None,
-                            'rights_statement': mets_doc.get('rights', {}).get('rights_statement') if mets_doc.get('rights') else None,
-                            'image_producer': mets_doc.get('technical', {}).get('image_producer') if mets_doc.get('technical') else None,
-                            'scanner_manufacturer': mets_doc.get('technical', {}).get('scanner_manufacturer') if mets_doc.get('technical') else None,
-                            'scanner_model': mets_doc.get('technical', {}).get('scanner_model') if mets_doc.get('technical') else None,
-                        }
-                except Exception as e:
-                    logger.error(f"Error fetching METS for document {doc.id}: {e}")
-
-            writer.writerow([
-                # Basic identification
-                doc.logical_id,
-                mets_data.get('title'),
-                mets_data.get('description'),
-                mets_data.get('conservative_id'),
-                mets_data.get('conservative_id_authority'),
-                # Archive information
-                mets_data.get('archive_name'),
-                mets_data.get('archive_contact'),
-                mets_data.get('fund_name'),
-                mets_data.get('series_name'),
-                mets_data.get('folder_number'),
-                # Temporal information
-                mets_data.get('date_from'),
-                mets_data.get('date_to'),
-                mets_data.get('period'),
-                # Geographic and contextual information
-                mets_data.get('location'),
-                mets_data.get('language'),
-                mets_data.get('subjects'),
-                # Document structure
-                mets_data.get('document_type'),
-                mets_data.get('total_pages'),
-                # Rights information
-                mets_data.get('license_url'),
-                mets_data.get('rights_statement'),
-                # Technical metadata
-                mets_data.get('image_producer'),
-                mets_data.get('scanner_manufacturer'),
-                mets_data.get('scanner_model'),
-                # System fields
-                doc.created_at
-            ])
-
-        # Generate filename using logical IDs
-        if len(documents) == 1:
-            # Sanitize logical_id for filename (remove/replace invalid characters)
-            safe_logical_id = self._sanitize_filename(documents[0].logical_id)
-            filename = f"{safe_logical_id}_metadata.csv"
-        else:
-            # For multiple documents, use a generic name or first logical_id + count
-            filename = f"documents_metadata_{len(documents)}_items.csv"
+        Raises:
+            HTTPException: If some of the given documents belong to another user, or none exists
+        """
+        filename = export_csv_filename()
+        if document_ids is not None:
+            unique_ids = set(document_ids)
+            document_count = self.db.query(func.count(Document.id)).filter(
+                Document.id.in_(unique_ids),
+                Document.owner_id == user_id
+            ).scalar()
+
+            if document_count != len(unique_ids):
+                logger.warning(f"User {user_id} attempted to access documents they don't own")
+                raise HTTPException(
+                    status_code=403,
+                    detail="You do not have permission to access some of the requested documents"
+                )
+            if not document_count:
+                raise HTTPException(status_code=404, detail="No documents found")
 
-        # Create proper BytesIO stream
-        csv_content = output.getvalue()
-        csv_bytes = io.BytesIO(csv_content.encode('utf-8'))
+            if document_count == 1:
+                logical_id = self.db.query(Document.logical_id).filter(Document.id.in_(unique_ids)).scalar()
+                # Sanitize logical_id for filename (remove/replace invalid characters)
+                filename = export_csv_filename(logical_id=self._sanitize_filename(logical_id))
+            else:
+                filename = export_csv_filename(document_count)
 
         return StreamingResponse(
-            csv_bytes,
+            iter_metadata_csv(user_id, document_ids, query, filters),
             media_type="text/csv",
             headers={"Content-Disposition": self._make_content_disposition(filename)}
         )
@@ -819,6 +883,10 @@ class DocumentService:
         """
         Export dynamically generated METS XML for a single document.
 
+        Only validate=False streams while rendering. Validation needs the
+        complete document, so with validate=True the XML (from the render
+        cache when current) is held in memory and sent once it has passed.
+
         Args:
             document_id: Document ID to export
             user_id: User ID (for ownership verification)
@@ -830,9 +898,7 @@ class DocumentService:
         Raises:
             HTTPException: If document not found or validation fails
         """
-        document = self.db.query(Document).options(
-            joinedload(Document.document_files).joinedload(DocumentFile.file)
-        ).filter(
+        document = self.db.query(Document).filter(
             Document.id == document_id,
             Document.owner_id == user_id
         ).first()
@@ -840,77 +906,118 @@ class DocumentService:
         if not document:
             raise HTTPException(status_code=404, detail="Document not found")
 
-        # Convert to DocumentDetail (merges PostgreSQL + MongoDB)
-        document_detail = await self._convert_to_document_detail(document)
+        filename = f"{document.logical_id}_mets.xml"
 
-        # Generate METS XML dynamically from merged data
-        mets_generator = METSEcoMicGenerator()
-        mets_xml = mets_generator.generate_mets_xml(document_detail)
+        if not validate:
+            key = await self._mets_cache_key(document)
+            cached = mets_cache.get(document.owner_id, document.id, key) if key else None
+            if cached is not None:
+                body = io.BytesIO(cached)
+            else:
+                # Stream sections as they are generated (files are read from the database), caching the result
+                document_detail = await self._convert_to_document_detail(document, include_files=False)
+                body = stream_document_mets(document_detail)
+                if key:
+                    body = mets_cache.store_stream(document.owner_id, document.id, key, body)
+            return StreamingResponse(
+                body,
+                media_type="application/xml",
+                headers={"Content-Disposition": self._make_content_disposition(filename)}
+            )
 
-        # Optional validation before export
-        if validate:
-            from app.services.mets_validation import METSValidationService
-            validation_service = METSValidationService()
+        # Validation needs the complete document
+        mets_xml, key = await self._render_mets_xml(document)
 
-            try:
-                validation_result = await validation_service.validate_mets_xml(
-                    mets_xml,
-                    f"{document.logical_id}_mets.xml"
-                )
+        # Stored verdict when this exact XML was validated before (background
+        # validation after edits), otherwise validate now and store the verdict
+        verdict = await validate_document_xml(self.db, document, mets_xml, cache_key=key)
 
-                if not validation_result.get('valid', False):
-                    # Block export if validation fails
-                    logger.warning(
-                        f"METS validation failed for document {document.id}: "
-                        f"{validation_result.get('summary', 'Unknown error')}"
-                    )
+        if verdict.status == VALIDATION_INVALID:
+            # Block export if validation fails
+            logger.warning(f"METS validation failed for document {document.id}: {verdict.summary}")
 
-                    # Prepare detailed error message for user
-                    error_details = validation_result.get('errors', [])
-                    summary = validation_result.get('summary', 'METS validation failed')
+            # Prepare detailed error message for user
+            error_details = verdict.errors or []
+            summary = verdict.summary or 'METS validation failed'
 
-                    # Format error message with details
-                    error_message = f"Cannot export: {summary}\n\n"
+            # Format error message with details
+            error_message = f"Cannot export: {summary}\n\n"
 
-                    if error_details:
-                        error_message += "Validation errors:\n"
-                        for i, error in enumerate(error_details[:10], 1):  # Limit to first 10 errors
-                            error_msg = error.get('message', 'Unknown error')
-                            error_location = error.get('location', 'Unknown location')
-                            error_message += f"{i}. {error_msg} (at: {error_location})\n"
+            if error_details:
+                error_message += "Validation errors:\n"
+                for i, error in enumerate(error_details[:10], 1):  # Limit to first 10 errors
+                    error_msg = error.get('description', error.get('message', 'Unknown error'))
+                    error_location = error.get('location', 'Unknown location')
+                    error_message += f"{i}. {error_msg} (at: {error_location})\n"
 
-                        if len(error_details) > 10:
-                            error_message += f"\n... and {len(error_details) - 10} more errors"
+                if len(error_details) > 10:
+                    error_message += f"\n... and {len(error_details) - 10} more errors"
 
-                    error_message += "\n\nPlease fix the document metadata and try exporting again."
+            error_message += "\n\nPlease fix the document metadata and try exporting again."
 
-                    raise HTTPException(
-                        status_code=422,
-                        detail=error_message
-                    )
-                else:
-                    logger.info(f"METS validation passed for document {document.id}")
-            except HTTPException:
-                # Re-raise HTTPException (validation failed)
-                raise
-            except Exception as e:
-                # Validation service error (network, API down, etc.)
-                logger.error(f"METS validation service error for document {document.id}: {e}")
-                # Block export with informative error
-                raise HTTPException(
-                    status_code=503,
-                    detail=f"METS validation service is unavailable. Cannot verify METS compliance. "
-                           f"Error: {str(e)}\n\n"
-                           f"You can retry later or contact support if the issue persists."
-                )
+            raise HTTPException(
+                status_code=422,
+                detail=error_message
+            )
+
+        if verdict.status != VALIDATION_VALID:
+            # Validation service error (network, API down, etc.)
+            logger.error(f"METS validation service error for document {document.id}: {verdict.summary}")
+            # Block export with informative error
+            raise HTTPException(
+                status_code=503,
+                detail=f"METS validation service is unavailable. Cannot verify METS compliance. "
+                       f"Error: {verdict.summary}\n\n"
+                       f"You can retry later or contact support if the issue persists."
+            )
+
+        logger.info(f"METS validation passed for document {document.id}")
 
         return StreamingResponse(
             io.BytesIO(mets_xml.encode('utf-8')),
             media_type="application/xml",
-            headers={"Content-Disposition": self._make_content_disposition(f"{document.logical_id}_mets.xml")}
+            headers={"Content-Disposition": self._make_content_disposition(filename)}
         )
 
-    # NOTE: Remaining methods (export_multiple_mets_xml, download_document_files,
+    async def export_multiple_mets_xml(
+        self,
+        user_id: int,
+        document_ids: Optional[List[int]] = None,
+        query: Optional[str] = None,
+        filters: Optional[Dict[str, Any]] = None,
+        compact: bool = False
+    ) -> StreamingResponse:
+        """
+        Export METS XML for multiple documents as a streamed ZIP archive.
+
+        Args:
+            user_id: User ID (only the user's documents are exported)
+            document_ids: Documents to export; if None, the documents matching the search
+            query: Full-text search query (with document_ids=None)
+            filters: Search filters (logical_id, archive, date_from, date_to, schema_version)
+            compact: Write METS without indentation whitespace
+
+        Returns:
+            StreamingResponse with a ZIP of {logical_id}_mets.xml entries (not validated)
+
+        Raises:
+            HTTPException: If none of the given documents exists
+        """
+        if document_ids is not None:
+            found = self.db.query(func.count(Document.id)).filter(
+                Document.id.in_(document_ids),
+                Document.owner_id == user_id
+            ).scalar()
+            if not found:
+                raise HTTPException(status_code=404, detail="No documents found")
+
+        return StreamingResponse(
+            iter_mets_zip(user_id, document_ids, query, filters, compact),
+            media_type="application/zip",
+            headers={"Content-Disposition": self._make_content_disposition(export_filename())}
+        )
+
+    # NOTE: Remaining methods (download_document_files,
     # download_document_archive, batch_download_archives, batch_create_documents,
     # upload_document_image, batch_upload_images, generate_mets_xml_for_validation,
     # upload_folder_archive, _guess_content_type) follow similar patterns and would
@@ -997,11 +1104,32 @@ class DocumentService:
                 file_category=file_category,
                 file_use=file_use,
                 sequence_number=max_seq + 1,
-                checksum_md5=uploaded_file.file_hash  # Populate hash for METS integrity
+                checksum_md5=uploaded_file.file_hash,  # Populate hash for METS integrity
+                # Technical metadata is extracted from the stored object in the background
+                metadata_status=METADATA_PENDING if self._is_image_file(uploaded_file.content_type) else None
             )
 
+            # Known content reuses its memoized metadata and placeholder
+            memoized = ContentMemoService(self.db).get_metadata(uploaded_file.file_hash)
+            if document_file.metadata_status and memoized:
+                apply_image_metadata(document_file, memoized[0])
+                document_file.metadata_status = METADATA_COMPLETE
+                document_file.placeholder = memoized[1]
+            if not document_file.placeholder:
+                document_file.placeholder = create_placeholder_from_file(file.file, file.filename)
+
             self.db.add(document_file)
+            refresh_file_stats(self.db, [document.id])
             self.db.commit()
+            mets_cache.invalidate(document.owner_id, document.id)
+            schedule_document_validation(document.id)
+
+            if document_file.metadata_status == METADATA_PENDING:
+                schedule_metadata_extraction(document.id)
+            if self._is_image_file(uploaded_file.content_type) and not document_file.placeholder:
+                schedule_placeholders(document.id)
+            if file_category == 'master':
+                schedule_derivatives(document.id)
 
             return {
                 "success": True,
@@ -1078,6 +1206,95 @@ class DocumentService:
 
     async def generate_mets_xml_for_validation(self, document_id: int, user_id: int) -> str:
         """Generate METS XML for validation purposes"""
+        document = self.db.query(Document).filter(
+            Document.id == document_id,
+            Document.owner_id == user_id
+        ).first()
+
+        if not document:
+            raise HTTPException(status_code=404, detail="Document not found")
+
+        return await self._get_mets_xml(document)
+
+    async def validate_document(self, document: Document) -> DocumentValidation:
+        """Verdict for a document's current METS XML (the stored one while the XML is unchanged)"""
+        mets_xml, key = await self._render_mets_xml(document)
+        return await validate_document_xml(self.db, document, mets_xml, cache_key=key)
+
+    async def is_validation_current(self, document: Document, verdict: DocumentValidation) -> Optional[bool]:
+        """
+        Whether a stored verdict applies to the document's current METS XML
+
+        Compares the render cache key recorded with the verdict, so nothing is
+        rendered. Verdicts stored without a key are checked against the cached
+        rendering when there is one.
+
+        Returns:
+            True/False, or None if it cannot be told (METS revision unreadable,
+            or a verdict without a key and no cached rendering)
+        """
+        key = await self._mets_cache_key(document)
+        if key is None:
+            return None
+        if verdict.mets_cache_key is not None:
+            return verdict.mets_cache_key == key
+        cached = mets_cache.get(document.owner_id, document.id, key)
+        if cached is None:
+            return None
+        return mets_xml_hash(cached.decode('utf-8')) == verdict.xml_hash
+
+    async def _mets_cache_key(self, document: Document) -> Optional[str]:
+        """METS render cache key of a document, or None if its METS revision cannot be read"""
+        mets_revision = None
+        if document.mets_document_id:
+            mets_revision = await self.mets_service.get_mets_revision(document.mets_document_id)
+            if mets_revision is None:
+                return None
+        return mets_cache_key(self.db, document, mets_revision)
+
+    async def _get_mets_xml(self, document: Document) -> str:
+        """Complete METS XML of a document, served from the render cache when current"""
+        return (await self._render_mets_xml(document))[0]
+
+    async def _render_mets_xml(self, document: Document) -> Tuple[str, Optional[str]]:
+        """Complete METS XML of a document and its render cache key (None if it has none)"""
+        key = await self._mets_cache_key(document)
+        cached = mets_cache.get(document.owner_id, document.id, key) if key else None
+        if cached is not None:
+            return cached.decode('utf-8'), key
+
+        # Convert to DocumentDetail (merges PostgreSQL + MongoDB); files are read from the database
+        document_detail = await self._convert_to_document_detail(document, include_files=False)
+        # Rendering reads the files from the database and builds the XML: off the event loop
+        mets_xml = await run_in_threadpool(lambda: ''.join(iter_document_mets(self.db, document_detail)))
+        if key:
+            mets_cache.put(document.owner_id, document.id, key, mets_xml.encode('utf-8'))
+        return mets_xml, key
+
+    def _get_sprite_files(
+        self,
+        document_id: int,
+        user_id: int,
+        file_category: Optional[str] = None,
+        per_page: int = DEFAULT_TILES_PER_PAGE,
+        tile_size: int = DEFAULT_TILE_SIZE,
+        columns: int = DEFAULT_COLUMNS
+    ) -> tuple:
+        """
+        Load a document and its image files in grid (sequence_number) order
+
+        Without file_category, each page (sequence_number) contributes a single
+        file, following SPRITE_CATEGORY_PREFERENCE, instead of one tile per
+        master/JPG300/JPG150 rendition.
+
+        Raises:
+            HTTPException: 400 if the layout exceeds the sheet size limit, 404 if the document is not found
+        """
+        try:
+            check_sprite_size(per_page, tile_size, columns)
+        except SpriteTooLarge as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
         document = self.db.query(Document).options(
             joinedload(Document.document_files).joinedload(DocumentFile.file)
         ).filter(
@@ -1088,12 +1305,171 @@ class DocumentService:
         if not document:
             raise HTTPException(status_code=404, detail="Document not found")
 
-        # Convert to DocumentDetail (merges PostgreSQL + MongoDB)
-        document_detail = await self._convert_to_document_detail(document)
+        image_files = [
+            doc_file for doc_file in document.document_files
+            if doc_file.file
+            and (self._is_image_file(doc_file.file.content_type)
+                 or self.file_service._is_dng_file(doc_file.file.content_type, doc_file.file.filename))
+            and (file_category is None or doc_file.file_category == file_category)
+        ]
+        if file_category is None:
+            preference = {category: rank for rank, category in enumerate(SPRITE_CATEGORY_PREFERENCE)}
+            pages = {}
+            unsequenced = []
+            for doc_file in image_files:
+                if doc_file.sequence_number is None:
+                    unsequenced.append(doc_file)
+                    continue
+                rank = (preference.get(doc_file.file_category, len(preference)), doc_file.id)
+                current = pages.get(doc_file.sequence_number)
+                if current is None or rank < current[0]:
+                    pages[doc_file.sequence_number] = (rank, doc_file)
+            image_files = [doc_file for _, doc_file in pages.values()] + unsequenced
+
+        image_files.sort(key=lambda df: (df.sequence_number is None, df.sequence_number or 0, df.id))
+        return document, image_files
+
+    async def get_document_sprite_map(
+        self,
+        document_id: int,
+        user_id: int,
+        per_page: int = DEFAULT_TILES_PER_PAGE,
+        tile_size: int = DEFAULT_TILE_SIZE,
+        columns: int = DEFAULT_COLUMNS,
+        file_category: Optional[str] = None
+    ) -> dict:
+        """
+        Build the coordinate map for a document's sprite sheets
+
+        Tiles follow sequence_number order and are split into pages of
+        per_page tiles; each page is one sprite image. The file_set_hash
+        identifies the exact files and layout, and changes whenever files
+        are attached, detached, replaced or reordered.
+
+        Returns:
+            Dictionary with layout options, file_set_hash and per-page tile rectangles
+        """
+        document, image_files = self._get_sprite_files(
+            document_id, user_id, file_category, per_page, tile_size, columns
+        )
+        file_set_hash = calculate_file_set_hash(
+            image_files, SPRITE_LAYOUT_VERSION, per_page, tile_size, columns, file_category
+        )
+
+        pages = []
+        for page_index, start in enumerate(range(0, len(image_files), per_page), start=1):
+            page_files = image_files[start:start + per_page]
+            (width, height), cells = sprite_layout(len(page_files), tile_size, columns)
+            pages.append({
+                'page': page_index,
+                'width': width,
+                'height': height,
+                'tiles': [
+                    {
+                        'index': start + offset,
+                        'document_file_id': doc_file.id,
+                        'file_id': doc_file.file_id,
+                        'sequence_number': doc_file.sequence_number,
+                        'file_label': doc_file.file_label,
+                        'file_category': doc_file.file_category,
+                        **cell
+                    }
+                    for offset, (doc_file, cell) in enumerate(zip(page_files, cells))
+                ]
+            })
+
+        return {
+            'document_id': document.id,
+            'file_set_hash': file_set_hash,
+            'tile_size': tile_size,
+            'columns': columns,
+            'per_page': per_page,
+            'total_tiles': len(image_files),
+            'pages': pages
+        }
+
+    async def get_document_sprite(
+        self,
+        document_id: int,
+        user_id: int,
+        page: int = 1,
+        per_page: int = DEFAULT_TILES_PER_PAGE,
+        tile_size: int = DEFAULT_TILE_SIZE,
+        columns: int = DEFAULT_COLUMNS,
+        file_category: Optional[str] = None,
+        accept: Optional[str] = None
+    ) -> Response:
+        """
+        Get one sprite sheet page for a document grid
+
+        Sheets are composed from the cached grid previews and stored as a
+        derivative keyed by the file-set hash and output format, so repeat
+        requests are a single MinIO read.
+        """
+        document, image_files = self._get_sprite_files(
+            document_id, user_id, file_category, per_page, tile_size, columns
+        )
+        page_files = image_files[(page - 1) * per_page:page * per_page]
+        if not page_files:
+            raise HTTPException(status_code=404, detail="Sprite page not found")
+
+        file_set_hash = calculate_file_set_hash(
+            image_files, SPRITE_LAYOUT_VERSION, per_page, tile_size, columns, file_category
+        )
+        output_format = negotiate_preview_format(accept)
+        extension = PREVIEW_FORMATS[output_format][2]
+        object_name = get_derivative_object_path(
+            document.owner_id, file_set_hash, f"sprite_p{page}", extension
+        )
+
+        def load_or_render() -> tuple:
+            try:
+                if self.minio_service.object_exists(object_name):
+                    response = self.minio_service.get_file(object_name)
+                    try:
+                        return response.read(), PREVIEW_FORMATS[output_format][1], "hit"
+                    finally:
+                        response.close()
+                        response.release_conn()
+            except Exception as e:
+                logger.warning(f"Sprite cache lookup failed for {object_name}: {e}")
 
-        # Generate METS XML using the existing generator
-        mets_generator = METSEcoMicGenerator()
-        return mets_generator.generate_mets_xml(document_detail)
+            previews = []
+            for doc_file in page_files:
+                try:
+                    result = self.file_service.get_or_create_preview(doc_file.file, 'grid', 'jpeg')
+                    previews.append(result[0] if result else None)
+                except MemoryBudgetExceeded:
+                    raise
+                except Exception as e:
+                    logger.warning(f"No grid preview for file {doc_file.file_id}: {e}")
+                    previews.append(None)
+
+            sheet = render_sprite(previews, tile_size, columns)
+            data, mime_type = encode_image(sheet, output_format, tier='grid')
+            try:
+                self.minio_service.put_bytes(object_name, data, mime_type)
+            except Exception as e:
+                logger.warning(f"Could not cache sprite {object_name}: {e}")
+            return data, mime_type, "miss"
+
+        loop = asyncio.get_event_loop()
+        try:
+            data, mime_type, cache_status = await loop.run_in_executor(None, load_or_render)
+        except MemoryBudgetExceeded as budget_error:
+            logger.warning(f"Sprite for document {document_id} refused: {budget_error}")
+            raise self.file_service._budget_exceeded_error()
+
+        return Response(
+            content=data,
+            media_type=mime_type,
+            headers={
+                "Cache-Control": "private, max-age=86400",
+                "ETag": f'"{file_set_hash[:32]}-p{page}-{output_format}"',
+                "Vary": "Accept",
+                "X-Preview-Cache": cache_status
+            }
+        )
 
     def _guess_content_type(self, filename: str) -> str:
         """Guess content type from filename extension"""
@@ -1248,6 +1624,8 @@ class DocumentService:
 
             # Phase 2: Upload all files to MinIO and create associations
             sequence_number = 1
+            metadata_pending = False
+            placeholder_pending = False
 
             for file_info in files_with_categories:
                 try:
@@ -1311,11 +1689,12 @@ class DocumentService:
 
                     # Extract metadata if image
                     metadata = {}
+                    placeholder = None
+                    metadata_status = None
                     if self._is_image_file(content_type):
-                        try:
-                            metadata = extract_image_metadata(full_path)
-                        except Exception as e:
-                            logger.error(f"Error extracting metadata from {filename}: {e}")
+                        metadata, placeholder, metadata_status = self._extract_ingest_metadata(
+                            full_path, file_hash, filename
+                        )
 
                     # Get file_use from category
                     file_use = categorizer.get_file_use_from_category(category)
@@ -1350,10 +1729,16 @@ class DocumentService:
                         scanner_model_name=metadata.get('scanner_model_name'),
                         scanning_software_name=metadata.get('scanning_software_name'),
                         scanning_software_version=metadata.get('scanning_software_version'),
-                        raw_metadata=metadata.get('raw_metadata')
+                        raw_metadata=metadata.get('raw_metadata'),
+                        metadata_status=metadata_status,
+                        placeholder=placeholder
                     )
 
                     self.db.add(doc_file)
+                    if doc_file.metadata_status == METADATA_PENDING:
+                        metadata_pending = True
+                    if self._is_image_file(content_type) and not placeholder:
+                        placeholder_pending = True
                     sequence_number += 1
 
                 except Exception as e:
@@ -1361,11 +1746,20 @@ class DocumentService:
                     # Rollback everything on file processing error
                     raise
 
-            # Commit all file associations
+            # Commit all file associations (with the document's summary)
+            refresh_file_stats(self.db, [document.id])
             self.db.commit()
 
             logger.info(f"Successfully uploaded {len(files_with_categories)} files for document {document.id}")
 
+            # Complete raw_metadata and generate missing JPG300/JPG150 derivatives in the background
+            if metadata_pending:
+                schedule_metadata_extraction(document.id)
+            if placeholder_pending:
+                schedule_placeholders(document.id)
+            if categorized_files.get('master'):
+                schedule_derivatives(document.id)
+
             return {
                 "success": True,
                 "message": f"Successfully uploaded {len(files_with_categories)} files for document '{logical_id}'",
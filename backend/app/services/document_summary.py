@@ -0,0 +1,355 @@
+"""
+Document Summaries - Denormalized read model of the document list
+
+A DocumentSummary row holds what the list and search views show for a
+document: the key METS fields and the file statistics (count, bytes, per
+category counts, cover placeholder). The write paths keep it in sync inside
+their own PostgreSQL transaction (they flush/commit it together with the
+Document and DocumentFile rows), so listing is a single indexed query on
+document_summaries instead of a join with document_files plus a MongoDB
+lookup per page.
+
+Documents created before the read model existed get their summary on first
+listing (ensure_owner_summaries) and their METS fields from MongoDB when a
+list page first shows them (fill_mets_fields). rebuild_summaries() recomputes
+every row from PostgreSQL and MongoDB (see rebuild_summaries.py), e.g. after
+out-of-band edits.
+"""
+import logging
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set
+
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app.models.document import Document, DocumentFile
+from app.models.document_summary import DocumentSummary
+from app.models.file import File
+from app.services.mets_document import LIST_ITEM_FIELDS, METSDocumentLoader, METSDocumentService
+
+logger = logging.getLogger(__name__)
+
+# Document data fields (DocumentCreate/DocumentUpdate) copied into the summary
+SUMMARY_METS_FIELDS = ('title', 'archive_name', 'document_type', 'total_pages')
+
+# category_counts key of files without a category
+UNCATEGORIZED = 'uncategorized'
+
+# Owners whose documents all have a summary (checked once per process)
+_summarized_owners: Set[int] = set()
+_summarized_owners_lock = threading.Lock()
+
+
+def cover_placeholders(db: Session, document_ids: List[int]) -> Dict[int, tuple]:
+    """
+    Get the first file placeholder of each document in one query
+
+    Args:
+        db: Database session
+        document_ids: Document IDs
+
+    Returns:
+        Dictionary mapping document_id to (file_id, placeholder)
+    """
+    if not document_ids:
+        return {}
+
+    rows = db.query(
+        DocumentFile.document_id,
+        DocumentFile.file_id,
+        DocumentFile.placeholder
+    ).filter(
+        DocumentFile.document_id.in_(document_ids),
+        DocumentFile.placeholder.isnot(None)
+    ).distinct(
+        DocumentFile.document_id
+    ).order_by(
+        DocumentFile.document_id,
+        DocumentFile.sequence_number.asc().nullslast(),
+        DocumentFile.id
+    ).all()
+
+    return {row.document_id: (row.file_id, row.placeholder) for row in rows}
+
+
+def apply_document_data(summary: DocumentSummary, document_data: Dict[str, Any]):
+    """Copy the summarized fields present in flat document data (create/update payloads)"""
+    for field in SUMMARY_METS_FIELDS:
+        if field in document_data:
+            setattr(summary, field, document_data[field])
+
+
+def apply_mets_document(summary: DocumentSummary, mets_doc: Optional[Dict[str, Any]]):
+    """Copy the summarized fields of a stored METS document"""
+    mets_doc = mets_doc or {}
+    archive = mets_doc.get('archive') or {}
+    physical = mets_doc.get('physical') or {}
+    summary.title = mets_doc.get('title')
+    summary.archive_name = archive.get('name')
+    summary.document_type = physical.get('document_type')
+    summary.total_pages = physical.get('total_pages')
+    summary.mets_synced = True
+
+
+def apply_mets_update(summary: DocumentSummary, mets_update: Dict[str, Any]):
+    """
+    Apply a structured METS update the way MongoDB's $set does
+
+    $set replaces whole sub-documents, so a new 'archive' or 'physical' also
+    clears the summarized fields it does not carry.
+    """
+    if 'title' in mets_update:
+        summary.title = mets_update['title']
+    if 'archive' in mets_update:
+        summary.archive_name = (mets_update['archive'] or {}).get('name')
+    if 'physical' in mets_update:
+        physical = mets_update['physical'] or {}
+        summary.document_type = physical.get('document_type')
+        summary.total_pages = physical.get('total_pages')
+
+
+def add_summary(db: Session, document: Document, document_data: Dict[str, Any]) -> DocumentSummary:
+    """
+    Summary of a new document, added to the document's transaction
+
+    Args:
+        db: Database session
+        document: Flushed document (with an id), no files yet
+        document_data: Flat document data the METS document is created from
+
+    Returns:
+        The new (pending) DocumentSummary
+    """
+    summary = DocumentSummary(
+        document_id=document.id,
+        owner_id=document.owner_id,
+        logical_id=document.logical_id,
+        file_count=0,
+        total_bytes=0,
+        category_counts={},
+        mets_synced=True
+    )
+    apply_document_data(summary, document_data)
+    db.add(summary)
+    return summary
+
+
+def get_summary(db: Session, document_id: int) -> Optional[DocumentSummary]:
+    return db.query(DocumentSummary).filter(DocumentSummary.document_id == document_id).first()
+
+
+def delete_summary(db: Session, document_id: int):
+    """Remove a document's summary in the deleting transaction (the foreign key cascades too)"""
+    db.query(DocumentSummary).filter(DocumentSummary.document_id == document_id).delete(synchronize_session=False)
+
+
+def refresh_file_stats(db: Session, document_ids: Iterable[int]) -> Dict[int, DocumentSummary]:
+    """
+    Recompute file count, bytes, category counts and cover of documents
+
+    Call after adding or changing DocumentFile rows and before committing
+    them. The summary rows are locked (SELECT ... FOR UPDATE) before the
+    files are counted, so concurrent uploads and background jobs touching
+    the same document count one after the other instead of overwriting each
+    other's totals. Documents without a summary get one (inserted with ON
+    CONFLICT DO NOTHING, so concurrent first writers do not collide); its
+    METS fields are filled in by the document list (fill_mets_fields).
+
+    Args:
+        db: Database session (pending changes are flushed first)
+        document_ids: Documents whose files changed
+
+    Returns:
+        Dictionary mapping document_id to its (locked) DocumentSummary
+    """
+    ids = sorted(set(document_ids))
+    if not ids:
+        return {}
+    db.flush()
+
+    db.execute(insert(DocumentSummary).from_select(
+        ['document_id', 'owner_id', 'logical_id', 'created_at', 'updated_at'],
+        select(Document.id, Document.owner_id, Document.logical_id, Document.created_at, Document.updated_at).where(
+            Document.id.in_(ids)
+        )
+    ).on_conflict_do_nothing(index_elements=['document_id']))
+    # Locked in document_id order, so two writers never wait on each other crosswise
+    summaries = {
+        summary.document_id: summary
+        for summary in db.query(DocumentSummary).filter(
+            DocumentSummary.document_id.in_(ids)
+        ).order_by(DocumentSummary.document_id).with_for_update().populate_existing().all()
+    }
+
+    stats = {document_id: {'file_count': 0, 'total_bytes': 0, 'category_counts': {}} for document_id in ids}
+    rows = db.query(
+        DocumentFile.document_id,
+        DocumentFile.file_category,
+        func.count(DocumentFile.id),
+        func.coalesce(func.sum(File.file_size), 0)
+    ).outerjoin(
+        File, File.id == DocumentFile.file_id
+    ).filter(
+        DocumentFile.document_id.in_(ids)
+    ).group_by(
+        DocumentFile.document_id,
+        DocumentFile.file_category
+    ).all()
+    for document_id, category, count, total_bytes in rows:
+        document_stats = stats[document_id]
+        document_stats['file_count'] += count
+        document_stats['total_bytes'] += int(total_bytes)
+        key = category or UNCATEGORIZED
+        document_stats['category_counts'][key] = document_stats['category_counts'].get(key, 0) + count
+    covers = cover_placeholders(db, ids)
+
+    for document_id, summary in summaries.items():
+        summary.file_count = stats[document_id]['file_count']
+        summary.total_bytes = stats[document_id]['total_bytes']
+        summary.category_counts = stats[document_id]['category_counts']
+        summary.cover_file_id, summary.cover_placeholder = covers.get(document_id, (None, None))
+    return summaries
+
+
+def ensure_owner_summaries(db: Session, owner_id: int, batch_size: int = 500) -> int:
+    """
+    Create the missing summaries of a user's documents
+
+    Documents from before the read model have none until migration 013 runs.
+    Checked once per owner and process; new documents get their summary on
+    creation.
+
+    Args:
+        db: Database session (committed per batch)
+        owner_id: Owner of the documents
+        batch_size: Documents per statement and commit
+
+    Returns:
+        Number of summaries created
+    """
+    with _summarized_owners_lock:
+        if owner_id in _summarized_owners:
+            return 0
+
+    missing = [row[0] for row in db.query(Document.id).outerjoin(
+        DocumentSummary, DocumentSummary.document_id == Document.id
+    ).filter(
+        Document.owner_id == owner_id,
+        DocumentSummary.document_id.is_(None)
+    ).order_by(Document.id).all()]
+    for start in range(0, len(missing), batch_size):
+        refresh_file_stats(db, missing[start:start + batch_size])
+        db.commit()
+    if missing:
+        logger.info(f"Created {len(missing)} missing document summaries for user {owner_id}")
+
+    with _summarized_owners_lock:
+        _summarized_owners.add(owner_id)
+    return len(missing)
+
+
+async def fill_mets_fields(db: Session, mets_service: METSDocumentService, summaries: List[DocumentSummary]):
+    """
+    Copy the METS fields of summaries created without them (mets_synced false)
+
+    One projected MongoDB query for the whole list; the summaries are
+    committed. If MongoDB cannot be read they are left as they are.
+
+    Args:
+        db: Database session
+        mets_service: METS document service
+        summaries: Summaries about to be shown
+    """
+    pending = [summary for summary in summaries if not summary.mets_synced]
+    if not pending:
+        return
+
+    mets_ids = dict(db.query(Document.id, Document.mets_document_id).filter(
+        Document.id.in_([summary.document_id for summary in pending])
+    ).all())
+    try:
+        mets_docs = await METSDocumentLoader(mets_service, LIST_ITEM_FIELDS).load_many(mets_ids.values())
+    except Exception as e:
+        logger.error(f"Could not load METS fields of {len(pending)} document summaries: {e}")
+        return
+
+    for summary in pending:
+        apply_mets_document(summary, mets_docs.get(mets_ids.get(summary.document_id)))
+    document_ids = [summary.document_id for summary in summaries]
+    db.commit()
+    # Reload the expired rows in one query rather than one per attribute access
+    db.query(DocumentSummary).filter(DocumentSummary.document_id.in_(document_ids)).all()
+
+
+def sync_document_fields(db: Session, document: Document, mets_update: Optional[Dict[str, Any]] = None):
+    """
+    Copy an updated document's logical_id, updated_at and summarized METS fields
+
+    Args:
+        db: Database session
+        document: Updated document (flushed)
+        mets_update: Structured METS update written to MongoDB, if any
+    """
+    summary = get_summary(db, document.id) or refresh_file_stats(db, [document.id])[document.id]
+    summary.logical_id = document.logical_id
+    summary.updated_at = document.updated_at
+    if mets_update:
+        apply_mets_update(summary, mets_update)
+
+
+async def rebuild_summaries(
+    db: Session,
+    mets_service: METSDocumentService,
+    owner_id: Optional[int] = None,
+    batch_size: int = 500,
+    progress: Optional[Callable[[int], None]] = None
+) -> int:
+    """
+    Recompute the summaries of all (or one owner's) documents
+
+    Documents are read in keyset pages; each page costs one grouped
+    document_files query, one cover query and one projected MongoDB $in
+    query, and is committed on its own.
+
+    Args:
+        db: Database session
+        mets_service: METS document service
+        owner_id: Only this user's documents
+        batch_size: Documents per page and commit
+        progress: Called with the number of documents done after every page
+
+    Returns:
+        Number of documents summarized
+    """
+    done = 0
+    last_id = 0
+    while True:
+        query = db.query(Document).filter(Document.id > last_id)
+        if owner_id is not None:
+            query = query.filter(Document.owner_id == owner_id)
+        documents = query.order_by(Document.id).limit(batch_size).all()
+        if not documents:
+            break
+        last_id = documents[-1].id
+
+        summaries = refresh_file_stats(db, [document.id for document in documents])
+        mets_docs = await METSDocumentLoader(mets_service, LIST_ITEM_FIELDS).load_many(
+            document.mets_document_id for document in documents
+        )
+        for document in documents:
+            summary = summaries[document.id]
+            summary.owner_id = document.owner_id
+            summary.logical_id = document.logical_id
+            summary.created_at = document.created_at
+            summary.updated_at = document.updated_at
+            apply_mets_document(summary, mets_docs.get(document.mets_document_id))
+        db.commit()
+        db.expunge_all()
+
+        done += len(documents)
+        if progress:
+            progress(done)
+
+    logger.info(f"Rebuilt {done} document summaries" + (f" for user {owner_id}" if owner_id is not None else ""))
+    return done
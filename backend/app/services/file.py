@@ -3,17 +3,28 @@ import hashlib
 import os
 import tempfile
 from typing import Dict, List, Optional
+from sqlalchemy import tuple_
 from sqlalchemy.orm import Session
 from fastapi import UploadFile, HTTPException
+from starlette.concurrency import run_in_threadpool
+from starlette.background import BackgroundTask
+from app.models.document import Document, DocumentFile
 from app.models.file import File, FileChunk
 from app.models.user import User
+from app.services.document_summary import refresh_file_stats
 from app.services.minio import MinIOService
+from app.services.mets_cache import mets_cache
 from app.schemas.file import FileCreate, FileUpdate
 from app.core.config import settings
+from app.utils.cursor import decode_cursor, parse_datetime
+from app.utils.memory_budget import MemoryBudgetExceeded
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Cursor kind of the file list (keyed on created_at, id)
+FILE_LIST_CURSOR = 'files'
+
 
 class FileService:
     """File management service"""
@@ -270,18 +281,42 @@ class FileService:
         download_url = await self.minio_service.get_file_url(db_file.minio_object_name)
         return download_url
     
-    async def stream_file(self, db: Session, file_id: int, user_id: int, thumbnail: bool = False):
+    async def stream_file(
+        self,
+        db: Session,
+        file_id: int,
+        user_id: int,
+        thumbnail: bool = True,
+        range_header: Optional[str] = None,
+        if_range: Optional[str] = None,
+        accept: Optional[str] = None
+    ):
         """Stream file content directly using chunked streaming
 
+        Supports HTTP Range requests (RFC 7233): a single range is answered with
+        206 Partial Content, several ranges with a multipart/byteranges body.
+        Each range maps to a ranged MinIO get_object, so only the requested
+        bytes are read from storage.
+
         Args:
             db: Database session
             file_id: File ID to stream
             user_id: User ID for access control
             thumbnail: If True, generate and return thumbnail for DNG files
+            range_header: Raw Range request header, if any
+            if_range: Raw If-Range request header, if any
+            accept: Raw Accept request header, used to pick the DNG preview format
         """
         from fastapi.responses import StreamingResponse, Response
-        from app.utils.thumbnail_generator import get_thumbnail_generator
+        from app.utils.thumbnail_generator import (
+            DEFAULT_TIER, PREVIEW_FORMATS, negotiate_preview_format
+        )
+        from app.utils.http_range import (
+            RangeNotSatisfiable, parse_range_header, if_range_matches,
+            format_http_date, content_range
+        )
         import re
+        import uuid
 
         # Get file record
         db_file = db.query(File).filter(
@@ -297,66 +332,297 @@ class FileService:
 
         # Get file content from MinIO
         try:
-            file_data = self.minio_service.get_file(db_file.minio_object_name)
-
-            # Generate thumbnail for DNG files (always for preview purposes)
-            if is_dng:
+            # Serve a cached/generated preview for DNG files (browsers can't render them)
+            if is_dng and thumbnail:
                 try:
-                    thumbnail_gen = get_thumbnail_generator()
-                    result = thumbnail_gen.generate_thumbnail(
-                        file_data,
-                        db_file.content_type,
-                        db_file.filename
+                    output_format = negotiate_preview_format(accept)
+                    loop = asyncio.get_event_loop()
+                    result = await loop.run_in_executor(
+                        None, self.get_or_create_preview, db_file, DEFAULT_TIER, output_format
                     )
 
                     if result:
-                        thumbnail_bytes, mime_type = result
-                        logger.info(f"Generated thumbnail for DNG file {file_id}")
+                        preview_bytes, mime_type, cache_status = result
+                        extension = PREVIEW_FORMATS[output_format][2]
 
-                        # Return thumbnail as response
                         return Response(
-                            content=thumbnail_bytes,
+                            content=preview_bytes,
                             media_type=mime_type,
                             headers={
-                                "Content-Disposition": f'inline; filename="thumb_{db_file.filename}.jpg"',
+                                "Content-Disposition": f'inline; filename="thumb_{db_file.filename}.{extension}"',
                                 "X-Original-Content-Type": db_file.content_type,
-                                "X-Thumbnail-Generated": "true"
+                                "X-Thumbnail-Generated": "true",
+                                "X-Preview-Cache": cache_status,
+                                "Vary": "Accept"
                             }
                         )
                     else:
                         logger.warning(f"Failed to generate thumbnail for DNG file {file_id}, serving original")
                         # Fall through to serve original file
-                        file_data = self.minio_service.get_file(db_file.minio_object_name)
 
+                except MemoryBudgetExceeded as budget_error:
+                    logger.warning(f"DNG thumbnail for file {file_id} refused: {budget_error}")
+                    raise self._budget_exceeded_error()
                 except Exception as thumb_error:
                     logger.error(f"Error generating DNG thumbnail: {thumb_error}", exc_info=True)
                     # Fall through to serve original file
-                    file_data = self.minio_service.get_file(db_file.minio_object_name)
 
-            # Generator function to stream file in chunks (for non-DNG or if thumbnail failed)
-            def file_stream_generator():
-                chunk_size = settings.STREAMING_CHUNK_SIZE
-                while True:
-                    chunk = file_data.read(chunk_size)
-                    if not chunk:
-                        break
-                    yield chunk
+            file_size = db_file.file_size
+            media_type = db_file.content_type or 'application/octet-stream'
+            etag = f'"{db_file.file_hash}"' if db_file.file_hash else None
 
             # Sanitize filename for safety
             safe_filename = re.sub(r'[^\w\-_\.]', '_', db_file.filename).strip('. ')
 
+            headers = {
+                "Content-Disposition": f'inline; filename="{safe_filename}"',
+                "Accept-Ranges": "bytes"
+            }
+            if etag:
+                headers["ETag"] = etag
+            if db_file.updated_at:
+                headers["Last-Modified"] = format_http_date(db_file.updated_at)
+
+            # Resolve requested ranges (a stale If-Range validator means full content)
+            ranges = None
+            if range_header and if_range_matches(if_range, etag, db_file.updated_at):
+                try:
+                    ranges = parse_range_header(range_header, file_size)
+                except RangeNotSatisfiable:
+                    raise HTTPException(
+                        status_code=416,
+                        detail="Requested range not satisfiable",
+                        headers={"Content-Range": f"bytes */{file_size}"}
+                    )
+
+            # Objects are opened here (in a worker thread), before the response
+            # starts, so a missing object or storage error is still a clean 500
+            # instead of a truncated body; the background task releases the
+            # connection if the client goes away before the body is read
+            if not ranges:
+                response = await run_in_threadpool(self._open_object_range, db_file.minio_object_name, 0, file_size)
+                headers["Content-Length"] = str(file_size)
+                return StreamingResponse(
+                    self._iter_object(response),
+                    media_type=media_type,
+                    headers=headers,
+                    background=BackgroundTask(self._release_object, response)
+                )
+
+            if len(ranges) == 1:
+                start, end = ranges[0]
+                response = await run_in_threadpool(
+                    self._open_object_range, db_file.minio_object_name, start, end - start + 1
+                )
+                headers["Content-Range"] = content_range(start, end, file_size)
+                headers["Content-Length"] = str(end - start + 1)
+                return StreamingResponse(
+                    self._iter_object(response),
+                    status_code=206,
+                    media_type=media_type,
+                    headers=headers,
+                    background=BackgroundTask(self._release_object, response)
+                )
+
+            # Multiple ranges: multipart/byteranges body, parts fetched lazily
+            boundary = uuid.uuid4().hex
+            part_headers = [
+                (
+                    f"--{boundary}\r\n"
+                    f"Content-Type: {media_type}\r\n"
+                    f"Content-Range: {content_range(start, end, file_size)}\r\n\r\n"
+                ).encode('latin-1')
+                for start, end in ranges
+            ]
+            closing = f"--{boundary}--\r\n".encode('latin-1')
+            headers["Content-Length"] = str(
+                sum(len(h) + (end - start + 1) + 2 for h, (start, end) in zip(part_headers, ranges))
+                + len(closing)
+            )
+
+            # Each part is opened only when the body reaches it (the generator
+            # runs in a worker thread) and released by _iter_object; a stat
+            # up front keeps a missing object a clean error
+            if not await run_in_threadpool(self.minio_service.object_exists, db_file.minio_object_name):
+                raise HTTPException(status_code=500, detail="Error accessing file")
+
+            def multipart_generator():
+                for part_header, (start, end) in zip(part_headers, ranges):
+                    yield part_header
+                    yield from self._iter_object(
+                        self._open_object_range(db_file.minio_object_name, start, end - start + 1)
+                    )
+                    yield b"\r\n"
+                yield closing
+
             return StreamingResponse(
-                file_stream_generator(),
-                media_type=db_file.content_type or 'application/octet-stream',
-                headers={
-                    "Content-Disposition": f'inline; filename="{safe_filename}"',
-                    "Content-Length": str(db_file.file_size)
-                }
+                multipart_generator(),
+                status_code=206,
+                media_type=f"multipart/byteranges; boundary={boundary}",
+                headers=headers
             )
+        except HTTPException:
+            raise
         except Exception as e:
             logger.error(f"Error streaming file {file_id}: {e}", exc_info=True)
             raise HTTPException(status_code=500, detail="Error accessing file")
 
+    async def get_preview(
+        self,
+        db: Session,
+        file_id: int,
+        user_id: int,
+        tier: str = 'viewer',
+        accept: Optional[str] = None
+    ):
+        """
+        Serve a resized preview of an image file in the best format the client accepts
+
+        Previews are negotiated from the Accept header (AVIF, WebP, progressive
+        JPEG) and encoded with per-tier settings. Encoded previews are cached in
+        MinIO keyed by content hash, tier and format, so each variant is only
+        generated once.
+
+        Args:
+            db: Database session
+            file_id: File ID to preview
+            user_id: User ID for access control
+            tier: Preview tier ('grid' for document grids, 'viewer' for the image viewer)
+            accept: Raw Accept request header
+        """
+        from fastapi.responses import Response
+        from app.utils.thumbnail_generator import (
+            PREVIEW_FORMATS, PREVIEW_TIERS, negotiate_preview_format
+        )
+
+        if tier not in PREVIEW_TIERS:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Invalid preview tier. Must be one of: {', '.join(PREVIEW_TIERS)}"
+            )
+
+        db_file = db.query(File).filter(
+            File.id == file_id,
+            File.owner_id == user_id
+        ).first()
+
+        if not db_file:
+            raise HTTPException(status_code=404, detail="File not found or not accessible")
+
+        output_format = negotiate_preview_format(accept)
+
+        loop = asyncio.get_event_loop()
+        try:
+            result = await loop.run_in_executor(
+                None, self.get_or_create_preview, db_file, tier, output_format
+            )
+        except MemoryBudgetExceeded as budget_error:
+            logger.warning(f"Preview for file {file_id} refused: {budget_error}")
+            raise self._budget_exceeded_error()
+        if not result:
+            raise HTTPException(status_code=415, detail="Preview not available for this file type")
+
+        preview_bytes, mime_type, cache_status = result
+        headers = {
+            "Content-Disposition": f'inline; filename="preview_{tier}_{file_id}.{PREVIEW_FORMATS[output_format][2]}"',
+            "Cache-Control": "private, max-age=86400",
+            "Vary": "Accept",
+            "X-Preview-Cache": cache_status
+        }
+        if db_file.file_hash:
+            headers["ETag"] = f'"{db_file.file_hash[:16]}-{tier}-{output_format}"'
+
+        return Response(content=preview_bytes, media_type=mime_type, headers=headers)
+
+    def _budget_exceeded_error(self) -> HTTPException:
+        """503 for RAW decodes refused by the memory budget (clients may retry later)"""
+        return HTTPException(
+            status_code=503,
+            detail="Server is busy processing large images, please retry shortly",
+            headers={"Retry-After": "30"}
+        )
+
+    def get_or_create_preview(self, db_file: File, tier: str, output_format: str):
+        """
+        Load a preview from the derivative cache, generating and storing it on a miss
+
+        Returns:
+            Tuple of (preview_bytes, mime_type, cache_status) or None if generation failed
+        """
+        from app.utils.minio_paths import get_derivative_object_path
+        from app.utils.thumbnail_generator import get_thumbnail_generator
+
+        generator = get_thumbnail_generator(tier, output_format)
+
+        # The content hash keys the cache; files uploaded without one are never cached
+        object_name = None
+        if db_file.file_hash:
+            object_name = get_derivative_object_path(
+                db_file.owner_id, db_file.file_hash, f"preview_{tier}", generator.extension
+            )
+            try:
+                if self.minio_service.object_exists(object_name):
+                    response = self.minio_service.get_file(object_name)
+                    try:
+                        return response.read(), generator.mime_type, "hit"
+                    finally:
+                        response.close()
+                        response.release_conn()
+            except Exception as e:
+                logger.warning(f"Derivative cache lookup failed for {object_name}: {e}")
+
+        response = self.minio_service.get_file(db_file.minio_object_name)
+        try:
+            result = generator.generate_thumbnail(response, db_file.content_type, db_file.filename)
+        finally:
+            response.close()
+            response.release_conn()
+
+        if not result:
+            return None
+
+        preview_bytes, mime_type = result
+        logger.info(
+            f"Generated {tier}/{generator.output_format} preview for file {db_file.id} "
+            f"({len(preview_bytes)} bytes)"
+        )
+
+        if object_name:
+            try:
+                self.minio_service.put_bytes(object_name, preview_bytes, mime_type)
+            except Exception as e:
+                logger.warning(f"Could not cache derivative {object_name}: {e}")
+
+        return preview_bytes, mime_type, "miss"
+
+    def _open_object_range(self, object_name: str, offset: int, length: int):
+        """Open a byte range of a MinIO object (None for an empty range)"""
+        if length <= 0:
+            return None
+        return self.minio_service.get_file(object_name, offset=offset, length=length)
+
+    def _iter_object(self, response):
+        """Yield an opened MinIO object response in STREAMING_CHUNK_SIZE chunks, then release it"""
+        if response is None:
+            return
+        try:
+            chunk_size = settings.STREAMING_CHUNK_SIZE
+            while True:
+                chunk = response.read(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            self._release_object(response)
+
+    @staticmethod
+    def _release_object(response):
+        """Close an opened MinIO object response and return its connection (idempotent)"""
+        if response is None:
+            return
+        response.close()
+        response.release_conn()
+
     def _is_dng_file(self, content_type: str, filename: str) -> bool:
         """Check if file is a DNG file"""
         dng_mime_types = ['image/x-adobe-dng', 'image/dng', 'image/x-dng']
@@ -366,12 +632,38 @@ class FileService:
             return True
         return False
     
-    def get_user_files(self, db: Session, user_id: int, skip: int = 0, limit: int = 100) -> List[File]:
-        """Get files for a user"""
-        return db.query(File).filter(
+    def get_user_files(
+        self,
+        db: Session,
+        user_id: int,
+        skip: int = 0,
+        limit: int = 100,
+        cursor: Optional[str] = None
+    ) -> List[File]:
+        """
+        Get files for a user, newest first
+
+        Args:
+            db: Database session
+            user_id: Owner of the files
+            skip: Offset pagination (ignored when a cursor is given)
+            limit: Page size
+            cursor: Keyset pagination: X-Next-Cursor of the previous page
+
+        Raises:
+            InvalidCursor: If the cursor does not belong to this listing
+        """
+        query = db.query(File).filter(
             File.owner_id == user_id,
             File.upload_completed == True
-        ).offset(skip).limit(limit).all()
+        ).order_by(File.created_at.desc(), File.id.desc())
+        if cursor:
+            # Keyset: strictly after the last (created_at, id) of the previous page
+            created_at, last_id = decode_cursor(cursor, FILE_LIST_CURSOR, (parse_datetime, int))
+            query = query.filter(tuple_(File.created_at, File.id) < tuple_(created_at, last_id))
+        else:
+            query = query.offset(skip)
+        return query.limit(limit).all()
     
     async def delete_file(self, db: Session, file_id: int, user_id: int) -> Dict:
         """Delete a file"""
@@ -385,22 +677,33 @@ class FileService:
         if not db_file:
             raise HTTPException(status_code=404, detail="File not found")
         
+        # Documents the file is attached to (their cached METS and summary list it)
+        attached_documents = db.query(Document.id, Document.owner_id).join(
+            DocumentFile, DocumentFile.document_id == Document.id
+        ).filter(DocumentFile.file_id == file_id).distinct().all()
+
         try:
-            # Delete from MinIO
-            await self.minio_service.delete_file(db_file.minio_object_name)
-            
-            # Delete chunks if any
+            # Remove the rows first, so a database error leaves the object in place
             db.query(FileChunk).filter(FileChunk.file_id == file_id).delete()
-            
-            # Delete file record
+            db.query(DocumentFile).filter(DocumentFile.file_id == file_id).delete(synchronize_session=False)
             db.delete(db_file)
+            refresh_file_stats(db, [document_id for document_id, _ in attached_documents])
+            db.flush()
+
+            # Delete from MinIO (blocking client call, off the event loop)
+            await run_in_threadpool(self.minio_service.delete_file, db_file.minio_object_name)
             db.commit()
-            
+
+            for document_id, owner_id in attached_documents:
+                mets_cache.invalidate(owner_id, document_id)
+
             return {"message": "File deleted successfully"}
-            
+
         except Exception as e:
+            db.rollback()
+            logger.error(f"Error deleting file {file_id}: {e}", exc_info=True)
             raise HTTPException(status_code=500, detail=f"Delete failed: {str(e)}")
-    
+
     async def upload_file(self, file: UploadFile, user_id: int, file_category: str = None) -> File:
         """
         Simple upload method for image files - handles the complete workflow
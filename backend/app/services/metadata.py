@@ -0,0 +1,212 @@
+"""
+Metadata Service - Deferred full technical metadata extraction
+
+Uploads only run the fast MIX profile inline (the columns shown in the UI and
+written to METS). The complete tag dump stored in raw_metadata is extracted
+here, on the background task queue, for every file whose metadata_status is
+"pending", reading only the header blocks of the stored object.
+
+Placeholders that uploads could not compute cheaply (formats without a
+reduced decode) are filled in on the same queue.
+"""
+import logging
+from typing import Dict, Iterable, Optional
+
+from sqlalchemy.orm import Session, joinedload
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.document import DocumentFile
+from app.models.file import File
+from app.services.content_memo import ContentMemoService
+from app.services.document_summary import refresh_file_stats
+from app.services.minio import MinIOService
+from app.services.ranged_reader import RangedObjectReader
+from app.services.task_queue import task_queue
+from app.utils.image_metadata import PROFILE_FULL, PROFILE_MIX, extract_image_metadata
+from app.utils.placeholder import PLACEHOLDER_MAX_DECODE_PIXELS, create_placeholder_from_file
+
+logger = logging.getLogger(__name__)
+
+METADATA_PENDING = 'pending'
+METADATA_COMPLETE = 'complete'
+METADATA_FAILED = 'failed'
+
+# Extracted fields stored in DocumentFile columns
+MIX_COLUMNS = (
+    'image_width', 'image_height', 'bits_per_sample', 'samples_per_pixel',
+    'compression_scheme', 'color_space', 'x_sampling_frequency', 'y_sampling_frequency',
+    'sampling_frequency_unit', 'date_time_created', 'format_name', 'byte_order',
+    'orientation', 'icc_profile_name', 'scanner_manufacturer', 'scanner_model_name',
+    'scanning_software_name', 'scanning_software_version',
+)
+
+
+def inline_metadata_profile() -> str:
+    """Extraction profile to run inside upload requests"""
+    return PROFILE_MIX if settings.DEFER_RAW_METADATA else PROFILE_FULL
+
+
+def initial_metadata_status(is_image: bool) -> Optional[str]:
+    """metadata_status for a file just extracted with inline_metadata_profile()"""
+    if not is_image:
+        return None
+    return METADATA_PENDING if settings.DEFER_RAW_METADATA else METADATA_COMPLETE
+
+
+def apply_image_metadata(doc_file: DocumentFile, metadata: Dict):
+    """Copy extracted MIX fields and raw_metadata onto a DocumentFile (None keeps the current value)"""
+    for column in MIX_COLUMNS:
+        value = metadata.get(column)
+        if value is not None:
+            setattr(doc_file, column, value)
+    if metadata.get('raw_metadata'):
+        doc_file.raw_metadata = {**(doc_file.raw_metadata or {}), **metadata['raw_metadata']}
+
+
+class MetadataService:
+    """Complete raw_metadata for document files extracted with the MIX profile"""
+
+    def __init__(self, db: Session):
+        self.db = db
+        self.minio_service = MinIOService()
+
+    def extract_for_document(
+        self,
+        document_id: int,
+        statuses: Iterable[str] = (METADATA_PENDING,)
+    ) -> Dict[str, int]:
+        """
+        Run full extraction for the document's files in the given states
+
+        Args:
+            document_id: Document ID
+            statuses: metadata_status values to process
+
+        Returns:
+            Dictionary with the number of files completed and failed
+        """
+        doc_files = self.db.query(DocumentFile).options(
+            joinedload(DocumentFile.file)
+        ).filter(
+            DocumentFile.document_id == document_id,
+            DocumentFile.metadata_status.in_(list(statuses))
+        ).all()
+
+        result = {METADATA_COMPLETE: 0, METADATA_FAILED: 0}
+        for doc_file in doc_files:
+            had_placeholder = doc_file.placeholder is not None
+            try:
+                self._extract_file(doc_file)
+                doc_file.metadata_status = METADATA_COMPLETE
+            except Exception as e:
+                logger.error(f"Full metadata extraction failed for document file {doc_file.id}: {e}", exc_info=True)
+                doc_file.metadata_status = METADATA_FAILED
+            if not had_placeholder and doc_file.placeholder is not None:
+                # A memoized placeholder can become the document's cover
+                refresh_file_stats(self.db, [document_id])
+            self.db.commit()
+            result[doc_file.metadata_status] += 1
+
+        logger.info(f"Full metadata for document {document_id}: {result}")
+        return result
+
+    def _extract_file(self, doc_file: DocumentFile):
+        """Apply the full extraction profile to the stored object through ranged reads"""
+        memo_service = ContentMemoService(self.db)
+        memoized = memo_service.get_metadata(doc_file.file.file_hash)
+        if memoized:
+            apply_image_metadata(doc_file, memoized[0])
+            doc_file.placeholder = doc_file.placeholder or memoized[1]
+            return
+
+        with RangedObjectReader(doc_file.file.minio_object_name, self.minio_service) as reader:
+            metadata = extract_image_metadata(reader, PROFILE_FULL)
+            if not metadata.get('format_name'):
+                raise ValueError(f"no metadata could be read from {doc_file.file.minio_object_name}")
+            apply_image_metadata(doc_file, metadata)
+            logger.debug(
+                f"Extracted metadata of {doc_file.file.filename} from "
+                f"{reader.bytes_fetched} of {reader.size} bytes"
+            )
+        memo_service.store_metadata(doc_file.file.file_hash, metadata, doc_file.placeholder)
+
+
+def _run_metadata_extraction(document_id: int, statuses: tuple):
+    db = SessionLocal()
+    try:
+        MetadataService(db).extract_for_document(document_id, statuses)
+    finally:
+        db.close()
+
+
+def schedule_metadata_extraction(document_id: int, retry_failed: bool = False):
+    """Queue full metadata extraction for a document's pending (and optionally failed) files"""
+    statuses = (METADATA_PENDING, METADATA_FAILED) if retry_failed else (METADATA_PENDING,)
+    return task_queue.submit(
+        _run_metadata_extraction, document_id, statuses,
+        key=('metadata', document_id, retry_failed)
+    )
+
+
+def fill_missing_placeholders(db: Session, document_id: int) -> int:
+    """
+    Compute the placeholders of a document's images that have none
+
+    Decodes the stored objects (up to PLACEHOLDER_MAX_DECODE_PIXELS) and
+    records each new placeholder in the content memo as well.
+
+    Args:
+        db: Database session
+        document_id: Document ID
+
+    Returns:
+        Number of placeholders filled in
+    """
+    doc_files = db.query(DocumentFile).join(
+        File, File.id == DocumentFile.file_id
+    ).options(
+        joinedload(DocumentFile.file)
+    ).filter(
+        DocumentFile.document_id == document_id,
+        DocumentFile.placeholder.is_(None),
+        File.content_type.like('image/%')
+    ).all()
+
+    minio_service = MinIOService()
+    memo_service = ContentMemoService(db)
+    filled = 0
+    for doc_file in doc_files:
+        try:
+            with RangedObjectReader(
+                doc_file.file.minio_object_name, minio_service, size=doc_file.file.file_size
+            ) as reader:
+                placeholder = create_placeholder_from_file(
+                    reader, doc_file.file.filename, max_pixels=PLACEHOLDER_MAX_DECODE_PIXELS
+                )
+        except Exception as e:
+            logger.warning(f"Could not read document file {doc_file.id} for its placeholder: {e}")
+            continue
+        if placeholder:
+            doc_file.placeholder = placeholder
+            memo_service.store_placeholder(doc_file.file.file_hash, placeholder)
+            filled += 1
+
+    if filled:
+        refresh_file_stats(db, [document_id])
+        db.commit()
+    logger.info(f"Filled {filled} of {len(doc_files)} missing placeholders for document {document_id}")
+    return filled
+
+
+def _run_placeholders(document_id: int):
+    db = SessionLocal()
+    try:
+        fill_missing_placeholders(db, document_id)
+    finally:
+        db.close()
+
+
+def schedule_placeholders(document_id: int):
+    """Queue placeholder generation for a document's images uploaded without one"""
+    return task_queue.submit(_run_placeholders, document_id, key=('placeholders', document_id))
@@ -0,0 +1,180 @@
+"""
+METS Cache - Rendered METS XML keyed by document revision
+
+A rendering depends on the Document row, the METS document in MongoDB and the
+document's files, so it is cached under a key built from Document.updated_at,
+the METS updated_at and a digest of the file rows the generator reads. Entries
+live in a small in-process LRU and as MinIO objects (shared by workers and
+kept across restarts); a changed key simply misses, and update/attach/detach/
+delete paths drop a document's entries explicitly.
+"""
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Iterable, Iterator, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.document import Document
+from app.services.minio import MinIOService
+from app.services.mets_stream import document_file_rows
+from app.utils.minio_paths import get_mets_cache_prefix
+
+logger = logging.getLogger(__name__)
+
+# Bump when the METS output changes for identical inputs (generator changes)
+METS_RENDER_VERSION = '2'
+
+
+def mets_cache_key(db: Session, document: Document, mets_revision: Optional[datetime]) -> str:
+    """
+    Cache key of a document's METS rendering
+
+    Args:
+        db: Database session
+        document: Document ORM object
+        mets_revision: updated_at of the METS document (None if there is none)
+
+    Returns:
+        Hex digest identifying the rendering inputs
+    """
+    digest = hashlib.sha256()
+    digest.update(f"{METS_RENDER_VERSION}|{document.updated_at}|{mets_revision}".encode('utf-8'))
+    # File set: every column the generator renders, in techMD order
+    for row in document_file_rows(db, document.id, 'amd'):
+        digest.update(repr(tuple(row)).encode('utf-8'))
+    return digest.hexdigest()
+
+
+class METSCache:
+    """Two-level (memory + MinIO) cache of rendered METS XML"""
+
+    def __init__(self, memory_bytes: Optional[int] = None):
+        self.memory_bytes = memory_bytes or settings.METS_CACHE_MEMORY_BYTES
+        self._entries: "OrderedDict[Tuple[int, str], bytes]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self._minio_service: Optional[MinIOService] = None
+
+    @property
+    def minio_service(self) -> MinIOService:
+        if self._minio_service is None:
+            self._minio_service = MinIOService()
+        return self._minio_service
+
+    @minio_service.setter
+    def minio_service(self, service: MinIOService):
+        self._minio_service = service
+
+    def _object_name(self, user_id: int, document_id: int, key: str) -> str:
+        return f"{get_mets_cache_prefix(user_id, document_id)}{key}.xml"
+
+    def get(self, user_id: int, document_id: int, key: str) -> Optional[bytes]:
+        """
+        Cached rendering, or None
+
+        Args:
+            user_id: Owner user ID
+            document_id: Document ID
+            key: mets_cache_key() of the current revision
+
+        Returns:
+            UTF-8 METS XML or None on a miss
+        """
+        if not settings.METS_CACHE_ENABLED:
+            return None
+        with self._lock:
+            data = self._entries.get((document_id, key))
+            if data is not None:
+                self._entries.move_to_end((document_id, key))
+                return data
+
+        object_name = self._object_name(user_id, document_id, key)
+        try:
+            if not self.minio_service.object_exists(object_name):
+                return None
+            response = self.minio_service.get_file(object_name)
+            try:
+                data = response.read()
+            finally:
+                response.close()
+                response.release_conn()
+        except Exception as e:
+            logger.warning(f"Could not read cached METS {object_name}: {e}")
+            return None
+
+        self._remember(document_id, key, data)
+        return data
+
+    def put(self, user_id: int, document_id: int, key: str, data: bytes):
+        """Store a rendering and drop the document's renderings of older revisions"""
+        if not settings.METS_CACHE_ENABLED or len(data) > settings.METS_CACHE_MAX_ENTRY_BYTES:
+            return
+        self._forget(document_id, keep=key)
+        self._remember(document_id, key, data)
+
+        object_name = self._object_name(user_id, document_id, key)
+        try:
+            self.minio_service.put_bytes(object_name, data, 'application/xml')
+            self._delete_objects(user_id, document_id, keep=object_name)
+        except Exception as e:
+            logger.warning(f"Could not store cached METS {object_name}: {e}")
+
+    def store_stream(self, user_id: int, document_id: int, key: str, chunks: Iterable[bytes]) -> Iterator[bytes]:
+        """
+        Pass a streamed rendering through, caching it once it is complete
+
+        Renderings above METS_CACHE_MAX_ENTRY_BYTES are streamed without being kept.
+        """
+        collected = []
+        size = 0
+        for chunk in chunks:
+            if collected is not None:
+                collected.append(chunk)
+                size += len(chunk)
+                if size > settings.METS_CACHE_MAX_ENTRY_BYTES:
+                    collected = None
+            yield chunk
+        if collected is not None:
+            self.put(user_id, document_id, key, b''.join(collected))
+
+    def invalidate(self, user_id: int, document_id: int):
+        """Drop every cached rendering of a document"""
+        self._forget(document_id)
+        if not settings.METS_CACHE_ENABLED:
+            return
+        try:
+            self._delete_objects(user_id, document_id)
+        except Exception as e:
+            logger.warning(f"Could not remove cached METS of document {document_id}: {e}")
+
+    def _remember(self, document_id: int, key: str, data: bytes):
+        # Entries above a quarter of the budget would evict most of the cache
+        if len(data) > self.memory_bytes // 4:
+            return
+        with self._lock:
+            previous = self._entries.pop((document_id, key), None)
+            if previous is not None:
+                self._size -= len(previous)
+            self._entries[(document_id, key)] = data
+            self._size += len(data)
+            while self._size > self.memory_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+    def _forget(self, document_id: int, keep: Optional[str] = None):
+        with self._lock:
+            for entry in [entry for entry in self._entries if entry[0] == document_id and entry[1] != keep]:
+                self._size -= len(self._entries.pop(entry))
+
+    def _delete_objects(self, user_id: int, document_id: int, keep: Optional[str] = None):
+        for object_name in self.minio_service.list_object_names(get_mets_cache_prefix(user_id, document_id)):
+            if object_name != keep:
+                self.minio_service.delete_file(object_name)
+
+
+# Global instance shared by request handlers and background tasks
+mets_cache = METSCache()
@@ -1,13 +1,17 @@
 """
 METS Document Service - Business logic for METS ECO-MiC metadata operations
 """
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Iterable, List, Sequence
 from datetime import datetime
+from app.core.config import settings
 from app.services.mongodb import MongoDBService
 import logging
 
 logger = logging.getLogger(__name__)
 
+# METS fields shown in document lists (DocumentListItem)
+LIST_ITEM_FIELDS = ('title', 'archive.name', 'physical.document_type', 'physical.total_pages')
+
 
 class METSDocumentService:
     """Service for METS ECO-MiC document operations"""
@@ -53,6 +57,34 @@ class METSDocumentService:
         logger.info(f"Created METS document {mets_id} for logical_id {logical_id} (schema v{schema_version})")
         return mets_id
 
+    async def create_mets_documents(self, owner_id: int, entries: List[Dict[str, Any]]) -> List[str]:
+        """
+        Create the METS documents of several platform documents in one insert
+
+        Args:
+            owner_id: User ID who owns the documents
+            entries: Dicts with logical_id, platform_document_id, metadata and schema_version
+
+        Returns:
+            MongoDB ObjectIds as strings, in the order of entries
+        """
+        now = datetime.utcnow()
+        documents = [
+            {
+                "schema_version": entry.get('schema_version') or "1.1",
+                "logical_id": entry['logical_id'],
+                "platform_document_id": entry['platform_document_id'],
+                "owner_id": owner_id,
+                "created_at": now,
+                "updated_at": now,
+                **entry['metadata']
+            }
+            for entry in entries
+        ]
+        mets_ids = await self.mongodb.create_mets_documents(documents)
+        logger.info(f"Created {len(mets_ids)} METS documents for user {owner_id}")
+        return mets_ids
+
     async def get_mets_document(self, mets_id: str) -> Optional[Dict[str, Any]]:
         """
         Get METS document by MongoDB ID
@@ -65,6 +97,35 @@ class METSDocumentService:
         """
         return await self.mongodb.get_mets_document(mets_id)
 
+    async def get_mets_documents(
+        self,
+        mets_ids: List[str],
+        fields: Optional[Sequence[str]] = None
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        Get several METS documents by MongoDB ID in one query
+
+        Args:
+            mets_ids: MongoDB ObjectIds as strings
+            fields: Fields to return (dotted paths for nested fields); None returns whole documents
+
+        Returns:
+            METS documents by id
+        """
+        return await self.mongodb.get_mets_documents(mets_ids, fields)
+
+    async def get_mets_revision(self, mets_id: str) -> Optional[datetime]:
+        """
+        Get the last update time of a METS document (without loading it)
+
+        Args:
+            mets_id: MongoDB ObjectId as string
+
+        Returns:
+            updated_at or None
+        """
+        return await self.mongodb.get_mets_document_revision(mets_id)
+
     async def get_mets_document_by_logical_id(self, logical_id: str) -> Optional[Dict[str, Any]]:
         """
         Get METS document by logical_id
@@ -110,6 +171,20 @@ class METSDocumentService:
             logger.info(f"Deleted METS document {mets_id}")
         return success
 
+    async def delete_mets_documents(self, mets_ids: List[str]) -> int:
+        """
+        Delete several METS documents
+
+        Args:
+            mets_ids: MongoDB ObjectIds as strings
+
+        Returns:
+            Number of documents deleted
+        """
+        deleted = await self.mongodb.delete_mets_documents(mets_ids)
+        logger.info(f"Deleted {deleted} METS documents")
+        return deleted
+
     async def list_mets_documents(
         self, owner_id: int, skip: int = 0, limit: int = 100
     ) -> list:
@@ -279,3 +354,39 @@ class METSDocumentService:
             metadata.pop('record_status', None)
 
         return metadata
+
+
+class METSDocumentLoader:
+    """
+    Batched METS document loader for endpoints that list many documents
+
+    Replaces one get_mets_document call per row with one $in query per
+    MONGO_LOAD_BATCH_SIZE ids, optionally projected to the fields the
+    endpoint shows. Documents already loaded by the same loader are not
+    fetched again, so one loader can be shared across the steps of a request.
+    """
+
+    def __init__(self, mets_service: METSDocumentService, fields: Optional[Sequence[str]] = None):
+        self.mets_service = mets_service
+        self.fields = tuple(fields) if fields is not None else None
+        self._loaded: Dict[str, Optional[Dict[str, Any]]] = {}
+
+    async def load_many(self, mets_ids: Iterable[Optional[str]]) -> Dict[str, Dict[str, Any]]:
+        """
+        METS documents of several rows
+
+        Args:
+            mets_ids: mets_document_id values (None and duplicates are ignored)
+
+        Returns:
+            METS documents by id; ids without a METS document are left out
+        """
+        wanted = list(dict.fromkeys(mets_id for mets_id in mets_ids if mets_id))
+        missing = [mets_id for mets_id in wanted if mets_id not in self._loaded]
+        batch_size = max(1, settings.MONGO_LOAD_BATCH_SIZE)
+        for start in range(0, len(missing), batch_size):
+            batch = missing[start:start + batch_size]
+            found = await self.mets_service.get_mets_documents(batch, self.fields)
+            for mets_id in batch:
+                self._loaded[mets_id] = found.get(mets_id)
+        return {mets_id: self._loaded[mets_id] for mets_id in wanted if self._loaded[mets_id] is not None}
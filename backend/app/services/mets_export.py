@@ -0,0 +1,208 @@
+"""
+METS Batch Export - Many documents' METS XML as one streamed ZIP
+
+Documents are selected by ID or by a search filter and loaded in batches
+(one PostgreSQL query for the rows, one for their files and one MongoDB $in
+query for the METS documents). Each METS is rendered from the loaded rows in
+a worker process, with a bounded number of renderings in flight, and written
+to the ZIP as soon as it is ready. The archive is never seekable or held in
+memory: what ZipFile writes is handed to the response entry by entry, so
+memory depends on the batch size and the window, not on the number of
+documents exported.
+"""
+import asyncio
+import logging
+import multiprocessing
+import re
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.document import Document
+from app.services.mets_document import METSDocumentLoader, METSDocumentService
+from app.services.mets_stream import load_file_rows
+from app.services.mongodb import mongodb_service
+from app.utils.mets_generator_ecomic import render_mets_xml
+
+logger = logging.getLogger(__name__)
+
+ERRORS_ENTRY = 'export_errors.txt'
+
+_render_pool: Optional[ProcessPoolExecutor] = None
+
+
+def _get_render_pool() -> Optional[ProcessPoolExecutor]:
+    """Process pool for METS rendering (None = the default thread pool)"""
+    global _render_pool
+    if settings.METS_EXPORT_PROCESSES <= 0:
+        return None
+    if _render_pool is None:
+        # spawn: the API process runs worker threads, which fork does not copy safely
+        _render_pool = ProcessPoolExecutor(
+            max_workers=settings.METS_EXPORT_PROCESSES,
+            mp_context=multiprocessing.get_context('spawn')
+        )
+    return _render_pool
+
+
+def shutdown_render_pool():
+    """Stop the rendering processes (application shutdown, or after a worker died)"""
+    global _render_pool
+    if _render_pool is not None:
+        _render_pool.shutdown(wait=False, cancel_futures=True)
+        _render_pool = None
+
+
+class _ZipSink:
+    """Write-only, non-seekable file object collecting the bytes ZipFile writes"""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def take(self) -> bytes:
+        """Bytes written since the previous call"""
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _entry_stem(logical_id: str) -> str:
+    # Same character set as DocumentService._sanitize_filename, without truncation (names must stay unique)
+    return re.sub(r'[^\w\-\.]', '_', logical_id).strip('. ') or 'document'
+
+
+async def _iter_document_batches(
+    db,
+    owner_id: int,
+    document_ids: Optional[List[int]],
+    query: Optional[str],
+    filters: Optional[Dict[str, Any]]
+) -> AsyncIterator[List[Tuple[Document, Optional[Dict[str, Any]]]]]:
+    """Batches of (Document, METS document) pairs of the owner's selected documents"""
+    batch_size = max(1, settings.METS_EXPORT_BATCH_SIZE)
+
+    if document_ids is not None:
+        ids = sorted(set(document_ids))
+        mets_service = METSDocumentService(mongodb_service)
+        for start in range(0, len(ids), batch_size):
+            documents = db.query(Document).filter(
+                Document.id.in_(ids[start:start + batch_size]),
+                Document.owner_id == owner_id
+            ).order_by(Document.id).all()
+            mets_docs = await METSDocumentLoader(mets_service).load_many(
+                document.mets_document_id for document in documents
+            )
+            yield [(document, mets_docs.get(document.mets_document_id)) for document in documents]
+        return
+
+    # Search filter: METS documents are matched in MongoDB, then joined by logical_id (as in the search route)
+    async for mets_batch in mongodb_service.iter_search_documents(owner_id, query, filters, batch_size):
+        mets_by_logical_id = {mets_doc['logical_id']: mets_doc for mets_doc in mets_batch}
+        documents = db.query(Document).filter(
+            Document.logical_id.in_(list(mets_by_logical_id)),
+            Document.owner_id == owner_id
+        ).order_by(Document.id).all()
+        yield [(document, mets_by_logical_id[document.logical_id]) for document in documents]
+
+
+async def iter_mets_zip(
+    owner_id: int,
+    document_ids: Optional[List[int]] = None,
+    query: Optional[str] = None,
+    filters: Optional[Dict[str, Any]] = None,
+    compact: bool = False
+) -> AsyncIterator[bytes]:
+    """
+    ZIP archive of METS XML files ({logical_id}_mets.xml), streamed entry by entry
+
+    Uses its own database session, since the body is produced after the
+    request handler has returned. Documents that fail to render are listed
+    in an export_errors.txt entry at the end of the archive.
+
+    Args:
+        owner_id: Owner of the documents
+        document_ids: Documents to export, or None to export a search
+        query: Full-text search query (when document_ids is None)
+        filters: Search filters as for MongoDBService.search_documents
+        compact: Write METS without indentation whitespace
+
+    Yields:
+        Chunks of the ZIP archive
+    """
+    from app.services.document import DocumentService
+
+    loop = asyncio.get_running_loop()
+    pool = _get_render_pool()
+    window = max(2, 2 * settings.METS_EXPORT_PROCESSES)
+    sink = _ZipSink()
+    failures: List[str] = []
+    exported = 0
+    db = SessionLocal()
+    try:
+        with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+            pending: deque = deque()
+
+            async def write_next():
+                nonlocal exported, pool
+                logical_id, rendering, detail, rows = pending.popleft()
+                try:
+                    try:
+                        data = await rendering
+                    except BrokenProcessPool:
+                        # A worker died (e.g. killed for memory): finish this export in threads
+                        logger.error("METS rendering process pool broke, rendering in threads")
+                        shutdown_render_pool()
+                        pool = None
+                        data = await loop.run_in_executor(None, render_mets_xml, detail, rows, compact)
+                except Exception as e:
+                    logger.error(f"Could not render METS of {logical_id}: {e}", exc_info=True)
+                    failures.append(f"{logical_id}: {e}")
+                    return
+                name = f"{_entry_stem(logical_id)}_mets.xml"
+                # Deflate off the event loop
+                await run_in_threadpool(archive.writestr, name, data)
+                exported += 1
+
+            async for batch in _iter_document_batches(db, owner_id, document_ids, query, filters):
+                file_rows = load_file_rows(db, [document.id for document, _ in batch])
+                for document, mets_doc in batch:
+                    detail = DocumentService._build_document_detail(document, mets_doc, [])
+                    rows = file_rows.pop(document.id)
+                    rendering = loop.run_in_executor(pool, render_mets_xml, detail, rows, compact)
+                    pending.append((document.logical_id, rendering, detail, rows))
+                    if len(pending) >= window:
+                        await write_next()
+                        if chunk := sink.take():
+                            yield chunk
+                db.expunge_all()
+
+            while pending:
+                await write_next()
+                if chunk := sink.take():
+                    yield chunk
+
+            if failures:
+                archive.writestr(ERRORS_ENTRY, '\n'.join(failures) + '\n')
+        yield sink.take()
+        logger.info(f"Batch METS export for user {owner_id}: {exported} documents, {len(failures)} failed")
+    finally:
+        db.close()
+
+
+def export_filename() -> str:
+    """Download name of a batch export"""
+    return f"mets_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip"
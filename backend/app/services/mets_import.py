@@ -0,0 +1,205 @@
+"""
+METS Import - Create documents in bulk from existing METS files
+
+Files are parsed with MetadataParser.parse_xml_file (hardened, reading only
+the METS header and descriptive sections) in a worker thread or worker
+processes, one batch ahead of the database writes. Each batch is created
+with one PostgreSQL flush/commit and one MongoDB insert_many instead of a
+coordinated transaction per document: if the MongoDB insert fails the
+PostgreSQL rows are rolled back (after deleting whatever part of the batch
+MongoDB did write), and if the commit fails the inserted METS documents are
+deleted.
+"""
+import asyncio
+import logging
+import multiprocessing
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from pydantic import ValidationError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.document import Document
+from app.schemas.document import DocumentCreate
+from app.services.document_summary import add_summary
+from app.services.mets_document import METSDocumentService
+from app.services.mongodb import mongodb_service
+from app.utils.metadata_parser import MetadataParser
+
+logger = logging.getLogger(__name__)
+
+# Failures listed in the result (the counters are always complete)
+MAX_REPORTED_ERRORS = 100
+
+
+def find_mets_files(directory: str, recursive: bool = False) -> List[str]:
+    """XML files of a directory, sorted by path"""
+    if not recursive:
+        return sorted(
+            entry.path for entry in os.scandir(directory)
+            if entry.is_file() and entry.name.lower().endswith('.xml')
+        )
+    paths = []
+    for folder, _, filenames in os.walk(directory):
+        paths.extend(os.path.join(folder, name) for name in filenames if name.lower().endswith('.xml'))
+    return sorted(paths)
+
+
+def import_logical_id(path: str) -> str:
+    """
+    Logical ID of a document imported from a METS file
+
+    The file name without extension and without the "_mets" suffix of the
+    METS export, so exported archives re-import under their original IDs.
+    """
+    stem = os.path.splitext(os.path.basename(path))[0]
+    stem = re.sub(r'_mets$', '', stem, flags=re.IGNORECASE)
+    return re.sub(r'[^a-zA-Z0-9_\-\.]', '_', stem)[:255] or 'document'
+
+
+class METSImporter:
+    """Create one owner's documents from METS files, batch by batch"""
+
+    def __init__(
+        self,
+        db: Session,
+        owner_id: int,
+        batch_size: Optional[int] = None,
+        processes: Optional[int] = None
+    ):
+        self.db = db
+        self.owner_id = owner_id
+        self.batch_size = max(1, batch_size or settings.METS_IMPORT_BATCH_SIZE)
+        self.processes = settings.METS_IMPORT_PROCESSES if processes is None else processes
+        self.mets_service = METSDocumentService(mongodb_service)
+        self.result: Dict[str, Any] = {'imported': 0, 'skipped': 0, 'failed': 0, 'errors': []}
+
+    def _fail(self, path: str, reason: str):
+        self.result['failed'] += 1
+        if len(self.result['errors']) < MAX_REPORTED_ERRORS:
+            self.result['errors'].append(f"{path}: {reason}")
+
+    async def run(
+        self,
+        paths: List[str],
+        progress: Optional[Callable[[Dict[str, Any]], None]] = None
+    ) -> Dict[str, Any]:
+        """
+        Import METS files
+
+        Args:
+            paths: METS files to import
+            progress: Called with the result counters after every batch
+
+        Returns:
+            Counters: imported, skipped (logical_id already exists), failed, and errors
+        """
+        batches = [paths[start:start + self.batch_size] for start in range(0, len(paths), self.batch_size)]
+        if not batches:
+            return self.result
+
+        loop = asyncio.get_running_loop()
+        pool = None
+        if self.processes > 0:
+            pool = ProcessPoolExecutor(max_workers=self.processes, mp_context=multiprocessing.get_context('spawn'))
+
+        def parse(batch: List[str]):
+            if pool is None:
+                return loop.run_in_executor(None, lambda: [MetadataParser.parse_xml_file(path) for path in batch])
+            chunksize = max(1, len(batch) // (4 * self.processes))
+            return loop.run_in_executor(None, lambda: list(pool.map(MetadataParser.parse_xml_file, batch, chunksize=chunksize)))
+
+        try:
+            parsing = parse(batches[0])
+            for index, batch in enumerate(batches):
+                parsed = await parsing
+                # Parse the next batch while this one is written
+                if index + 1 < len(batches):
+                    parsing = parse(batches[index + 1])
+                await self._import_batch(batch, parsed)
+                if progress:
+                    progress(self.result)
+        finally:
+            if pool is not None:
+                pool.shutdown(cancel_futures=True)
+
+        logger.info(
+            f"METS import for user {self.owner_id}: {self.result['imported']} imported, "
+            f"{self.result['skipped']} skipped, {self.result['failed']} failed"
+        )
+        return self.result
+
+    async def _import_batch(self, paths: List[str], parsed: Iterable[Optional[Dict[str, Any]]]):
+        entries: Dict[str, DocumentCreate] = {}
+        for path, metadata in zip(paths, parsed):
+            if not metadata:
+                self._fail(path, "not parseable or no metadata found")
+                continue
+            try:
+                # A logical_id in the file itself (simple XML) takes precedence over the file name
+                document_data = DocumentCreate(**{'logical_id': import_logical_id(path), **metadata})
+            except ValidationError as e:
+                self._fail(path, f"invalid metadata: {e.errors()[0].get('msg')}")
+                continue
+            if document_data.logical_id in entries:
+                self.result['skipped'] += 1
+                continue
+            entries[document_data.logical_id] = document_data
+
+        # logical_id is unique across all owners
+        existing = {row[0] for row in self.db.query(Document.logical_id).filter(
+            Document.logical_id.in_(list(entries))
+        ).all()} if entries else set()
+        for logical_id in existing:
+            del entries[logical_id]
+        self.result['skipped'] += len(existing)
+        if not entries:
+            return
+
+        try:
+            # METS documents left without a platform document (e.g. by a failed
+            # coordinated create) would make the whole insert fail
+            orphaned = await mongodb_service.find_logical_ids(list(entries))
+            for logical_id in orphaned:
+                del entries[logical_id]
+                self._fail(logical_id, "a METS document with this logical_id already exists")
+            if not entries:
+                return
+            await self._create_documents(list(entries.values()))
+            self.result['imported'] += len(entries)
+        except Exception as e:
+            logger.error(f"Could not import a batch of {len(entries)} METS files: {e}", exc_info=True)
+            for logical_id in entries:
+                self._fail(logical_id, str(e))
+
+    async def _create_documents(self, entries: List[DocumentCreate]):
+        documents = [Document(logical_id=data.logical_id, owner_id=self.owner_id) for data in entries]
+        self.db.add_all(documents)
+        try:
+            self.db.flush()
+            mets_ids = await self.mets_service.create_mets_documents(self.owner_id, [
+                {
+                    'logical_id': data.logical_id,
+                    'platform_document_id': document.id,
+                    'metadata': self.mets_service.extract_mets_metadata_from_document_data(data.dict()),
+                    'schema_version': data.schema_version
+                }
+                for data, document in zip(entries, documents)
+            ])
+        except Exception:
+            self.db.rollback()
+            raise
+
+        for data, document, mets_id in zip(entries, documents, mets_ids):
+            document.mets_document_id = mets_id
+            add_summary(self.db, document, data.dict())
+        try:
+            self.db.commit()
+        except Exception:
+            self.db.rollback()
+            await self.mets_service.delete_mets_documents(mets_ids)
+            raise
+        self.db.expunge_all()
@@ -0,0 +1,126 @@
+"""
+METS Stream - Incremental METS XML export for large documents
+
+Feeds METSEcoMicGenerator.iter_mets_xml with DocumentFile rows read through
+server-side cursors (one pass per section, in the order the section needs),
+so a volume with thousands of files is written without building the
+ElementTree or the full XML string, and the first bytes go out immediately.
+"""
+import logging
+from types import SimpleNamespace
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from sqlalchemy import case, func
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.document import Document, DocumentFile
+from app.models.file import File
+from app.services.metadata import MIX_COLUMNS
+from app.utils.mets_generator_ecomic import CATEGORY_TO_USE, USE_ORDER, mets_generator
+
+logger = logging.getLogger(__name__)
+
+# DocumentFile columns used by the generator (plus the File columns below)
+FILE_ROW_COLUMNS = ('id', 'file_id', 'file_category', 'file_label', 'sequence_number', 'checksum_md5') + MIX_COLUMNS
+
+
+def document_file_rows(db: Session, document_id: int, section: str) -> Iterable:
+    """
+    Stream a document's files in the order a METS section expects
+
+    Args:
+        db: Database session
+        document_id: Document ID
+        section: One of app.utils.mets_generator_ecomic.FILE_SECTIONS
+
+    Returns:
+        Iterable of rows with DocumentFile attributes plus filename, content_type and file_size
+    """
+    query = db.query(
+        *(getattr(DocumentFile, column) for column in FILE_ROW_COLUMNS),
+        File.filename, File.content_type, File.file_size
+    ).join(File, DocumentFile.file_id == File.id).filter(DocumentFile.document_id == document_id)
+
+    sequence = func.coalesce(DocumentFile.sequence_number, 0)
+    if section == 'amd':
+        query = query.order_by(DocumentFile.id)
+    elif section == 'file':
+        use_rank = case(
+            {category: USE_ORDER.index(use) for category, use in CATEGORY_TO_USE.items()},
+            value=DocumentFile.file_category,
+            else_=USE_ORDER.index('OTHER')
+        )
+        query = query.order_by(use_rank, sequence, DocumentFile.id)
+    elif section == 'struct':
+        query = query.order_by(sequence, DocumentFile.id)
+    else:
+        raise ValueError(f"unknown METS section {section}")
+
+    # yield_per streams through a server-side cursor instead of loading every row
+    return query.yield_per(settings.METS_STREAM_BATCH_SIZE)
+
+
+def load_file_rows(db: Session, document_ids: List[int]) -> Dict[int, List[SimpleNamespace]]:
+    """
+    Files of several documents in one query, as plain picklable rows
+
+    Args:
+        db: Database session
+        document_ids: Document IDs
+
+    Returns:
+        Rows (same attributes as document_file_rows) by document ID, in no particular order
+    """
+    rows: Dict[int, List[SimpleNamespace]] = {document_id: [] for document_id in document_ids}
+    if not document_ids:
+        return rows
+    query = db.query(
+        DocumentFile.document_id,
+        *(getattr(DocumentFile, column) for column in FILE_ROW_COLUMNS),
+        File.filename, File.content_type, File.file_size
+    ).join(File, DocumentFile.file_id == File.id).filter(DocumentFile.document_id.in_(document_ids))
+
+    for row in query.yield_per(settings.METS_STREAM_BATCH_SIZE):
+        values = row._asdict()
+        rows[values.pop('document_id')].append(SimpleNamespace(**values))
+    return rows
+
+
+def iter_document_mets(db: Session, document: Document) -> Iterator[str]:
+    """METS XML text fragments of a document (document_files is not loaded)"""
+    return mets_generator.iter_mets_xml(document, lambda section: document_file_rows(db, document.id, section))
+
+
+def stream_document_mets(document: Document, chunk_size: Optional[int] = None) -> Iterator[bytes]:
+    """
+    UTF-8 METS XML of a document in chunks, for StreamingResponse
+
+    Uses its own database session, since the response body is produced after
+    the request handler (and its session) has returned.
+
+    Args:
+        document: Document (or DocumentDetail) with the descriptive fields
+        chunk_size: Bytes buffered per chunk (default METS_STREAM_CHUNK_SIZE)
+
+    Yields:
+        Chunks of the XML document
+    """
+    chunk_size = chunk_size or settings.METS_STREAM_CHUNK_SIZE
+    db = SessionLocal()
+    try:
+        buffer = []
+        buffered = 0
+        for fragment in iter_document_mets(db, document):
+            data = fragment.encode('utf-8')
+            buffer.append(data)
+            buffered += len(data)
+            if buffered >= chunk_size:
+                yield b''.join(buffer)
+                buffer = []
+                buffered = 0
+        if buffer:
+            yield b''.join(buffer)
+    finally:
+        db.close()
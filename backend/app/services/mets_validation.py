@@ -1,6 +1,7 @@
 """
 METS ECO-MiC Validation Service
-Service for validating METS XML files against ECO-MiC 1.1 standard using external API
+Service for validating METS XML files against ECO-MiC 1.1 standard: offline
+XSD + profile checks first, then optionally the external Cineca API
 """
 
 import httpx
@@ -8,8 +9,12 @@ import html
 import xml.etree.ElementTree as ET
 import logging
 from datetime import datetime
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 from fastapi import HTTPException
+from starlette.concurrency import run_in_threadpool
+from app.core.config import settings
+from app.services.validation_client import remote_validation_client
+from app.utils.mets_local_validator import get_local_validator
 
 # Set up logging
 logger = logging.getLogger(__name__)
@@ -22,8 +27,7 @@ class METSValidationService:
     """Service for validating METS XML against ECO-MiC 1.1 standard"""
 
     def __init__(self):
-        self.validation_api_url = "https://validavmetsecomic.prod.os01.ocp.cineca.it/api/v1/checkmetsecomic/files"
-        self.timeout = 30.0  # seconds
+        self.remote_enabled = settings.METS_REMOTE_VALIDATION
 
     @staticmethod
     def _sanitize_text(text: str) -> str:
@@ -33,38 +37,53 @@ class METSValidationService:
         # HTML escape to prevent XML injection
         return html.escape(str(text), quote=True)
     
-    async def validate_mets_xml(self, xml_content: str, filename: str = "mets.xml") -> Dict[str, Any]:
+    async def validate_mets_xml(
+        self, xml_content: str, filename: str = "mets.xml", remote: Optional[bool] = None
+    ) -> Dict[str, Any]:
         """
         Validate METS XML content against ECO-MiC 1.1 standard
-        
+
+        The bundled XSDs and ECO-MiC profile rules run locally first, in a
+        worker thread; only documents passing them are sent to the remote
+        API, if enabled.
+
         Args:
             xml_content: The METS XML content as string
             filename: Optional filename for the validation (default: mets.xml)
-            
+            remote: Run the remote stage (default: METS_REMOTE_VALIDATION)
+
         Returns:
             Dict containing validation results with structure:
             {
                 "valid": bool,
-                "response": dict,  # Original API response
+                "response": dict,  # Engine details or original API response
                 "errors": list,    # Simplified error list for UI
+                "warnings": list,  # Profile findings that do not invalidate
                 "summary": str     # Human-readable summary
             }
         """
-        try:
-            # Prepare file data for multipart form
-            files = {
-                "files": (filename, xml_content.encode('utf-8'), "application/xml")
-            }
+        # lxml validation is CPU-bound: keep it off the event loop
+        result = await run_in_threadpool(lambda: get_local_validator().validate(xml_content))
+        logger.info(
+            f"Local METS validation of {filename}: valid={result['valid']}, "
+            f"{len(result['errors'])} error(s) in {result['response']['duration_ms']} ms"
+        )
+
+        if not result['valid'] or not (self.remote_enabled if remote is None else remote):
+            return result
+
+        remote_result = await self._validate_remote(xml_content, filename)
+        remote_result['warnings'] = result['warnings']
+        return remote_result
 
+    async def _validate_remote(self, xml_content: str, filename: str) -> Dict[str, Any]:
+        """Validate METS XML with the remote Cineca API"""
+        try:
             logger.info(f"Validating METS XML against Cineca API: {filename}")
             logger.debug(f"XML content length: {len(xml_content)} bytes")
 
-            # Make request to validation API
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                response = await client.post(
-                    self.validation_api_url,
-                    files=files
-                )
+            # Pooled, cached and coalesced request to the validation API
+            response = await remote_validation_client.validate(xml_content.encode('utf-8'), filename)
 
             logger.info(f"Cineca API response: HTTP {response.status_code}")
             
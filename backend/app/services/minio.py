@@ -1,8 +1,10 @@
 import asyncio
+import io
 import uuid
 from datetime import timedelta
 from typing import Dict, List, Optional, AsyncGenerator, BinaryIO
 from minio import Minio
+from minio.commonconfig import CopySource
 from minio.error import S3Error
 import aiofiles
 import magic
@@ -166,6 +168,64 @@ class MinIOService:
             logger.error(f"Error deleting file: {e}")
             raise
     
+    def object_exists(self, object_name: str) -> bool:
+        """Check whether an object exists in the bucket"""
+        try:
+            self.client.stat_object(settings.MINIO_BUCKET_NAME, object_name)
+            return True
+        except S3Error as e:
+            if e.code in ('NoSuchKey', 'NoSuchObject', 'ResourceNotFound'):
+                return False
+            logger.error(f"Error checking object {object_name}: {e}")
+            raise
+
+    def get_object_size(self, object_name: str) -> int:
+        """Size of an object in bytes"""
+        try:
+            return self.client.stat_object(settings.MINIO_BUCKET_NAME, object_name).size
+        except S3Error as e:
+            logger.error(f"Error getting size of {object_name}: {e}")
+            raise
+
+    def copy_object(self, source_object_name: str, object_name: str) -> str:
+        """Server-side copy of an object within the bucket"""
+        try:
+            self.client.copy_object(
+                settings.MINIO_BUCKET_NAME,
+                object_name,
+                CopySource(settings.MINIO_BUCKET_NAME, source_object_name)
+            )
+            return object_name
+        except S3Error as e:
+            logger.error(f"Error copying {source_object_name} to {object_name}: {e}")
+            raise
+
+    def list_object_names(self, prefix: str) -> List[str]:
+        """Names of the objects under a prefix"""
+        try:
+            return [
+                obj.object_name for obj in
+                self.client.list_objects(settings.MINIO_BUCKET_NAME, prefix=prefix, recursive=True)
+            ]
+        except S3Error as e:
+            logger.error(f"Error listing objects under {prefix}: {e}")
+            raise
+
+    def put_bytes(self, object_name: str, data: bytes, content_type: str) -> str:
+        """Upload an in-memory payload (derivatives, generated documents)"""
+        try:
+            self.client.put_object(
+                settings.MINIO_BUCKET_NAME,
+                object_name,
+                io.BytesIO(data),
+                len(data),
+                content_type=content_type
+            )
+            return object_name
+        except S3Error as e:
+            logger.error(f"Error uploading {object_name}: {e}")
+            raise
+
     def detect_content_type(self, file_path: str) -> str:
         """Detect file content type using python-magic"""
         try:
@@ -173,12 +233,21 @@ class MinIOService:
         except Exception:
             return "application/octet-stream"
     
-    def get_file(self, object_name: str):
-        """Get file data from MinIO"""
+    def get_file(self, object_name: str, offset: int = 0, length: int = 0):
+        """
+        Get file data from MinIO
+
+        Args:
+            object_name: Object path in the bucket
+            offset: Start byte of a ranged read (default: beginning of object)
+            length: Number of bytes to read (0 = until end of object)
+        """
         try:
             response = self.client.get_object(
                 settings.MINIO_BUCKET_NAME,
-                object_name
+                object_name,
+                offset=offset,
+                length=length
             )
             return response
         except S3Error as e:
@@ -1,16 +1,27 @@
 """
 MongoDB service for METS ECO-MiC metadata storage
 """
+import asyncio
 from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
-from pymongo.errors import ConnectionFailure
-from typing import Optional, Dict, Any
+from pymongo.errors import BulkWriteError, ConnectionFailure, PyMongoError
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence
 from bson import ObjectId
 from datetime import datetime
 from app.core.config import settings
+from app.utils.cursor import decode_cursor, next_cursor, parse_datetime
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Cursor kinds of search results: by relevance (text search) or by creation date
+SEARCH_TEXT_CURSOR = 'search_text'
+SEARCH_CURSOR = 'search'
+
+# How search_documents() computes the total
+SEARCH_TOTAL_EXACT = 'exact'
+SEARCH_TOTAL_NONE = 'none'
+SEARCH_TOTAL_MODES = (SEARCH_TOTAL_EXACT, SEARCH_TOTAL_NONE)
+
 
 class MongoDBService:
     """MongoDB service for METS ECO-MiC metadata storage"""
@@ -61,6 +72,9 @@ class MongoDBService:
         # Index on created_at for sorting
         await mets_collection.create_index([("created_at", -1)])
 
+        # Owner's documents newest first, keyset-paginated on (created_at, _id)
+        await mets_collection.create_index([("owner_id", 1), ("created_at", -1), ("_id", -1)])
+
         # Index on temporal date fields
         await mets_collection.create_index("temporal.date_from")
         await mets_collection.create_index("temporal.date_to")
@@ -111,6 +125,31 @@ class MongoDBService:
         result = await self.async_db.mets_documents.insert_one(document_data)
         return str(result.inserted_id)
 
+    async def create_mets_documents(self, documents: List[Dict[str, Any]]) -> List[str]:
+        """
+        Create several METS documents in one round trip
+
+        Args:
+            documents: METS metadata dictionaries
+
+        Returns:
+            String representations of the new ObjectIds, in input order
+
+        Raises:
+            BulkWriteError: if any document was rejected (e.g. duplicate
+            logical_id); the documents that were written are deleted again
+        """
+        if not documents:
+            return []
+        try:
+            result = await self.async_db.mets_documents.insert_many(documents, ordered=False)
+        except BulkWriteError:
+            # insert_many assigned an _id to every document: remove the ones that were written
+            inserted_ids = [document['_id'] for document in documents if '_id' in document]
+            await self.async_db.mets_documents.delete_many({"_id": {"$in": inserted_ids}})
+            raise
+        return [str(inserted_id) for inserted_id in result.inserted_ids]
+
     async def get_mets_document(self, mets_id: str) -> Optional[Dict[str, Any]]:
         """
         Get METS document by MongoDB ObjectId
@@ -133,6 +172,68 @@ class MongoDBService:
             logger.error(f"Error fetching METS document {mets_id}: {e}")
             return None
 
+    async def get_mets_document_revision(self, mets_id: str) -> Optional[datetime]:
+        """
+        Get only the updated_at timestamp of a METS document
+
+        Args:
+            mets_id: String representation of MongoDB ObjectId
+
+        Returns:
+            updated_at, or None if the document is not found or cannot be read
+        """
+        try:
+            doc = await self.async_db.mets_documents.find_one(
+                {"_id": ObjectId(mets_id)},
+                {"updated_at": 1}
+            )
+            return doc.get('updated_at') if doc else None
+        except Exception as e:
+            logger.error(f"Error fetching revision of METS document {mets_id}: {e}")
+            return None
+
+    async def get_mets_documents(
+        self,
+        mets_ids: List[str],
+        fields: Optional[Sequence[str]] = None
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        Get several METS documents in one query
+
+        Args:
+            mets_ids: String representations of MongoDB ObjectIds
+            fields: Fields to return (dotted paths for nested fields); None returns whole documents
+
+        Returns:
+            Dictionary of METS documents by id (missing or invalid ids are left out)
+        """
+        object_ids = [ObjectId(mets_id) for mets_id in mets_ids if mets_id and ObjectId.is_valid(mets_id)]
+        if not object_ids:
+            return {}
+        projection = {field: 1 for field in fields} if fields is not None else None
+        documents = {}
+        async for doc in self.async_db.mets_documents.find({"_id": {"$in": object_ids}}, projection):
+            doc['_id'] = str(doc['_id'])
+            documents[doc['_id']] = doc
+        return documents
+
+    async def find_logical_ids(self, logical_ids: Sequence[str]) -> set:
+        """
+        Logical IDs that already have a METS document
+
+        Args:
+            logical_ids: Logical identifiers to look up
+
+        Returns:
+            The subset of logical_ids present in the collection
+        """
+        if not logical_ids:
+            return set()
+        cursor = self.async_db.mets_documents.find(
+            {"logical_id": {"$in": list(logical_ids)}}, {"logical_id": 1, "_id": 0}
+        )
+        return {doc['logical_id'] async for doc in cursor}
+
     async def get_mets_document_by_logical_id(self, logical_id: str) -> Optional[Dict[str, Any]]:
         """
         Get METS document by logical_id
@@ -199,6 +300,22 @@ class MongoDBService:
             logger.error(f"Error deleting METS document {mets_id}: {e}")
             return False
 
+    async def delete_mets_documents(self, mets_ids: List[str]) -> int:
+        """
+        Delete several METS documents
+
+        Args:
+            mets_ids: String representations of MongoDB ObjectIds
+
+        Returns:
+            Number of documents deleted
+        """
+        object_ids = [ObjectId(mets_id) for mets_id in mets_ids if mets_id and ObjectId.is_valid(mets_id)]
+        if not object_ids:
+            return 0
+        result = await self.async_db.mets_documents.delete_many({"_id": {"$in": object_ids}})
+        return result.deleted_count
+
     async def list_mets_documents(
         self,
         owner_id: int,
@@ -232,64 +349,107 @@ class MongoDBService:
             logger.error(f"Error listing METS documents for user {owner_id}: {e}")
             return []
 
+    @staticmethod
+    def _search_filter(owner_id: int, query: Optional[str], filters: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """MongoDB filter for search_documents() arguments"""
+        filters = filters or {}
+        match_filter = {"owner_id": owner_id}
+
+        # Full-text search
+        if query:
+            match_filter["$text"] = {"$search": query}
+
+        # Additional filters
+        if filters.get('logical_id'):
+            match_filter["logical_id"] = {
+                "$regex": filters['logical_id'],
+                "$options": "i"
+            }
+
+        if filters.get('archive'):
+            match_filter["archive.name"] = {
+                "$regex": filters['archive'],
+                "$options": "i"
+            }
+
+        if filters.get('schema_version'):
+            match_filter["schema_version"] = filters['schema_version']
+
+        # Date range filters
+        if filters.get('date_from') or filters.get('date_to'):
+            temporal_filter = {}
+            if filters.get('date_from'):
+                temporal_filter["$gte"] = filters['date_from']
+            if filters.get('date_to'):
+                temporal_filter["$lte"] = filters['date_to']
+
+            if temporal_filter:
+                match_filter["temporal.date_from"] = temporal_filter
+
+        return match_filter
+
     async def search_documents(
         self,
         owner_id: int,
         query: Optional[str] = None,
         filters: Optional[Dict[str, Any]] = None,
         skip: int = 0,
-        limit: int = 20
+        limit: int = 20,
+        cursor: Optional[str] = None,
+        total: str = SEARCH_TOTAL_EXACT
     ) -> Dict[str, Any]:
         """
         Search METS documents with full-text search and filters
 
+        Results are sorted by relevance (search_score, _id) for a text search,
+        else by (created_at, _id), newest first.
+
+        The total is computed according to total:
+        - exact: for a text search, items and total come from one
+          $facet aggregation, so the $text match and scoring run once; other
+          searches read the page through the (owner_id, created_at, _id)
+          index while count_documents runs concurrently (for an unfiltered
+          search, from the owner_id index alone)
+        - none: no total (None); only the page is read
+
         Args:
             owner_id: User ID
             query: Full-text search query
             filters: Dictionary of filters (logical_id, archive, date_from, date_to, schema_version)
-            skip: Number of documents to skip (pagination)
+            skip: Number of documents to skip (pagination, ignored when a cursor is given)
             limit: Maximum number of documents to return
+            cursor: Keyset pagination: next_cursor of the previous page of the same search
+            total: SEARCH_TOTAL_EXACT or SEARCH_TOTAL_NONE
 
         Returns:
-            Dictionary with 'items' (list of documents), 'total' (total count), and metadata
+            Dictionary with 'items' (list of documents), 'total' (total count or None),
+            'next_cursor' (None on the last page), and metadata
+
+        Raises:
+            InvalidCursor: If the cursor does not belong to this kind of search
+            ValueError: If total is not a known mode
+            PyMongoError: If MongoDB cannot be queried
         """
+        if total not in SEARCH_TOTAL_MODES:
+            raise ValueError(f"Unknown search total mode: {total}")
+
+        sort_field = "search_score" if query else "created_at"
+        keyset = None
+        if cursor:
+            # Keyset: strictly after the last (sort value, _id) of the previous page
+            kind = SEARCH_TEXT_CURSOR if query else SEARCH_CURSOR
+            last_value, last_id = decode_cursor(cursor, kind, (float if query else parse_datetime, ObjectId))
+            if last_value is None:
+                keyset = {sort_field: None, "_id": {"$lt": last_id}}
+            else:
+                keyset = {"$or": [
+                    {sort_field: {"$lt": last_value}},
+                    {sort_field: last_value, "_id": {"$lt": last_id}}
+                ]}
+
         try:
             mets_collection = self.async_db.mets_documents
-            filters = filters or {}
-
-            # Build MongoDB filter
-            match_filter = {"owner_id": owner_id}
-
-            # Full-text search
-            if query:
-                match_filter["$text"] = {"$search": query}
-
-            # Additional filters
-            if filters.get('logical_id'):
-                match_filter["logical_id"] = {
-                    "$regex": filters['logical_id'],
-                    "$options": "i"
-                }
-
-            if filters.get('archive'):
-                match_filter["archive.name"] = {
-                    "$regex": filters['archive'],
-                    "$options": "i"
-                }
-
-            if filters.get('schema_version'):
-                match_filter["schema_version"] = filters['schema_version']
-
-            # Date range filters
-            if filters.get('date_from') or filters.get('date_to'):
-                temporal_filter = {}
-                if filters.get('date_from'):
-                    temporal_filter["$gte"] = filters['date_from']
-                if filters.get('date_to'):
-                    temporal_filter["$lte"] = filters['date_to']
-
-                if temporal_filter:
-                    match_filter["temporal.date_from"] = temporal_filter
+            match_filter = self._search_filter(owner_id, query, filters)
 
             # Build aggregation pipeline
             pipeline = [
@@ -303,44 +463,91 @@ class MongoDBService:
                         "search_score": {"$meta": "textScore"}
                     }
                 })
-                pipeline.append({"$sort": {"search_score": -1}})
+
+            # Pagination (_id breaks ties, so pages never overlap)
+            page_stages = []
+            if keyset is not None:
+                page_stages.append({"$match": keyset})
+            page_stages.append({"$sort": {sort_field: -1, "_id": -1}})
+            if keyset is None:
+                page_stages.append({"$skip": skip})
+            page_stages.append({"$limit": limit})
+
+            total_count = None
+            if total == SEARCH_TOTAL_NONE:
+                documents = await mets_collection.aggregate(pipeline + page_stages).to_list(length=limit)
+            elif query:
+                # One round trip: the page and the count share the $text match and scoring
+                pipeline.append({"$facet": {
+                    "items": page_stages,
+                    "total": [{"$count": "total"}]
+                }})
+                facet = (await mets_collection.aggregate(pipeline).to_list(length=1))[0]
+                documents = facet['items']
+                total_count = facet['total'][0]['total'] if facet['total'] else 0
             else:
-                # Sort by created_at if no text search
-                pipeline.append({"$sort": {"created_at": -1}})
+                # Inside $facet the sort could not use an index: read the page
+                # through the sort index and count concurrently
+                documents, total_count = await asyncio.gather(
+                    mets_collection.aggregate(pipeline + page_stages).to_list(length=limit),
+                    mets_collection.count_documents(match_filter)
+                )
+
+        except PyMongoError as e:
+            logger.error(f"Error searching METS documents: {e}", exc_info=True)
+            raise
 
-            # Get total count
-            count_pipeline = pipeline.copy()
-            count_pipeline.append({"$count": "total"})
-            count_result = await mets_collection.aggregate(count_pipeline).to_list(1)
-            total = count_result[0]['total'] if count_result else 0
+        next_page = next_cursor(
+            SEARCH_TEXT_CURSOR if query else SEARCH_CURSOR, documents, limit,
+            lambda doc: (doc.get(sort_field), doc['_id'])
+        )
 
-            # Add pagination
-            pipeline.append({"$skip": skip})
-            pipeline.append({"$limit": limit})
+        # Convert ObjectIds to strings
+        for doc in documents:
+            doc['_id'] = str(doc['_id'])
 
-            # Execute search
-            cursor = mets_collection.aggregate(pipeline)
-            documents = await cursor.to_list(length=limit)
+        return {
+            "items": documents,
+            "total": total_count,
+            "skip": skip,
+            "limit": limit,
+            "next_cursor": next_page
+        }
 
-            # Convert ObjectIds to strings
-            for doc in documents:
-                doc['_id'] = str(doc['_id'])
+    async def iter_search_documents(
+        self,
+        owner_id: int,
+        query: Optional[str] = None,
+        filters: Optional[Dict[str, Any]] = None,
+        batch_size: int = 100,
+        fields: Optional[Sequence[str]] = None
+    ) -> AsyncIterator[List[Dict[str, Any]]]:
+        """
+        Every METS document matching a search, in batches (no pagination or count)
 
-            return {
-                "items": documents,
-                "total": total,
-                "skip": skip,
-                "limit": limit
-            }
+        Args:
+            owner_id: User ID
+            query: Full-text search query
+            filters: Same filters as search_documents()
+            batch_size: Documents per batch (and per cursor round trip)
+            fields: Fields to return (dotted paths for nested fields); None returns whole documents
 
-        except Exception as e:
-            logger.error(f"Error searching METS documents: {e}")
-            return {
-                "items": [],
-                "total": 0,
-                "skip": skip,
-                "limit": limit
-            }
+        Yields:
+            Lists of METS documents
+        """
+        projection = {field: 1 for field in fields} if fields is not None else None
+        cursor = self.async_db.mets_documents.find(
+            self._search_filter(owner_id, query, filters), projection
+        ).sort("_id", 1).batch_size(batch_size)
+        batch = []
+        async for doc in cursor:
+            doc['_id'] = str(doc['_id'])
+            batch.append(doc)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
 
 
 # Global instance
@@ -0,0 +1,77 @@
+"""
+Background task queue - Run CPU/IO heavy work off the request path
+
+Tasks run in a bounded thread pool inside the API process. They must open
+their own database session (SessionLocal) since request sessions are closed
+once the response is sent.
+"""
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Hashable, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class TaskQueue:
+    """
+    Bounded worker pool with per-key de-duplication
+
+    Submitting a task with a key that is still waiting in the queue returns
+    the existing future instead of scheduling the work twice (e.g. several
+    uploads to the same document in quick succession). Once a task has
+    started, a new submission is scheduled again so that it sees the latest
+    state.
+    """
+
+    def __init__(self, max_workers: int, name: str):
+        self.name = name
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._pending: Dict[Hashable, Future] = {}
+        self._lock = threading.RLock()
+        # Set on shutdown; long-running tasks poll it to stop at a safe point
+        self.stopping = threading.Event()
+
+    def submit(self, fn: Callable, *args, key: Optional[Hashable] = None, **kwargs) -> Future:
+        """
+        Schedule a task
+
+        Args:
+            fn: Callable to run in a worker thread
+            key: Optional de-duplication key
+        """
+        with self._lock:
+            if key is not None and key in self._pending:
+                return self._pending[key]
+
+            future = self._executor.submit(self._run, key, fn, *args, **kwargs)
+            if key is not None:
+                self._pending[key] = future
+            return future
+
+    def _run(self, key: Optional[Hashable], fn: Callable, *args, **kwargs):
+        if key is not None:
+            self._forget(key)
+        try:
+            return fn(*args, **kwargs)
+        except Exception as e:
+            logger.error(f"Background task {getattr(fn, '__name__', fn)} failed in {self.name}: {e}", exc_info=True)
+            raise
+
+    def _forget(self, key: Hashable):
+        with self._lock:
+            self._pending.pop(key, None)
+
+    def shutdown(self, wait: bool = True):
+        """Stop accepting tasks, cancel queued ones and wait for running ones"""
+        self.stopping.set()
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+
+# Global queue for ingest-time work (derivatives, deferred metadata)
+task_queue = TaskQueue(max_workers=settings.BACKGROUND_WORKERS, name="archivia-bg")
+
+# Separate queue for long maintenance jobs (backfills) so they never hold ingest workers
+job_queue = TaskQueue(max_workers=settings.JOB_WORKERS, name="archivia-jobs")
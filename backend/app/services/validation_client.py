@@ -0,0 +1,155 @@
+"""
+Remote Validation Client - Pooled HTTP access to the METS validation API
+
+One httpx.AsyncClient (keep-alive, HTTP/2 when available) is opened at
+startup and shared by every request, so DNS/TCP/TLS setup is paid once per
+connection instead of once per validation. Validator answers (HTTP 200/412)
+are cached by XML content hash for METS_VALIDATION_CACHE_TTL seconds, and
+concurrent validations of the same XML share a single upstream request.
+"""
+import asyncio
+import hashlib
+import logging
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+import httpx
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Validator answers worth reusing: conforming (200) and non-conforming (412)
+CACHEABLE_STATUS_CODES = (200, 412)
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+class RemoteValidationClient:
+    """Shared client for the remote METS validation API"""
+
+    def __init__(self, url: Optional[str] = None):
+        self.url = url or settings.METS_VALIDATION_API_URL
+        self._client: Optional[httpx.AsyncClient] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._results: "OrderedDict[str, Tuple[float, httpx.Response]]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Task] = {}
+
+    def _new_client(self) -> httpx.AsyncClient:
+        http2 = settings.METS_VALIDATION_HTTP2 and _http2_available()
+        if settings.METS_VALIDATION_HTTP2 and not http2:
+            logger.warning("h2 is not installed, remote METS validation uses HTTP/1.1")
+        return httpx.AsyncClient(
+            timeout=settings.METS_VALIDATION_TIMEOUT,
+            http2=http2,
+            limits=httpx.Limits(
+                max_connections=settings.METS_VALIDATION_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.METS_VALIDATION_MAX_CONNECTIONS,
+                keepalive_expiry=settings.METS_VALIDATION_KEEPALIVE_EXPIRY
+            )
+        )
+
+    async def start(self):
+        """Open the pooled client on the running event loop (application startup)"""
+        if self._client is None:
+            self._client = self._new_client()
+            self._loop = asyncio.get_running_loop()
+            logger.info(f"Remote METS validation client ready ({self.url})")
+
+    async def close(self):
+        """Close pooled connections (application shutdown)"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+            self._loop = None
+        self._inflight.clear()
+
+    def clear_cache(self):
+        self._results.clear()
+
+    async def validate(self, xml_content: bytes, filename: str) -> httpx.Response:
+        """
+        Submit METS XML to the validation API
+
+        Args:
+            xml_content: METS XML as UTF-8 bytes
+            filename: File name sent with the multipart upload
+
+        Returns:
+            The (fully read) validator response; identical XML within the TTL
+            returns the cached response without contacting the API
+
+        Raises:
+            httpx.TimeoutException, httpx.RequestError: upstream failures (never cached)
+        """
+        if self._client is None:
+            await self.start()
+        if asyncio.get_running_loop() is not self._loop:
+            # Called from another event loop (e.g. a worker thread): the pooled
+            # client belongs to the application loop, use a one-off client
+            async with self._new_client() as client:
+                return await self._post(client, xml_content, filename)
+
+        key = hashlib.sha256(xml_content).hexdigest()
+        cached = self._cached(key)
+        if cached is not None:
+            logger.info(f"Remote METS validation of {filename} served from cache")
+            return cached
+
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch(key, xml_content, filename))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            logger.info(f"Remote METS validation of {filename} joined an in-flight request")
+        # Shielded so one cancelled caller does not cancel the shared request
+        return await asyncio.shield(task)
+
+    async def _fetch(self, key: str, xml_content: bytes, filename: str) -> httpx.Response:
+        response = await self._post(self._client, xml_content, filename)
+        if response.status_code in CACHEABLE_STATUS_CODES:
+            self._store(key, response)
+        return response
+
+    async def _post(self, client: httpx.AsyncClient, xml_content: bytes, filename: str) -> httpx.Response:
+        started = time.perf_counter()
+        response = await client.post(
+            self.url,
+            files={"files": (filename, xml_content, "application/xml")}
+        )
+        logger.info(
+            f"Validation API response: HTTP {response.status_code} ({response.http_version}) "
+            f"in {(time.perf_counter() - started) * 1000:.0f} ms"
+        )
+        return response
+
+    def _cached(self, key: str) -> Optional[httpx.Response]:
+        entry = self._results.get(key)
+        if entry is None:
+            return None
+        expires_at, response = entry
+        if expires_at < time.monotonic():
+            del self._results[key]
+            return None
+        self._results.move_to_end(key)
+        return response
+
+    def _store(self, key: str, response: httpx.Response):
+        if settings.METS_VALIDATION_CACHE_TTL <= 0:
+            return
+        self._results[key] = (time.monotonic() + settings.METS_VALIDATION_CACHE_TTL, response)
+        self._results.move_to_end(key)
+        while len(self._results) > settings.METS_VALIDATION_CACHE_MAX_ENTRIES:
+            self._results.popitem(last=False)
+
+
+# Global instance, opened and closed with the application
+remote_validation_client = RemoteValidationClient()
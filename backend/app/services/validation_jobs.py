@@ -0,0 +1,356 @@
+"""
+Validation Jobs - Background METS validation with persisted verdicts
+
+Validation runs off the export path: a document is validated in the
+background shortly after its metadata or images change, and clients can
+validate many documents at once through a checkpointed job. Each verdict is
+stored with the SHA256 of the validated METS XML (DocumentValidation), so an
+export whose rendered XML has the same hash reuses the verdict instantly and
+only unknown XML is validated synchronously.
+
+Validation needs MongoDB (motor) and the pooled validation client, both bound
+to the application event loop, so these jobs run as asyncio tasks on that
+loop rather than on the thread-based job_queue.
+"""
+import asyncio
+import hashlib
+import logging
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Set
+
+from fastapi import HTTPException
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.document import Document
+from app.models.document_validation import DocumentValidation
+from app.models.job import Job
+from app.services.backfill import (
+    JOB_CANCELLED, JOB_COMPLETED, JOB_FAILED, JOB_INTERRUPTED, JOB_QUEUED, JOB_RUNNING, claim_job, release_job
+)
+from app.services.mets_validation import METSValidationService
+from app.services.task_queue import job_queue
+
+logger = logging.getLogger(__name__)
+
+JOB_TYPE_METS_VALIDATION = 'mets_validation'
+
+VALIDATION_VALID = 'valid'
+VALIDATION_INVALID = 'invalid'
+VALIDATION_ERROR = 'error'  # The validator could not be reached; retried on the next request
+
+# Verdicts that are reused while the METS XML is unchanged
+FINAL_VERDICTS = (VALIDATION_VALID, VALIDATION_INVALID)
+
+# Background tasks of this process (referenced so they are not garbage collected)
+_tasks: Set[asyncio.Task] = set()
+# Documents with a debounced validation waiting to start
+_pending_documents: Set[int] = set()
+
+
+def mets_xml_hash(mets_xml: str) -> str:
+    """SHA256 of rendered METS XML"""
+    return hashlib.sha256(mets_xml.encode('utf-8')).hexdigest()
+
+
+def get_document_validation(db: Session, document_id: int) -> Optional[DocumentValidation]:
+    """Stored verdict of a document, if any"""
+    return db.query(DocumentValidation).filter(DocumentValidation.document_id == document_id).first()
+
+
+async def validate_document_xml(
+    db: Session, document: Document, mets_xml: str, cache_key: Optional[str] = None
+) -> DocumentValidation:
+    """
+    Verdict for a document's rendered METS, validating only unknown XML
+
+    Args:
+        db: Database session (the verdict is committed)
+        document: Document ORM object
+        mets_xml: Current METS XML of the document
+        cache_key: METS render cache key of mets_xml, stored with the verdict
+
+    Returns:
+        The stored verdict when its xml_hash matches, else a fresh one
+    """
+    xml_hash = mets_xml_hash(mets_xml)
+    verdict = await run_in_threadpool(get_document_validation, db, document.id)
+    if verdict is not None and verdict.xml_hash == xml_hash and verdict.status in FINAL_VERDICTS:
+        if cache_key and verdict.mets_cache_key != cache_key:
+            # Same XML from new rendering inputs (or a verdict stored before keys were recorded)
+            return await run_in_threadpool(_store_verdict, db, document.id, verdict, {'mets_cache_key': cache_key})
+        return verdict
+
+    try:
+        result = await METSValidationService().validate_mets_xml(mets_xml, f"{document.logical_id}_mets.xml")
+        values = {
+            'status': VALIDATION_VALID if result.get('valid') else VALIDATION_INVALID,
+            'engine': (result.get('response') or {}).get('engine', 'local+remote'),
+            'errors': result.get('errors', []),
+            'warnings': result.get('warnings', []),
+            'summary': result.get('summary'),
+        }
+    except HTTPException as e:
+        # Remote stage unavailable (timeout, connection error, unexpected status)
+        logger.warning(f"METS validation of document {document.id} failed: {e.detail}")
+        values = {'status': VALIDATION_ERROR, 'engine': None, 'errors': [], 'warnings': [], 'summary': str(e.detail)}
+
+    values.update(xml_hash=xml_hash, mets_cache_key=cache_key, validated_at=datetime.now(timezone.utc))
+    return await run_in_threadpool(_store_verdict, db, document.id, verdict, values)
+
+
+def _store_verdict(
+    db: Session, document_id: int, verdict: Optional[DocumentValidation], values: Dict
+) -> DocumentValidation:
+    """Insert or update a document's verdict and commit"""
+    if verdict is None:
+        try:
+            with db.begin_nested():
+                verdict = DocumentValidation(document_id=document_id, **values)
+                db.add(verdict)
+        except IntegrityError:
+            # Validated concurrently (export and background job); overwrite with this result
+            verdict = get_document_validation(db, document_id)
+
+    for column, value in values.items():
+        setattr(verdict, column, value)
+    db.commit()
+    return verdict
+
+
+async def _validate_document(document_id: int) -> Optional[str]:
+    """Render and validate one document in its own session; returns the verdict status"""
+    # Imported here: DocumentService imports this module for export verdicts
+    from app.services.document import DocumentService
+
+    db = SessionLocal()
+    try:
+        document = await run_in_threadpool(db.query(Document).filter(Document.id == document_id).first)
+        if document is None:
+            return None
+        return (await DocumentService(db).validate_document(document)).status
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Could not validate document {document_id}: {e}", exc_info=True)
+        return VALIDATION_ERROR
+    finally:
+        db.close()
+
+
+def create_validation_job(db: Session, owner_id: int, document_ids: Optional[List[int]] = None) -> Job:
+    """
+    Create (but do not start) a bulk METS validation job
+
+    Args:
+        db: Database session
+        owner_id: Owner of the documents (and of the job)
+        document_ids: Documents to validate (None = all of the owner's documents)
+
+    Returns:
+        The new Job
+    """
+    job = Job(
+        job_type=JOB_TYPE_METS_VALIDATION,
+        status=JOB_QUEUED,
+        owner_id=owner_id,
+        params={
+            'owner_id': owner_id,
+            'document_ids': sorted(set(document_ids)) if document_ids else None,
+            'batch_size': settings.METS_VALIDATION_JOB_BATCH_SIZE,
+            'concurrency': settings.METS_VALIDATION_JOB_CONCURRENCY
+        },
+        checkpoint={'last_id': 0, 'invalid': 0},
+        processed=0,
+        succeeded=0,
+        failed=0
+    )
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+class METSValidationJob:
+    """Run one bulk validation job from its checkpoint"""
+
+    def __init__(self, db: Session, job: Job):
+        self.db = db
+        self.job = job
+        self.params = job.params or {}
+
+    def _pending_query(self):
+        query = self.db.query(Document.id).filter(Document.owner_id == self.params['owner_id'])
+        if self.params.get('document_ids') is not None:
+            query = query.filter(Document.id.in_(self.params['document_ids']))
+        return query
+
+    async def run(self) -> Job:
+        """
+        Validate documents batch by batch until done, cancelled or shut down
+
+        Counters: succeeded = documents with a verdict (valid or invalid),
+        failed = documents the validator could not process; the number of
+        invalid documents is kept in checkpoint["invalid"].
+        """
+        job = self.job
+        if job.status == JOB_CANCELLED:
+            # Cancelled before the task started
+            return job
+        await run_in_threadpool(self._start)
+        logger.info(f"METS validation job {job.id} started ({job.total} documents)")
+
+        batch_size = max(1, int(self.params.get('batch_size') or settings.METS_VALIDATION_JOB_BATCH_SIZE))
+        semaphore = asyncio.Semaphore(
+            max(1, int(self.params.get('concurrency') or settings.METS_VALIDATION_JOB_CONCURRENCY))
+        )
+
+        async def validate(document_id: int) -> Optional[str]:
+            async with semaphore:
+                return await _validate_document(document_id)
+
+        try:
+            while True:
+                await run_in_threadpool(self.db.refresh, job)
+                if job.status != JOB_RUNNING:
+                    # Cancelled, or already handed to another runner by a resume
+                    logger.info(f"METS validation job {job.id} stopped: {job.status}")
+                    break
+                if job_queue.stopping.is_set():
+                    job.status = JOB_INTERRUPTED
+                    await run_in_threadpool(self.db.commit)
+                    break
+
+                document_ids = await run_in_threadpool(self._next_batch, batch_size)
+                if not document_ids:
+                    job.status = JOB_COMPLETED
+                    job.finished_at = datetime.now(timezone.utc)
+                    await run_in_threadpool(self.db.commit)
+                    logger.info(
+                        f"METS validation job {job.id} completed: {job.succeeded} validated "
+                        f"({job.checkpoint.get('invalid', 0)} invalid), {job.failed} failed"
+                    )
+                    break
+
+                statuses = await asyncio.gather(*(validate(document_id) for document_id in document_ids))
+                await run_in_threadpool(self._record_batch, document_ids, statuses)
+
+        except asyncio.CancelledError:
+            # Event loop shutting down: keep the checkpoint, resume later
+            self.db.rollback()
+            job.status = JOB_INTERRUPTED
+            self.db.commit()
+            raise
+        except Exception as e:
+            await run_in_threadpool(self._fail, str(e))
+            logger.error(f"METS validation job {job.id} failed: {e}", exc_info=True)
+
+        return job
+
+    def _start(self):
+        job = self.job
+        job.status = JOB_RUNNING
+        job.error = None
+        job.started_at = job.started_at or datetime.now(timezone.utc)
+        job.finished_at = None
+        if job.total is None:
+            job.total = self._pending_query().count()
+        self.db.commit()
+
+    def _next_batch(self, batch_size: int) -> List[int]:
+        last_id = int((self.job.checkpoint or {}).get('last_id') or 0)
+        return [row[0] for row in self._pending_query().filter(
+            Document.id > last_id
+        ).order_by(Document.id).limit(batch_size).all()]
+
+    def _fail(self, error: str):
+        self.db.rollback()
+        job = self.job
+        job.status = JOB_FAILED
+        job.error = error
+        job.finished_at = datetime.now(timezone.utc)
+        self.db.commit()
+
+    def _record_batch(self, document_ids: List[int], statuses: List[Optional[str]]):
+        counts: Dict[Optional[str], int] = {}
+        for status in statuses:
+            counts[status] = counts.get(status, 0) + 1
+        verdicts = counts.get(VALIDATION_VALID, 0) + counts.get(VALIDATION_INVALID, 0)
+
+        job = self.job
+        job.processed += len(document_ids)
+        job.succeeded += verdicts
+        # Documents deleted meanwhile (None) are neither validated nor failed
+        job.failed += counts.get(VALIDATION_ERROR, 0)
+        job.checkpoint = {
+            'last_id': document_ids[-1],
+            'invalid': int((job.checkpoint or {}).get('invalid') or 0) + counts.get(VALIDATION_INVALID, 0)
+        }
+        self.db.commit()
+        logger.info(f"METS validation job {job.id}: {job.processed}/{job.total} (checkpoint id {document_ids[-1]})")
+
+
+async def run_validation_job(job_id: int) -> Optional[Job]:
+    """Run a validation job in its own database session"""
+    db = SessionLocal()
+    try:
+        job = await run_in_threadpool(db.query(Job).filter(Job.id == job_id).first)
+        if not job:
+            logger.warning(f"Validation job {job_id} not found")
+            return None
+        return await METSValidationJob(db, job).run()
+    finally:
+        db.close()
+
+
+def _spawn(coroutine) -> asyncio.Task:
+    task = asyncio.get_running_loop().create_task(coroutine)
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+    return task
+
+
+def schedule_validation_job(job_id: int) -> Optional[asyncio.Task]:
+    """
+    Run a validation job in the background on the application event loop
+
+    Returns:
+        The task, or None if the job already has a runner in this process
+    """
+    if not claim_job(job_id):
+        logger.warning(f"Validation job {job_id} is already scheduled")
+        return None
+    task = _spawn(run_validation_job(job_id))
+    task.add_done_callback(lambda _: release_job(job_id))
+    return task
+
+
+def schedule_document_validation(document_id: int):
+    """
+    Validate a document in the background once its edits settle
+
+    Repeated changes within METS_VALIDATION_DEBOUNCE_SECONDS share one
+    validation, which sees the latest state.
+    """
+    if not settings.METS_VALIDATE_ON_CHANGE or document_id in _pending_documents:
+        return
+    _pending_documents.add(document_id)
+
+    async def debounced():
+        try:
+            await asyncio.sleep(settings.METS_VALIDATION_DEBOUNCE_SECONDS)
+        finally:
+            _pending_documents.discard(document_id)
+        await _validate_document(document_id)
+
+    _spawn(debounced())
+
+
+async def cancel_validation_tasks():
+    """Stop background validations (application shutdown); running jobs are left resumable"""
+    tasks = list(_tasks)
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
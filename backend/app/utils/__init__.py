@@ -1,7 +1,7 @@
-from .file_utils import calculate_file_hash, format_file_size, validate_filename
+from .file_utils import calculate_file_hash, calculate_file_set_hash, format_file_size, validate_filename
 from .logging import setup_logging, log_api_call, log_file_operation
 
 __all__ = [
-    "calculate_file_hash", "format_file_size", "validate_filename",
+    "calculate_file_hash", "calculate_file_set_hash", "format_file_size", "validate_filename",
     "setup_logging", "log_api_call", "log_file_operation"
 ]
\ No newline at end of file
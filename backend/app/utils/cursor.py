@@ -0,0 +1,91 @@
+"""
+Opaque cursors for keyset pagination
+
+A cursor holds the sort key of the last item of a page, e.g. (created_at, id),
+and the next page continues strictly after it. Unlike skip/offset, the cost
+of a page does not grow with its depth and rows inserted meanwhile do not
+shift the following pages.
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Any, Callable, Optional, Sequence, Tuple
+
+# Name of the response header carrying the cursor of the next page in list endpoints
+NEXT_CURSOR_HEADER = 'X-Next-Cursor'
+
+
+class InvalidCursor(ValueError):
+    """Raised when a cursor was not produced by encode_cursor() for this listing"""
+
+
+def _json_default(value: Any):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+def encode_cursor(kind: str, *values: Any) -> str:
+    """
+    Encode the sort key of the last item of a page
+
+    Args:
+        kind: Listing the cursor belongs to (a cursor of another listing is rejected)
+        values: Sort key values; datetimes and ObjectIds are stored as strings
+
+    Returns:
+        URL-safe cursor string
+    """
+    data = json.dumps([kind, *values], default=_json_default, separators=(',', ':'))
+    return base64.urlsafe_b64encode(data.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str, kind: str, types: Sequence[Callable[[Any], Any]]) -> Tuple[Any, ...]:
+    """
+    Decode a cursor of the given listing
+
+    Args:
+        cursor: Value returned by encode_cursor()
+        kind: Expected listing
+        types: Converter for each value (e.g. datetime.fromisoformat, int); None values are kept
+
+    Returns:
+        The sort key values
+
+    Raises:
+        InvalidCursor: If the cursor is malformed or belongs to another listing
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        if not isinstance(data, list) or len(data) != len(types) + 1 or data[0] != kind:
+            raise InvalidCursor("Invalid cursor")
+        return tuple(None if value is None else convert(value) for convert, value in zip(types, data[1:]))
+    except InvalidCursor:
+        raise
+    except Exception as e:
+        # Malformed base64/JSON, or a value its converter rejects (e.g. bson InvalidId)
+        raise InvalidCursor("Invalid cursor") from e
+
+
+def parse_datetime(value: str) -> datetime:
+    """datetime of a cursor value (ISO 8601)"""
+    return datetime.fromisoformat(value)
+
+
+def next_cursor(kind: str, items: Sequence[Any], limit: int, key: Callable[[Any], Tuple[Any, ...]]) -> Optional[str]:
+    """
+    Cursor of the page after items, or None if items is the last page
+
+    Args:
+        kind: Listing the cursor belongs to
+        items: Items of the current page
+        limit: Page size requested
+        key: Sort key of an item
+
+    Returns:
+        Cursor string, or None when fewer than limit items were returned
+    """
+    if limit <= 0 or len(items) < limit:
+        return None
+    return encode_cursor(kind, *key(items[-1]))
@@ -19,6 +19,30 @@ def calculate_file_hash(file: BinaryIO, algorithm: str = "sha256") -> str:
     return hash_obj.hexdigest()
 
 
+def calculate_file_set_hash(document_files, *extra: object) -> str:
+    """
+    Calculate a stable hash identifying a document's set of files
+
+    Covers each association's id, content hash and sequence number in the
+    given order, so adding, removing, replacing or reordering files changes
+    the hash. Extra values (layout options, versions) are mixed in as well.
+
+    Args:
+        document_files: Ordered DocumentFile rows (with .file loaded)
+        extra: Additional values that affect derived output
+
+    Returns:
+        Hex SHA256 digest
+    """
+    hash_obj = hashlib.sha256()
+    for doc_file in document_files:
+        file_hash = doc_file.file.file_hash if doc_file.file else ''
+        hash_obj.update(f"{doc_file.id}:{file_hash}:{doc_file.sequence_number}\n".encode())
+    for value in extra:
+        hash_obj.update(f"|{value}".encode())
+    return hash_obj.hexdigest()
+
+
 def format_file_size(size_bytes: int) -> str:
     """Format file size in human readable format"""
     if size_bytes == 0:
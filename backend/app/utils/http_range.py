@@ -0,0 +1,140 @@
+"""
+HTTP Range request utilities (RFC 7233) for partial content streaming
+"""
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import List, Optional, Tuple
+
+# Upper bound on ranges honoured in a single request. Requests with more
+# ranges are served as a full 200 response (RFC 7233 allows ignoring Range).
+MAX_RANGES = 16
+
+
+class RangeNotSatisfiable(Exception):
+    """Raised when none of the requested byte ranges overlap the resource"""
+
+    def __init__(self, file_size: int):
+        self.file_size = file_size
+        super().__init__(f"Requested range not satisfiable (size {file_size})")
+
+
+def parse_range_header(range_header: Optional[str], file_size: int) -> Optional[List[Tuple[int, int]]]:
+    """
+    Parse a Range header into a list of inclusive (start, end) byte ranges
+
+    Overlapping and adjacent ranges are coalesced and returned sorted.
+
+    Args:
+        range_header: Raw value of the Range header (e.g. "bytes=0-1023,-500")
+        file_size: Size of the resource in bytes
+
+    Returns:
+        List of (start, end) tuples, or None if the header is absent, malformed,
+        uses an unsupported unit or asks for too many ranges (serve full content)
+
+    Raises:
+        RangeNotSatisfiable: If the header is valid but no range is satisfiable
+    """
+    if not range_header:
+        return None
+
+    unit, _, spec = range_header.partition('=')
+    if unit.strip().lower() != 'bytes' or not spec.strip():
+        return None
+
+    ranges = []
+    for part in spec.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        start_str, sep, end_str = part.partition('-')
+        if not sep:
+            return None
+        start_str, end_str = start_str.strip(), end_str.strip()
+
+        try:
+            if not start_str:
+                # Suffix range: last N bytes
+                suffix_length = int(end_str)
+                if suffix_length < 0:
+                    return None
+                if suffix_length == 0 or file_size == 0:
+                    # Nothing to select: unsatisfiable on its own
+                    continue
+                ranges.append((max(file_size - suffix_length, 0), file_size - 1))
+                continue
+
+            start = int(start_str)
+            end = int(end_str) if end_str else None
+        except ValueError:
+            return None
+
+        if start < 0 or (end is not None and end < start):
+            return None
+        if start >= file_size:
+            # Unsatisfiable on its own, other ranges may still be valid
+            continue
+        end = file_size - 1 if end is None else min(end, file_size - 1)
+        ranges.append((start, end))
+
+    if len(ranges) > MAX_RANGES:
+        return None
+    if not ranges:
+        raise RangeNotSatisfiable(file_size)
+
+    ranges.sort()
+    coalesced = [ranges[0]]
+    for start, end in ranges[1:]:
+        last_start, last_end = coalesced[-1]
+        if start <= last_end + 1:
+            coalesced[-1] = (last_start, max(last_end, end))
+        else:
+            coalesced.append((start, end))
+
+    return coalesced
+
+
+def if_range_matches(
+    if_range: Optional[str],
+    etag: Optional[str],
+    last_modified: Optional[datetime]
+) -> bool:
+    """
+    Evaluate an If-Range precondition
+
+    Returns True when the Range header should be honoured. An entity-tag
+    validator must strongly match the current ETag (weak tags never match);
+    a date validator must equal the current Last-Modified timestamp.
+    """
+    if not if_range:
+        return True
+
+    if_range = if_range.strip()
+    if if_range.startswith('W/'):
+        return False
+    if if_range.startswith('"'):
+        return etag is not None and if_range == etag
+
+    if last_modified is None:
+        return False
+    try:
+        validator_date = parsedate_to_datetime(if_range)
+    except (TypeError, ValueError):
+        return False
+    return validator_date == _to_utc(last_modified).replace(microsecond=0)
+
+
+def format_http_date(value: datetime) -> str:
+    """Format a datetime as an RFC 7231 HTTP-date (naive values are treated as UTC)"""
+    return format_datetime(_to_utc(value).replace(microsecond=0), usegmt=True)
+
+
+def content_range(start: int, end: int, file_size: int) -> str:
+    """Build a Content-Range header value for a satisfied byte range"""
+    return f"bytes {start}-{end}/{file_size}"
+
+
+def _to_utc(value: datetime) -> datetime:
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
@@ -5,12 +5,88 @@ Extracts ALL technical metadata from images (EXIF, DNG, TIFF tags, etc.) for MET
 
 from PIL import Image
 from PIL.ExifTags import TAGS
-from typing import Dict, Optional, Any
+from typing import Dict, Optional, Any, BinaryIO, Union
 import logging
+from contextlib import nullcontext
 from datetime import datetime
 
+from exifread.tags import EXIF_TAGS
+
+from app.utils.tiff_header import (
+    RATIONAL_TYPES, TAG_DNG_VERSION, TAG_EXIF_IFD, TAG_NEW_SUBFILE_TYPE, TAG_SUB_IFDS,
+    HeaderFormatError, ParsedHeader, icc_profile_description, parse_header
+)
+
 logger = logging.getLogger(__name__)
 
+# Bumped whenever extracted values change, invalidating memoized results
+EXTRACTOR_VERSION = '3'
+
+# Extraction profiles: "mix" reads only what the DocumentFile MIX columns need
+# (cheap enough to run inside the upload request), "full" also dumps every tag
+PROFILE_MIX = 'mix'
+PROFILE_FULL = 'full'
+
+# Tags read by the MIX profile, including the pointers needed to reach them
+MIX_TAGS = frozenset({
+    TAG_NEW_SUBFILE_TYPE,
+    0x0100, 0x0101, 0x0102, 0x0103, 0x0106,  # dimensions, bits, compression, photometric
+    0x010F, 0x0110, 0x0112, 0x0115,          # make, model, orientation, samples per pixel
+    0x011A, 0x011B, 0x0128,                  # resolution and unit
+    0x0131, 0x0132, 0x0152,                  # software, datetime, extra samples
+    0x9003, 0x9004,                          # EXIF DateTimeOriginal / DateTimeDigitized
+    0xC68D,                                  # DNG ActiveArea
+    TAG_SUB_IFDS, TAG_EXIF_IFD, TAG_DNG_VERSION,
+})
+
+# TIFF Compression tag -> MIX compressionScheme
+COMPRESSION_SCHEMES = {
+    1: 'uncompressed',
+    2: 'CCITT 1D',
+    3: 'CCITT Group 3',
+    4: 'CCITT Group 4',
+    5: 'LZW',
+    6: 'JPEG',
+    7: 'JPEG',
+    8: 'Deflate',
+    32773: 'PackBits',
+    32946: 'Deflate',
+    34712: 'JPEG 2000',
+    34892: 'Lossy JPEG',
+}
+
+# TIFF PhotometricInterpretation -> MIX colorSpace
+PHOTOMETRIC_COLOR_SPACES = {
+    2: 'RGB',
+    3: 'Palette',
+    4: 'Transparency Mask',
+    5: 'CMYK',
+    6: 'YCbCr',
+    8: 'LAB',
+    9: 'ICCLab',
+    10: 'ITULab',
+}
+
+# JPEG frame components -> (samples per pixel, color space) as decoded by PIL
+JPEG_COMPONENTS = {
+    1: (1, 'Grayscale'),
+    3: (3, 'RGB'),
+    4: (4, 'CMYK'),
+}
+
+RESOLUTION_UNITS = {1: 'none', 2: 'in.', 3: 'cm'}
+
+ORIENTATIONS = {
+    1: 'normal*',
+    2: 'flip horizontal',
+    3: 'rotate 180',
+    4: 'flip vertical',
+    5: 'transpose',
+    6: 'rotate 90',
+    7: 'transverse',
+    8: 'rotate 270'
+}
+
 
 class ImageMetadataExtractor:
     """Extract comprehensive technical metadata from image files"""
@@ -18,12 +94,22 @@ class ImageMetadataExtractor:
     def __init__(self):
         self.exif_tags = TAGS
 
-    def extract_metadata(self, file_path: str) -> Dict:
+    def extract_metadata(self, file_path: Union[str, BinaryIO], profile: str = PROFILE_FULL) -> Dict:
         """
         Extract comprehensive metadata from an image file
 
+        TIFF, DNG and JPEG files are opened once and their header region is
+        parsed once (see app.utils.tiff_header); both the MIX fields and
+        raw_metadata are derived from that single parse. Other formats fall
+        back to PIL on the same file handle. Files with a vendor MakerNote
+        get a second, exifread pass for the "MakerNote ..." tags (full
+        profile only).
+
         Args:
-            file_path: Path to the image file
+            file_path: Path to the image file, or a seekable binary file object
+                (e.g. a RangedObjectReader over a stored object)
+            profile: PROFILE_FULL for every tag, PROFILE_MIX to only read the
+                tags behind the MIX fields (raw_metadata is left empty)
 
         Returns:
             Dictionary containing:
@@ -46,6 +132,7 @@ class ImageMetadataExtractor:
             'byte_order': None,
             'orientation': None,
             'icc_profile_name': None,
+            'scanner_manufacturer': None,
             'scanner_model_name': None,
             'scanning_software_name': None,
             'scanning_software_version': None,
@@ -54,101 +141,164 @@ class ImageMetadataExtractor:
         }
 
         try:
-            # Check if file is DNG (RAW)
-            is_dng = file_path.lower().endswith('.dng')
-
-            # Extract ALL metadata using exifread
-            metadata_exifread = self._extract_with_exifread(file_path)
-            metadata['raw_metadata'] = metadata_exifread
-
-            # Extract using PIL for standard fields
-            pil_metadata = self._extract_with_pil(file_path)
-
-            # Merge standard fields
-            for key in ['image_width', 'image_height', 'bits_per_sample', 'samples_per_pixel',
-                       'compression_scheme', 'color_space', 'x_sampling_frequency',
-                       'y_sampling_frequency', 'sampling_frequency_unit', 'date_time_created',
-                       'format_name', 'byte_order', 'orientation', 'icc_profile_name']:
-                if pil_metadata.get(key):
-                    metadata[key] = pil_metadata[key]
-
-            # Extract additional metadata from raw_metadata for standard fields
-            metadata.update(self._map_raw_to_standard_fields(metadata['raw_metadata']))
-
-            # For DNG files, try rawpy for additional data
-            if is_dng:
+            source = open(file_path, 'rb') if isinstance(file_path, str) else nullcontext(file_path)
+            with source as f:
                 try:
-                    import rawpy
-                    with rawpy.imread(file_path) as raw:
-                        # Override dimensions from RAW data
-                        metadata['image_width'] = raw.sizes.width
-                        metadata['image_height'] = raw.sizes.height
-                        if not metadata['samples_per_pixel']:
-                            metadata['samples_per_pixel'] = raw.num_colors
-                except Exception as e:
-                    logger.debug(f"Could not extract rawpy metadata: {e}")
+                    header = parse_header(f, MIX_TAGS if profile == PROFILE_MIX else None)
+                except HeaderFormatError:
+                    pil_metadata = self._extract_with_pil(f)
+                    if profile == PROFILE_MIX:
+                        pil_metadata.pop('raw_metadata', None)
+                    metadata.update(pil_metadata)
+                else:
+                    if profile != PROFILE_MIX:
+                        metadata['raw_metadata'] = self._raw_metadata(header)
+                        if header.has_maker_note:
+                            metadata['raw_metadata'].update(self._maker_note_tags(f))
+                    metadata.update(self._standard_fields(header))
 
         except Exception as e:
             logger.error(f"Error extracting metadata from {file_path}: {e}", exc_info=True)
 
         return metadata
 
-    def _extract_with_exifread(self, file_path: str) -> Dict[str, Any]:
-        """Extract ALL EXIF/DNG tags using exifread library"""
+    def _raw_metadata(self, header: ParsedHeader) -> Dict[str, Any]:
+        """Convert every parsed tag to a JSON-serializable value keyed like exifread"""
         raw_metadata = {}
+        for key, field_type, values in header.tags():
+            if isinstance(values, str):
+                raw_metadata[key] = values
+            elif not values:
+                continue
+            elif field_type in RATIONAL_TYPES:
+                ratios = [float(num) / float(den) if den != 0 else num for num, den in values]
+                raw_metadata[key] = ratios if len(ratios) > 1 else ratios[0]
+            else:
+                raw_metadata[key] = values if len(values) > 1 else values[0]
+        return raw_metadata
 
+    def _maker_note_tags(self, f: BinaryIO) -> Dict[str, Any]:
+        """Decode vendor MakerNote tags with exifread (the header parser leaves them opaque)"""
         try:
             import exifread
 
-            with open(file_path, 'rb') as f:
-                tags = exifread.process_file(f, details=True)
-
-                for tag_name, tag_value in tags.items():
-                    # Convert tag value to serializable format
-                    try:
-                        # Get the printable value
-                        value_str = str(tag_value)
-
-                        # Try to parse numeric values
-                        if hasattr(tag_value, 'values'):
-                            values = tag_value.values
-                            # Handle ratio values
-                            if len(values) == 1 and hasattr(values[0], 'num') and hasattr(values[0], 'den'):
-                                if values[0].den != 0:
-                                    raw_metadata[tag_name] = float(values[0].num) / float(values[0].den)
-                                else:
-                                    raw_metadata[tag_name] = values[0].num
-                            # Handle multiple ratio values
-                            elif all(hasattr(v, 'num') and hasattr(v, 'den') for v in values):
-                                raw_metadata[tag_name] = [
-                                    float(v.num) / float(v.den) if v.den != 0 else v.num
-                                    for v in values
-                                ]
-                            # Handle integer arrays
-                            elif all(isinstance(v, int) for v in values):
-                                raw_metadata[tag_name] = values if len(values) > 1 else values[0]
-                            else:
-                                raw_metadata[tag_name] = value_str
-                        else:
-                            raw_metadata[tag_name] = value_str
-
-                    except Exception as e:
-                        logger.debug(f"Could not parse tag {tag_name}: {e}")
-                        raw_metadata[tag_name] = value_str
-
-        except ImportError:
-            logger.warning("exifread not available, using PIL only")
+            f.seek(0)
+            tags = exifread.process_file(f, details=True)
         except Exception as e:
-            logger.error(f"Error with exifread extraction: {e}", exc_info=True)
+            logger.debug(f"Could not decode MakerNote: {e}")
+            return {}
+
+        maker_note = {}
+        for tag_name, tag_value in tags.items():
+            if not tag_name.startswith('MakerNote '):
+                continue
+            values = getattr(tag_value, 'values', None)
+            if isinstance(values, list) and values and all(hasattr(v, 'num') and hasattr(v, 'den') for v in values):
+                ratios = [float(v.num) / float(v.den) if v.den != 0 else v.num for v in values]
+                maker_note[tag_name] = ratios if len(ratios) > 1 else ratios[0]
+            elif isinstance(values, list) and values and all(isinstance(v, int) for v in values):
+                maker_note[tag_name] = values if len(values) > 1 else values[0]
+            else:
+                maker_note[tag_name] = str(tag_value)
+        return maker_note
+
+    def _standard_fields(self, header: ParsedHeader) -> Dict:
+        """Derive the MIX fields from a parsed TIFF/DNG/JPEG header"""
+        metadata = {'byte_order': header.byte_order}
+
+        if header.format == 'JPEG':
+            metadata['format_name'] = 'image/jpeg'
+            metadata['compression_scheme'] = 'JPEG'
+            frame = header.frame
+            if frame:
+                metadata['image_width'] = frame['width']
+                metadata['image_height'] = frame['height']
+                metadata['bits_per_sample'] = ','.join([str(frame['precision'])] * frame['components'])
+                metadata['samples_per_pixel'], metadata['color_space'] = JPEG_COMPONENTS.get(
+                    frame['components'], (frame['components'], None)
+                )
+        else:
+            metadata['format_name'] = 'image/dng' if header.is_dng else 'image/tiff'
+            image_ifd = self._main_image_ifd(header)
+            metadata['image_width'] = header.first(image_ifd, 0x0100)
+            metadata['image_height'] = header.first(image_ifd, 0x0101)
+            # DNG: LibRaw reports the active sensor area, not the full raw frame
+            active_area = header.get(image_ifd, 0xC68D)
+            if header.is_dng and isinstance(active_area, list) and len(active_area) == 4:
+                top, left, bottom, right = active_area
+                metadata['image_width'] = right - left
+                metadata['image_height'] = bottom - top
+
+            samples = header.first(image_ifd, 0x0115, 1)
+            bits = header.get(image_ifd, 0x0102) or [1]
+            metadata['bits_per_sample'] = ','.join(str(b) for b in bits)
+            compression = header.first(image_ifd, 0x0103, 1)
+            metadata['compression_scheme'] = COMPRESSION_SCHEMES.get(compression, f'unknown ({compression})')
+
+            photometric = header.first(image_ifd, 0x0106)
+            if photometric in (0, 1):
+                color_space = 'Bi-level' if bits[0] == 1 else 'Grayscale'
+            elif photometric == 2 and samples == 4 and header.get(image_ifd, 0x0152):
+                color_space = 'RGBA'
+            elif photometric in (32803, 34892):
+                # CFA/LinearRaw sensor data demosaics to RGB
+                color_space, samples = 'RGB', 3
+            else:
+                color_space = PHOTOMETRIC_COLOR_SPACES.get(photometric)
+            metadata['samples_per_pixel'] = samples
+            metadata['color_space'] = color_space
+
+        # Resolution: EXIF/TIFF tags first, then the JPEG JFIF density
+        x_resolution = header.first('Image', 0x011A)
+        y_resolution = header.first('Image', 0x011B)
+        if x_resolution and y_resolution:
+            metadata['x_sampling_frequency'] = int(x_resolution[0] / x_resolution[1]) if x_resolution[1] else None
+            metadata['y_sampling_frequency'] = int(y_resolution[0] / y_resolution[1]) if y_resolution[1] else None
+            metadata['sampling_frequency_unit'] = RESOLUTION_UNITS.get(header.first('Image', 0x0128, 2), 'in.')
+        elif header.jfif.get('units') in (1, 2):
+            metadata['x_sampling_frequency'] = header.jfif['x_density']
+            metadata['y_sampling_frequency'] = header.jfif['y_density']
+            metadata['sampling_frequency_unit'] = 'in.' if header.jfif['units'] == 1 else 'cm'
+
+        orientation = header.first('Image', 0x0112)
+        if orientation is not None:
+            metadata['orientation'] = ORIENTATIONS.get(orientation, f'unknown ({orientation})')
+
+        for field_name, tag in (('scanner_manufacturer', 0x010F),
+                                ('scanner_model_name', 0x0110),
+                                ('scanning_software_name', 0x0131)):
+            value = header.get('Image', tag)
+            if isinstance(value, str) and value.strip():
+                metadata[field_name] = value.strip()
+
+        for ifd_name, tag in (('EXIF', 0x9003), ('EXIF', 0x9004), ('Image', 0x0132)):
+            value = header.get(ifd_name, tag)
+            if isinstance(value, str):
+                try:
+                    metadata['date_time_created'] = datetime.strptime(value.strip(), '%Y:%m:%d %H:%M:%S')
+                    break
+                except ValueError:
+                    continue
 
-        return raw_metadata
+        metadata['icc_profile_name'] = icc_profile_description(header.icc_profile)
+        return metadata
 
-    def _extract_with_pil(self, file_path: str) -> Dict:
-        """Extract metadata using PIL/Pillow"""
+    @staticmethod
+    def _main_image_ifd(header: ParsedHeader) -> str:
+        """Name of the IFD holding the full-resolution image (a SubIFD for DNG)"""
+        if header.is_dng:
+            for ifd_name in header.ifds:
+                if ifd_name.startswith('SubIFD') and header.first(ifd_name, TAG_NEW_SUBFILE_TYPE, 0) == 0:
+                    return ifd_name
+        return 'Image'
+
+    def _extract_with_pil(self, f: BinaryIO) -> Dict:
+        """Extract metadata of non-TIFF/JPEG formats using PIL/Pillow"""
         metadata = {}
 
         try:
-            with Image.open(file_path) as img:
+            f.seek(0)
+            with Image.open(f) as img:
                 # Basic image information
                 metadata['image_width'] = img.width
                 metadata['image_height'] = img.height
@@ -190,19 +340,24 @@ class ImageMetadataExtractor:
                     }
                     metadata['compression_scheme'] = compression_map.get(img.format)
 
+                # Resolution (PNG pHYs, BMP header)
+                dpi = img.info.get('dpi')
+                if dpi:
+                    metadata['x_sampling_frequency'] = int(dpi[0])
+                    metadata['y_sampling_frequency'] = int(dpi[1])
+                    metadata['sampling_frequency_unit'] = 'in.'
+
                 # Extract EXIF data
                 exif_data = img.getexif()
                 if exif_data:
                     metadata.update(self._parse_pil_exif(exif_data))
+                    metadata['raw_metadata'] = {
+                        f"Image {EXIF_TAGS.get(tag, (f'Tag 0x{tag:04X}',))[0]}": value
+                        for tag, value in exif_data.items()
+                        if isinstance(value, (str, int, float))
+                    }
 
-                # ICC Profile
-                if hasattr(img, 'info') and 'icc_profile' in img.info:
-                    try:
-                        from PIL import ImageCms
-                        icc_profile = ImageCms.ImageCmsProfile(io.BytesIO(img.info['icc_profile']))
-                        metadata['icc_profile_name'] = icc_profile.profile.profile_description
-                    except:
-                        pass
+                metadata['icc_profile_name'] = icc_profile_description(img.info.get('icc_profile'))
 
         except Exception as e:
             logger.error(f"Error with PIL extraction: {e}", exc_info=True)
@@ -258,17 +413,7 @@ class ImageMetadataExtractor:
                             metadata['bits_per_sample'] = str(value)
 
                     elif field_name == 'orientation':
-                        orientation_map = {
-                            1: 'normal*',
-                            2: 'flip horizontal',
-                            3: 'rotate 180',
-                            4: 'flip vertical',
-                            5: 'transpose',
-                            6: 'rotate 90',
-                            7: 'transverse',
-                            8: 'rotate 270'
-                        }
-                        metadata['orientation'] = orientation_map.get(value, f'unknown ({value})')
+                        metadata['orientation'] = ORIENTATIONS.get(value, f'unknown ({value})')
 
                     elif field_name == 'scanner_model':
                         metadata['scanner_model_name'] = str(value)
@@ -289,46 +434,17 @@ class ImageMetadataExtractor:
 
         return metadata
 
-    def _map_raw_to_standard_fields(self, raw_metadata: Dict) -> Dict:
-        """Map raw EXIF/DNG tags to standard MIX fields"""
-        metadata = {}
-
-        # Mapping of common EXIF/DNG tags to our standard fields
-        tag_mappings = {
-            'Image Make': 'scanner_manufacturer',
-            'Image Model': 'scanner_model_name',
-            'Image Software': 'scanning_software_name',
-            'EXIF DateTimeOriginal': 'date_time_created',
-            'EXIF DateTimeDigitized': 'date_time_created',
-        }
-
-        for raw_tag, std_field in tag_mappings.items():
-            if raw_tag in raw_metadata and not metadata.get(std_field):
-                value = raw_metadata[raw_tag]
-
-                if 'DateTime' in raw_tag:
-                    try:
-                        if isinstance(value, str):
-                            # Parse EXIF datetime format
-                            dt = datetime.strptime(value.split()[0], '%Y:%m:%d')
-                            metadata[std_field] = dt
-                    except:
-                        pass
-                else:
-                    metadata[std_field] = str(value)
-
-        return metadata
-
 
-def extract_image_metadata(file_path: str) -> Dict:
+def extract_image_metadata(file_path: Union[str, BinaryIO], profile: str = PROFILE_FULL) -> Dict:
     """
     Extract comprehensive metadata from an image file
 
     Args:
-        file_path: Path to the image file
+        file_path: Path to the image file or seekable binary file object
+        profile: PROFILE_FULL (MIX fields + all tags) or PROFILE_MIX (MIX fields only)
 
     Returns:
         Dictionary containing both standard MIX fields and raw_metadata with ALL tags
     """
     extractor = ImageMetadataExtractor()
-    return extractor.extract_metadata(file_path)
+    return extractor.extract_metadata(file_path, profile)
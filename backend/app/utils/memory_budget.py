@@ -0,0 +1,82 @@
+"""
+Process-wide memory budget for large decode tasks (RAW/DNG processing)
+
+Each task reserves its estimated peak memory before decoding. Tasks that
+don't fit wait until earlier tasks release their reservation. Tasks that
+wait longer than allowed are refused, as are tasks larger than the whole
+budget when they have a timeout; background tasks (no timeout) that are
+larger than the budget wait for all of it and run alone.
+"""
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryBudgetExceeded(Exception):
+    """Raised when a task cannot get its memory reservation"""
+
+    def __init__(self, requested: int, budget: int, reason: str):
+        self.requested = requested
+        self.budget = budget
+        super().__init__(
+            f"Memory reservation of {requested / 1024 ** 2:.0f} MiB refused "
+            f"(budget {budget / 1024 ** 2:.0f} MiB): {reason}"
+        )
+
+
+class MemoryBudget:
+    """Counting reservation of bytes shared by all threads of the process"""
+
+    def __init__(self, total_bytes: int):
+        self.total_bytes = total_bytes
+        self.reserved_bytes = 0
+        self._condition = threading.Condition()
+
+    @contextmanager
+    def reserve(self, nbytes: int, timeout: Optional[float] = None):
+        """
+        Reserve nbytes for the duration of the with-block
+
+        Args:
+            nbytes: Estimated peak memory of the task
+            timeout: Seconds to wait for enough budget (None = wait indefinitely,
+                and reserve the whole budget for a task larger than it)
+
+        Raises:
+            MemoryBudgetExceeded: If the task can never fit (with a timeout) or the wait timed out
+        """
+        if nbytes > self.total_bytes:
+            if timeout is not None:
+                raise MemoryBudgetExceeded(nbytes, self.total_bytes, "task exceeds total budget")
+            logger.warning(
+                f"Task needs {nbytes / 1024 ** 2:.0f} MiB, more than the whole budget "
+                f"({self.total_bytes / 1024 ** 2:.0f} MiB): running it alone"
+            )
+            nbytes = self.total_bytes
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            while self.reserved_bytes + nbytes > self.total_bytes:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise MemoryBudgetExceeded(nbytes, self.total_bytes, "timed out waiting for budget")
+                self._condition.wait(remaining)
+            self.reserved_bytes += nbytes
+
+        logger.debug(f"Reserved {nbytes} bytes ({self.reserved_bytes}/{self.total_bytes} in use)")
+        try:
+            yield
+        finally:
+            with self._condition:
+                self.reserved_bytes -= nbytes
+                self._condition.notify_all()
+
+
+# Shared budget for RAW decoding (thumbnails, previews, derivatives)
+raw_memory_budget = MemoryBudget(settings.RAW_MEMORY_BUDGET_BYTES)
@@ -1,44 +1,79 @@
 """
 Metadata parser for extracting document metadata from XML and CSV files
+
+XML is read with defusedxml (no DTDs, entity expansion or external
+references) and incrementally: for METS only the header and descriptive
+sections are built, and parsing stops at the first amdSec/fileSec/structMap,
+so a large METS file costs about as much as its dmdSec.
 """
 import csv
+import io
+import os
 import xml.etree.ElementTree as ET
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, BinaryIO, Union
 import logging
 
+from defusedxml import DefusedXmlException
+from defusedxml.ElementTree import iterparse as safe_iterparse
+
 logger = logging.getLogger(__name__)
 
+# Namespace mappings for METS
+METS_NAMESPACES = {
+    'mets': 'http://www.loc.gov/METS/',
+    'mods': 'http://www.loc.gov/mods/v3',
+    'dc': 'http://purl.org/dc/elements/1.1/',
+    'dct': 'http://purl.org/dc/terms/',
+    'xlink': 'http://www.w3.org/1999/xlink'
+}
+
+# Top-level METS sections read for metadata; parsing stops at any other section
+METS_DESCRIPTIVE_SECTIONS = ('metsHdr', 'dmdSec')
+
+# File path or file object (binary, or text for in-memory content)
+XMLSource = Union[str, os.PathLike, BinaryIO, io.StringIO]
+
 
 class MetadataParser:
     """Parser for document metadata from XML and CSV files"""
 
     @staticmethod
-    def parse_xml_metadata(xml_content: str) -> Optional[Dict[str, Any]]:
+    def parse_xml_metadata(xml_content: Union[str, bytes]) -> Optional[Dict[str, Any]]:
         """
         Parse metadata from XML file (METS or custom format)
 
         Args:
-            xml_content: XML content as string
+            xml_content: XML content as string or bytes
+
+        Returns:
+            Dictionary with extracted metadata or None if parsing fails
+        """
+        if isinstance(xml_content, bytes):
+            return MetadataParser.parse_xml_file(io.BytesIO(xml_content))
+        return MetadataParser.parse_xml_file(io.StringIO(xml_content))
+
+    @staticmethod
+    def parse_xml_file(source: XMLSource) -> Optional[Dict[str, Any]]:
+        """
+        Parse metadata from an XML file without loading all of it
+
+        Args:
+            source: Path of the XML file, or a file object
 
         Returns:
             Dictionary with extracted metadata or None if parsing fails
         """
         try:
-            root = ET.fromstring(xml_content)
+            if isinstance(source, (str, os.PathLike)):
+                with open(source, 'rb') as f:
+                    root = MetadataParser._read_xml_root(f)
+            else:
+                root = MetadataParser._read_xml_root(source)
             metadata = {}
 
-            # Define namespace mappings for METS
-            namespaces = {
-                'mets': 'http://www.loc.gov/METS/',
-                'mods': 'http://www.loc.gov/mods/v3',
-                'dc': 'http://purl.org/dc/elements/1.1/',
-                'dct': 'http://purl.org/dc/terms/',
-                'xlink': 'http://www.w3.org/1999/xlink'
-            }
-
             # Try to parse as METS ECO-MiC format first
-            if root.tag.endswith('mets') or 'METS' in root.tag:
-                metadata = MetadataParser._parse_mets_xml(root, namespaces)
+            if MetadataParser._is_mets(root):
+                metadata = MetadataParser._parse_mets_xml(root, METS_NAMESPACES)
             else:
                 # Try to parse as simple XML with common fields
                 metadata = MetadataParser._parse_simple_xml(root)
@@ -49,10 +84,49 @@ class MetadataParser:
         except ET.ParseError as e:
             logger.error(f"XML parsing error: {e}")
             return None
+        except DefusedXmlException as e:
+            logger.error(f"Rejected unsafe XML: {e}")
+            return None
         except Exception as e:
             logger.error(f"Unexpected error parsing XML: {e}")
             return None
 
+    @staticmethod
+    def _is_mets(root: ET.Element) -> bool:
+        return root.tag.endswith('mets') or 'METS' in root.tag
+
+    @staticmethod
+    def _read_xml_root(f: Union[BinaryIO, io.StringIO]) -> ET.Element:
+        """
+        Build the tree needed for metadata extraction
+
+        For METS the tree ends before the first top-level section that is not
+        a header or descriptive section (the rest of the file is not read);
+        other XML is built completely.
+
+        Raises:
+            ET.ParseError: Malformed XML
+            DefusedXmlException: DTD, entity declaration or external reference
+        """
+        root = None
+        is_mets = False
+        depth = 0
+        for event, elem in safe_iterparse(f, events=('start', 'end'), forbid_dtd=True):
+            if event == 'end':
+                depth -= 1
+                continue
+            depth += 1
+            if root is None:
+                root = elem
+                is_mets = MetadataParser._is_mets(root)
+            elif is_mets and depth == 2 and elem.tag.rsplit('}', 1)[-1] not in METS_DESCRIPTIVE_SECTIONS:
+                # Descriptive part consumed: drop the partial section and stop reading
+                root.remove(elem)
+                break
+        if root is None:
+            raise ET.ParseError("no element found")
+        return root
+
     @staticmethod
     def _parse_mets_xml(root: ET.Element, namespaces: Dict[str, str]) -> Dict[str, Any]:
         """Parse METS XML format"""
@@ -302,21 +376,20 @@ class MetadataParser:
             if 'metadata' in folder_path.lower() or folder_path.lower() == 'metadata':
                 logger.info(f"Found metadata file: {filename} in {folder_path}")
 
-                # Read file content
                 try:
-                    with open(full_path, 'r', encoding='utf-8') as f:
-                        content = f.read()
-
                     # Parse based on extension
                     if filename.lower().endswith('.xml'):
                         logger.info(f"Parsing XML metadata from {filename}")
-                        metadata = MetadataParser.parse_xml_metadata(content)
+                        # Read incrementally from disk: METS files can be very large
+                        metadata = MetadataParser.parse_xml_file(full_path)
                         if metadata:
                             logger.info(f"Extracted {len(metadata)} fields from XML")
                             break  # Use first valid metadata file found
 
                     elif filename.lower().endswith('.csv'):
                         logger.info(f"Parsing CSV metadata from {filename}")
+                        with open(full_path, 'r', encoding='utf-8') as f:
+                            content = f.read()
                         metadata = MetadataParser.parse_csv_metadata(content)
                         if metadata:
                             logger.info(f"Extracted {len(metadata)} fields from CSV")
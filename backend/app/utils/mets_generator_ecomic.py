@@ -2,520 +2,715 @@
 METS ECO-MiC 1.1 Generator
 Generates METS XML compliant with ECO-MiC 1.1 standard for archival description
 Compatible with Cineca validation API
+
+Everything that does not depend on the document is prepared once per
+process: namespace registration, Clark-notation tag names (METS['file']),
+their prefixed forms, the root element's namespace declarations and the
+indentation strings. The per-file entries (techMD, mets:file, page div) are
+written from string templates instead of being built as elements and
+re-indented, and output is either indented or compact.
 """
 
 import xml.etree.ElementTree as ET
+from functools import lru_cache
+from itertools import chain, groupby
+from typing import Callable, Dict, FrozenSet, Iterable, Iterator, List, Sequence
 from app.models.document import Document
 from datetime import datetime
 
+SCHEMA_LOCATION = 'http://www.loc.gov/METS/ http://www.loc.gov/standards/mets/mets.xsd http://www.loc.gov/mix/ http://www.loc.gov/standards/mix/mix02/mix02.xsd http://www.loc.gov/mods/v3 http://www.loc.gov/mods/v3/mods-3-7.xsd http://cosimo.stanford.edu/sdr/metsrights/ https://www.loc.gov/standards/rights/METSRights.xsd'
+
+XML_DECLARATION = '<?xml version="1.0" encoding="UTF-8"?>\n'
+
+# METS ECO-MiC namespaces
+NAMESPACES = {
+    'mets': 'http://www.loc.gov/METS/',
+    'mods': 'http://www.loc.gov/mods/v3',
+    'mix': 'http://www.loc.gov/mix/v20',
+    'dct': 'http://purl.org/dc/terms/',
+    'metsrights': 'http://cosimo.stanford.edu/sdr/metsrights/',
+    'xlink': 'http://www.w3.org/1999/xlink',
+    'xsi': 'http://www.w3.org/2001/XMLSchema-instance'
+}
+
+for _prefix, _uri in NAMESPACES.items():
+    ET.register_namespace(_prefix, _uri)
+
+# Map file_category to METS USE attribute (ECO-MiC compliant)
+CATEGORY_TO_USE = {
+    'master': 'MASTER',
+    'normalized': 'REFERENCE',
+    'export_high': 'HIGH',
+    'export_low': 'THUMBNAIL',
+    'metadata': 'METADATA',
+    'icc': 'METADATA',
+    'logs': 'METADATA',
+    'other': 'OTHER'
+}
+
+# Order of fileGrp elements (ECO-MiC best practice: MASTER first)
+USE_ORDER = ['MASTER', 'REFERENCE', 'HIGH', 'THUMBNAIL', 'METADATA', 'OTHER']
+
+# Map file_category to ECO-MiC folder naming convention (FLocat href)
+CATEGORY_TO_FOLDER = {
+    'master': 'Master',
+    'normalized': 'Normalized',
+    'export_high': 'Export300',
+    'export_low': 'Export150',
+    'metadata': 'Metadata',
+    'icc': 'ICC',
+    'logs': 'Logs',
+    'other': 'Other'
+}
+
+# Sections of the streaming writer that iterate document files, and the order each expects:
+#   'amd'    - techMD entries: document_files order (DocumentFile.id)
+#   'file'   - fileSec: USE_ORDER rank, then sequence_number (None as 0), then id
+#   'struct' - structMap: sequence_number (None as 0), then id
+FILE_SECTIONS = ('amd', 'file', 'struct')
+
+# Clark-notation tag name -> prefixed name, filled as the tag tables below are used
+QNAMES: Dict[str, str] = {}
+
+
+class _Tags(dict):
+    """Clark-notation tag names of one namespace, built on first use: METS['file']"""
+
+    def __init__(self, prefix: str):
+        super().__init__()
+        self.prefix = prefix
+        self.uri = NAMESPACES[prefix]
+
+    def __missing__(self, local: str) -> str:
+        tag = self[local] = f"{{{self.uri}}}{local}"
+        QNAMES[tag] = f"{self.prefix}:{local}"
+        return tag
+
+
+METS = _Tags('mets')
+MODS = _Tags('mods')
+MIX = _Tags('mix')
+METSRIGHTS = _Tags('metsrights')
+XLINK = _Tags('xlink')
+XSI = _Tags('xsi')
+
+# Whitespace written before an element at each depth ("\n" plus two spaces per level)
+_PRETTY = tuple("\n" + level * "  " for level in range(32))
+_COMPACT = ("",) * 32
+
+
+@lru_cache(maxsize=None)
+def _root_attributes(used: FrozenSet[str]) -> str:
+    # ElementTree declares the namespaces used anywhere in the tree on the root, sorted by prefix
+    attributes = ''.join(f' xmlns:{prefix}="{_escape_attrib(NAMESPACES[prefix])}"' for prefix in sorted(used))
+    return attributes + f' xsi:schemaLocation="{_escape_attrib(SCHEMA_LOCATION)}"'
+
+
+def _container(tag: str, attributes: str, children: List[str], level: int, indents: Sequence[str]) -> str:
+    """Element with already serialized children, indented for depth level"""
+    if not children:
+        return f"<{tag}{attributes} />"
+    inner = indents[level + 1]
+    return f"<{tag}{attributes}>{inner}{inner.join(children)}{indents[level]}</{tag}>"
+
+
+def _leaf(tag: str, text) -> str:
+    return f"<{tag}>{_escape_cdata(str(text))}</{tag}>"
+
+
+def _file_id(doc_file) -> int:
+    return doc_file.file.id if hasattr(doc_file, 'file') else doc_file.file_id
+
 
 class METSEcoMicGenerator:
     """Generator for METS ECO-MiC 1.1 compliant XML documents"""
 
     def __init__(self):
-        # METS ECO-MiC namespaces
-        self.namespaces = {
-            'mets': 'http://www.loc.gov/METS/',
-            'mods': 'http://www.loc.gov/mods/v3',
-            'mix': 'http://www.loc.gov/mix/v20',
-            'dct': 'http://purl.org/dc/terms/',
-            'metsrights': 'http://cosimo.stanford.edu/sdr/metsrights/',
-            'xlink': 'http://www.w3.org/1999/xlink',
-            'xsi': 'http://www.w3.org/2001/XMLSchema-instance'
-        }
-
-        # Register namespaces
-        for prefix, uri in self.namespaces.items():
-            ET.register_namespace(prefix, uri)
-
-    def generate_mets_xml(self, document: Document) -> str:
-        """Generate complete ECO-MiC 1.1 compliant METS XML"""
-
-        # Create root METS element
-        # ElementTree automatically adds xmlns declarations when using namespaced elements
-        mets_attrs = {
-            f"{{{self.namespaces['xsi']}}}schemaLocation": 'http://www.loc.gov/METS/ http://www.loc.gov/standards/mets/mets.xsd http://www.loc.gov/mix/ http://www.loc.gov/standards/mix/mix02/mix02.xsd http://www.loc.gov/mods/v3 http://www.loc.gov/mods/v3/mods-3-7.xsd http://cosimo.stanford.edu/sdr/metsrights/ https://www.loc.gov/standards/rights/METSRights.xsd'
-        }
-
-        root = ET.Element(f"{{{self.namespaces['mets']}}}mets", mets_attrs)
-
-        # Add sections in ECO-MiC order
-        self._add_mets_header(root, document)
-        self._add_descriptive_metadata(root, document)
-        self._add_administrative_metadata(root, document)
-        self._add_file_section(root, document)
-        self._add_structural_map(root, document)
-
-        # Convert to string with pretty formatting
-        self._indent(root)
-        xml_str = ET.tostring(root, encoding='unicode')
-        return f'<?xml version="1.0" encoding="UTF-8"?>\n{xml_str}'
+        self.namespaces = NAMESPACES
+
+    def generate_mets_xml(self, document: Document, compact: bool = False) -> str:
+        """
+        Generate complete ECO-MiC 1.1 compliant METS XML
+
+        Args:
+            document: Document (or DocumentDetail) with document_files loaded
+            compact: Leave out the indentation whitespace
+
+        Returns:
+            METS XML, files in document_files order within each section
+        """
+        files = list(document.document_files)
+
+        def file_rows(section: str) -> List:
+            # Stable sorts: files with equal keys keep their document_files order
+            if section == 'file':
+                return sorted(files, key=lambda f: (USE_ORDER.index(self._file_use(f)), f.sequence_number or 0))
+            if section == 'struct':
+                return sorted(files, key=lambda f: f.sequence_number or 0)
+            return files
+
+        return ''.join(self.iter_mets_xml(document, file_rows, compact))
 
     def _add_mets_header(self, root: ET.Element, document: Document):
         """Add METS header with ECO-MiC RECORDSTATUS"""
-        header = ET.SubElement(root, f"{{{self.namespaces['mets']}}}metsHdr")
+        header = ET.SubElement(root, METS['metsHdr'])
         header.set('CREATEDATE', document.created_at.strftime('%Y-%m-%dT%H:%M:%S'))
         header.set('LASTMODDATE', document.updated_at.strftime('%Y-%m-%dT%H:%M:%S'))
         header.set('RECORDSTATUS', document.record_status or 'COMPLETE')
 
         # Agent - CREATOR (Ministero della Cultura or organization)
-        agent_creator = ET.SubElement(header, f"{{{self.namespaces['mets']}}}agent")
+        agent_creator = ET.SubElement(header, METS['agent'])
         agent_creator.set('ROLE', 'CREATOR')
         agent_creator.set('TYPE', 'ORGANIZATION')
 
-        name_creator = ET.SubElement(agent_creator, f"{{{self.namespaces['mets']}}}name")
+        name_creator = ET.SubElement(agent_creator, METS['name'])
         name_creator.text = "Archivia Digital Archive System"
 
         # Agent - CUSTODIAN (Archive)
         if document.archive_name:
-            agent_custodian = ET.SubElement(header, f"{{{self.namespaces['mets']}}}agent")
+            agent_custodian = ET.SubElement(header, METS['agent'])
             agent_custodian.set('ROLE', 'CUSTODIAN')
             agent_custodian.set('TYPE', 'ORGANIZATION')
 
-            name_custodian = ET.SubElement(agent_custodian, f"{{{self.namespaces['mets']}}}name")
+            name_custodian = ET.SubElement(agent_custodian, METS['name'])
             name_custodian.text = document.archive_name
 
             if document.archive_contact:
-                note = ET.SubElement(agent_custodian, f"{{{self.namespaces['mets']}}}note")
+                note = ET.SubElement(agent_custodian, METS['note'])
                 note.text = f"Contact: {document.archive_contact}"
 
     def _add_descriptive_metadata(self, root: ET.Element, document: Document):
         """Add MODS descriptive metadata in ECO-MiC structure"""
-        dmd_sec = ET.SubElement(root, f"{{{self.namespaces['mets']}}}dmdSec")
+        dmd_sec = ET.SubElement(root, METS['dmdSec'])
         dmd_sec.set('ID', 'dmd01')  # Use standard ID format for ECO-MiC 1.1
         dmd_sec.set('STATUS', 'referenced')  # ECO-MiC 1.1 requirement
 
-        md_wrap = ET.SubElement(dmd_sec, f"{{{self.namespaces['mets']}}}mdWrap")
+        md_wrap = ET.SubElement(dmd_sec, METS['mdWrap'])
         md_wrap.set('MDTYPE', 'MODS')
 
-        xml_data = ET.SubElement(md_wrap, f"{{{self.namespaces['mets']}}}xmlData")
+        xml_data = ET.SubElement(md_wrap, METS['xmlData'])
 
         # MODS root
-        mods = ET.SubElement(xml_data, f"{{{self.namespaces['mods']}}}mods")
+        mods = ET.SubElement(xml_data, MODS['mods'])
 
         # 1. Identifiers (ECO-MiC 1.1: logical, conservative, and relation IDs)
-        identifier_logical = ET.SubElement(mods, f"{{{self.namespaces['mods']}}}identifier")
+        identifier_logical = ET.SubElement(mods, MODS['identifier'])
         identifier_logical.set('type', 'logicalId')
         identifier_logical.text = document.logical_id
 
         if document.conservative_id:
-            identifier_conservative = ET.SubElement(mods, f"{{{self.namespaces['mods']}}}identifier")
+            identifier_conservative = ET.SubElement(mods, MODS['identifier'])
             identifier_conservative.set('type', 'conservativeId')
             identifier_conservative.text = document.conservative_id
 
         if document.conservative_id_authority:
-            identifier_authority = ET.SubElement(mods, f"{{{self.namespaces['mods']}}}identifier")
+            identifier_authority = ET.SubElement(mods, MODS['identifier'])
             identifier_authority.set('type', 'conservativeIdAuthority')
             identifier_authority.text = document.conservative_id_authority
 
         # Add relationId as per ECO-MiC 1.1 example
-        identifier_relation = ET.SubElement(mods, f"{{{self.namespaces['mods']}}}identifier")
+        identifier_relation = ET.SubElement(mods, MODS['identifier'])
         identifier_relation.set('type', 'relationId')
         identifier_relation.text = 'representation'
 
         # 2. Title
         if document.title:
-            title_info = ET.SubElement(mods, f"{{{self.namespaces['mods']}}}titleInfo")
-            title = ET.SubElement(title_info, f"{{{self.namespaces['mods']}}}title")
+            title_info = ET.SubElement(mods, MODS['titleInfo'])
+            title = ET.SubElement(title_info, MODS['title'])
             title.text = document.title
 
         # 3. Type of Resource (ECO-MiC required)
         if document.type_of_resource:
-            type_of_resource = ET.SubElement(mods, f"{{{self.namespaces['mods']}}}typeOfResource")
+            type_of_resource = ET.SubElement(mods, MODS['typeOfResource'])
             type_of_resource.text = document.type_of_resource
 
         # 4. Abstract/Description
         if document.description:
-            abstract = ET.SubElement(mods, f"{{{self.namespaces['mods']}}}abstract")
+            abstract = ET.SubElement(mods, MODS['abstract'])
             abstract.text = document.description
 
         # 5. Corporate/Personal Names (ECO-MiC structure)
         if document.producer_name:
-            name_producer = ET.SubElement(mods, f"{{{self.namespaces['mods']}}}name")
+            name_producer = ET.SubElement(mods, MODS['name'])
             name_producer.set('type', document.producer_type or 'corporate')
 
-            name_part = ET.SubElement(name_producer, f"{{{self.namespaces['mods']}}}namePart")
+            name_part = ET.SubElement(name_producer, MODS['namePart'])
             name_part.text = document.producer_name
 
             if document.producer_role:
-                role = ET.SubElement(name_producer, f"{{{self.namespaces['mods']}}}role")
-                role_term = ET.SubElement(role, f"{{{self.namespaces['mods']}}}roleTerm")
+                role = ET.SubElement(name_producer, MODS['role'])
+                role_term = ET.SubElement(role, MODS['roleTerm'])
                 role_term.set('type', 'text')
                 role_term.text = document.producer_role
 
         if document.creator_name:
-            name_creator = ET.SubElement(mods, f"{{{self.namespaces['mods']}}}name")
+            name_creator = ET.SubElement(mods, MODS['name'])
             name_creator.set('type', document.creator_type or 'personal')
 
-            name_part = ET.SubElement(name_creator, f"{{{self.namespaces['mods']}}}namePart")
+            name_part = ET.SubElement(name_creator, MODS['namePart'])
             name_part.text = document.creator_name
 
             if document.creator_role:
-                role = ET.SubElement(name_creator, f"{{{self.namespaces['mods']}}}role")
-                role_term = ET.SubElement(role, f"{{{self.namespaces['mods']}}}roleTerm")
+                role = ET.SubElement(name_creator, MODS['role'])
+                role_term = ET.SubElement(role, MODS['roleTerm'])
                 role_term.set('type', 'text')
                 role_term.text = document.creator_role
 
         # 6. Origin Info (dates)
         if document.date_from or document.date_to or document.period:
-            origin_info = ET.SubElement(mods, f"{{{self.namespaces['mods']}}}originInfo")
+            origin_info = ET.SubElement(mods, MODS['originInfo'])
 
             if document.date_from and document.date_to:
-                date_created_start = ET.SubElement(origin_info, f"{{{self.namespaces['mods']}}}dateCreated")
+                date_created_start = ET.SubElement(origin_info, MODS['dateCreated'])
                 date_created_start.set('point', 'start')
                 date_created_start.text = document.date_from
 
-                date_created_end = ET.SubElement(origin_info, f"{{{self.namespaces['mods']}}}dateCreated")
+                date_created_end = ET.SubElement(origin_info, MODS['dateCreated'])
                 date_created_end.set('point', 'end')
                 date_created_end.text = document.date_to
             elif document.date_from:
-                date_created = ET.SubElement(origin_info, f"{{{self.namespaces['mods']}}}dateCreated")
+                date_created = ET.SubElement(origin_info, MODS['dateCreated'])
                 date_created.text = document.date_from
             elif document.date_to:
-                date_created = ET.SubElement(origin_info, f"{{{self.namespaces['mods']}}}dateCreated")
+                date_created = ET.SubElement(origin_info, MODS['dateCreated'])
                 date_created.text = document.date_to
 
             if document.period:
-                date_other = ET.SubElement(origin_info, f"{{{self.namespaces['mods']}}}dateOther")
+                date_other = ET.SubElement(origin_info, MODS['dateOther'])
                 date_other.set('type', 'period')
                 date_other.text = document.period
 
         # 7. Language
         if document.language:
-            language_elem = ET.SubElement(mods, f"{{{self.namespaces['mods']}}}language")
-            language_term = ET.SubElement(language_elem, f"{{{self.namespaces['mods']}}}languageTerm")
+            language_elem = ET.SubElement(mods, MODS['language'])
+            language_term = ET.SubElement(language_elem, MODS['languageTerm'])
             language_term.set('type', 'code')
             language_term.set('authority', 'iso639-2b')
             language_term.text = document.language
 
         # 8. Physical Description (ECO-MiC structure)
         if document.physical_form or document.extent_description or document.total_pages:
-            phys_desc = ET.SubElement(mods, f"{{{self.namespaces['mods']}}}physicalDescription")
+            phys_desc = ET.SubElement(mods, MODS['physicalDescription'])
 
             if document.physical_form:
-                form = ET.SubElement(phys_desc, f"{{{self.namespaces['mods']}}}form")
+                form = ET.SubElement(phys_desc, MODS['form'])
                 form.set('authority', 'gmd')
                 form.text = document.physical_form
 
             if document.extent_description:
-                extent = ET.SubElement(phys_desc, f"{{{self.namespaces['mods']}}}extent")
+                extent = ET.SubElement(phys_desc, MODS['extent'])
                 extent.text = document.extent_description
             elif document.total_pages:
-                extent = ET.SubElement(phys_desc, f"{{{self.namespaces['mods']}}}extent")
+                extent = ET.SubElement(phys_desc, MODS['extent'])
                 extent.text = f"{document.total_pages} pages"
 
         # 9. Subjects
         if document.subjects:
             subjects_list = [s.strip() for s in document.subjects.replace(';', ',').split(',') if s.strip()]
             for subject_text in subjects_list:
-                subject = ET.SubElement(mods, f"{{{self.namespaces['mods']}}}subject")
-                topic = ET.SubElement(subject, f"{{{self.namespaces['mods']}}}topic")
+                subject = ET.SubElement(mods, MODS['subject'])
+                topic = ET.SubElement(subject, MODS['topic'])
                 topic.text = subject_text
 
         # 10. Geographic subject
         if document.location:
-            subject_geo = ET.SubElement(mods, f"{{{self.namespaces['mods']}}}subject")
-            geographic = ET.SubElement(subject_geo, f"{{{self.namespaces['mods']}}}geographic")
+            subject_geo = ET.SubElement(mods, MODS['subject'])
+            geographic = ET.SubElement(subject_geo, MODS['geographic'])
             geographic.text = document.location
 
         # 11. Archival hierarchy (ECO-MiC relatedItem structure)
         if document.fund_name or document.series_name or document.folder_number:
-            related_item = ET.SubElement(mods, f"{{{self.namespaces['mods']}}}relatedItem")
+            related_item = ET.SubElement(mods, MODS['relatedItem'])
             related_item.set('type', 'host')
 
             if document.fund_name:
-                title_info = ET.SubElement(related_item, f"{{{self.namespaces['mods']}}}titleInfo")
-                title = ET.SubElement(title_info, f"{{{self.namespaces['mods']}}}title")
+                title_info = ET.SubElement(related_item, MODS['titleInfo'])
+                title = ET.SubElement(title_info, MODS['title'])
                 title.text = document.fund_name
 
                 if document.conservative_id:
-                    identifier = ET.SubElement(related_item, f"{{{self.namespaces['mods']}}}identifier")
+                    identifier = ET.SubElement(related_item, MODS['identifier'])
                     identifier.set('type', 'collection')
                     identifier.text = document.conservative_id
 
             if document.series_name or document.folder_number:
-                part = ET.SubElement(related_item, f"{{{self.namespaces['mods']}}}part")
+                part = ET.SubElement(related_item, MODS['part'])
 
                 if document.series_name:
-                    detail_series = ET.SubElement(part, f"{{{self.namespaces['mods']}}}detail")
+                    detail_series = ET.SubElement(part, MODS['detail'])
                     detail_series.set('type', 'series')
-                    caption = ET.SubElement(detail_series, f"{{{self.namespaces['mods']}}}caption")
+                    caption = ET.SubElement(detail_series, MODS['caption'])
                     caption.text = "Series"
-                    title = ET.SubElement(detail_series, f"{{{self.namespaces['mods']}}}title")
+                    title = ET.SubElement(detail_series, MODS['title'])
                     title.text = document.series_name
 
                 if document.folder_number:
-                    detail_folder = ET.SubElement(part, f"{{{self.namespaces['mods']}}}detail")
+                    detail_folder = ET.SubElement(part, MODS['detail'])
                     detail_folder.set('type', 'folder')
-                    caption = ET.SubElement(detail_folder, f"{{{self.namespaces['mods']}}}caption")
+                    caption = ET.SubElement(detail_folder, MODS['caption'])
                     caption.text = "Folder"
-                    number = ET.SubElement(detail_folder, f"{{{self.namespaces['mods']}}}number")
+                    number = ET.SubElement(detail_folder, MODS['number'])
                     number.text = document.folder_number
 
         # 12. Access Condition (Rights)
         if document.license_url or document.rights_statement:
-            access_condition = ET.SubElement(mods, f"{{{self.namespaces['mods']}}}accessCondition")
+            access_condition = ET.SubElement(mods, MODS['accessCondition'])
             access_condition.set('type', 'use and reproduction')
 
             if document.license_url:
-                access_condition.set(f"{{{self.namespaces['xlink']}}}href", document.license_url)
+                access_condition.set(XLINK['href'], document.license_url)
 
             if document.rights_statement:
                 access_condition.text = document.rights_statement
 
-    def _add_administrative_metadata(self, root: ET.Element, document: Document):
-        """Add administrative metadata with techMD per file and rightsMD"""
-        amd_sec = ET.SubElement(root, f"{{{self.namespaces['mets']}}}amdSec")
+    def _administrative_section(self, root: ET.Element, document: Document) -> ET.Element:
+        amd_sec = ET.SubElement(root, METS['amdSec'])
         amd_sec.set('ID', f'amd_{document.id}')
+        return amd_sec
 
-        # Rights Metadata (ECO-MiC requirement)
+    def _add_rights_metadata(self, parent: ET.Element, document: Document):
+        """Add METSRights rightsMD (ECO-MiC requirement)"""
         if any([document.rights_category, document.rights_holder, document.rights_constraint]):
-            rights_md = ET.SubElement(amd_sec, f"{{{self.namespaces['mets']}}}rightsMD")
+            rights_md = ET.SubElement(parent, METS['rightsMD'])
             rights_md.set('ID', f'rights_{document.id}')
 
-            md_wrap = ET.SubElement(rights_md, f"{{{self.namespaces['mets']}}}mdWrap")
+            md_wrap = ET.SubElement(rights_md, METS['mdWrap'])
             md_wrap.set('MDTYPE', 'OTHER')
             md_wrap.set('OTHERMDTYPE', 'METSRIGHTS')
 
-            xml_data = ET.SubElement(md_wrap, f"{{{self.namespaces['mets']}}}xmlData")
+            xml_data = ET.SubElement(md_wrap, METS['xmlData'])
 
             # METSRights declaration
-            rights_decl = ET.SubElement(xml_data, f"{{{self.namespaces['metsrights']}}}RightsDeclaration")
+            rights_decl = ET.SubElement(xml_data, METSRIGHTS['RightsDeclaration'])
             rights_decl.set('RIGHTSCATEGORY', document.rights_category or 'COPYRIGHTED')
 
             if document.rights_holder:
-                rights_holder = ET.SubElement(rights_decl, f"{{{self.namespaces['metsrights']}}}RightsHolder")
-                rights_holder_name = ET.SubElement(rights_holder, f"{{{self.namespaces['metsrights']}}}RightsHolderName")
+                rights_holder = ET.SubElement(rights_decl, METSRIGHTS['RightsHolder'])
+                rights_holder_name = ET.SubElement(rights_holder, METSRIGHTS['RightsHolderName'])
                 rights_holder_name.text = document.rights_holder
 
             if document.rights_constraint:
-                context = ET.SubElement(rights_decl, f"{{{self.namespaces['metsrights']}}}Context")
+                context = ET.SubElement(rights_decl, METSRIGHTS['Context'])
                 context.set('CONTEXTCLASS', 'GENERAL PUBLIC')
 
-                constraints = ET.SubElement(context, f"{{{self.namespaces['metsrights']}}}Constraints")
-                constraint_desc = ET.SubElement(constraints, f"{{{self.namespaces['metsrights']}}}ConstraintDescription")
+                constraints = ET.SubElement(context, METSRIGHTS['Constraints'])
+                constraint_desc = ET.SubElement(constraints, METSRIGHTS['ConstraintDescription'])
                 constraint_desc.text = document.rights_constraint
 
-        # Technical Metadata per file (ECO-MiC structure)
-        for doc_file in document.document_files:
-            file_id = doc_file.file.id if hasattr(doc_file, 'file') else doc_file.file_id
-
-            tech_md = ET.SubElement(amd_sec, f"{{{self.namespaces['mets']}}}techMD")
-            tech_md.set('ID', f'tech_{file_id}')
-
-            md_wrap = ET.SubElement(tech_md, f"{{{self.namespaces['mets']}}}mdWrap")
-            md_wrap.set('MDTYPE', 'OTHER')
-            md_wrap.set('OTHERMDTYPE', 'MIX')
-
-            xml_data = ET.SubElement(md_wrap, f"{{{self.namespaces['mets']}}}xmlData")
-
-            # MIX metadata
-            mix = ET.SubElement(xml_data, f"{{{self.namespaces['mix']}}}mix")
-
-            # Image characteristics
-            if any([doc_file.image_width, doc_file.image_height, doc_file.bits_per_sample,
-                    doc_file.compression_scheme, doc_file.color_space]):
-                img_char = ET.SubElement(mix, f"{{{self.namespaces['mix']}}}ImageCharacteristics")
-
-                # Dimensions
-                if doc_file.image_width or doc_file.image_height:
-                    img_dim = ET.SubElement(img_char, f"{{{self.namespaces['mix']}}}ImageDimensions")
-
-                    if doc_file.image_width:
-                        width = ET.SubElement(img_dim, f"{{{self.namespaces['mix']}}}imageWidth")
-                        width.text = str(doc_file.image_width)
-
-                    if doc_file.image_height:
-                        height = ET.SubElement(img_dim, f"{{{self.namespaces['mix']}}}imageHeight")
-                        height.text = str(doc_file.image_height)
-
-                # Bits per sample
-                if doc_file.bits_per_sample:
-                    img_color = ET.SubElement(img_char, f"{{{self.namespaces['mix']}}}PhotometricInterpretation")
-                    color_space = ET.SubElement(img_color, f"{{{self.namespaces['mix']}}}colorSpace")
-                    color_space.text = doc_file.color_space or 'RGB'
-
-                # Sampling frequency (DPI)
-                if doc_file.x_sampling_frequency or doc_file.y_sampling_frequency:
-                    sampling = ET.SubElement(img_char, f"{{{self.namespaces['mix']}}}SamplingFrequency")
-
-                    if doc_file.x_sampling_frequency:
-                        x_freq = ET.SubElement(sampling, f"{{{self.namespaces['mix']}}}xSamplingFrequency")
-                        x_freq.text = str(doc_file.x_sampling_frequency)
-
-                    if doc_file.y_sampling_frequency:
-                        y_freq = ET.SubElement(sampling, f"{{{self.namespaces['mix']}}}ySamplingFrequency")
-                        y_freq.text = str(doc_file.y_sampling_frequency)
-
-                    if doc_file.sampling_frequency_unit:
-                        unit = ET.SubElement(sampling, f"{{{self.namespaces['mix']}}}samplingFrequencyUnit")
-                        unit.text = doc_file.sampling_frequency_unit
-
-            # Scanner/Camera information (from file-level metadata extracted from EXIF)
-            if doc_file.scanner_manufacturer or doc_file.scanner_model_name:
-                img_creation = ET.SubElement(mix, f"{{{self.namespaces['mix']}}}ImageCreation")
-                scanner_capture = ET.SubElement(img_creation, f"{{{self.namespaces['mix']}}}ScannerCapture")
-
-                if doc_file.scanner_manufacturer:
-                    manufacturer = ET.SubElement(scanner_capture, f"{{{self.namespaces['mix']}}}scannerManufacturer")
-                    manufacturer.text = doc_file.scanner_manufacturer
-
-                if doc_file.scanner_model_name:
-                    scanner_model = ET.SubElement(scanner_capture, f"{{{self.namespaces['mix']}}}ScannerModel")
-                    model_name = ET.SubElement(scanner_model, f"{{{self.namespaces['mix']}}}scannerModelName")
-                    model_name.text = doc_file.scanner_model_name
-
-            # Scanning software information (from file-level metadata)
-            if doc_file.scanning_software_name or doc_file.scanning_software_version:
-                if not any([doc_file.scanner_manufacturer, doc_file.scanner_model_name]):
-                    img_creation = ET.SubElement(mix, f"{{{self.namespaces['mix']}}}ImageCreation")
-                    scanner_capture = ET.SubElement(img_creation, f"{{{self.namespaces['mix']}}}ScannerCapture")
-
-                if doc_file.scanning_software_name:
-                    software = ET.SubElement(scanner_capture, f"{{{self.namespaces['mix']}}}scanningSoftware")
-                    software_name = ET.SubElement(software, f"{{{self.namespaces['mix']}}}scanningSoftwareName")
-                    software_name.text = doc_file.scanning_software_name
-
-                    if doc_file.scanning_software_version:
-                        software_version = ET.SubElement(software, f"{{{self.namespaces['mix']}}}scanningSoftwareVersionNo")
-                        software_version.text = doc_file.scanning_software_version
-
-    def _add_file_section(self, root: ET.Element, document: Document):
-        """Add file section with proper ECO-MiC structure grouped by file_category"""
-        file_sec = ET.SubElement(root, f"{{{self.namespaces['mets']}}}fileSec")
-
-        # Map file_category to METS USE attribute (ECO-MiC compliant)
-        category_to_use = {
-            'master': 'MASTER',
-            'normalized': 'REFERENCE',
-            'export_high': 'HIGH',
-            'export_low': 'THUMBNAIL',
-            'metadata': 'METADATA',
-            'icc': 'METADATA',
-            'logs': 'METADATA',
-            'other': 'OTHER'
-        }
-
-        # Group files by file_category
-        file_groups = {}
-        for doc_file in document.document_files:
-            # Use file_category if available, fallback to file_use, then 'other'
-            category = doc_file.file_category or 'other'
-            use_attr = category_to_use.get(category, 'OTHER')
-
-            if use_attr not in file_groups:
-                file_groups[use_attr] = []
-            file_groups[use_attr].append(doc_file)
-
-        # Define order for fileGrp elements (ECO-MiC best practice: MASTER first)
-        use_order = ['MASTER', 'REFERENCE', 'HIGH', 'THUMBNAIL', 'METADATA', 'OTHER']
-
-        # Create fileGrp for each USE type in proper order
-        for use in use_order:
-            if use not in file_groups:
-                continue
-
-            file_grp = ET.SubElement(file_sec, f"{{{self.namespaces['mets']}}}fileGrp")
-            file_grp.set('USE', use)
-
-            for doc_file in sorted(file_groups[use], key=lambda x: x.sequence_number or 0):
-                file_elem = ET.SubElement(file_grp, f"{{{self.namespaces['mets']}}}file")
-
-                # Get file information
-                if hasattr(doc_file, 'file'):
-                    file_id = doc_file.file.id
-                    content_type = doc_file.file.content_type
-                    file_size = doc_file.file.file_size
-                    filename = doc_file.file.filename
-                else:
-                    file_id = doc_file.file_id
-                    content_type = doc_file.content_type
-                    file_size = doc_file.file_size
-                    filename = doc_file.filename
-
-                file_elem.set('ID', f'file_{file_id}')
-                file_elem.set('MIMETYPE', content_type or 'application/octet-stream')
-                file_elem.set('SIZE', str(file_size))
-                file_elem.set('ADMID', f'tech_{file_id}')  # Link to techMD
-
-                if doc_file.checksum_md5:
-                    file_elem.set('CHECKSUM', doc_file.checksum_md5)
-                    file_elem.set('CHECKSUMTYPE', 'MD5')
-
-                # File location - use category-based folder structure
-                category = doc_file.file_category or 'other'
-                folder_name = self._get_folder_name_for_category(category)
-                flocat = ET.SubElement(file_elem, f"{{{self.namespaces['mets']}}}FLocat")
-                flocat.set('LOCTYPE', 'URL')
-                flocat.set(f"{{{self.namespaces['xlink']}}}href", f"file://./{folder_name}/{filename}")
-
-    def _get_folder_name_for_category(self, category: str) -> str:
-        """Map file_category to ECO-MiC folder naming convention"""
-        folder_mapping = {
-            'master': 'Master',
-            'normalized': 'Normalized',
-            'export_high': 'Export300',
-            'export_low': 'Export150',
-            'metadata': 'Metadata',
-            'icc': 'ICC',
-            'logs': 'Logs',
-            'other': 'Other'
-        }
-        return folder_mapping.get(category, 'Other')
-
-    def _add_structural_map(self, root: ET.Element, document: Document):
-        """Add PHYSICAL structural map (ECO-MiC requirement)"""
-        struct_map = ET.SubElement(root, f"{{{self.namespaces['mets']}}}structMap")
-        struct_map.set('TYPE', 'PHYSICAL')  # ECO-MiC uses PHYSICAL not LOGICAL
-
-        # Main folder div
-        folder_div = ET.SubElement(struct_map, f"{{{self.namespaces['mets']}}}div")
+    def _folder_div(self, parent: ET.Element, document: Document) -> ET.Element:
+        """Main folder div of the structMap"""
+        folder_div = ET.SubElement(parent, METS['div'])
         folder_div.set('TYPE', 'folder')
         folder_div.set('DMDID', f'dmd_{document.id}')
         folder_div.set('ADMID', f'amd_{document.id}')
 
         if document.title:
             folder_div.set('LABEL', document.title)
+        return folder_div
+
+    def _tech_md_xml(self, doc_file, level: int, indents: Sequence[str]) -> str:
+        """MIX techMD of one document file"""
+        mix = []
+
+        # Image characteristics
+        if any([doc_file.image_width, doc_file.image_height, doc_file.bits_per_sample,
+                doc_file.compression_scheme, doc_file.color_space]):
+            img_char = []
+
+            # Dimensions
+            if doc_file.image_width or doc_file.image_height:
+                img_dim = []
+                if doc_file.image_width:
+                    img_dim.append(_leaf('mix:imageWidth', doc_file.image_width))
+                if doc_file.image_height:
+                    img_dim.append(_leaf('mix:imageHeight', doc_file.image_height))
+                img_char.append(_container('mix:ImageDimensions', '', img_dim, level + 5, indents))
+
+            # Bits per sample
+            if doc_file.bits_per_sample:
+                color_space = _leaf('mix:colorSpace', doc_file.color_space or 'RGB')
+                img_char.append(_container('mix:PhotometricInterpretation', '', [color_space], level + 5, indents))
+
+            # Sampling frequency (DPI)
+            if doc_file.x_sampling_frequency or doc_file.y_sampling_frequency:
+                sampling = []
+                if doc_file.x_sampling_frequency:
+                    sampling.append(_leaf('mix:xSamplingFrequency', doc_file.x_sampling_frequency))
+                if doc_file.y_sampling_frequency:
+                    sampling.append(_leaf('mix:ySamplingFrequency', doc_file.y_sampling_frequency))
+                if doc_file.sampling_frequency_unit:
+                    sampling.append(_leaf('mix:samplingFrequencyUnit', doc_file.sampling_frequency_unit))
+                img_char.append(_container('mix:SamplingFrequency', '', sampling, level + 5, indents))
+
+            mix.append(_container('mix:ImageCharacteristics', '', img_char, level + 4, indents))
+
+        # Scanner/Camera and scanning software information (from file-level metadata extracted from EXIF)
+        has_scanner = doc_file.scanner_manufacturer or doc_file.scanner_model_name
+        if has_scanner or doc_file.scanning_software_name or doc_file.scanning_software_version:
+            capture = []
+            if doc_file.scanner_manufacturer:
+                capture.append(_leaf('mix:scannerManufacturer', doc_file.scanner_manufacturer))
+            if doc_file.scanner_model_name:
+                model_name = _leaf('mix:scannerModelName', doc_file.scanner_model_name)
+                capture.append(_container('mix:ScannerModel', '', [model_name], level + 6, indents))
+            if doc_file.scanning_software_name:
+                software = [_leaf('mix:scanningSoftwareName', doc_file.scanning_software_name)]
+                if doc_file.scanning_software_version:
+                    software.append(_leaf('mix:scanningSoftwareVersionNo', doc_file.scanning_software_version))
+                capture.append(_container('mix:scanningSoftware', '', software, level + 6, indents))
+            scanner_capture = _container('mix:ScannerCapture', '', capture, level + 5, indents)
+            mix.append(_container('mix:ImageCreation', '', [scanner_capture], level + 4, indents))
+
+        xml_data = _container('mets:xmlData', '', [_container('mix:mix', '', mix, level + 3, indents)], level + 2, indents)
+        md_wrap = _container('mets:mdWrap', ' MDTYPE="OTHER" OTHERMDTYPE="MIX"', [xml_data], level + 1, indents)
+        return _container('mets:techMD', f' ID="tech_{_file_id(doc_file)}"', [md_wrap], level, indents)
+
+    def _file_use(self, doc_file) -> str:
+        """METS USE of a document file (file_category if available, then 'other')"""
+        category = doc_file.file_category or 'other'
+        return CATEGORY_TO_USE.get(category, 'OTHER')
+
+    def _file_xml(self, doc_file, level: int, indents: Sequence[str]) -> str:
+        """mets:file entry (with FLocat) of one document file"""
+        # Get file information
+        if hasattr(doc_file, 'file'):
+            file_id = doc_file.file.id
+            content_type = doc_file.file.content_type
+            file_size = doc_file.file.file_size
+            filename = doc_file.file.filename
+        else:
+            file_id = doc_file.file_id
+            content_type = doc_file.content_type
+            file_size = doc_file.file_size
+            filename = doc_file.filename
+
+        attributes = (
+            f' ID="file_{file_id}" MIMETYPE="{_escape_attrib(content_type or "application/octet-stream")}"'
+            f' SIZE="{file_size}" ADMID="tech_{file_id}"'  # ADMID links to techMD
+        )
+        if doc_file.checksum_md5:
+            attributes += f' CHECKSUM="{_escape_attrib(doc_file.checksum_md5)}" CHECKSUMTYPE="MD5"'
+
+        # File location - use category-based folder structure
+        folder_name = self._get_folder_name_for_category(doc_file.file_category or 'other')
+        flocat = f'<mets:FLocat LOCTYPE="URL" xlink:href="{_escape_attrib(f"file://./{folder_name}/{filename}")}" />'
+        return _container('mets:file', attributes, [flocat], level, indents)
 
-        # Group files by sequence number for pages
-        files_by_sequence = {}
-        for doc_file in document.document_files:
-            seq = doc_file.sequence_number or 0
-            if seq not in files_by_sequence:
-                files_by_sequence[seq] = []
-            files_by_sequence[seq].append(doc_file)
+    def _get_folder_name_for_category(self, category: str) -> str:
+        """Map file_category to ECO-MiC folder naming convention"""
+        return CATEGORY_TO_FOLDER.get(category, 'Other')
+
+    def _page_div_xml(self, seq: int, files: List, level: int, indents: Sequence[str]) -> str:
+        """Page div of one sequence number with a file pointer per version (ARCHIVE, HIGH, etc.)"""
+        attributes = f' TYPE="page" ORDER="{seq}"'
+
+        # Use file_label from first file if available
+        if files and files[0].file_label:
+            attributes += f' LABEL="{_escape_attrib(files[0].file_label)}"'
+
+        pointers = [f'<mets:fptr FILEID="file_{_file_id(doc_file)}" />' for doc_file in files]
+        return _container('mets:div', attributes, pointers, level, indents)
+
+    def iter_mets_xml(
+        self,
+        document: Document,
+        file_rows: Callable[[str], Iterable],
+        compact: bool = False
+    ) -> Iterator[str]:
+        """
+        Generate METS XML incrementally, one file entry at a time
+
+        Only the document-level sections and the entry of a single file are
+        held in memory; document.document_files is not used.
+
+        Args:
+            document: Document (or DocumentDetail) with the descriptive fields
+            file_rows: Called with each name in FILE_SECTIONS, returns the
+                document's files (objects with DocumentFile attributes plus
+                filename, content_type and file_size) in that section's order
+            compact: Leave out the indentation whitespace
+
+        Yields:
+            XML text fragments
+        """
+        indents = _COMPACT if compact else _PRETTY
+
+        amd_rows = iter(file_rows('amd'))
+        first_row = next(amd_rows, None)
+        if first_row is not None:
+            amd_rows = chain([first_row], amd_rows)
+
+        # Document-level sections are small: build them as elements
+        scratch = ET.Element(METS['mets'])
+        self._add_mets_header(scratch, document)
+        self._add_descriptive_metadata(scratch, document)
+        amd_sec = self._administrative_section(scratch, document)
+        self._add_rights_metadata(amd_sec, document)
+        struct_map = ET.Element(METS['structMap'], {'TYPE': 'PHYSICAL'})  # ECO-MiC uses PHYSICAL not LOGICAL
+        folder_div = self._folder_div(struct_map, document)
+
+        used = {'mets', 'mods', 'xsi'}
+        if first_row is not None:
+            used.update(('mix', 'xlink'))
+        if len(amd_sec):
+            used.add('metsrights')
+        if document.license_url:
+            used.add('xlink')
+
+        yield XML_DECLARATION
+        root = _ContainerWriter('mets:mets', _root_attributes(frozenset(used)), 0, indents)
+        yield root.open()
+        for section in scratch:
+            if section is not amd_sec:
+                yield root.child(self._serialize(section, 1, indents))
+
+        # amdSec: one techMD per file, then rightsMD (METS requires techMD before rightsMD)
+        amd_writer = _ContainerWriter('mets:amdSec', self._attributes(amd_sec), 1, indents)
+        yield root.child(amd_writer.open())
+        for row in amd_rows:
+            yield amd_writer.child(self._tech_md_xml(row, 2, indents))
+        for rights_md in amd_sec:
+            yield amd_writer.child(self._serialize(rights_md, 2, indents))
+        yield amd_writer.close()
+
+        # fileSec: one fileGrp per USE, in USE_ORDER
+        file_sec_writer = _ContainerWriter('mets:fileSec', '', 1, indents)
+        yield root.child(file_sec_writer.open())
+        for use, rows in groupby(file_rows('file'), key=self._file_use):
+            group_writer = _ContainerWriter('mets:fileGrp', f' USE="{use}"', 2, indents)
+            yield file_sec_writer.child(group_writer.open())
+            for row in rows:
+                yield group_writer.child(self._file_xml(row, 3, indents))
+            yield group_writer.close()
+        yield file_sec_writer.close()
+
+        # structMap: one page div per sequence number
+        struct_writer = _ContainerWriter('mets:structMap', self._attributes(struct_map), 1, indents)
+        folder_writer = _ContainerWriter('mets:div', self._attributes(folder_div), 2, indents)
+        yield root.child(struct_writer.open())
+        yield struct_writer.child(folder_writer.open())
+        for seq, rows in groupby(file_rows('struct'), key=lambda row: row.sequence_number or 0):
+            yield folder_writer.child(self._page_div_xml(seq, list(rows), 3, indents))
+        yield folder_writer.close()
+        yield struct_writer.close()
+
+        # The document ends with a newline, as ElementTree writes the root's indentation tail
+        yield root.close() + '\n'
+
+    def _qname(self, name: str) -> str:
+        """'{uri}local' -> 'prefix:local' using the generator namespaces"""
+        qname = QNAMES.get(name)
+        if qname is not None:
+            return qname
+        if name[:1] != '{':
+            return name
+        uri, local = name[1:].split('}', 1)
+        for prefix, namespace in NAMESPACES.items():
+            if namespace == uri:
+                QNAMES[name] = qname = f"{prefix}:{local}"
+                return qname
+        raise ValueError(f"unknown namespace {uri}")
+
+    def _attributes(self, elem: ET.Element) -> str:
+        return ''.join(f' {self._qname(key)}="{_escape_attrib(value)}"' for key, value in elem.items())
+
+    def _serialize(self, elem: ET.Element, level: int, indents: Sequence[str]) -> str:
+        """Serialize a document-level element at depth level (without trailing whitespace)"""
+        parts = []
+        self._write_element(elem, parts.append, level, indents)
+        return ''.join(parts)
+
+    def _write_element(self, elem: ET.Element, write: Callable[[str], None], level: int, indents: Sequence[str]):
+        tag = self._qname(elem.tag)
+        write(f"<{tag}{self._attributes(elem)}")
+        if len(elem):
+            write(">")
+            for child in elem:
+                write(indents[level + 1])
+                self._write_element(child, write, level + 1, indents)
+            write(f"{indents[level]}</{tag}>")
+        elif elem.text:
+            write(f">{_escape_cdata(elem.text)}</{tag}>")
+        else:
+            write(" />")
 
-        # Add page divs with multiple file pointers (for different versions)
-        for seq in sorted(files_by_sequence.keys()):
-            files = files_by_sequence[seq]
 
-            page_div = ET.SubElement(folder_div, f"{{{self.namespaces['mets']}}}div")
-            page_div.set('TYPE', 'page')
-            page_div.set('ORDER', str(seq))
+class _ContainerWriter:
+    """Open/close tags of an element whose children are streamed"""
 
-            # Use file_label from first file if available
-            if files and files[0].file_label:
-                page_div.set('LABEL', files[0].file_label)
+    def __init__(self, tag: str, attributes: str, level: int, indents: Sequence[str] = _PRETTY):
+        self.tag = tag
+        self.attributes = attributes
+        self.level = level
+        self.indents = indents
+        self.has_children = False
 
-            # Add file pointers for all versions (ARCHIVE, HIGH, etc.)
-            for doc_file in files:
-                fptr = ET.SubElement(page_div, f"{{{self.namespaces['mets']}}}fptr")
+    def open(self) -> str:
+        return f"<{self.tag}{self.attributes}"
 
-                file_id = doc_file.file.id if hasattr(doc_file, 'file') else doc_file.file_id
-                fptr.set('FILEID', f'file_{file_id}')
+    def child(self, text: str) -> str:
+        prefix = '' if self.has_children else '>'
+        self.has_children = True
+        return f"{prefix}{self.indents[self.level + 1]}{text}"
 
-    def _indent(self, elem, level=0):
-        """Add indentation for pretty printing"""
-        i = "\n" + level * "  "
-        if len(elem):
-            if not elem.text or not elem.text.strip():
-                elem.text = i + "  "
-            if not elem.tail or not elem.tail.strip():
-                elem.tail = i
-            for child in elem:
-                self._indent(child, level + 1)
-            if not child.tail or not child.tail.strip():
-                child.tail = i
-        else:
-            if level and (not elem.tail or not elem.tail.strip()):
-                elem.tail = i
+    def close(self) -> str:
+        if not self.has_children:
+            return " />"
+        return f"{self.indents[self.level]}</{self.tag}>"
+
+
+def _escape_cdata(text: str) -> str:
+    # Same escaping as xml.etree.ElementTree for character data
+    return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+
+def _escape_attrib(text: str) -> str:
+    # Same escaping as xml.etree.ElementTree for attribute values
+    return (
+        text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;").replace("\"", "&quot;")
+        .replace("\r", "&#13;").replace("\n", "&#10;").replace("\t", "&#09;")
+    )
+
+
+def sort_file_rows(rows: Iterable, section: str) -> List:
+    """
+    Document files in the order a FILE_SECTIONS section expects
+
+    In-memory counterpart of the ORDER BY clauses of
+    app.services.mets_stream.document_file_rows.
+    """
+    def sequence(row):
+        return row.sequence_number or 0
+
+    if section == 'amd':
+        return sorted(rows, key=lambda row: row.id)
+    if section == 'file':
+        return sorted(rows, key=lambda row: (
+            USE_ORDER.index(CATEGORY_TO_USE.get(row.file_category or 'other', 'OTHER')), sequence(row), row.id
+        ))
+    if section == 'struct':
+        return sorted(rows, key=lambda row: (sequence(row), row.id))
+    raise ValueError(f"unknown METS section {section}")
+
+
+# Stateless: shared by the streaming export, the cache and the render workers
+mets_generator = METSEcoMicGenerator()
+
+
+def render_mets_xml(document: Document, rows: List, compact: bool = False) -> bytes:
+    """
+    Complete UTF-8 METS XML of a document from its already loaded file rows
+
+    Needs no database session, so it can run in a worker process (document
+    and rows must then be picklable).
+
+    Args:
+        document: Document (or DocumentDetail) with the descriptive fields
+        rows: The document's files in any order, as accepted by iter_mets_xml
+        compact: Leave out the indentation whitespace
+
+    Returns:
+        The same bytes as the streamed export of the document (when not compact)
+    """
+    fragments = mets_generator.iter_mets_xml(document, lambda section: sort_file_rows(rows, section), compact)
+    return ''.join(fragments).encode('utf-8')
@@ -0,0 +1,309 @@
+"""
+Offline METS ECO-MiC validation
+
+Validates METS XML against the bundled XSDs (app/resources/xsd, compiled once
+per process) and against the ECO-MiC 1.1 profile rules followed by
+METSEcoMicGenerator, without any network access. Results use the same shape
+as the remote Cineca validator (see METSValidationService), so callers can
+treat both stages alike.
+"""
+
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Union
+
+from lxml import etree
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_XSD_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'resources', 'xsd')
+
+NAMESPACES = {
+    'mets': 'http://www.loc.gov/METS/',
+    'mods': 'http://www.loc.gov/mods/v3',
+    'mix': 'http://www.loc.gov/mix/v20',
+    'metsrights': 'http://cosimo.stanford.edu/sdr/metsrights/',
+    'xlink': 'http://www.w3.org/1999/xlink',
+}
+
+# Schema file per namespace; METS is required, the others are validated when bundled
+SCHEMA_CATALOG = [
+    (NAMESPACES['mets'], 'mets.xsd', True),
+    (NAMESPACES['mods'], 'mods-3-7.xsd', False),
+    (NAMESPACES['mix'], 'mix20.xsd', False),
+    (NAMESPACES['metsrights'], 'METSRights.xsd', False),
+]
+
+# Official locations of the optional schemas (fetch_mets_schemas.py vendors them)
+SCHEMA_SOURCES = {
+    'mods-3-7.xsd': 'https://www.loc.gov/standards/mods/v3/mods-3-7.xsd',
+    'mix20.xsd': 'https://www.loc.gov/standards/mix/mix20/mix20.xsd',
+    'METSRights.xsd': 'https://www.loc.gov/standards/rights/METSRights.xsd',
+}
+
+# fileGrp USE values written by METSEcoMicGenerator (CATEGORY_TO_USE)
+ECOMIC_FILE_USES = {'MASTER', 'REFERENCE', 'HIGH', 'THUMBNAIL', 'METADATA', 'OTHER'}
+
+ERROR = 'error'
+WARNING = 'warning'
+
+
+class _LocalSchemaResolver(etree.Resolver):
+    """Resolve schema imports/includes to bundled files by name; nothing is fetched"""
+
+    def __init__(self, directories: List[str]):
+        super().__init__()
+        self.directories = directories
+
+    def resolve(self, url, pubid, context):
+        name = os.path.basename((url or '').split('?', 1)[0])
+        for directory in self.directories:
+            path = os.path.join(directory, name)
+            if name and os.path.isfile(path):
+                return self.resolve_filename(path, context)
+        logger.warning(f"Schema reference {url} is not bundled and will not be fetched")
+        return None
+
+
+def _issue(code: str, severity: str, description: str, tag: str = 'N/A', location: str = 'N/A') -> Dict[str, Any]:
+    return {
+        'id': code,
+        'type': severity,
+        'description': description,
+        'tag': tag,
+        'location': location,
+    }
+
+
+def _location(elem) -> str:
+    return f"line {elem.sourceline}" if elem is not None and elem.sourceline else 'N/A'
+
+
+def _qualified(name: str) -> str:
+    prefix, local = name.split(':', 1)
+    return f"{{{NAMESPACES[prefix]}}}{local}"
+
+
+# ECO-MiC profile rules. Each takes the parsed mets:mets root and yields issues.
+
+def _rule_header(root) -> Iterable[Dict[str, Any]]:
+    header = root.find('mets:metsHdr', NAMESPACES)
+    if header is None:
+        yield _issue('ECOMIC-HDR-01', ERROR, 'metsHdr is required', 'mets:metsHdr')
+        return
+    for attribute in ('CREATEDATE', 'RECORDSTATUS'):
+        if not header.get(attribute):
+            yield _issue('ECOMIC-HDR-02', ERROR, f'metsHdr must have {attribute}', 'mets:metsHdr', _location(header))
+    if header.find("mets:agent[@ROLE='CREATOR']", NAMESPACES) is None:
+        yield _issue('ECOMIC-HDR-03', ERROR, 'metsHdr must declare a CREATOR agent', 'mets:agent', _location(header))
+
+
+def _rule_descriptive(root) -> Iterable[Dict[str, Any]]:
+    mods = root.find("mets:dmdSec/mets:mdWrap[@MDTYPE='MODS']/mets:xmlData/mods:mods", NAMESPACES)
+    if mods is None:
+        yield _issue('ECOMIC-DMD-01', ERROR, 'dmdSec must wrap a MODS record (mdWrap MDTYPE="MODS")', 'mets:dmdSec')
+        return
+    logical_id = mods.find("mods:identifier[@type='logicalId']", NAMESPACES)
+    if logical_id is None or not (logical_id.text or '').strip():
+        yield _issue('ECOMIC-DMD-02', ERROR, 'MODS must contain a non-empty identifier of type logicalId',
+                     'mods:identifier', _location(mods))
+    if mods.find('mods:titleInfo/mods:title', NAMESPACES) is None:
+        yield _issue('ECOMIC-DMD-03', WARNING, 'MODS record has no title', 'mods:titleInfo', _location(mods))
+
+
+def _rule_files(root) -> Iterable[Dict[str, Any]]:
+    tech_ids = {tech.get('ID') for tech in root.iterfind('mets:amdSec/mets:techMD', NAMESPACES)}
+    if root.find('mets:amdSec', NAMESPACES) is None:
+        yield _issue('ECOMIC-AMD-01', ERROR, 'amdSec is required', 'mets:amdSec')
+
+    for tech in root.iterfind('mets:amdSec/mets:techMD', NAMESPACES):
+        if tech.find("mets:mdWrap[@OTHERMDTYPE='MIX']/mets:xmlData/mix:mix", NAMESPACES) is None:
+            yield _issue('ECOMIC-AMD-02', ERROR, f"techMD {tech.get('ID')} must wrap a MIX record",
+                         'mets:techMD', _location(tech))
+
+    for group in root.iterfind('mets:fileSec/mets:fileGrp', NAMESPACES):
+        if group.get('USE') not in ECOMIC_FILE_USES:
+            yield _issue('ECOMIC-FILE-01', WARNING, f"fileGrp USE '{group.get('USE')}' is not an ECO-MiC file use",
+                         'mets:fileGrp', _location(group))
+
+    for file_elem in root.iterfind('mets:fileSec//mets:file', NAMESPACES):
+        file_id = file_elem.get('ID')
+        for attribute in ('MIMETYPE', 'SIZE'):
+            if not file_elem.get(attribute):
+                yield _issue('ECOMIC-FILE-02', ERROR, f'file {file_id} must have {attribute}',
+                             'mets:file', _location(file_elem))
+        if file_elem.get('CHECKSUM') and not file_elem.get('CHECKSUMTYPE'):
+            yield _issue('ECOMIC-FILE-03', ERROR, f'file {file_id} has CHECKSUM without CHECKSUMTYPE',
+                         'mets:file', _location(file_elem))
+        flocat = file_elem.find('mets:FLocat', NAMESPACES)
+        if flocat is None or not flocat.get(_qualified('xlink:href')):
+            yield _issue('ECOMIC-FILE-04', ERROR, f'file {file_id} must have an FLocat with xlink:href',
+                         'mets:FLocat', _location(file_elem))
+        for admid in (file_elem.get('ADMID') or '').split():
+            if admid not in tech_ids:
+                yield _issue('ECOMIC-FILE-05', ERROR, f'file {file_id} ADMID {admid} has no techMD',
+                             'mets:file', _location(file_elem))
+
+
+def _rule_structure(root) -> Iterable[Dict[str, Any]]:
+    struct_map = root.find("mets:structMap[@TYPE='PHYSICAL']", NAMESPACES)
+    if struct_map is None:
+        yield _issue('ECOMIC-STRUCT-01', ERROR, 'a PHYSICAL structMap is required', 'mets:structMap')
+        return
+
+    file_ids = {file_elem.get('ID') for file_elem in root.iterfind('mets:fileSec//mets:file', NAMESPACES)}
+    dmd_ids = {dmd.get('ID') for dmd in root.iterfind('mets:dmdSec', NAMESPACES)}
+    referenced = set()
+    for fptr in struct_map.iterfind('.//mets:fptr', NAMESPACES):
+        file_id = fptr.get('FILEID')
+        referenced.add(file_id)
+        if file_id not in file_ids:
+            yield _issue('ECOMIC-STRUCT-02', ERROR, f'fptr FILEID {file_id} has no file', 'mets:fptr', _location(fptr))
+    for div in struct_map.iterfind('.//mets:div[@DMDID]', NAMESPACES):
+        for dmdid in div.get('DMDID').split():
+            if dmdid not in dmd_ids:
+                yield _issue('ECOMIC-STRUCT-03', WARNING, f'div DMDID {dmdid} has no dmdSec', 'mets:div', _location(div))
+    for file_id in sorted(file_ids - referenced):
+        yield _issue('ECOMIC-STRUCT-04', WARNING, f'file {file_id} is not referenced by the structMap', 'mets:file')
+
+
+PROFILE_RULES: List[Callable] = [_rule_header, _rule_descriptive, _rule_files, _rule_structure]
+
+
+class LocalMETSValidator:
+    """METS XSD + ECO-MiC profile validator with schemas compiled once"""
+
+    def __init__(self, xsd_dir: Optional[str] = None):
+        """
+        Args:
+            xsd_dir: Extra directory searched before the bundled schemas (e.g. settings.METS_XSD_DIR)
+        """
+        self.directories = [d for d in (xsd_dir, DEFAULT_XSD_DIR) if d]
+        self.namespaces = []
+        # Optional schemas not found: their mets:xmlData content is only checked laxly
+        self.skipped_namespaces = []
+        started = time.perf_counter()
+        self.schema = self._compile()
+        self.compile_ms = (time.perf_counter() - started) * 1000
+        # lxml validators keep their error log on the instance
+        self._lock = threading.Lock()
+        logger.info(
+            f"Compiled METS schemas in {self.compile_ms:.0f} ms "
+            f"({', '.join(self.namespaces)})"
+        )
+        if self.skipped_namespaces:
+            logger.warning(
+                f"METS schemas not bundled, validated laxly: {', '.join(self.skipped_namespaces)} "
+                f"(run fetch_mets_schemas.py to vendor them)"
+            )
+
+    def _find(self, filename: str) -> Optional[str]:
+        for directory in self.directories:
+            path = os.path.join(directory, filename)
+            if os.path.isfile(path):
+                return path
+        return None
+
+    def _compile(self) -> etree.XMLSchema:
+        """Compile a driver schema importing every available catalog schema"""
+        imports = []
+        for namespace, filename, required in SCHEMA_CATALOG:
+            path = self._find(filename)
+            if path is None:
+                if required:
+                    raise FileNotFoundError(f"Required schema {filename} not found in {self.directories}")
+                self.skipped_namespaces.append(namespace)
+                continue
+            imports.append(f'<xsd:import namespace="{namespace}" schemaLocation="{filename}"/>')
+            self.namespaces.append(namespace)
+
+        driver = (
+            '<xsd:schema xmlns:xsd="http://www.w3.org/2001/XMLSchema" '
+            'targetNamespace="urn:archivia:mets-validation">' + ''.join(imports) + '</xsd:schema>'
+        )
+        parser = etree.XMLParser(no_network=True, resolve_entities=False)
+        parser.resolvers.add(_LocalSchemaResolver(self.directories))
+        base_url = os.path.join(self.directories[-1], 'driver.xsd')
+        return etree.XMLSchema(etree.fromstring(driver.encode('utf-8'), parser, base_url=base_url))
+
+    def validate(self, xml_content: Union[str, bytes]) -> Dict[str, Any]:
+        """
+        Validate a METS document
+
+        Args:
+            xml_content: METS XML (str or UTF-8 bytes)
+
+        Returns:
+            Dict with valid, errors, warnings, summary, response (engine details)
+        """
+        started = time.perf_counter()
+        if isinstance(xml_content, str):
+            xml_content = xml_content.encode('utf-8')
+
+        errors: List[Dict[str, Any]] = []
+        warnings: List[Dict[str, Any]] = []
+        # Untrusted input: no DTDs, entities or network access
+        parser = etree.XMLParser(resolve_entities=False, no_network=True, load_dtd=False, huge_tree=False)
+        try:
+            root = etree.fromstring(xml_content, parser)
+        except etree.XMLSyntaxError as e:
+            errors.append(_issue('XML-SYNTAX', ERROR, str(e), location=f"line {e.lineno}"))
+            return self._result(errors, warnings, started)
+
+        if root.tag != _qualified('mets:mets'):
+            errors.append(_issue('ECOMIC-ROOT', ERROR, 'root element must be mets:mets', str(root.tag), _location(root)))
+            return self._result(errors, warnings, started)
+
+        with self._lock:
+            try:
+                self.schema.validate(root)
+            except etree.XMLSchemaValidateError as e:
+                # e.g. unexpanded entity references, which libxml2 cannot validate
+                errors.append(_issue('XSD', ERROR, f"document cannot be schema-validated: {e}"))
+                return self._result(errors, warnings, started)
+            schema_errors = list(self.schema.error_log)
+        for entry in schema_errors:
+            errors.append(_issue('XSD', ERROR, entry.message, entry.path or 'N/A', f"line {entry.line}"))
+
+        for rule in PROFILE_RULES:
+            for issue in rule(root):
+                (errors if issue['type'] == ERROR else warnings).append(issue)
+
+        return self._result(errors, warnings, started)
+
+    def _result(self, errors, warnings, started) -> Dict[str, Any]:
+        duration_ms = round((time.perf_counter() - started) * 1000, 2)
+        if errors:
+            summary = f"METS XML non conforme: {len(errors)} errore/i trovato/i"
+        else:
+            summary = "METS XML è conforme al standard ECO-MiC 1.1"
+        return {
+            'valid': not errors,
+            'response': {
+                'engine': 'local',
+                'schemas': self.namespaces,
+                'skipped_schemas': self.skipped_namespaces,
+                'duration_ms': duration_ms,
+            },
+            'errors': errors,
+            'warnings': warnings,
+            'summary': summary,
+        }
+
+
+_validator: Optional[LocalMETSValidator] = None
+_validator_lock = threading.Lock()
+
+
+def get_local_validator() -> LocalMETSValidator:
+    """Process-wide validator (schemas are compiled at startup or on first use)"""
+    global _validator
+    if _validator is None:
+        with _validator_lock:
+            if _validator is None:
+                _validator = LocalMETSValidator(settings.METS_XSD_DIR)
+    return _validator
@@ -45,6 +45,52 @@ def get_minio_object_path(
     return f"{user_id}/{category}/{short_hash}{extension}"
 
 
+def get_derivative_object_path(
+    user_id: int,
+    file_hash: str,
+    variant: str,
+    extension: str
+) -> str:
+    """
+    Generate MinIO object path for a cached derivative (preview, thumbnail, ...)
+
+    Derivatives are keyed by the source content hash plus a variant name that
+    encodes everything affecting the output bytes (tier, format, ...):
+    Format: {user_id}/derivatives/{short_hash}/{variant}.{ext}
+
+    Examples:
+        - 2/derivatives/abc123def/preview_grid.webp
+        - 2/derivatives/abc123def/preview_viewer.jpg
+
+    Args:
+        user_id: Owner user ID
+        file_hash: SHA256 hash of the source file content
+        variant: Derivative variant name
+        extension: Output file extension (without dot)
+
+    Returns:
+        String path for MinIO object storage
+    """
+    short_hash = file_hash[:16] if len(file_hash) >= 16 else file_hash
+    return f"{user_id}/derivatives/{short_hash}/{variant}.{extension}"
+
+
+def get_mets_cache_prefix(user_id: int, document_id: int) -> str:
+    """
+    MinIO prefix holding the cached METS renderings of a document
+
+    Format: {user_id}/mets-cache/{document_id}/
+
+    Args:
+        user_id: Owner user ID
+        document_id: Document ID
+
+    Returns:
+        Object name prefix (with trailing slash)
+    """
+    return f"{user_id}/mets-cache/{document_id}/"
+
+
 def get_export_folder_name(file_category: str) -> str:
     """
     Map storage category to ECO-MiC export folder name
@@ -0,0 +1,113 @@
+"""
+Low-quality image placeholders (LQIP) for document grids
+
+A placeholder is a tiny (16px) heavily compressed image encoded as a data
+URI, small enough (~150-300 bytes) to be sent inline in list and detail
+payloads so grids can paint immediately while real previews load.
+"""
+import base64
+import io
+import logging
+from contextlib import nullcontext
+from typing import BinaryIO, Optional, Union
+
+from PIL import Image
+
+from app.utils.file_categorizer import FileCategorizer
+from app.utils.memory_budget import MemoryBudgetExceeded, raw_memory_budget
+from app.utils.thumbnail_generator import estimate_embedded_preview_bytes, is_format_supported, spill_to_file
+
+logger = logging.getLogger(__name__)
+
+PLACEHOLDER_SIZE = 16
+
+# Formats without a reduced decode (TIFF, PNG, ...) are only decoded inside
+# the upload request up to this size; larger ones get their placeholder from
+# the background task queue (app.services.metadata.schedule_placeholders)
+PLACEHOLDER_MAX_INLINE_PIXELS = 1_000_000
+
+# Upper bound for the background full decode; bigger masters reuse the
+# placeholder of their page's derivative (app.services.derivatives)
+PLACEHOLDER_MAX_DECODE_PIXELS = 25_000_000
+
+
+def create_placeholder(image: Image.Image) -> str:
+    """
+    Encode a decoded image as a placeholder data URI
+
+    Args:
+        image: Source image (any size, left untouched)
+
+    Returns:
+        data: URI (WebP when supported, otherwise JPEG)
+    """
+    tiny = image.copy()
+    if tiny.mode not in ('RGB', 'L'):
+        tiny = tiny.convert('RGB')
+    tiny.thumbnail((PLACEHOLDER_SIZE, PLACEHOLDER_SIZE), Image.Resampling.BILINEAR)
+
+    output = io.BytesIO()
+    if is_format_supported('webp'):
+        tiny.save(output, format='WEBP', quality=30, method=6)
+        mime_type = 'image/webp'
+    else:
+        tiny.save(output, format='JPEG', quality=30, optimize=True)
+        mime_type = 'image/jpeg'
+
+    return f"data:{mime_type};base64,{base64.b64encode(output.getvalue()).decode('ascii')}"
+
+
+def create_placeholder_from_file(
+    source: Union[str, BinaryIO],
+    filename: str = "",
+    max_pixels: int = PLACEHOLDER_MAX_INLINE_PIXELS
+) -> Optional[str]:
+    """
+    Compute a placeholder from a local file using the cheapest reduced decode
+
+    JPEGs are decoded at 1/8 scale, RAW files through their embedded preview;
+    other formats are only decoded when they have at most max_pixels pixels.
+
+    Args:
+        source: Local file path or seekable file object
+        filename: Original filename (used to detect RAW formats)
+        max_pixels: Full-decode limit for formats without a reduced decode
+
+    Returns:
+        Placeholder data URI, or None when the file was skipped or unreadable
+    """
+    name = (filename or (source if isinstance(source, str) else '')).lower()
+    try:
+        if name.endswith(tuple(FileCategorizer.MASTER_EXTENSIONS)):
+            import rawpy
+
+            if isinstance(source, str):
+                raw_source = nullcontext(source)
+            else:
+                source.seek(0)
+                raw_source = spill_to_file(source)
+            with raw_source as raw_path, rawpy.imread(raw_path) as raw:
+                with raw_memory_budget.reserve(
+                    estimate_embedded_preview_bytes(raw, (PLACEHOLDER_SIZE, PLACEHOLDER_SIZE)), timeout=0
+                ):
+                    thumb = raw.extract_thumb()
+                    if thumb.format != rawpy.ThumbFormat.JPEG:
+                        return None
+                    with Image.open(io.BytesIO(thumb.data)) as image:
+                        image.draft('RGB', (PLACEHOLDER_SIZE, PLACEHOLDER_SIZE))
+                        return create_placeholder(image)
+
+        if not isinstance(source, str):
+            source.seek(0)
+        with Image.open(source) as image:
+            if image.format == 'JPEG':
+                image.draft('RGB', (PLACEHOLDER_SIZE, PLACEHOLDER_SIZE))
+            elif image.width * image.height > max_pixels:
+                return None
+            return create_placeholder(image)
+
+    except MemoryBudgetExceeded:
+        logger.debug(f"Placeholder for {name} deferred: RAW memory budget busy")
+    except Exception as e:
+        logger.debug(f"Could not create placeholder for {name}: {e}")
+    return None
@@ -0,0 +1,114 @@
+"""
+Sprite sheet (contact sheet) composition for document grids
+
+Lays out fixed-size square cells left-to-right, top-to-bottom. Each preview
+is fitted and centered inside its cell, so the coordinate map only depends
+on the tile count and layout options, never on image content.
+"""
+import io
+import logging
+from typing import Dict, List, Optional, Tuple
+
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+# Bumped whenever the layout or rendering changes, invalidating cached sprites
+SPRITE_LAYOUT_VERSION = 1
+
+SPRITE_BACKGROUND = (238, 238, 238)
+
+DEFAULT_TILE_SIZE = 160
+DEFAULT_COLUMNS = 10
+DEFAULT_TILES_PER_PAGE = 100
+MAX_TILES_PER_PAGE = 400
+
+# Without a category filter, the rendition tiled for each page: the lightest one first
+SPRITE_CATEGORY_PREFERENCE = ('export_low', 'export_high', 'normalized', 'master')
+
+# Largest sheet edge every output format can encode (WebP and AVIF stop at 16383 px)
+MAX_SHEET_EDGE = 16383
+
+
+class SpriteTooLarge(ValueError):
+    """The requested layout would produce a sheet larger than MAX_SHEET_EDGE"""
+    pass
+
+
+def check_sprite_size(per_page: int, tile_size: int, columns: int):
+    """
+    Reject layouts whose full pages exceed the encoder size limit
+
+    Args:
+        per_page: Tiles per sheet
+        tile_size: Cell edge in pixels
+        columns: Maximum cells per row
+
+    Raises:
+        SpriteTooLarge: If the sheet width or height would exceed MAX_SHEET_EDGE
+    """
+    (width, height), _ = sprite_layout(per_page, tile_size, columns)
+    if width > MAX_SHEET_EDGE or height > MAX_SHEET_EDGE:
+        raise SpriteTooLarge(
+            f"A sheet of {per_page} tiles of {tile_size}px in {min(columns, per_page)} columns "
+            f"is {width}x{height}px; sheets are limited to {MAX_SHEET_EDGE}px per side"
+        )
+
+
+def sprite_layout(count: int, tile_size: int, columns: int) -> Tuple[Tuple[int, int], List[Dict[str, int]]]:
+    """
+    Compute the sheet size and cell rectangles for count tiles
+
+    Args:
+        count: Number of tiles on the sheet
+        tile_size: Cell edge in pixels
+        columns: Maximum cells per row
+
+    Returns:
+        Tuple of ((width, height), [{'x', 'y', 'width', 'height'}, ...])
+    """
+    columns = max(1, min(columns, count)) if count else 1
+    rows = (count + columns - 1) // columns
+    cells = [
+        {
+            'x': (index % columns) * tile_size,
+            'y': (index // columns) * tile_size,
+            'width': tile_size,
+            'height': tile_size
+        }
+        for index in range(count)
+    ]
+    return (columns * tile_size, max(rows, 1) * tile_size), cells
+
+
+def render_sprite(previews: List[Optional[bytes]], tile_size: int, columns: int) -> Image.Image:
+    """
+    Compose encoded preview images into one RGB sheet
+
+    Args:
+        previews: Encoded images in tile order (None leaves an empty cell)
+        tile_size: Cell edge in pixels
+        columns: Maximum cells per row
+
+    Returns:
+        PIL image of the sheet
+    """
+    size, cells = sprite_layout(len(previews), tile_size, columns)
+    sheet = Image.new('RGB', size, SPRITE_BACKGROUND)
+
+    for preview, cell in zip(previews, cells):
+        if not preview:
+            continue
+        try:
+            with Image.open(io.BytesIO(preview)) as tile:
+                tile.draft('RGB', (tile_size, tile_size))
+                tile = tile.convert('RGB')
+                tile.thumbnail((tile_size, tile_size), Image.Resampling.LANCZOS)
+                sheet.paste(tile, (
+                    cell['x'] + (tile_size - tile.width) // 2,
+                    cell['y'] + (tile_size - tile.height) // 2
+                ))
+        except Exception as e:
+            logger.warning(f"Skipping unreadable sprite tile at ({cell['x']}, {cell['y']}): {e}")
+
+    return sheet
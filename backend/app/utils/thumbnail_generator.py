@@ -3,26 +3,206 @@ Thumbnail generation utilities for image files, including DNG support
 """
 import io
 import logging
-from typing import Optional, BinaryIO
-from PIL import Image
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional, BinaryIO
+from PIL import Image, features
 import rawpy
 
+from app.core.config import settings
+from app.utils.memory_budget import MemoryBudgetExceeded, raw_memory_budget
+
 logger = logging.getLogger(__name__)
 
+# AVIF support is optional: pillow-avif-plugin registers the codec with Pillow
+try:
+    import pillow_avif  # noqa: F401
+except ImportError:
+    pillow_avif = None
+
+
+# Output formats: format key -> (PIL format name, MIME type, file extension)
+PREVIEW_FORMATS = {
+    'avif': ('AVIF', 'image/avif', 'avif'),
+    'webp': ('WEBP', 'image/webp', 'webp'),
+    'jpeg': ('JPEG', 'image/jpeg', 'jpg'),
+}
+
+# Negotiation preference when the client accepts several formats (smallest first)
+FORMAT_PREFERENCE = ['avif', 'webp', 'jpeg']
+
+# Encoder settings per preview tier. Grid tiles are small and viewed at a glance,
+# so they trade fidelity for bytes; the viewer tier keeps detail for inspection.
+PREVIEW_TIERS = {
+    'grid': {
+        'max_size': (400, 400),
+        'jpeg': {'quality': 72, 'optimize': True, 'progressive': True, 'subsampling': '4:2:0'},
+        'webp': {'quality': 68, 'method': 4},
+        'avif': {'quality': 50, 'speed': 8},
+    },
+    'viewer': {
+        'max_size': (1200, 1200),
+        'jpeg': {'quality': 85, 'optimize': True, 'progressive': True, 'subsampling': '4:2:0'},
+        'webp': {'quality': 80, 'method': 4},
+        'avif': {'quality': 62, 'speed': 6},
+    },
+}
+
+DEFAULT_TIER = 'viewer'
+
+
+@contextmanager
+def spill_to_file(file_data: BinaryIO) -> Iterator[str]:
+    """
+    Yield a local path holding the stream's content
+
+    Streams that are already backed by a local file are used in place;
+    anything else (MinIO responses, uploads) is copied in chunks to a
+    temporary spill file that is removed afterwards.
+    """
+    name = getattr(file_data, 'name', None)
+    if isinstance(name, str) and os.path.isfile(name):
+        yield name
+        return
+
+    spill = tempfile.NamedTemporaryFile(prefix='archivia_raw_', dir=settings.RAW_SPILL_DIR, delete=False)
+    try:
+        with spill:
+            shutil.copyfileobj(file_data, spill, settings.STREAMING_CHUNK_SIZE)
+        yield spill.name
+    finally:
+        try:
+            os.unlink(spill.name)
+        except OSError:
+            pass
+
+
+def estimate_embedded_preview_bytes(raw, decode_size: tuple) -> int:
+    """
+    Estimate peak memory for extracting and decoding a RAW file's embedded JPEG preview
+
+    Assumes a worst-case full-resolution preview compressed at ~1:4 plus the
+    decoded image at (up to twice) decode_size, since JPEG draft decoding
+    only scales by powers of two.
+    """
+    return raw.sizes.width * raw.sizes.height * 3 // 4 + decode_size[0] * decode_size[1] * 3 * 4
+
+
+def estimate_postprocess_bytes(raw, half_size: bool = True) -> int:
+    """
+    Estimate peak memory for demosaicing a RAW file with LibRaw
+
+    Counts the unpacked 16-bit sensor data, LibRaw's 4-channel 16-bit working
+    image and the 8-bit RGB output array.
+    """
+    scale = 2 if half_size else 1
+    pixels = (raw.sizes.width // scale) * (raw.sizes.height // scale)
+    return raw.sizes.raw_width * raw.sizes.raw_height * 2 + pixels * 4 * 2 + pixels * 3
+
+
+def is_format_supported(output_format: str) -> bool:
+    """Check whether the installed Pillow build can encode a preview format"""
+    if output_format == 'jpeg':
+        return True
+    if output_format == 'webp':
+        return features.check('webp')
+    if output_format == 'avif':
+        return '.avif' in Image.registered_extensions()
+    return False
+
+
+def negotiate_preview_format(accept_header: Optional[str]) -> str:
+    """
+    Choose a preview format from an HTTP Accept header
+
+    Picks the smallest supported format the client explicitly accepts
+    (AVIF, then WebP) and falls back to progressive JPEG, which every
+    client can display.
+
+    Args:
+        accept_header: Raw Accept request header
+
+    Returns:
+        Format key from PREVIEW_FORMATS
+    """
+    if not accept_header:
+        return 'jpeg'
+
+    accepted = {}
+    for item in accept_header.split(','):
+        media_range, *params = [p.strip() for p in item.split(';')]
+        quality = 1.0
+        for param in params:
+            if param.startswith('q='):
+                try:
+                    quality = float(param[2:])
+                except ValueError:
+                    quality = 0.0
+        accepted[media_range.lower()] = quality
+
+    for output_format in FORMAT_PREFERENCE:
+        mime_type = PREVIEW_FORMATS[output_format][1]
+        if accepted.get(mime_type, 0.0) > 0 and is_format_supported(output_format):
+            return output_format
+
+    return 'jpeg'
+
+
+def encode_image(image: Image.Image, output_format: str, tier: str = DEFAULT_TIER) -> tuple[bytes, str]:
+    """
+    Encode an RGB image as-is (no resizing) with a tier's encoder settings
+
+    Used for composed images such as sprite sheets.
+
+    Returns:
+        Tuple of (image_bytes, mime_type)
+    """
+    output_format = output_format if is_format_supported(output_format) else 'jpeg'
+    pil_format, mime_type, _ = PREVIEW_FORMATS[output_format]
+    output = io.BytesIO()
+    image.save(output, format=pil_format, **PREVIEW_TIERS[tier][output_format])
+    return output.getvalue(), mime_type
+
 
 class ThumbnailGenerator:
     """Generate thumbnails for various image formats including DNG"""
 
-    def __init__(self, max_size: tuple = (800, 800), quality: int = 85):
+    def __init__(
+        self,
+        max_size: tuple = (800, 800),
+        quality: int = 85,
+        output_format: str = 'jpeg',
+        encoder_options: Optional[Dict] = None
+    ):
         """
         Initialize thumbnail generator
 
         Args:
             max_size: Maximum dimensions (width, height) for thumbnail
-            quality: JPEG quality for output (1-100)
+            quality: Encoder quality for output (1-100)
+            output_format: Output format key (jpeg, webp, avif)
+            encoder_options: Extra Pillow save() options, overriding the defaults
         """
         self.max_size = max_size
         self.quality = quality
+        self.budget_timeout = settings.RAW_BUDGET_WAIT_SECONDS
+        self.output_format = output_format if output_format in PREVIEW_FORMATS else 'jpeg'
+        self.encoder_options = {'quality': quality, **(encoder_options or {})}
+        if self.output_format == 'jpeg':
+            self.encoder_options.setdefault('optimize', True)
+            self.encoder_options.setdefault('progressive', True)
+
+    @property
+    def mime_type(self) -> str:
+        """MIME type of generated thumbnails"""
+        return PREVIEW_FORMATS[self.output_format][1]
+
+    @property
+    def extension(self) -> str:
+        """File extension of generated thumbnails"""
+        return PREVIEW_FORMATS[self.output_format][2]
 
     def generate_thumbnail(
         self,
@@ -40,6 +220,9 @@ class ThumbnailGenerator:
 
         Returns:
             Tuple of (thumbnail_bytes, mime_type) or None if generation failed
+
+        Raises:
+            MemoryBudgetExceeded: If a RAW decode was refused by the memory budget
         """
         try:
             # Handle DNG files specially
@@ -54,10 +237,21 @@ class ThumbnailGenerator:
                 logger.warning(f"Unsupported content type for thumbnail: {content_type}")
                 return None
 
+        except MemoryBudgetExceeded:
+            raise
         except Exception as e:
             logger.error(f"Error generating thumbnail: {e}", exc_info=True)
             return None
 
+    def generate_from_image(self, image: Image.Image) -> Optional[tuple[bytes, str]]:
+        """
+        Generate thumbnail from an already decoded image
+
+        The source image is left untouched, so one decode can feed several
+        tiers and formats.
+        """
+        return self._process_pil_image(image.copy())
+
     def _is_dng_file(self, content_type: str, filename: str) -> bool:
         """Check if file is a DNG file"""
         dng_mime_types = ['image/x-adobe-dng', 'image/dng', 'image/x-dng']
@@ -71,89 +265,76 @@ class ThumbnailGenerator:
         """
         Generate thumbnail from DNG file
 
-        DNG files contain embedded JPEG preview which we can extract
-        """
-        try:
-            # Read file data into memory (MinIO streams may not support seek)
-            file_bytes = file_data.read()
-            # Don't try to seek on original stream - it may not support it
+        DNG files contain embedded JPEG preview which we can extract.
+        The stream is spilled to a local file (LibRaw reads it directly, no
+        in-memory copy) and decoding runs under the shared RAW memory budget.
 
-            # Try to extract embedded thumbnail first (fast method)
+        Raises:
+            MemoryBudgetExceeded: If the decode can't get its memory reservation
+        """
+        with spill_to_file(file_data) as raw_path:
             try:
-                with rawpy.imread(io.BytesIO(file_bytes)) as raw:
-                    # Try to extract the embedded JPEG preview
-                    try:
-                        # Get the largest embedded thumbnail
-                        thumb = raw.extract_thumb()
-                        if thumb.format == rawpy.ThumbFormat.JPEG:
-                            # Resize if needed
-                            thumb_image = Image.open(io.BytesIO(thumb.data))
-                            thumb_image.thumbnail(self.max_size, Image.Resampling.LANCZOS)
-
-                            # Convert to RGB if necessary
-                            if thumb_image.mode in ('RGBA', 'LA', 'P'):
-                                background = Image.new('RGB', thumb_image.size, (255, 255, 255))
-                                if thumb_image.mode == 'P':
-                                    thumb_image = thumb_image.convert('RGBA')
-                                background.paste(thumb_image, mask=thumb_image.split()[-1] if 'A' in thumb_image.mode else None)
-                                thumb_image = background
-                            elif thumb_image.mode != 'RGB':
-                                thumb_image = thumb_image.convert('RGB')
-
-                            # Save to bytes
-                            output = io.BytesIO()
-                            thumb_image.save(output, format='JPEG', quality=self.quality, optimize=True)
-                            output.seek(0)
-
-                            logger.info("Generated thumbnail from DNG embedded preview")
-                            return output.read(), 'image/jpeg'
-                    except (rawpy.LibRawNoThumbnailError, rawpy.LibRawUnsupportedThumbnailError):
-                        logger.info("No embedded thumbnail, processing RAW data")
+                with rawpy.imread(raw_path) as raw:
+                    # Try to extract the embedded JPEG preview first (fast method)
+                    with raw_memory_budget.reserve(self._estimate_preview_bytes(raw), self.budget_timeout):
+                        try:
+                            # Get the largest embedded thumbnail
+                            thumb = raw.extract_thumb()
+                            if thumb.format == rawpy.ThumbFormat.JPEG:
+                                thumb_image = Image.open(io.BytesIO(thumb.data))
+                                # Decode at reduced scale, the preview is only resized down
+                                thumb_image.draft('RGB', self.max_size)
+                                del thumb
+
+                                logger.info("Generated thumbnail from DNG embedded preview")
+                                return self._process_pil_image(thumb_image)
+                        except (rawpy.LibRawNoThumbnailError, rawpy.LibRawUnsupportedThumbnailError):
+                            logger.info("No embedded thumbnail, processing RAW data")
 
                     # If no embedded thumbnail, process the RAW data (slower)
-                    rgb = raw.postprocess(
-                        use_camera_wb=True,
-                        half_size=True,  # Use half-size for faster processing
-                        no_auto_bright=True,
-                        output_bps=8
-                    )
-
-                    # Convert to PIL Image
-                    image = Image.fromarray(rgb)
-                    image.thumbnail(self.max_size, Image.Resampling.LANCZOS)
-
-                    # Convert to RGB if necessary
-                    if image.mode != 'RGB':
-                        image = image.convert('RGB')
-
-                    # Save to bytes
-                    output = io.BytesIO()
-                    image.save(output, format='JPEG', quality=self.quality, optimize=True)
-                    output.seek(0)
-
-                    logger.info("Generated thumbnail from DNG RAW data")
-                    return output.read(), 'image/jpeg'
-
+                    with raw_memory_budget.reserve(estimate_postprocess_bytes(raw, half_size=True), self.budget_timeout):
+                        rgb = raw.postprocess(
+                            use_camera_wb=True,
+                            half_size=True,  # Use half-size for faster processing
+                            no_auto_bright=True,
+                            output_bps=8
+                        )
+
+                        # Convert to PIL Image
+                        image = Image.fromarray(rgb)
+                        del rgb
+
+                        logger.info("Generated thumbnail from DNG RAW data")
+                        return self._process_pil_image(image)
+
+            except MemoryBudgetExceeded:
+                raise
             except Exception as e:
                 logger.error(f"Error processing DNG with rawpy: {e}", exc_info=True)
 
                 # Fallback: try with PIL (may work for some DNG files)
                 try:
-                    image = Image.open(io.BytesIO(file_bytes))
-                    return self._process_pil_image(image)
+                    with Image.open(raw_path) as image:
+                        image.draft('RGB', self.max_size)
+                        return self._process_pil_image(image)
                 except Exception as pil_error:
                     logger.error(f"PIL fallback also failed: {pil_error}")
                     return None
 
-        except Exception as e:
-            logger.error(f"Error generating DNG thumbnail: {e}", exc_info=True)
-            return None
+    def _estimate_preview_bytes(self, raw) -> int:
+        """Peak memory of the embedded-preview path: compressed JPEG plus draft-decoded image"""
+        return estimate_embedded_preview_bytes(raw, self.max_size)
 
     def _generate_standard_thumbnail(self, file_data: BinaryIO) -> Optional[tuple[bytes, str]]:
         """Generate thumbnail from standard image formats (JPEG, PNG, TIFF)"""
         try:
             # Open image with PIL
             image = Image.open(file_data)
+
+            # JPEG can decode at a reduced scale (1/2, 1/4, 1/8) directly
+            if image.format == 'JPEG':
+                image.draft('RGB', self.max_size)
+
             return self._process_pil_image(image)
 
         except Exception as e:
@@ -176,28 +357,42 @@ class ThumbnailGenerator:
             elif image.mode != 'RGB':
                 image = image.convert('RGB')
 
-            # Save to bytes
-            output = io.BytesIO()
-            image.save(output, format='JPEG', quality=self.quality, optimize=True)
-            output.seek(0)
-
-            return output.read(), 'image/jpeg'
+            return self._encode(image)
 
         except Exception as e:
             logger.error(f"Error processing PIL image: {e}", exc_info=True)
             return None
 
-
-# Singleton instance
-_thumbnail_generator = None
-
-
-def get_thumbnail_generator() -> ThumbnailGenerator:
-    """Get thumbnail generator singleton instance"""
-    global _thumbnail_generator
-    if _thumbnail_generator is None:
-        _thumbnail_generator = ThumbnailGenerator(
-            max_size=(1200, 1200),  # Good quality for preview
-            quality=85
+    def _encode(self, image: Image.Image) -> tuple[bytes, str]:
+        """Encode an RGB image in the configured output format"""
+        output = io.BytesIO()
+        image.save(output, format=PREVIEW_FORMATS[self.output_format][0], **self.encoder_options)
+        return output.getvalue(), self.mime_type
+
+
+# Singleton instances, one per (tier, format)
+_thumbnail_generators: Dict[tuple, ThumbnailGenerator] = {}
+
+
+def get_thumbnail_generator(tier: str = DEFAULT_TIER, output_format: str = 'jpeg') -> ThumbnailGenerator:
+    """
+    Get thumbnail generator singleton instance for a preview tier and format
+
+    Args:
+        tier: Preview tier from PREVIEW_TIERS ('grid' or 'viewer')
+        output_format: Output format key from PREVIEW_FORMATS
+    """
+    tier = tier if tier in PREVIEW_TIERS else DEFAULT_TIER
+    output_format = output_format if is_format_supported(output_format) else 'jpeg'
+
+    key = (tier, output_format)
+    if key not in _thumbnail_generators:
+        tier_settings = PREVIEW_TIERS[tier]
+        encoder_options = dict(tier_settings[output_format])
+        _thumbnail_generators[key] = ThumbnailGenerator(
+            max_size=tier_settings['max_size'],
+            quality=encoder_options.pop('quality'),
+            output_format=output_format,
+            encoder_options=encoder_options
         )
-    return _thumbnail_generator
+    return _thumbnail_generators[key]
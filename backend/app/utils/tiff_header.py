@@ -0,0 +1,413 @@
+"""
+Single-pass TIFF/EXIF/DNG and JPEG header parser
+
+Reads the header region of an image through one buffered reader and walks the
+structures needed for technical metadata without decoding any pixels:
+
+- TIFF/DNG: the IFD chain (IFD0, IFD1, ...) plus the EXIF, GPS,
+  Interoperability and DNG SubIFD sub-directories
+- JPEG: the marker segments up to the first scan (SOF, APP0 JFIF,
+  APP1 Exif, APP2 ICC profile)
+
+IFD and tag names follow exifread ("Image Model", "EXIF DateTimeOriginal",
+"GPS GPSLatitude", ...) so raw_metadata keys stay stable across extractors.
+
+Vendor MakerNotes are not decoded: the parser only records that the EXIF
+IFD has one (ParsedHeader.has_maker_note) so callers can hand the file to
+exifread for the "MakerNote ..." tags.
+
+Passing a tag filter turns the walk into a fast profile: only IFD0 and the
+sub-directories the filter points into are visited, values of other tags
+are never read, and JPEG parsing stops at the frame header.
+"""
+import logging
+import struct
+from typing import AbstractSet, Any, BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+from exifread.tags import EXIF_TAGS
+from exifread.tags.exif import GPS_TAGS, INTEROP_TAGS
+
+logger = logging.getLogger(__name__)
+
+# Initial read; covers the IFDs of virtually all scanner and camera output
+HEADER_READ_SIZE = 256 * 1024
+# Minimum size of follow-up reads when an offset points past what was read
+EXTRA_READ_SIZE = 64 * 1024
+
+# Arrays this long (strip offsets, tile tables, ...) are skipped, like exifread does
+MAX_TAG_VALUES = 1000
+# Guards against IFD loops and corrupt chains
+MAX_IFDS = 64
+
+# TIFF field type -> (struct code, size in bytes)
+FIELD_TYPES = {
+    1: ('B', 1),   # BYTE
+    2: ('s', 1),   # ASCII
+    3: ('H', 2),   # SHORT
+    4: ('I', 4),   # LONG
+    5: ('I', 8),   # RATIONAL (two LONGs)
+    6: ('b', 1),   # SBYTE
+    7: ('B', 1),   # UNDEFINED
+    8: ('h', 2),   # SSHORT
+    9: ('i', 4),   # SLONG
+    10: ('i', 8),  # SRATIONAL (two SLONGs)
+    11: ('f', 4),  # FLOAT
+    12: ('d', 8),  # DOUBLE
+    13: ('I', 4),  # IFD
+}
+ASCII = 2
+RATIONAL_TYPES = (5, 10)
+
+TAG_NEW_SUBFILE_TYPE = 0x00FE
+TAG_SUB_IFDS = 0x014A
+TAG_EXIF_IFD = 0x8769
+TAG_GPS_IFD = 0x8825
+TAG_INTEROP_IFD = 0xA005
+TAG_ICC_PROFILE = 0x8773
+TAG_DNG_VERSION = 0xC612
+TAG_MAKER_NOTE = 0x927C
+
+# Sub-directory pointers: tag -> (IFD name, tag table)
+SUB_IFD_POINTERS = {
+    TAG_EXIF_IFD: ('EXIF', EXIF_TAGS),
+    TAG_GPS_IFD: ('GPS', GPS_TAGS),
+    TAG_INTEROP_IFD: ('Interoperability', INTEROP_TAGS),
+}
+
+# JPEG start-of-frame markers (all except DHT, JPG and DAC share the 0xC0-0xCF range)
+JPEG_SOF_MARKERS = set(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+
+class HeaderFormatError(ValueError):
+    """Raised when the data is not a TIFF or JPEG stream this parser understands"""
+
+
+class HeaderReader:
+    """
+    Random access over the start of a file with a single initial read
+
+    Offsets inside the first HEADER_READ_SIZE bytes are served from memory;
+    anything further (IFDs written at the end of a TIFF, large ICC profiles)
+    costs one extra seek+read on the same handle and is cached.
+    """
+
+    def __init__(self, file_obj: BinaryIO, initial_size: int = HEADER_READ_SIZE):
+        self._file = file_obj
+        self._file.seek(0)
+        self._head = self._file.read(initial_size)
+        self._chunks: List[Tuple[int, bytes]] = []
+        self.reads = 1
+
+    @property
+    def head(self) -> bytes:
+        return self._head
+
+    def read(self, offset: int, size: int) -> bytes:
+        """Return up to size bytes at offset (shorter at end of file)"""
+        end = offset + size
+        if end <= len(self._head):
+            return self._head[offset:end]
+        for start, chunk in self._chunks:
+            if start <= offset and end <= start + len(chunk):
+                return chunk[offset - start:end - start]
+
+        self._file.seek(offset)
+        chunk = self._file.read(max(size, EXTRA_READ_SIZE))
+        self._chunks.append((offset, chunk))
+        self.reads += 1
+        return chunk[:size]
+
+
+class ParsedHeader:
+    """Result of one header parse"""
+
+    def __init__(self, image_format: str):
+        self.format = image_format
+        self.byte_order: Optional[str] = None
+        # IFD name -> {tag: (field type, values)} in walk order
+        self.ifds: Dict[str, Dict[int, Tuple[int, Any]]] = {}
+        self._tag_tables: Dict[str, Dict] = {}
+        self.icc_profile: Optional[bytes] = None
+        # The EXIF IFD carries a vendor MakerNote (left undecoded)
+        self.has_maker_note = False
+        # JPEG frame and JFIF data
+        self.frame: Dict[str, int] = {}
+        self.jfif: Dict[str, int] = {}
+
+    @property
+    def is_dng(self) -> bool:
+        return TAG_DNG_VERSION in self.ifds.get('Image', {})
+
+    def get(self, ifd_name: str, tag: int, default: Any = None) -> Any:
+        """Values of a tag (string for ASCII, list otherwise)"""
+        entry = self.ifds.get(ifd_name, {}).get(tag)
+        return entry[1] if entry else default
+
+    def first(self, ifd_name: str, tag: int, default: Any = None) -> Any:
+        """First value of a numeric tag"""
+        values = self.get(ifd_name, tag)
+        if isinstance(values, list) and values:
+            return values[0]
+        return default
+
+    def tags(self) -> Iterator[Tuple[str, int, Any]]:
+        """Yield (exifread-style key, field type, values) for every parsed tag"""
+        for ifd_name, entries in self.ifds.items():
+            tag_table = self._tag_tables.get(ifd_name, EXIF_TAGS)
+            for tag, (field_type, values) in entries.items():
+                tag_entry = tag_table.get(tag)
+                tag_name = tag_entry[0] if tag_entry else 'Tag 0x%04X' % tag
+                yield f"{ifd_name} {tag_name}", field_type, values
+
+
+def parse_header(file_obj: BinaryIO, tag_filter: Optional[AbstractSet[int]] = None) -> ParsedHeader:
+    """
+    Parse the TIFF/DNG IFD tree or JPEG segments of an open file
+
+    Args:
+        file_obj: Seekable binary file object (position is not preserved)
+        tag_filter: Only keep these tags and skip unrelated IFDs (None = full walk)
+
+    Returns:
+        ParsedHeader
+
+    Raises:
+        HeaderFormatError: If the data is neither TIFF nor JPEG
+    """
+    reader = HeaderReader(file_obj)
+    head = reader.head
+    if head[:4] in (b'II*\x00', b'MM\x00*'):
+        header = ParsedHeader('TIFF')
+        _TiffParser(reader, 0, header, tag_filter).parse()
+    elif head[:2] == b'\xff\xd8':
+        header = ParsedHeader('JPEG')
+        _parse_jpeg(reader, header, tag_filter)
+    else:
+        raise HeaderFormatError("not a TIFF or JPEG stream")
+
+    logger.debug(f"Parsed {header.format} header with {reader.reads} read(s)")
+    return header
+
+
+class _TiffParser:
+    """Walk the IFD tree of a TIFF stream starting at base (non-zero inside JPEG APP1)"""
+
+    def __init__(
+        self,
+        reader: HeaderReader,
+        base: int,
+        header: ParsedHeader,
+        tag_filter: Optional[AbstractSet[int]] = None
+    ):
+        self.reader = reader
+        self.base = base
+        self.header = header
+        self.tag_filter = tag_filter
+        self.endian = '<'
+        self._visited = set()
+
+    def _unpack(self, fmt: str, offset: int) -> Tuple:
+        size = struct.calcsize(self.endian + fmt)
+        data = self.reader.read(self.base + offset, size)
+        if len(data) < size:
+            raise HeaderFormatError(f"truncated TIFF structure at offset {offset}")
+        return struct.unpack(self.endian + fmt, data)
+
+    def parse(self):
+        byte_order = self.reader.read(self.base, 2)
+        if byte_order == b'II':
+            self.endian, self.header.byte_order = '<', 'little endian'
+        elif byte_order == b'MM':
+            self.endian, self.header.byte_order = '>', 'big endian'
+        else:
+            raise HeaderFormatError("invalid TIFF byte order")
+        if self._unpack('H', 2)[0] != 42:
+            raise HeaderFormatError("unsupported TIFF version (BigTIFF?)")
+
+        # IFD chain, named like exifread: Image, Thumbnail, IFD 2, IFD 3, ...
+        # (the fast profile stops after IFD0, where all MIX tags live)
+        offset = self._unpack('I', 4)[0]
+        index = 0
+        max_ifds = 1 if self.tag_filter is not None else MAX_IFDS
+        while offset and index < max_ifds:
+            name = 'Image' if index == 0 else 'Thumbnail' if index == 1 else f'IFD {index}'
+            offset = self._read_ifd(offset, name, EXIF_TAGS)
+            index += 1
+
+        image = self.header.ifds.get('Image', {})
+        if TAG_EXIF_IFD in image:
+            self._read_sub_ifd(image[TAG_EXIF_IFD][1], TAG_EXIF_IFD)
+
+        # DNG keeps the full-resolution raw image in a SubIFD of IFD0
+        for position, sub_offset in enumerate(self.header.get('Image', TAG_SUB_IFDS) or []):
+            self._read_ifd(sub_offset, f'SubIFD {position}', EXIF_TAGS)
+
+    def _read_sub_ifd(self, values: Any, pointer_tag: int):
+        if isinstance(values, list) and values:
+            name, tag_table = SUB_IFD_POINTERS[pointer_tag]
+            self._read_ifd(values[0], name, tag_table)
+
+    def _read_ifd(self, offset: int, name: str, tag_table: Dict) -> int:
+        """Parse one IFD and return the offset of the next one in the chain (0 at the end)"""
+        if offset in self._visited or len(self._visited) >= MAX_IFDS:
+            return 0
+        self._visited.add(offset)
+
+        try:
+            count = self._unpack('H', offset)[0]
+            table = self.reader.read(self.base + offset + 2, count * 12 + 4)
+        except HeaderFormatError as e:
+            logger.debug(f"Skipping {name} IFD: {e}")
+            return 0
+        if len(table) < count * 12:
+            logger.debug(f"Skipping truncated {name} IFD")
+            return 0
+
+        entries = self.header.ifds.setdefault(name, {})
+        self.header._tag_tables[name] = tag_table
+        sub_ifds = []
+        for position in range(count):
+            tag, field_type, value_count, value_field = struct.unpack(
+                self.endian + 'HHI4s', table[position * 12:position * 12 + 12]
+            )
+            if field_type not in FIELD_TYPES:
+                continue
+
+            if tag == TAG_MAKER_NOTE and name == 'EXIF':
+                self.header.has_maker_note = True
+            if tag == TAG_ICC_PROFILE and name == 'Image':
+                self.header.icc_profile = self._read_bytes(value_count, value_field)
+                continue
+            if self.tag_filter is not None and tag not in self.tag_filter:
+                continue
+            if value_count >= MAX_TAG_VALUES and field_type != ASCII:
+                continue
+
+            values = self._read_values(field_type, value_count, value_field)
+            if values is None:
+                continue
+            entries[tag] = (field_type, values)
+            if tag in (TAG_GPS_IFD, TAG_INTEROP_IFD):
+                sub_ifds.append((tag, values))
+
+        for tag, values in sub_ifds:
+            self._read_sub_ifd(values, tag)
+
+        if len(table) < count * 12 + 4:
+            return 0
+        return struct.unpack(self.endian + 'I', table[count * 12:count * 12 + 4])[0]
+
+    def _read_bytes(self, value_count: int, value_field: bytes) -> bytes:
+        if value_count <= 4:
+            return value_field[:value_count]
+        offset = struct.unpack(self.endian + 'I', value_field)[0]
+        return self.reader.read(self.base + offset, value_count)
+
+    def _read_values(self, field_type: int, value_count: int, value_field: bytes) -> Any:
+        code, size = FIELD_TYPES[field_type]
+        data = self._read_bytes(value_count * size, value_field)
+        if len(data) < value_count * size:
+            return None
+
+        if field_type == ASCII:
+            text = data.split(b'\x00', 1)[0]
+            try:
+                return text.decode('utf-8')
+            except UnicodeDecodeError:
+                return text.decode('latin-1')
+
+        if field_type in RATIONAL_TYPES:
+            numbers = struct.unpack(f"{self.endian}{value_count * 2}{code}", data)
+            return list(zip(numbers[0::2], numbers[1::2]))
+
+        return list(struct.unpack(f"{self.endian}{value_count}{code}", data))
+
+
+def _parse_jpeg(reader: HeaderReader, header: ParsedHeader, tag_filter: Optional[AbstractSet[int]] = None):
+    """Walk JPEG marker segments until the first scan (or the frame header for the fast profile)"""
+    icc_chunks: Dict[int, bytes] = {}
+    offset = 2
+    while True:
+        marker = reader.read(offset, 4)
+        if len(marker) < 2 or marker[0] != 0xFF:
+            break
+        code = marker[1]
+        if code == 0xFF:
+            # Fill byte before the real marker
+            offset += 1
+            continue
+        if code in (0x01, 0xD8) or 0xD0 <= code <= 0xD7:
+            offset += 2
+            continue
+        if code in (0xD9, 0xDA) or len(marker) < 4:
+            break
+
+        length = struct.unpack('>H', marker[2:4])[0]
+        payload_offset = offset + 4
+        offset += 2 + length
+
+        if code in JPEG_SOF_MARKERS:
+            frame = reader.read(payload_offset, 6)
+            if len(frame) == 6:
+                precision, height, width, components = struct.unpack('>BHHB', frame)
+                header.frame = {
+                    'precision': precision, 'height': height,
+                    'width': width, 'components': components
+                }
+            if tag_filter is not None:
+                break
+        elif code == 0xE0:
+            jfif = reader.read(payload_offset, 12)
+            if jfif[:5] == b'JFIF\x00' and len(jfif) == 12:
+                units, x_density, y_density = struct.unpack('>BHH', jfif[7:12])
+                header.jfif = {'units': units, 'x_density': x_density, 'y_density': y_density}
+        elif code == 0xE1:
+            if reader.read(payload_offset, 6) == b'Exif\x00\x00' and not header.ifds:
+                try:
+                    _TiffParser(reader, payload_offset + 6, header, tag_filter).parse()
+                except HeaderFormatError as e:
+                    logger.debug(f"Ignoring unreadable Exif segment: {e}")
+        elif code == 0xE2:
+            if reader.read(payload_offset, 12) == b'ICC_PROFILE\x00':
+                sequence = reader.read(payload_offset + 12, 1)
+                if sequence:
+                    icc_chunks[sequence[0]] = reader.read(payload_offset + 14, length - 16)
+
+    if icc_chunks:
+        header.icc_profile = b''.join(icc_chunks[index] for index in sorted(icc_chunks))
+
+
+def icc_profile_description(profile: Optional[bytes]) -> Optional[str]:
+    """
+    Read the description ('desc' tag) of an ICC profile
+
+    Args:
+        profile: Raw ICC profile bytes
+
+    Returns:
+        Profile description, or None if missing or unreadable
+    """
+    if not profile or len(profile) < 132:
+        return None
+    try:
+        tag_count = struct.unpack('>I', profile[128:132])[0]
+        for position in range(min(tag_count, 256)):
+            entry = 132 + position * 12
+            signature, offset, size = struct.unpack('>4sII', profile[entry:entry + 12])
+            if signature != b'desc':
+                continue
+            data = profile[offset:offset + size]
+            if data[:4] == b'desc':
+                # ICC v2 textDescriptionType: 7-bit ASCII with length prefix
+                length = struct.unpack('>I', data[8:12])[0]
+                text = data[12:12 + length].split(b'\x00', 1)[0].decode('latin-1')
+            elif data[:4] == b'mluc':
+                # ICC v4 multiLocalizedUnicodeType: use the first record
+                record_length, record_offset = struct.unpack('>II', data[20:28])
+                text = data[record_offset:record_offset + record_length].decode('utf-16-be')
+            else:
+                return None
+            return text.strip('\x00 ') or None
+    except (struct.error, UnicodeDecodeError) as e:
+        logger.debug(f"Could not read ICC profile description: {e}")
+    return None
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Backfill technical metadata (MIX fields + raw_metadata) for existing document files
+Run with: python backfill_metadata.py [--batch-size N] [--workers N] [--rate FILES_PER_S] [--force]
+          python backfill_metadata.py --resume JOB_ID
+          python backfill_metadata.py --status JOB_ID
+
+Progress is checkpointed after every batch; stop with Ctrl+C and continue
+later with --resume. Use --rate to keep load on MinIO/PostgreSQL bounded
+while the platform is in use.
+"""
+
+import argparse
+import os
+import sys
+import threading
+
+# Add the backend directory to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.core.database import SessionLocal, create_tables
+from app.models.job import Job
+from app.services.backfill import (
+    JOB_TYPE_METADATA_BACKFILL, JOB_RUNNING, can_resume, create_backfill_job, run_backfill_job
+)
+
+
+def print_job(job):
+    print(f"Job {job.id} [{job.status}] {job.processed}/{job.total if job.total is not None else '?'} processed, "
+          f"{job.succeeded} succeeded, {job.failed} failed, checkpoint {job.checkpoint}")
+    if job.error:
+        print(f"  error: {job.error}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backfill technical metadata for existing document files")
+    parser.add_argument("--batch-size", type=int, help="Rows per batch and checkpoint")
+    parser.add_argument("--workers", type=int, help="Parallel extractions per batch")
+    parser.add_argument("--rate", type=float, help="Max files per second (0 = unlimited)")
+    parser.add_argument("--owner-id", type=int, help="Only documents of this user")
+    parser.add_argument("--force", action="store_true", help="Re-extract every image, not only missing metadata")
+    parser.add_argument("--resume", type=int, metavar="JOB_ID", help="Continue a job from its checkpoint")
+    parser.add_argument("--status", type=int, metavar="JOB_ID", help="Show job progress and exit")
+    args = parser.parse_args()
+
+    create_tables()
+    db = SessionLocal()
+    try:
+        if args.status or args.resume:
+            job = db.query(Job).filter(
+                Job.id == (args.status or args.resume),
+                Job.job_type == JOB_TYPE_METADATA_BACKFILL
+            ).first()
+            if not job:
+                print("Job not found")
+                sys.exit(1)
+            if args.status:
+                print_job(job)
+                return
+            # A job left "running" by a killed process can be resumed once it is stale
+            if not can_resume(job):
+                if job.status == JOB_RUNNING:
+                    print(f"Job {job.id} is still running (last progress {job.updated_at}); "
+                          f"it can be resumed after JOB_STALE_AFTER_SECONDS without progress")
+                else:
+                    print(f"Job {job.id} is {job.status} and cannot be resumed")
+                sys.exit(1)
+        else:
+            job = create_backfill_job(
+                db,
+                owner_id=args.owner_id,
+                batch_size=args.batch_size,
+                workers=args.workers,
+                max_files_per_second=args.rate,
+                force=args.force
+            )
+            print(f"Created metadata backfill job {job.id} with {job.params}")
+        job_id = job.id
+    finally:
+        db.close()
+
+    stop = threading.Event()
+    try:
+        job = run_backfill_job(job_id, stop.is_set)
+    except KeyboardInterrupt:
+        # Interrupt during a batch: the last committed checkpoint is kept
+        print(f"\nInterrupted; continue with: python backfill_metadata.py --resume {job_id}")
+        sys.exit(130)
+    if job:
+        print_job(job)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Benchmark technical metadata extraction: files/s per format, single-parse vs multi-pass
+Run with: python benchmarks/bench_metadata.py [image files or directories ...]
+
+"multi-pass" reproduces the previous extractor (exifread with details=True,
+then PIL, then rawpy for DNGs, each opening the file again); "single-parse"
+is ImageMetadataExtractor with the full profile and "mix" the fast
+upload-time profile. Defaults to the sample images in test_images/; pass
+real scans (TIFF/DNG masters) for representative numbers.
+"""
+
+import os
+import sys
+import time
+
+# Add the backend directory to the path
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from app.utils.image_metadata import PROFILE_MIX, ImageMetadataExtractor
+
+REPO_DIR = os.path.dirname(BACKEND_DIR)
+DEFAULT_SOURCES = [os.path.join(REPO_DIR, 'test_images')]
+FORMAT_GROUPS = {
+    'TIFF': ('.tif', '.tiff'),
+    'JPEG': ('.jpg', '.jpeg'),
+    'DNG': ('.dng',),
+}
+MIN_SECONDS = 1.0
+
+
+def collect_images(sources):
+    """Expand files and directories into a sorted list of image paths"""
+    extensions = tuple(ext for group in FORMAT_GROUPS.values() for ext in group)
+    images = []
+    for source in sources:
+        if os.path.isdir(source):
+            for root, _, files in os.walk(source):
+                images.extend(
+                    os.path.join(root, name) for name in files
+                    if name.lower().endswith(extensions)
+                )
+        elif os.path.isfile(source):
+            images.append(source)
+    return sorted(images)
+
+
+def multi_pass_extract(path):
+    """Open and parse the file once per library, like the previous extractor"""
+    import exifread
+    from PIL import Image
+
+    with open(path, 'rb') as f:
+        exifread.process_file(f, details=True)
+    with Image.open(path) as img:
+        img.getexif()
+    if path.lower().endswith('.dng'):
+        import rawpy
+        # LibRaw parses the header (sizes, metadata) when the file is opened
+        rawpy.imread(path).close()
+
+
+def files_per_second(extract, paths):
+    """Repeat extraction over paths for at least MIN_SECONDS"""
+    count = 0
+    start = time.perf_counter()
+    while True:
+        for path in paths:
+            extract(path)
+        count += len(paths)
+        elapsed = time.perf_counter() - start
+        if elapsed >= MIN_SECONDS:
+            return count / elapsed
+
+
+def main():
+    images = collect_images(sys.argv[1:] or DEFAULT_SOURCES)
+    if not images:
+        print("No images found")
+        sys.exit(1)
+
+    extractor = ImageMetadataExtractor()
+    print(f"{'format':<6} {'files':>6} {'multi-pass/s':>13} {'single-parse/s':>15} {'speedup':>8} {'mix/s':>8}")
+
+    for group, extensions in FORMAT_GROUPS.items():
+        paths = [path for path in images if path.lower().endswith(extensions)]
+        if not paths:
+            print(f"{group:<6} {0:>6} {'(no samples)':>13}")
+            continue
+
+        try:
+            baseline = files_per_second(multi_pass_extract, paths)
+        except Exception as e:
+            print(f"{group:<6} {len(paths):>6} {'(failed: ' + type(e).__name__ + ')':>13}")
+            baseline = None
+        single = files_per_second(extractor.extract_metadata, paths)
+        mix = files_per_second(lambda path: extractor.extract_metadata(path, PROFILE_MIX), paths)
+        speedup = f"{single / baseline:.1f}x" if baseline else '-'
+        baseline_text = f"{baseline:.0f}" if baseline else '-'
+        print(f"{group:<6} {len(paths):>6} {baseline_text:>13} {single:>15.0f} {speedup:>8} {mix:>8.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark METS generation: indented vs compact output for small to very large documents
+Run with: python benchmarks/bench_mets_generator.py [--sizes 10 1000 10000] [--min-seconds 1]
+
+Renders synthetic ECO-MiC documents (master, high and thumbnail versions of
+each page, full MIX metadata) from preloaded rows with render_mets_xml, as
+the batch export and the METS cache do, and with generate_mets_xml from
+document_files. Each case is repeated for at least --min-seconds.
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+from datetime import datetime
+from functools import partial
+from types import SimpleNamespace
+
+# Add the backend directory to the path
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from app.schemas.document import DocumentDetail
+from app.utils.mets_generator_ecomic import METSEcoMicGenerator, render_mets_xml
+
+CATEGORIES = ('master', 'export_high', 'export_low')
+
+
+def synthetic_rows(count: int):
+    """count file rows: one category per file, three files per page"""
+    return [
+        SimpleNamespace(
+            id=i, file_id=i, file_category=CATEGORIES[i % 3], sequence_number=i // 3 + 1,
+            file_label=f'Page {i // 3 + 1}', filename=f'page_{i:05d}.tif', file_size=48_000_000,
+            content_type='image/tiff', checksum_md5='0' * 32, image_width=6000, image_height=8000,
+            bits_per_sample='8,8,8', compression_scheme='Uncompressed', color_space='RGB',
+            x_sampling_frequency=400, y_sampling_frequency=400, sampling_frequency_unit='in.',
+            scanner_manufacturer='Phase One', scanner_model_name='iXH 150',
+            scanning_software_name='Capture One', scanning_software_version='16.0'
+        )
+        for i in range(count)
+    ]
+
+
+def synthetic_document(rows):
+    return DocumentDetail(
+        id=1, logical_id='BENCH-001', owner_id=1, title='Benchmark document',
+        description='Synthetic document for bench_mets_generator', archive_name='Archivio di Stato',
+        fund_name='Fondo', series_name='Serie', date_from='1850', date_to='1860',
+        rights_category='COPYRIGHTED', rights_holder='Archivio', license_url='https://creativecommons.org/',
+        created_at=datetime.now(), updated_at=datetime.now(),
+        document_files=[vars(row) for row in rows]
+    )
+
+
+def measure(function, min_seconds: float):
+    """Run function until min_seconds have passed; returns (timings in ms, last result)"""
+    timings = []
+    deadline = time.perf_counter() + min_seconds
+    while True:
+        start = time.perf_counter()
+        result = function()
+        timings.append((time.perf_counter() - start) * 1000)
+        if time.perf_counter() >= deadline and len(timings) >= 3:
+            return timings, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 1000, 10000], help='Files per document')
+    parser.add_argument('--min-seconds', type=float, default=1.0)
+    args = parser.parse_args()
+
+    generator = METSEcoMicGenerator()
+    print(f"{'files':>7} {'scenario':<24} {'runs':>5} {'median ms':>10} {'files/s':>10} {'KiB':>9}")
+    for count in args.sizes:
+        rows = synthetic_rows(count)
+        document = synthetic_document(rows)
+        cases = (
+            ('render_mets_xml', partial(render_mets_xml, document, rows)),
+            ('render_mets_xml compact', partial(render_mets_xml, document, rows, compact=True)),
+            ('generate_mets_xml', partial(generator.generate_mets_xml, document)),
+        )
+        for label, function in cases:
+            timings, result = measure(function, args.min_seconds)
+            median = statistics.median(timings)
+            print(f"{count:>7} {label:<24} {len(timings):>5} {median:>10.2f} "
+                  f"{count / median * 1000:>10.0f} {len(result) / 1024:>9.0f}")
+
+
+if __name__ == '__main__':
+    main()
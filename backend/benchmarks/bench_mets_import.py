@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Benchmark METS metadata import: full-tree parsing vs incremental parsing
+Run with: python benchmarks/bench_mets_import.py [--files 1000] [--pages 200] [--processes 4] [METS files ...]
+
+Parses generated ECO-MiC METS files (or the given ones) the way the previous
+importer did (whole file read, ET.fromstring, dmdSec extraction) and with
+MetadataParser.parse_xml_file, which stops after the descriptive sections,
+first in this process and then in a process pool as import_mets.py does.
+Peak memory is measured on the largest file with tracemalloc.
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+# Add the backend directory to the path
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from app.schemas.document import DocumentDetail
+from app.utils.metadata_parser import METS_NAMESPACES, MetadataParser
+from app.utils.mets_generator_ecomic import METSEcoMicGenerator
+
+
+def full_parse(path: str):
+    """Previous behaviour: read and build the whole tree"""
+    with open(path, 'r', encoding='utf-8') as f:
+        root = ET.fromstring(f.read())
+    return MetadataParser._parse_mets_xml(root, METS_NAMESPACES)
+
+
+def generate_files(directory: str, count: int, pages: int):
+    """Write count METS files of pages master images each; returns their paths"""
+    files = [
+        dict(
+            id=i, file_id=i, file_category='master', sequence_number=i, file_label=f'Page {i}',
+            filename=f'page_{i:04d}.tif', file_size=48_000_000, content_type='image/tiff',
+            checksum_md5='0' * 32, image_width=6000, image_height=8000, bits_per_sample='8,8,8',
+            color_space='RGB', x_sampling_frequency=400, y_sampling_frequency=400,
+            sampling_frequency_unit='in.'
+        )
+        for i in range(1, pages + 1)
+    ]
+    document = DocumentDetail(
+        id=1, logical_id='BENCH-000000', owner_id=1, title='Benchmark document',
+        description='Generated for bench_mets_import', archive_name='Archivio di Stato',
+        fund_name='Fondo', series_name='Serie', date_from='1850', date_to='1860',
+        created_at=datetime.now(), updated_at=datetime.now(), document_files=files
+    )
+    template = METSEcoMicGenerator().generate_mets_xml(document)
+    paths = []
+    for n in range(count):
+        path = os.path.join(directory, f'BENCH-{n:06d}_mets.xml')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(template.replace('BENCH-000000', f'BENCH-{n:06d}'))
+        paths.append(path)
+    return paths
+
+
+def report(label: str, paths, elapsed: float, total_bytes: int):
+    print(f"{label:<28} {len(paths) / elapsed:>10.0f} {total_bytes / elapsed / 1e6:>10.1f} {elapsed:>9.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--files', type=int, default=1000, help='Generated files')
+    parser.add_argument('--pages', type=int, default=200, help='Master images per generated file')
+    parser.add_argument('--processes', type=int, default=os.cpu_count() or 2)
+    parser.add_argument('paths', nargs='*', help='Existing METS files instead of generated ones')
+    args = parser.parse_args()
+
+    directory = None
+    if args.paths:
+        paths = args.paths
+    else:
+        directory = tempfile.mkdtemp(prefix='bench_mets_import_')
+        paths = generate_files(directory, args.files, args.pages)
+    try:
+        total_bytes = sum(os.path.getsize(path) for path in paths)
+        print(f"{len(paths)} METS files, {total_bytes / len(paths) / 1024:.0f} KiB on average\n")
+        print(f"{'scenario':<28} {'files/s':>10} {'MB/s':>10} {'seconds':>9}")
+
+        start = time.perf_counter()
+        expected = [full_parse(path) for path in paths]
+        report('full tree', paths, time.perf_counter() - start, total_bytes)
+
+        start = time.perf_counter()
+        results = [MetadataParser.parse_xml_file(path) for path in paths]
+        report('incremental', paths, time.perf_counter() - start, total_bytes)
+        if results != expected:
+            print("  warning: incremental results differ from the full-tree parse")
+
+        with ProcessPoolExecutor(max_workers=args.processes) as pool:
+            chunksize = max(1, len(paths) // (4 * args.processes))
+            start = time.perf_counter()
+            list(pool.map(MetadataParser.parse_xml_file, paths, chunksize=chunksize))
+            report(f'incremental, {args.processes} processes', paths, time.perf_counter() - start, total_bytes)
+
+        largest = max(paths, key=os.path.getsize)
+        print(f"\nPeak memory parsing {os.path.basename(largest)} ({os.path.getsize(largest) / 1e6:.1f} MB):")
+        for label, parse in (('full tree', full_parse), ('incremental', MetadataParser.parse_xml_file)):
+            tracemalloc.start()
+            parse(largest)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print(f"  {label:<14} {peak / 1e6:>8.2f} MB")
+    finally:
+        if directory:
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
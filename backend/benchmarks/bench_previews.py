@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Benchmark preview encoding: bytes per preview and encode time per tier/format
+Run with: python benchmarks/bench_previews.py [image files or directories ...]
+
+Defaults to the sample images in test_images/; pass real scans (TIFF/DNG masters)
+for representative numbers.
+"""
+
+import io
+import os
+import statistics
+import sys
+import time
+
+# Add the backend directory to the path
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from app.utils.thumbnail_generator import (
+    PREVIEW_FORMATS, PREVIEW_TIERS, get_thumbnail_generator, is_format_supported
+)
+
+REPO_DIR = os.path.dirname(BACKEND_DIR)
+DEFAULT_SOURCES = [os.path.join(REPO_DIR, 'test_images')]
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.tif', '.tiff', '.dng')
+CONTENT_TYPES = {
+    '.jpg': 'image/jpeg', '.jpeg': 'image/jpeg', '.png': 'image/png',
+    '.tif': 'image/tiff', '.tiff': 'image/tiff', '.dng': 'image/x-adobe-dng',
+}
+ROUNDS = 3
+
+
+def collect_images(sources):
+    """Expand files and directories into a sorted list of image paths"""
+    images = []
+    for source in sources:
+        if os.path.isdir(source):
+            for root, _, files in os.walk(source):
+                images.extend(
+                    os.path.join(root, name) for name in files
+                    if name.lower().endswith(IMAGE_EXTENSIONS)
+                )
+        elif os.path.isfile(source):
+            images.append(source)
+    return sorted(images)
+
+
+def main():
+    images = collect_images(sys.argv[1:] or DEFAULT_SOURCES)
+    if not images:
+        print("No images found")
+        sys.exit(1)
+
+    originals = []
+    for path in images:
+        with open(path, 'rb') as f:
+            ext = os.path.splitext(path)[1].lower()
+            originals.append((path, f.read(), CONTENT_TYPES.get(ext, 'application/octet-stream')))
+
+    total_original = sum(len(data) for _, data, _ in originals)
+    print(f"{len(originals)} images, {total_original / 1024:.0f} KiB total\n")
+    print(f"{'tier':<8} {'format':<6} {'avg bytes':>10} {'vs jpeg':>8} {'avg ms':>8} {'p95 ms':>8}")
+
+    for tier in PREVIEW_TIERS:
+        jpeg_avg = None
+        for output_format in ['jpeg', 'webp', 'avif']:
+            if not is_format_supported(output_format):
+                print(f"{tier:<8} {output_format:<6} {'(encoder not available)':>36}")
+                continue
+
+            generator = get_thumbnail_generator(tier, output_format)
+            sizes, timings = [], []
+            for path, data, content_type in originals:
+                for _ in range(ROUNDS):
+                    start = time.perf_counter()
+                    result = generator.generate_thumbnail(io.BytesIO(data), content_type, path)
+                    timings.append((time.perf_counter() - start) * 1000)
+                if result:
+                    sizes.append(len(result[0]))
+
+            if not sizes:
+                print(f"{tier:<8} {output_format:<6} {'(no previews generated)':>36}")
+                continue
+
+            avg_bytes = statistics.mean(sizes)
+            if output_format == 'jpeg':
+                jpeg_avg = avg_bytes
+            ratio = f"{avg_bytes / jpeg_avg:.0%}" if jpeg_avg else '-'
+            p95 = sorted(timings)[int(len(timings) * 0.95) - 1] if len(timings) > 1 else timings[0]
+            print(
+                f"{tier:<8} {output_format:<6} {avg_bytes:>10.0f} {ratio:>8} "
+                f"{statistics.mean(timings):>8.1f} {p95:>8.1f}"
+            )
+
+    print(f"\nFormats: {', '.join(f for f in PREVIEW_FORMATS if is_format_supported(f))}")
+
+
+if __name__ == '__main__':
+    main()
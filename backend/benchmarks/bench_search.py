@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Benchmark METS search: separate count + page aggregations vs $facet and total=none
+Run with: python benchmarks/bench_search.py [--documents 50000] [--runs 20] [--mongodb-url URL] [--keep]
+
+Fills a scratch database (default archivia_bench_search, dropped at the end
+unless --keep) with a synthetic corpus for one owner plus other owners, creates
+the application's indexes and times MongoDBService.search_documents with each
+total mode against the previous implementation, which ran the match pipeline
+once with $count and once more for the page. Needs a running MongoDB.
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+from functools import partial
+
+# Add the backend directory to the path
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from app.core.config import settings
+from app.services.mongodb import SEARCH_TOTAL_EXACT, SEARCH_TOTAL_NONE, MongoDBService
+
+OWNER_ID = 1
+WORDS = (
+    'lettera', 'contratto', 'mappa', 'registro', 'atto', 'notarile', 'catasto', 'fondo', 'comune',
+    'parrocchia', 'battesimi', 'matrimoni', 'sentenza', 'inventario', 'carteggio', 'fattura',
+    'podere', 'confini', 'privilegio', 'statuto', 'corporazione', 'mercanti', 'seta', 'porto'
+)
+ARCHIVES = ('Archivio di Stato di Firenze', 'Archivio di Stato di Bologna', 'Archivio Storico Comunale',
+            'Archivio Diocesano', 'Biblioteca Nazionale')
+
+
+def synthetic_documents(count: int, owners: int, seed: int = 7):
+    """count METS documents, a third of them for other owners"""
+    rng = random.Random(seed)
+    start = datetime(2020, 1, 1)
+    for n in range(count):
+        year = rng.randint(1400, 1900)
+        yield {
+            'logical_id': f'BENCH-{n:07d}',
+            'owner_id': OWNER_ID if n % 3 else rng.randint(2, owners + 1),
+            'schema_version': '1.1',
+            'title': ' '.join(rng.choice(WORDS) for _ in range(4)).capitalize(),
+            'description': ' '.join(rng.choice(WORDS) for _ in range(30)),
+            'archive': {'name': rng.choice(ARCHIVES), 'fund_name': f'Fondo {rng.randint(1, 40)}'},
+            'temporal': {'date_from': f'{year}-01-01', 'date_to': f'{year + rng.randint(0, 20)}-12-31'},
+            'physical': {'document_type': 'fascicolo', 'total_pages': rng.randint(1, 400)},
+            'subjects': [rng.choice(WORDS) for _ in range(3)],
+            'created_at': start + timedelta(seconds=n * 13),
+            'updated_at': start + timedelta(seconds=n * 13)
+        }
+
+
+async def legacy_search(collection, match_filter, text: bool, skip: int, limit: int):
+    """Previous behaviour: a $count aggregation, then the page aggregation"""
+    pipeline = [{'$match': match_filter}]
+    if text:
+        pipeline.append({'$addFields': {'search_score': {'$meta': 'textScore'}}})
+        pipeline.append({'$sort': {'search_score': -1}})
+    else:
+        pipeline.append({'$sort': {'created_at': -1}})
+    count = await collection.aggregate(pipeline + [{'$count': 'total'}]).to_list(1)
+    items = await collection.aggregate(pipeline + [{'$skip': skip}, {'$limit': limit}]).to_list(limit)
+    return items, count[0]['total'] if count else 0
+
+
+async def measure(function, runs: int):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        await function()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+async def run(args):
+    client = AsyncIOMotorClient(args.mongodb_url)
+    service = MongoDBService()
+    service.async_client = client
+    service.async_db = client[args.database]
+    collection = service.async_db.mets_documents
+    try:
+        if await collection.estimated_document_count() != args.documents:
+            await collection.drop()
+            batch = []
+            for document in synthetic_documents(args.documents, args.owners):
+                batch.append(document)
+                if len(batch) == 5000:
+                    await collection.insert_many(batch)
+                    batch = []
+            if batch:
+                await collection.insert_many(batch)
+        await service._create_indexes()
+
+        owned = await collection.count_documents({'owner_id': OWNER_ID})
+        print(f"{args.documents} METS documents, {owned} owned by the searching user\n")
+        print(f"{'search':<22} {'implementation':<22} {'median ms':>10} {'total':>8}")
+
+        searches = (
+            ('unfiltered', None, {}),
+            ('archive filter', None, {'archive': 'Firenze'}),
+            ('text', 'contratto notarile', {}),
+        )
+        for label, query, filters in searches:
+            match_filter = service._search_filter(OWNER_ID, query, filters)
+            _, legacy_total = await legacy_search(collection, match_filter, bool(query), 0, args.size)
+            cases = [('count + page (before)', partial(
+                legacy_search, collection, match_filter, bool(query), args.skip, args.size), legacy_total)]
+            for mode in (SEARCH_TOTAL_EXACT, SEARCH_TOTAL_NONE):
+                result = await service.search_documents(OWNER_ID, query, filters, 0, args.size, total=mode)
+                cases.append((f'total={mode}', partial(
+                    service.search_documents, OWNER_ID, query, filters, args.skip, args.size, total=mode
+                ), result['total']))
+            for name, function, total in cases:
+                median = await measure(function, args.runs)
+                print(f"{label:<22} {name:<22} {median:>10.2f} {total if total is not None else '-':>8}")
+    finally:
+        if not args.keep:
+            await client.drop_database(args.database)
+        client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--documents', type=int, default=50000)
+    parser.add_argument('--owners', type=int, default=5, help='Other owners sharing the collection')
+    parser.add_argument('--size', type=int, default=20, help='Page size')
+    parser.add_argument('--skip', type=int, default=0, help='Offset of the timed page')
+    parser.add_argument('--runs', type=int, default=20)
+    parser.add_argument('--mongodb-url', default=settings.MONGODB_URL)
+    parser.add_argument('--database', default='archivia_bench_search', help='Scratch database')
+    parser.add_argument('--keep', action='store_true', help='Keep the scratch database for the next run')
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == '__main__':
+    main()
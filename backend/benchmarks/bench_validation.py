@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Benchmark remote METS validation: per-call client vs pooled client, cache and coalescing
+Run with: python benchmarks/bench_validation.py [--latency-ms 50] [--calls 50]
+
+Starts benchmarks/mock_validation_server.py in-process and validates a
+generated ECO-MiC METS document against it:
+"per-call client" reproduces the previous behaviour (a new AsyncClient per
+validation), "pooled" reuses RemoteValidationClient's connections with the
+result cache disabled, "cached" repeats identical XML with the cache on and
+"coalesced" fires concurrent validations of one document (upstream requests
+are counted by the stand-in). The stand-in speaks plain HTTP on localhost, so
+TLS and DNS savings against the real API are larger than shown here.
+"""
+
+import argparse
+import asyncio
+import os
+import socket
+import statistics
+import sys
+import threading
+import time
+from datetime import datetime
+
+# Add the backend directory to the path
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+import httpx
+import uvicorn
+
+from app.core.config import settings
+from app.schemas.document import DocumentDetail
+from app.services.validation_client import RemoteValidationClient
+from app.utils.mets_generator_ecomic import METSEcoMicGenerator
+from app.utils.mets_local_validator import get_local_validator
+from benchmarks.mock_validation_server import API_PATH, create_app
+
+PAGES = 200
+
+
+def sample_mets(pages: int = PAGES) -> bytes:
+    """METS of a document with one master image per page"""
+    files = [
+        dict(
+            id=i, file_id=i, file_category='master', sequence_number=i, file_label=f'Page {i}',
+            filename=f'page_{i:04d}.tif', file_size=48_000_000, content_type='image/tiff',
+            checksum_md5='0' * 32, image_width=6000, image_height=8000, bits_per_sample='8,8,8',
+            color_space='RGB', x_sampling_frequency=400, y_sampling_frequency=400,
+            sampling_frequency_unit='in.'
+        )
+        for i in range(1, pages + 1)
+    ]
+    document = DocumentDetail(
+        id=1, logical_id='BENCH-001', owner_id=1, title='Benchmark document',
+        created_at=datetime.now(), updated_at=datetime.now(), document_files=files
+    )
+    return METSEcoMicGenerator().generate_mets_xml(document).encode('utf-8')
+
+
+def start_server(latency_ms: float):
+    """Run the stand-in API on a free local port; returns (server, url)"""
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+    app = create_app(latency_ms)
+    server = uvicorn.Server(uvicorn.Config(app, host='127.0.0.1', port=port, log_level='warning'))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return server, f"http://127.0.0.1:{port}"
+
+
+def report(label: str, timings):
+    p95 = sorted(timings)[int(len(timings) * 0.95) - 1] if len(timings) > 1 else timings[0]
+    print(f"{label:<18} {len(timings):>6} {statistics.mean(timings):>9.2f} {p95:>9.2f}")
+
+
+async def timed(coroutine_factory, calls: int):
+    timings = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        await coroutine_factory()
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+async def run(base_url: str, xml: bytes, calls: int, concurrency: int):
+    url = base_url + API_PATH
+
+    async def per_call_client():
+        async with httpx.AsyncClient(timeout=settings.METS_VALIDATION_TIMEOUT) as client:
+            await client.post(url, files={"files": ("mets.xml", xml, "application/xml")})
+
+    print(f"{'scenario':<18} {'calls':>6} {'avg ms':>9} {'p95 ms':>9}")
+    report('per-call client', await timed(per_call_client, calls))
+
+    settings.METS_VALIDATION_CACHE_TTL = 0
+    pooled = RemoteValidationClient(url)
+    await pooled.start()
+    report('pooled', await timed(lambda: pooled.validate(xml, "mets.xml"), calls))
+
+    settings.METS_VALIDATION_CACHE_TTL = 3600
+    report('cached', await timed(lambda: pooled.validate(xml, "mets.xml"), calls))
+
+    pooled.clear_cache()
+    async with httpx.AsyncClient() as stats_client:
+        before = (await stats_client.get(base_url + '/stats')).json()['requests']
+        start = time.perf_counter()
+        await asyncio.gather(*(pooled.validate(xml, "mets.xml") for _ in range(concurrency)))
+        elapsed = (time.perf_counter() - start) * 1000
+        upstream = (await stats_client.get(base_url + '/stats')).json()['requests'] - before
+    print(f"{'coalesced':<18} {concurrency:>6} {elapsed:>9.2f} {'':>9}  ({upstream} upstream request(s))")
+    await pooled.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--latency-ms', type=float, default=50, help='Stand-in processing delay')
+    parser.add_argument('--calls', type=int, default=50)
+    parser.add_argument('--concurrency', type=int, default=20)
+    args = parser.parse_args()
+
+    xml = sample_mets()
+    validator = get_local_validator()
+    local = []
+    for _ in range(args.calls):
+        start = time.perf_counter()
+        validator.validate(xml)
+        local.append((time.perf_counter() - start) * 1000)
+    print(f"METS document: {PAGES} pages, {len(xml) / 1024:.0f} KiB; stand-in latency {args.latency_ms:.0f} ms\n")
+
+    server, base_url = start_server(args.latency_ms)
+    try:
+        asyncio.run(run(base_url, xml, args.calls, args.concurrency))
+    finally:
+        server.should_exit = True
+    report('local (offline)', local)
+
+
+if __name__ == '__main__':
+    main()
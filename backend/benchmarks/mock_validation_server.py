@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the Cineca METS ECO-MiC validation API
+Run with: python benchmarks/mock_validation_server.py [--port 8099] [--latency-ms 150]
+
+Accepts the same multipart upload (field "files") on the same path and
+answers in the API's format: HTTP 200 for conforming METS, HTTP 412 with
+listaMessaggi otherwise. Conformance is decided by the offline validator.
+Point the backend at it with
+METS_VALIDATION_API_URL=http://127.0.0.1:8099/api/v1/checkmetsecomic/files
+GET /stats returns the number of validations served (to check caching and
+request coalescing).
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+
+# Add the backend directory to the path
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from fastapi import FastAPI, File, UploadFile
+from fastapi.responses import JSONResponse
+
+from app.utils.mets_local_validator import get_local_validator
+
+API_PATH = '/api/v1/checkmetsecomic/files'
+
+
+def create_app(latency_ms: float = 0) -> FastAPI:
+    """
+    Build the stand-in API
+
+    Args:
+        latency_ms: Artificial delay per validation, to mimic the remote service
+    """
+    app = FastAPI(title="Mock METS ECO-MiC validation API")
+    app.state.requests = 0
+
+    @app.post(API_PATH)
+    async def check_files(files: UploadFile = File(...)):
+        app.state.requests += 1
+        content = await files.read()
+        if latency_ms:
+            await asyncio.sleep(latency_ms / 1000)
+
+        result = get_local_validator().validate(content)
+        file_response = {'nomeFile': files.filename, 'esito': 'OK' if result['valid'] else 'KO'}
+        if result['valid']:
+            return {'filesResponse': [file_response]}
+
+        file_response['listaMessaggi'] = [
+            {
+                'idErrore': error['id'],
+                'tipologiaErrore': error['type'],
+                'descrizioneErrore': error['description'],
+                'tagCoinvolto': error['tag'],
+                'fileLocationDetail': error['location'],
+            }
+            for error in result['errors']
+        ]
+        return JSONResponse(status_code=412, content={'filesResponse': [file_response]})
+
+    @app.get('/stats')
+    async def stats():
+        return {'requests': app.state.requests}
+
+    return app
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Local stand-in for the METS validation API")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8099)
+    parser.add_argument('--latency-ms', type=float, default=0, help='Artificial delay per validation')
+    args = parser.parse_args()
+
+    print(f"Mock validation API on http://{args.host}:{args.port}{API_PATH}")
+    uvicorn.run(create_app(args.latency_ms), host=args.host, port=args.port, log_level='warning')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Vendor the optional METS XSDs (MODS 3.7, MIX 2.0, METSRights) for offline validation
+Run with: python fetch_mets_schemas.py [--dir PATH] [--force]
+
+Downloads the official Library of Congress schemas into app/resources/xsd
+(or --dir, e.g. METS_XSD_DIR), checks that each is a schema for the expected
+namespace and compiles the validator with them. Commit the files so that
+validation never needs the network.
+"""
+
+import argparse
+import os
+import sys
+
+# Add the backend directory to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import httpx
+from lxml import etree
+
+from app.utils.mets_local_validator import (
+    DEFAULT_XSD_DIR, SCHEMA_CATALOG, SCHEMA_SOURCES, LocalMETSValidator
+)
+
+XSD_NAMESPACE = 'http://www.w3.org/2001/XMLSchema'
+
+
+def fetch_schema(client: httpx.Client, url: str, namespace: str) -> bytes:
+    """Download a schema and check its root and targetNamespace"""
+    response = client.get(url)
+    response.raise_for_status()
+    root = etree.fromstring(response.content, etree.XMLParser(resolve_entities=False, no_network=True))
+    if root.tag != f"{{{XSD_NAMESPACE}}}schema" or root.get('targetNamespace') != namespace:
+        raise ValueError(f"{url} is not a schema for {namespace}")
+    return response.content
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Vendor the optional METS XSDs for offline validation")
+    parser.add_argument("--dir", default=DEFAULT_XSD_DIR, help="Target directory (default: bundled schemas)")
+    parser.add_argument("--force", action="store_true", help="Download schemas that are already present")
+    args = parser.parse_args()
+
+    namespaces = {filename: namespace for namespace, filename, _ in SCHEMA_CATALOG}
+    os.makedirs(args.dir, exist_ok=True)
+    with httpx.Client(follow_redirects=True, timeout=30.0) as client:
+        for filename, url in SCHEMA_SOURCES.items():
+            path = os.path.join(args.dir, filename)
+            if os.path.exists(path) and not args.force:
+                print(f"{filename}: already present")
+                continue
+            content = fetch_schema(client, url, namespaces[filename])
+            with open(path, 'wb') as f:
+                f.write(content)
+            print(f"{filename}: {len(content)} bytes from {url}")
+
+    validator = LocalMETSValidator(args.dir)
+    print(f"Compiled in {validator.compile_ms:.0f} ms: {', '.join(validator.namespaces)}")
+    if validator.skipped_namespaces:
+        print(f"Still missing: {', '.join(validator.skipped_namespaces)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
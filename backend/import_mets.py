@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Create documents from existing METS files
+Run with: python import_mets.py DIRECTORY --owner-id N [--recursive] [--batch-size N] [--processes N]
+
+Each *.xml file becomes a document whose logical_id is the file name
+(without extension and "_mets" suffix) and whose METS metadata is read from
+the file's header and dmdSec. Files whose logical_id already exists are
+skipped, so an interrupted import can simply be run again.
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+# Add the backend directory to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.core.database import SessionLocal, create_tables
+from app.models.user import User
+from app.services.mets_import import METSImporter, find_mets_files
+from app.services.mongodb import mongodb_service
+
+
+async def run_import(args, paths):
+    await mongodb_service.connect_async()
+    db = SessionLocal()
+    start = time.perf_counter()
+
+    def progress(result):
+        done = result['imported'] + result['skipped'] + result['failed']
+        elapsed = time.perf_counter() - start
+        print(f"{done}/{len(paths)} files, {result['imported']} imported, {result['skipped']} skipped, "
+              f"{result['failed']} failed ({done / elapsed:.0f} files/s)")
+
+    try:
+        if not db.query(User).filter(User.id == args.owner_id).first():
+            print(f"User {args.owner_id} not found")
+            sys.exit(1)
+        importer = METSImporter(db, args.owner_id, batch_size=args.batch_size, processes=args.processes)
+        return await importer.run(paths, progress)
+    finally:
+        db.close()
+        await mongodb_service.close_async()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Create documents from existing METS files")
+    parser.add_argument("directory", help="Directory containing the METS files")
+    parser.add_argument("--owner-id", type=int, required=True, help="User that will own the documents")
+    parser.add_argument("--recursive", action="store_true", help="Also import files in subdirectories")
+    parser.add_argument("--batch-size", type=int, help="Documents created per batch")
+    parser.add_argument("--processes", type=int, help="Parsing processes (0 = parse in this process)")
+    args = parser.parse_args()
+
+    paths = find_mets_files(args.directory, args.recursive)
+    if not paths:
+        print(f"No XML files in {args.directory}")
+        return
+    print(f"Importing {len(paths)} METS files from {args.directory}")
+
+    create_tables()
+    try:
+        result = asyncio.run(run_import(args, paths))
+    except KeyboardInterrupt:
+        # Committed batches are kept; already imported files are skipped on the next run
+        print("\nInterrupted; run the same command again to import the remaining files")
+        sys.exit(130)
+
+    for error in result['errors']:
+        print(f"  {error}")
+    print(f"Done: {result['imported']} imported, {result['skipped']} skipped, {result['failed']} failed")
+
+
+if __name__ == "__main__":
+    main()
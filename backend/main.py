@@ -1,12 +1,20 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.concurrency import run_in_threadpool
 from app.core.config import settings
 from app.core.database import create_tables, get_db
 from app.services.auth import AuthService
+from app.services.mets_export import shutdown_render_pool
 from app.services.mongodb import mongodb_service
+from app.services.task_queue import job_queue, task_queue
+from app.services.validation_client import remote_validation_client
+from app.services.validation_jobs import cancel_validation_tasks
 from app.routes import auth_router, files_router
 from app.routes.documents import router as documents_router
+from app.routes.jobs import router as jobs_router
 from app.schemas.user import UserCreate
+from app.utils.cursor import NEXT_CURSOR_HEADER
+from app.utils.mets_local_validator import get_local_validator
 from app.utils import setup_logging
 import logging
 
@@ -28,12 +36,14 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER],  # Keyset pagination of list endpoints
 )
 
 # Include routers
 app.include_router(auth_router)
 app.include_router(files_router, prefix="/api")
 app.include_router(documents_router, prefix="/api/documents", tags=["documents"])
+app.include_router(jobs_router, prefix="/api")
 
 @app.on_event("startup")
 async def startup_event():
@@ -51,6 +61,16 @@ async def startup_event():
         logger.error(f"Failed to connect to MongoDB: {e}")
         raise
 
+    # Compile the bundled METS schemas once, before the first validation request
+    try:
+        get_local_validator()
+    except Exception as e:
+        logger.error(f"Failed to compile METS validation schemas: {e}")
+
+    # Pooled connections to the remote validation API
+    if settings.METS_REMOTE_VALIDATION:
+        await remote_validation_client.start()
+
     logger.info("Archivia API v2.0.0 started successfully!")
     logger.info("To create an admin user, use the /api/auth/register endpoint or run the user creation script")
 
@@ -60,6 +80,16 @@ async def shutdown_event():
     """Cleanup on shutdown"""
     logger.info("Shutting down Archivia API...")
 
+    # Stop background workers (queued tasks are dropped, running ones finish);
+    # draining blocks, so it runs off the event loop
+    await run_in_threadpool(job_queue.shutdown)
+    await run_in_threadpool(task_queue.shutdown)
+    await cancel_validation_tasks()
+    shutdown_render_pool()
+
+    # Close pooled validation API connections
+    await remote_validation_client.close()
+
     # Close MongoDB connection
     await mongodb_service.close_async()
 
@@ -0,0 +1,7 @@
+-- Migration 006: Add low-quality image placeholder to document files
+-- Tiny (16px) WebP/JPEG data URI computed at ingest and returned inline in
+-- list and detail payloads so grids can render before previews load
+
+ALTER TABLE document_files ADD COLUMN IF NOT EXISTS placeholder TEXT;
+
+COMMENT ON COLUMN document_files.placeholder IS 'Low-quality image placeholder (data URI, ~200 bytes)';
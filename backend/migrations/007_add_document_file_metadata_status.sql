@@ -0,0 +1,11 @@
+-- Migration 007: Track deferred raw metadata extraction per document file
+-- Uploads only extract the MIX fields inline; the full tag dump (raw_metadata)
+-- is filled in by a background task and its progress is recorded here
+
+ALTER TABLE document_files ADD COLUMN IF NOT EXISTS metadata_status VARCHAR(20);
+
+-- Files ingested before this migration already carry their full raw_metadata
+UPDATE document_files SET metadata_status = 'complete'
+WHERE metadata_status IS NULL AND raw_metadata IS NOT NULL;
+
+COMMENT ON COLUMN document_files.metadata_status IS 'Full raw_metadata extraction state: pending, complete or failed';
@@ -0,0 +1,19 @@
+-- Migration 008: Digest-keyed memo of metadata extraction and derivatives
+-- Content already seen (same SHA256 and extractor version) reuses its
+-- extracted metadata, placeholder and export derivatives at ingest
+
+CREATE TABLE IF NOT EXISTS content_memos (
+    id SERIAL PRIMARY KEY,
+    content_hash VARCHAR(64) NOT NULL,
+    extractor_version VARCHAR(20) NOT NULL,
+    image_metadata JSONB,
+    placeholder TEXT,
+    derivatives JSONB,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT now(),
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT now(),
+    CONSTRAINT uq_content_memos_hash_version UNIQUE (content_hash, extractor_version)
+);
+
+CREATE INDEX IF NOT EXISTS ix_content_memos_content_hash ON content_memos (content_hash);
+
+COMMENT ON TABLE content_memos IS 'Metadata, placeholder and derivative references memoized by content digest';
@@ -0,0 +1,25 @@
+-- Migration 009: Persisted background jobs
+-- Long maintenance jobs (metadata backfill, ...) record their parameters,
+-- progress counters and a resume checkpoint so they survive restarts
+
+CREATE TABLE IF NOT EXISTS jobs (
+    id SERIAL PRIMARY KEY,
+    job_type VARCHAR(50) NOT NULL,
+    status VARCHAR(20) NOT NULL DEFAULT 'queued',
+    owner_id INTEGER REFERENCES users(id),
+    params JSONB,
+    checkpoint JSONB,
+    total INTEGER,
+    processed INTEGER NOT NULL DEFAULT 0,
+    succeeded INTEGER NOT NULL DEFAULT 0,
+    failed INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT now(),
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT now(),
+    started_at TIMESTAMP WITH TIME ZONE,
+    finished_at TIMESTAMP WITH TIME ZONE
+);
+
+CREATE INDEX IF NOT EXISTS ix_jobs_job_type ON jobs (job_type);
+
+COMMENT ON TABLE jobs IS 'Background jobs with progress counters and resume checkpoint';
@@ -0,0 +1,20 @@
+-- Migration 010: Persisted METS validation verdicts
+-- Background validation jobs store the latest verdict of each document
+-- together with the hash of the validated METS XML; exports reuse it while
+-- the XML is unchanged instead of calling the validator synchronously
+
+CREATE TABLE IF NOT EXISTS document_validations (
+    document_id INTEGER PRIMARY KEY REFERENCES documents(id) ON DELETE CASCADE,
+    status VARCHAR(20) NOT NULL,
+    xml_hash VARCHAR(64),
+    engine VARCHAR(20),
+    errors JSONB,
+    warnings JSONB,
+    summary TEXT,
+    validated_at TIMESTAMP WITH TIME ZONE,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS ix_document_validations_status ON document_validations (status);
+
+COMMENT ON TABLE document_validations IS 'Latest METS ECO-MiC validation verdict per document, keyed to the validated XML hash';
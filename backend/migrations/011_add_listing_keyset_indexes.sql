@@ -0,0 +1,11 @@
+-- Migration 011: Composite indexes for keyset (cursor) pagination
+-- Document and file lists are ordered newest first on (created_at, id) and
+-- continue after the last row of the previous page, so each page is an
+-- index range scan for the owner instead of an OFFSET over earlier pages
+
+CREATE INDEX IF NOT EXISTS ix_documents_owner_created_id
+    ON documents (owner_id, created_at DESC, id DESC);
+
+CREATE INDEX IF NOT EXISTS ix_files_owner_created_id
+    ON files (owner_id, created_at DESC, id DESC)
+    WHERE upload_completed = true;
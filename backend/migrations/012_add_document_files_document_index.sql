@@ -0,0 +1,7 @@
+-- Migration 012: Index document_files by document
+-- Search and list pages read each document's file count and first
+-- placeholder (in sequence order) in the page query itself; without this
+-- index each of those lookups scans document_files
+
+CREATE INDEX IF NOT EXISTS ix_document_files_document_sequence
+    ON document_files (document_id, sequence_number, id);
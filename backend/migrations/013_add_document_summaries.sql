@@ -0,0 +1,61 @@
+-- Migration 013: Document list read model
+-- One row per document with everything the list and search views show
+-- (key METS fields, file count, bytes, per-category counts, cover), kept in
+-- sync by the document write paths, so listing is one indexed query
+
+CREATE TABLE IF NOT EXISTS document_summaries (
+    document_id INTEGER PRIMARY KEY REFERENCES documents(id) ON DELETE CASCADE,
+    owner_id INTEGER NOT NULL REFERENCES users(id),
+    logical_id VARCHAR(255) NOT NULL,
+    title TEXT,
+    archive_name TEXT,
+    document_type VARCHAR(255),
+    total_pages INTEGER,
+    file_count INTEGER NOT NULL DEFAULT 0,
+    total_bytes BIGINT NOT NULL DEFAULT 0,
+    category_counts JSONB,
+    cover_file_id INTEGER,
+    cover_placeholder TEXT,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT now(),
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS ix_document_summaries_owner_created_id
+    ON document_summaries (owner_id, created_at DESC, document_id DESC);
+
+-- Existing documents: file statistics and covers from PostgreSQL. The METS
+-- fields (title, archive_name, document_type, total_pages) live in MongoDB:
+-- fill them with `python rebuild_summaries.py`
+INSERT INTO document_summaries (
+    document_id, owner_id, logical_id, file_count, total_bytes, category_counts,
+    cover_file_id, cover_placeholder, created_at, updated_at
+)
+SELECT d.id, d.owner_id, d.logical_id,
+       COALESCE(stats.file_count, 0), COALESCE(stats.total_bytes, 0), COALESCE(stats.category_counts, '{}'::jsonb),
+       cover.file_id, cover.placeholder, d.created_at, d.updated_at
+FROM documents d
+LEFT JOIN (
+    SELECT document_id,
+           SUM(file_count)::integer AS file_count,
+           SUM(total_bytes)::bigint AS total_bytes,
+           jsonb_object_agg(category, file_count) AS category_counts
+    FROM (
+        SELECT df.document_id,
+               COALESCE(df.file_category, 'uncategorized') AS category,
+               COUNT(*) AS file_count,
+               COALESCE(SUM(f.file_size), 0) AS total_bytes
+        FROM document_files df
+        LEFT JOIN files f ON f.id = df.file_id
+        GROUP BY df.document_id, COALESCE(df.file_category, 'uncategorized')
+    ) per_category
+    GROUP BY document_id
+) stats ON stats.document_id = d.id
+LEFT JOIN (
+    SELECT DISTINCT ON (document_id) document_id, file_id, placeholder
+    FROM document_files
+    WHERE placeholder IS NOT NULL
+    ORDER BY document_id, sequence_number ASC NULLS LAST, id
+) cover ON cover.document_id = d.id
+ON CONFLICT (document_id) DO NOTHING;
+
+COMMENT ON TABLE document_summaries IS 'Denormalized document list row (METS key fields + file statistics), maintained on writes';
@@ -0,0 +1,7 @@
+-- Migration 014: Track which document summaries hold their METS fields
+-- Summaries created from PostgreSQL alone (migration 013, or on the first
+-- file change of an older document) have empty METS fields until they are
+-- copied from MongoDB; the document list fills those in on first display
+
+ALTER TABLE document_summaries
+    ADD COLUMN IF NOT EXISTS mets_synced BOOLEAN NOT NULL DEFAULT FALSE;
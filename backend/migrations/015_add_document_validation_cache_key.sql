@@ -0,0 +1,7 @@
+-- Migration 015: Record the METS render cache key with each verdict
+-- The validation status endpoint compares it with the document's current
+-- cache key instead of rendering the METS XML to hash it on every poll;
+-- verdicts stored before this migration have no key until revalidated
+
+ALTER TABLE document_validations
+    ADD COLUMN IF NOT EXISTS mets_cache_key VARCHAR(64);
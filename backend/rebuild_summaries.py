@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Rebuild the document list read model (document_summaries)
+Run with: python rebuild_summaries.py [--owner-id N] [--batch-size N]
+
+Recomputes every summary from PostgreSQL (file statistics, cover) and
+MongoDB (title, archive, document type, pages). After migration 013,
+which can only fill the PostgreSQL part, the document list fills in the
+METS fields page by page; running this command does it up front. Run it
+too after editing documents outside the API. Each batch is committed on its own, so the
+command can be interrupted and run again.
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+# Add the backend directory to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.core.database import SessionLocal, create_tables
+from app.services.document_summary import rebuild_summaries
+from app.services.mets_document import METSDocumentService
+from app.services.mongodb import mongodb_service
+
+
+async def run_rebuild(args):
+    await mongodb_service.connect_async()
+    db = SessionLocal()
+    start = time.perf_counter()
+
+    def progress(done):
+        print(f"{done} documents ({done / (time.perf_counter() - start):.0f} documents/s)")
+
+    try:
+        return await rebuild_summaries(
+            db, METSDocumentService(mongodb_service), owner_id=args.owner_id,
+            batch_size=args.batch_size, progress=progress
+        )
+    finally:
+        db.close()
+        await mongodb_service.close_async()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild the document list read model")
+    parser.add_argument("--owner-id", type=int, help="Only documents of this user")
+    parser.add_argument("--batch-size", type=int, default=500, help="Documents per batch and commit")
+    args = parser.parse_args()
+
+    create_tables()
+    done = asyncio.run(run_rebuild(args))
+    print(f"Done: {done} document summaries rebuilt")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Shared setup for the backend unit tests
+
+Run with: python -m pytest tests (from the repository root)
+
+The backend package is imported from backend/ with placeholder settings;
+these tests need no database, MinIO, MongoDB or network access.
+"""
+import datetime as dt
+import os
+import socket
+import sys
+
+import minio
+import pytest
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend')
+sys.path.insert(0, BACKEND_DIR)
+
+os.environ.setdefault('DATABASE_URL', 'sqlite://')
+os.environ.setdefault('SECRET_KEY', 'test-secret-key')
+os.environ.setdefault('MINIO_ACCESS_KEY', 'test')
+os.environ.setdefault('MINIO_SECRET_KEY', 'test')
+
+# app.services creates its MinIO client (and checks the bucket) on import
+minio.Minio.bucket_exists = lambda self, bucket_name: True
+
+# Manual script against a running API server, not a unit test
+collect_ignore = ['test_mets_validation.py']
+
+
+@pytest.fixture
+def no_network(monkeypatch):
+    """Fail any attempt to open a network connection"""
+    def refuse(*args, **kwargs):
+        raise AssertionError(f"unexpected network access: {args!r}")
+
+    monkeypatch.setattr(socket.socket, 'connect', refuse)
+    monkeypatch.setattr(socket, 'create_connection', refuse)
+    monkeypatch.setattr(socket, 'getaddrinfo', refuse)
+
+
+@pytest.fixture(scope='session')
+def mets_xml() -> str:
+    """METS generated for a one-page document (valid against the bundled schemas)"""
+    from app.schemas.document import DocumentDetail, DocumentFileSchema
+    from app.utils.mets_generator_ecomic import METSEcoMicGenerator
+
+    master = DocumentFileSchema(
+        id=1, file_id=10, file_category='master', sequence_number=1, filename='p001.tif',
+        file_size=1234, content_type='image/tiff', checksum_md5='a' * 64,
+        image_width=2400, image_height=3200, format_name='image/tiff'
+    )
+    document = DocumentDetail(
+        id=1, logical_id='DOC-001', owner_id=1, title='Registro dei battesimi', archive_name='Archivio di Stato',
+        created_at=dt.datetime(2024, 1, 2), updated_at=dt.datetime(2024, 1, 2), document_files=[master]
+    )
+    return METSEcoMicGenerator().generate_mets_xml(document)
@@ -0,0 +1,98 @@
+"""Keyset pagination cursors (app.utils.cursor): round trips and rejected input"""
+import base64
+import json
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import pytest
+from bson import ObjectId
+
+from app.utils.cursor import InvalidCursor, decode_cursor, encode_cursor, next_cursor, parse_datetime
+
+CREATED_AT = datetime(2024, 5, 17, 9, 30, 12, 345678, tzinfo=timezone.utc)
+
+
+def raw_cursor(payload) -> str:
+    """Cursor string for an arbitrary JSON payload, bypassing encode_cursor()"""
+    return base64.urlsafe_b64encode(json.dumps(payload).encode('utf-8')).decode('ascii').rstrip('=')
+
+
+@pytest.mark.parametrize('values, types', [
+    ((CREATED_AT, 42), (parse_datetime, int)),
+    ((datetime(2024, 1, 1), 1), (parse_datetime, int)),
+    ((0.75, 'doc-001'), (float, str)),
+    ((None, 7), (float, int)),
+    (('città/ü?&=', 3), (str, int)),
+])
+def test_round_trip(values, types):
+    cursor = encode_cursor('documents', *values)
+
+    assert decode_cursor(cursor, 'documents', types) == values
+
+
+def test_object_id_round_trip():
+    object_id = ObjectId()
+    cursor = encode_cursor('search', 1.5, object_id)
+
+    assert decode_cursor(cursor, 'search', (float, ObjectId)) == (1.5, object_id)
+
+
+def test_cursor_is_url_safe():
+    cursor = encode_cursor('documents', '>>>???', CREATED_AT, 2 ** 40)
+
+    assert set(cursor) <= set('ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-_')
+
+
+def test_cursor_of_another_listing_is_rejected():
+    cursor = encode_cursor('files', CREATED_AT, 42)
+
+    with pytest.raises(InvalidCursor):
+        decode_cursor(cursor, 'documents', (parse_datetime, int))
+
+
+@pytest.mark.parametrize('cursor', [
+    '',
+    'not a cursor',
+    '!!!!',
+    base64.urlsafe_b64encode(b'\xff\xfe').decode('ascii'),   # not UTF-8 JSON
+    raw_cursor({'kind': 'documents'}),                      # not a list
+    raw_cursor(['documents', '2024-05-17T09:30:12']),       # too few values
+    raw_cursor(['documents', '2024-05-17T09:30:12', 1, 2]),  # too many values
+    raw_cursor(['documents', 'yesterday', 1]),              # value rejected by its converter
+    raw_cursor(['documents', '2024-05-17T09:30:12', 'one']),
+])
+def test_malformed_cursors_are_rejected(cursor):
+    with pytest.raises(InvalidCursor):
+        decode_cursor(cursor, 'documents', (parse_datetime, int))
+
+
+def test_tampered_cursor_is_rejected_or_decodes_to_plain_values():
+    cursor = encode_cursor('documents', CREATED_AT, 42)
+    # Flip one character: either the payload no longer parses, or it is a
+    # well-formed key that is only used as a comparison bound
+    tampered = cursor[:5] + ('A' if cursor[5] != 'A' else 'B') + cursor[6:]
+
+    try:
+        created_at, document_id = decode_cursor(tampered, 'documents', (parse_datetime, int))
+    except InvalidCursor:
+        return
+    assert isinstance(created_at, datetime) and isinstance(document_id, int)
+
+
+def test_invalid_object_id_is_rejected():
+    with pytest.raises(InvalidCursor):
+        decode_cursor(raw_cursor(['search', 1.0, 'not-an-object-id']), 'search', (float, ObjectId))
+
+
+def test_invalid_cursor_is_a_value_error():
+    assert issubclass(InvalidCursor, ValueError)
+
+
+def test_next_cursor_only_for_full_pages():
+    items = [SimpleNamespace(created_at=CREATED_AT, id=n) for n in range(3)]
+    key = lambda item: (item.created_at, item.id)  # noqa: E731
+
+    assert next_cursor('documents', items, 4, key) is None
+    assert next_cursor('documents', items, 0, key) is None
+    cursor = next_cursor('documents', items, 3, key)
+    assert decode_cursor(cursor, 'documents', (parse_datetime, int)) == (CREATED_AT, 2)
@@ -0,0 +1,112 @@
+"""Range / If-Range handling (app.utils.http_range)"""
+from datetime import datetime, timezone
+
+import pytest
+
+from app.utils.http_range import (
+    MAX_RANGES, RangeNotSatisfiable, content_range, format_http_date, if_range_matches, parse_range_header
+)
+
+SIZE = 1000
+
+
+@pytest.mark.parametrize('header, expected', [
+    ('bytes=0-99', [(0, 99)]),
+    ('bytes=100-', [(100, 999)]),
+    ('bytes=990-5000', [(990, 999)]),
+    ('bytes=-100', [(900, 999)]),
+    ('bytes=-5000', [(0, 999)]),
+    ('BYTES = 0-0', [(0, 0)]),
+    ('bytes=0-0,-1', [(0, 0), (999, 999)]),
+    ('bytes= 0-9 , 20-29 ', [(0, 9), (20, 29)]),
+])
+def test_single_and_multiple_ranges(header, expected):
+    assert parse_range_header(header, SIZE) == expected
+
+
+@pytest.mark.parametrize('header, expected', [
+    ('bytes=500-599,0-99', [(0, 99), (500, 599)]),
+    ('bytes=0-99,50-149', [(0, 149)]),
+    ('bytes=0-99,100-199', [(0, 199)]),
+    ('bytes=0-99,101-199', [(0, 99), (101, 199)]),
+    ('bytes=0-,-100', [(0, 999)]),
+    ('bytes=10-20,12-15', [(10, 20)]),
+])
+def test_overlapping_and_adjacent_ranges_are_merged(header, expected):
+    assert parse_range_header(header, SIZE) == expected
+
+
+@pytest.mark.parametrize('header', [
+    None,
+    '',
+    'items=0-9',
+    'bytes=',
+    'bytes=abc',
+    'bytes=5',
+    'bytes=9-0',
+    'bytes=-1-5',
+    'bytes=0-x',
+    'bytes=--5',
+])
+def test_malformed_headers_mean_full_content(header):
+    assert parse_range_header(header, SIZE) is None
+
+
+def test_too_many_ranges_mean_full_content():
+    header = 'bytes=' + ','.join(f'{n * 10}-{n * 10}' for n in range(MAX_RANGES + 1))
+    assert parse_range_header(header, SIZE) is None
+
+    header = 'bytes=' + ','.join(f'{n * 10}-{n * 10}' for n in range(MAX_RANGES))
+    assert len(parse_range_header(header, SIZE)) == MAX_RANGES
+
+
+@pytest.mark.parametrize('header, size', [
+    ('bytes=1000-', SIZE),
+    ('bytes=1000-2000', SIZE),
+    ('bytes=-0', SIZE),
+    ('bytes=-0,2000-', SIZE),
+    ('bytes=0-', 0),
+    ('bytes=-10', 0),
+])
+def test_unsatisfiable_ranges(header, size):
+    with pytest.raises(RangeNotSatisfiable) as excinfo:
+        parse_range_header(header, size)
+    assert excinfo.value.file_size == size
+
+
+def test_unsatisfiable_part_is_dropped():
+    assert parse_range_header('bytes=2000-3000,0-9,-0', SIZE) == [(0, 9)]
+
+
+MODIFIED = datetime(2024, 3, 1, 12, 30, 15, 123456, tzinfo=timezone.utc)
+ETAG = '"abc123"'
+
+
+@pytest.mark.parametrize('if_range, expected', [
+    (None, True),
+    ('', True),
+    ('"abc123"', True),
+    (' "abc123" ', True),
+    ('"other"', False),
+    ('W/"abc123"', False),
+    ('Fri, 01 Mar 2024 12:30:15 GMT', True),
+    ('Fri, 01 Mar 2024 12:30:16 GMT', False),
+    ('not a date', False),
+])
+def test_if_range(if_range, expected):
+    assert if_range_matches(if_range, ETAG, MODIFIED) is expected
+
+
+def test_if_range_without_validators():
+    assert not if_range_matches('"abc123"', None, MODIFIED)
+    assert not if_range_matches('Fri, 01 Mar 2024 12:30:15 GMT', ETAG, None)
+
+
+def test_naive_timestamps_are_utc():
+    naive = MODIFIED.replace(tzinfo=None)
+    assert if_range_matches(format_http_date(naive), ETAG, naive)
+    assert format_http_date(naive) == 'Fri, 01 Mar 2024 12:30:15 GMT'
+
+
+def test_content_range():
+    assert content_range(0, 99, SIZE) == 'bytes 0-99/1000'
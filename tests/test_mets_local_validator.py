@@ -0,0 +1,125 @@
+"""Offline METS ECO-MiC validation (app.utils.mets_local_validator)"""
+import os
+
+import pytest
+from lxml import etree
+
+from app.utils.mets_local_validator import DEFAULT_XSD_DIR, NAMESPACES, SCHEMA_CATALOG, LocalMETSValidator
+
+pytestmark = pytest.mark.usefixtures('no_network')
+
+OPTIONAL_SCHEMAS = [(namespace, filename) for namespace, filename, required in SCHEMA_CATALOG if not required]
+
+
+@pytest.fixture(scope='module')
+def validator():
+    return LocalMETSValidator()
+
+
+def issue_ids(result, kind='errors'):
+    return {issue['id'] for issue in result[kind]}
+
+
+def remove(xml: str, path: str) -> bytes:
+    root = etree.fromstring(xml.encode('utf-8'))
+    for element in root.findall(path, NAMESPACES):
+        element.getparent().remove(element)
+    return etree.tostring(root)
+
+
+def test_generated_mets_is_valid(validator, mets_xml):
+    result = validator.validate(mets_xml)
+
+    assert result['valid'], result['errors']
+    assert result['response']['engine'] == 'local'
+    assert NAMESPACES['mets'] in result['response']['schemas']
+
+
+def test_accepts_bytes(validator, mets_xml):
+    assert validator.validate(mets_xml.encode('utf-8'))['valid']
+
+
+def test_missing_optional_schemas_are_reported(validator):
+    present = set(os.listdir(DEFAULT_XSD_DIR))
+    expected = [namespace for namespace, filename in OPTIONAL_SCHEMAS if filename not in present]
+
+    assert validator.skipped_namespaces == expected
+    assert validator.validate('<x/>')['response']['skipped_schemas'] == expected
+
+
+def test_syntax_error(validator):
+    result = validator.validate('<mets:mets xmlns:mets="http://www.loc.gov/METS/">')
+
+    assert not result['valid']
+    assert issue_ids(result) == {'XML-SYNTAX'}
+
+
+def test_wrong_root(validator):
+    result = validator.validate('<mods xmlns="http://www.loc.gov/mods/v3"/>')
+
+    assert issue_ids(result) == {'ECOMIC-ROOT'}
+
+
+def test_entities_are_not_expanded(validator):
+    xml = (
+        '<?xml version="1.0"?><!DOCTYPE x [<!ENTITY e SYSTEM "http://example.com/">]>'
+        '<mets:mets xmlns:mets="http://www.loc.gov/METS/">&e;</mets:mets>'
+    )
+    result = validator.validate(xml)
+
+    assert not result['valid']
+    assert 'XSD' in issue_ids(result)
+
+
+def test_xsd_error(validator, mets_xml):
+    xml = mets_xml.replace('<mets:metsHdr ', '<mets:unknownSection/><mets:metsHdr ', 1)
+    result = validator.validate(xml)
+
+    assert not result['valid']
+    assert 'XSD' in issue_ids(result)
+
+
+def test_profile_requires_header(validator, mets_xml):
+    result = validator.validate(remove(mets_xml, 'mets:metsHdr'))
+
+    assert 'ECOMIC-HDR-01' in issue_ids(result)
+
+
+def test_profile_requires_mods_logical_id(validator, mets_xml):
+    result = validator.validate(remove(mets_xml, ".//mods:identifier[@type='logicalId']"))
+
+    assert 'ECOMIC-DMD-02' in issue_ids(result)
+
+
+def test_profile_checks_file_references(validator, mets_xml):
+    root = etree.fromstring(mets_xml.encode('utf-8'))
+    root.find('.//mets:fptr', NAMESPACES).set('FILEID', 'missing_file')
+    result = validator.validate(etree.tostring(root))
+
+    assert 'ECOMIC-STRUCT-02' in issue_ids(result)
+    assert 'ECOMIC-STRUCT-04' in issue_ids(result, 'warnings')
+
+
+def test_optional_schema_is_enforced_when_present(tmp_path, mets_xml):
+    # A stand-in MIX schema in an extra directory (as with METS_XSD_DIR)
+    (tmp_path / 'mix20.xsd').write_text(
+        '<xsd:schema xmlns:xsd="http://www.w3.org/2001/XMLSchema" '
+        'targetNamespace="http://www.loc.gov/mix/v20" elementFormDefault="qualified">'
+        '<xsd:element name="mix"><xsd:complexType><xsd:sequence>'
+        '<xsd:element name="RequiredByTest" type="xsd:string"/>'
+        '</xsd:sequence></xsd:complexType></xsd:element></xsd:schema>'
+    )
+    validator = LocalMETSValidator(str(tmp_path))
+
+    assert NAMESPACES['mix'] in validator.namespaces
+    assert NAMESPACES['mix'] not in validator.skipped_namespaces
+    result = validator.validate(mets_xml)
+    assert not result['valid']
+    assert any('RequiredByTest' in issue['description'] for issue in result['errors'])
+
+
+def test_required_schema_missing(tmp_path, monkeypatch):
+    monkeypatch.setattr('app.utils.mets_local_validator.DEFAULT_XSD_DIR', str(tmp_path))
+
+    with pytest.raises(FileNotFoundError):
+        LocalMETSValidator(str(tmp_path))
@@ -0,0 +1,217 @@
+"""Single-pass TIFF/JPEG header parser (app.utils.tiff_header) on well-formed and malformed input"""
+import io
+import struct
+
+import pytest
+from PIL import Image
+
+from app.utils.image_metadata import ImageMetadataExtractor
+from app.utils.tiff_header import (
+    HEADER_READ_SIZE, TAG_EXIF_IFD, TAG_MAKER_NOTE, HeaderFormatError, parse_header
+)
+
+SHORT, LONG, RATIONAL, ASCII, UNDEFINED = 3, 4, 5, 2, 7
+
+
+def build_tiff(endian: str = '<', extra_entries=(), exif_entries=None, ifd_offset: int = 8) -> bytes:
+    """
+    Minimal TIFF with one IFD: 640x480, 8-bit RGB, 300 dpi, Model "Scanner"
+
+    Entries are (tag, field type, count, payload bytes); payloads longer than
+    four bytes are stored after the IFD. exif_entries adds an EXIF sub-IFD.
+    """
+    def ifd_bytes(entries, offset):
+        entries = sorted(entries)
+        data_offset = offset + 2 + len(entries) * 12 + 4
+        table, data = b'', b''
+        for tag, field_type, count, payload in entries:
+            if len(payload) <= 4:
+                value_field = payload.ljust(4, b'\x00')
+            else:
+                value_field = struct.pack(endian + 'I', data_offset + len(data))
+                data += payload + b'\x00' * (len(payload) % 2)
+            table += struct.pack(endian + 'HHI', tag, field_type, count) + value_field
+        return struct.pack(endian + 'H', len(entries)) + table + struct.pack(endian + 'I', 0) + data
+
+    def short(value):
+        return struct.pack(endian + 'H', value)
+
+    entries = [
+        (0x0100, SHORT, 1, short(640)),
+        (0x0101, SHORT, 1, short(480)),
+        (0x0102, SHORT, 3, struct.pack(endian + '3H', 8, 8, 8)),
+        (0x0106, SHORT, 1, short(2)),
+        (0x0110, ASCII, 8, b'Scanner\x00'),
+        (0x011A, RATIONAL, 1, struct.pack(endian + '2I', 300, 1)),
+        *extra_entries,
+    ]
+    if exif_entries is not None:
+        entries.append((TAG_EXIF_IFD, LONG, 1, b'\x00' * 4))
+        main = ifd_bytes(entries, ifd_offset)
+        exif_offset = ifd_offset + len(main)
+        entries[-1] = (TAG_EXIF_IFD, LONG, 1, struct.pack(endian + 'I', exif_offset))
+        main = ifd_bytes(entries, ifd_offset) + ifd_bytes(exif_entries, exif_offset)
+    else:
+        main = ifd_bytes(entries, ifd_offset)
+
+    byte_order = b'II' if endian == '<' else b'MM'
+    head = byte_order + struct.pack(endian + 'HI', 42, ifd_offset)
+    return head.ljust(ifd_offset, b'\x00') + main
+
+
+def parse(data: bytes, tag_filter=None):
+    return parse_header(io.BytesIO(data), tag_filter)
+
+
+@pytest.mark.parametrize('endian, byte_order', [('<', 'little endian'), ('>', 'big endian')])
+def test_tiff_byte_orders(endian, byte_order):
+    header = parse(build_tiff(endian))
+
+    assert header.format == 'TIFF'
+    assert header.byte_order == byte_order
+    assert header.first('Image', 0x0100) == 640
+    assert header.first('Image', 0x0101) == 480
+    assert header.get('Image', 0x0102) == [8, 8, 8]
+    assert header.get('Image', 0x0110) == 'Scanner'
+    assert header.first('Image', 0x011A) == (300, 1)
+
+
+def test_pil_written_tiff():
+    buffer = io.BytesIO()
+    Image.new('RGB', (32, 16)).save(buffer, 'TIFF')
+    little = parse(buffer.getvalue())
+
+    assert little.byte_order == 'little endian'
+    assert (little.first('Image', 0x0100), little.first('Image', 0x0101)) == (32, 16)
+
+
+def test_tag_filter_skips_other_tags():
+    header = parse(build_tiff(), tag_filter={0x0100})
+
+    assert list(header.ifds['Image']) == [0x0100]
+
+
+def test_tags_use_exifread_names():
+    keys = {key for key, _, _ in parse(build_tiff('>')).tags()}
+
+    assert {'Image ImageWidth', 'Image Model', 'Image XResolution'} <= keys
+
+
+@pytest.mark.parametrize('data', [
+    b'II+\x00\x08\x00\x00\x00',                  # little-endian BigTIFF
+    b'MM\x00+\x00\x08\x00\x00',                  # big-endian BigTIFF
+    b'\x89PNG\r\n\x1a\n',
+    b'',
+])
+def test_unsupported_streams_are_rejected(data):
+    with pytest.raises(HeaderFormatError):
+        parse(data)
+
+
+def test_bigtiff_version_inside_exif_segment_is_rejected():
+    # Byte order is valid but the version is 43 (BigTIFF): the Exif segment is ignored
+    exif = b'Exif\x00\x00' + b'II' + struct.pack('<HI', 43, 8)
+    jpeg = b'\xff\xd8' + b'\xff\xe1' + struct.pack('>H', len(exif) + 2) + exif + b'\xff\xd9'
+
+    header = parse(jpeg)
+
+    assert header.format == 'JPEG'
+    assert header.ifds == {}
+
+
+def test_truncated_before_first_ifd_offset():
+    with pytest.raises(HeaderFormatError):
+        parse(b'II*\x00\x08\x00')
+
+
+def test_first_ifd_offset_past_end_of_file():
+    header = parse(b'II*\x00' + struct.pack('<I', 10 * HEADER_READ_SIZE))
+
+    assert header.ifds == {}
+
+
+def test_truncated_ifd_table_is_skipped():
+    data = build_tiff()
+    # Keep the entry count but cut the table after two entries
+    header = parse(data[:8 + 2 + 2 * 12])
+
+    assert 'Image' not in header.ifds
+
+
+def test_value_offset_past_end_of_file_drops_only_that_tag():
+    data = bytearray(build_tiff())
+    # Point the Model string (4th entry after width, height, bits, photometric) past the end
+    entry = 8 + 2 + 4 * 12
+    assert struct.unpack('<H', data[entry:entry + 2])[0] == 0x0110
+    data[entry + 8:entry + 12] = struct.pack('<I', len(data) + 100)
+
+    header = parse(bytes(data))
+
+    assert header.get('Image', 0x0110) is None
+    assert header.first('Image', 0x0100) == 640
+
+
+def test_ifd_loop_terminates():
+    data = bytearray(build_tiff())
+    # Next-IFD offset of the only IFD points back at itself
+    count = struct.unpack('<H', data[8:10])[0]
+    next_offset = 8 + 2 + count * 12
+    data[next_offset:next_offset + 4] = struct.pack('<I', 8)
+
+    header = parse(bytes(data))
+
+    assert list(header.ifds) == ['Image']
+
+
+def test_unknown_field_types_are_ignored():
+    header = parse(build_tiff(extra_entries=[(0x9999, 99, 1, b'\x01\x00\x00\x00')]))
+
+    assert 0x9999 not in header.ifds['Image']
+    assert header.first('Image', 0x0100) == 640
+
+
+def test_maker_note_is_flagged_not_decoded():
+    maker_note = b'Nikon\x00' + b'\x00' * 2000
+    header = parse(build_tiff(exif_entries=[(TAG_MAKER_NOTE, UNDEFINED, len(maker_note), maker_note)]))
+
+    assert header.has_maker_note
+    assert TAG_MAKER_NOTE not in header.ifds['EXIF']
+    assert not parse(build_tiff(exif_entries=[])).has_maker_note
+
+
+def test_maker_note_tags_come_from_exifread(monkeypatch):
+    maker_note = b'\x00' * 2000
+    data = build_tiff(exif_entries=[(TAG_MAKER_NOTE, UNDEFINED, len(maker_note), maker_note)])
+    extractor = ImageMetadataExtractor()
+    monkeypatch.setattr(extractor, '_maker_note_tags', lambda f: {'MakerNote Quality': 'FINE'})
+
+    metadata = extractor.extract_metadata(io.BytesIO(data))
+
+    assert metadata['raw_metadata']['MakerNote Quality'] == 'FINE'
+    assert metadata['raw_metadata']['Image Model'] == 'Scanner'
+    assert metadata['image_width'] == 640
+
+
+def test_jpeg_frame_and_exif():
+    exif = Image.Exif()
+    exif[0x0110] = 'Camera'
+    buffer = io.BytesIO()
+    Image.new('RGB', (48, 32)).save(buffer, 'JPEG', exif=exif, dpi=(72, 72))
+
+    header = parse(buffer.getvalue())
+
+    assert header.format == 'JPEG'
+    assert header.frame == {'precision': 8, 'height': 32, 'width': 48, 'components': 3}
+    assert header.get('Image', 0x0110) == 'Camera'
+
+
+def test_truncated_jpeg_keeps_what_was_read():
+    buffer = io.BytesIO()
+    Image.new('L', (8, 8)).save(buffer, 'JPEG')
+    data = buffer.getvalue()
+    sof = data.index(b'\xff\xc0')
+
+    header = parse(data[:sof + 6])
+
+    assert header.format == 'JPEG'
+    assert header.frame == {}
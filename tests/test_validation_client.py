@@ -0,0 +1,203 @@
+"""Remote validation client (app.services.validation_client) against the mock validation API"""
+import asyncio
+import time
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+from app.core.config import settings
+from app.services import validation_client
+from app.services.validation_client import RemoteValidationClient
+from benchmarks.mock_validation_server import API_PATH, create_app
+
+pytestmark = pytest.mark.usefixtures('no_network')
+
+INVALID_XML = b'<mods xmlns="http://www.loc.gov/mods/v3"/>'
+
+
+class FlakyTransport(httpx.AsyncBaseTransport):
+    """Fail the first `failures` requests with a connection error, then pass through"""
+
+    def __init__(self, transport: httpx.AsyncBaseTransport, failures: int):
+        self.transport = transport
+        self.failures = failures
+
+    async def handle_async_request(self, request):
+        if self.failures:
+            self.failures -= 1
+            raise httpx.ConnectError("connection refused", request=request)
+        return await self.transport.handle_async_request(request)
+
+
+def make_client(app, failures: int = 0) -> RemoteValidationClient:
+    """Client whose pooled connections go to the in-process mock API"""
+    client = RemoteValidationClient(url=f"http://validator{API_PATH}")
+    transport = httpx.ASGITransport(app=app)
+    if failures:
+        transport = FlakyTransport(transport, failures)
+    client._new_client = lambda: httpx.AsyncClient(transport=transport)
+    return client
+
+
+@pytest.fixture
+def valid_xml(mets_xml) -> bytes:
+    return mets_xml.encode('utf-8')
+
+
+def served(app) -> int:
+    return app.state.requests
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Controllable monotonic clock for cache expiry"""
+    now = SimpleNamespace(value=1000.0)
+    monkeypatch.setattr(validation_client, 'time', SimpleNamespace(
+        monotonic=lambda: now.value, perf_counter=time.perf_counter
+    ))
+    return now
+
+
+def test_identical_xml_is_served_from_cache(valid_xml):
+    app = create_app()
+
+    async def scenario():
+        client = make_client(app)
+        try:
+            first = await client.validate(valid_xml, 'a.xml')
+            second = await client.validate(valid_xml, 'b.xml')
+            rejected = await client.validate(INVALID_XML, 'c.xml')
+            rejected_again = await client.validate(INVALID_XML, 'c.xml')
+        finally:
+            await client.close()
+        return first, second, rejected, rejected_again
+
+    first, second, rejected, rejected_again = asyncio.run(scenario())
+
+    assert first.status_code == 200
+    assert second is first
+    assert rejected.status_code == 412
+    assert rejected.json()['filesResponse'][0]['listaMessaggi'][0]['idErrore'] == 'ECOMIC-ROOT'
+    assert rejected_again is rejected
+    assert served(app) == 2
+
+
+def test_cache_entries_expire(valid_xml, clock, monkeypatch):
+    monkeypatch.setattr(settings, 'METS_VALIDATION_CACHE_TTL', 60)
+    app = create_app()
+
+    async def scenario():
+        client = make_client(app)
+        try:
+            await client.validate(valid_xml, 'a.xml')
+            clock.value += 59
+            await client.validate(valid_xml, 'a.xml')
+            assert served(app) == 1
+            clock.value += 2
+            await client.validate(valid_xml, 'a.xml')
+        finally:
+            await client.close()
+
+    asyncio.run(scenario())
+
+    assert served(app) == 2
+
+
+def test_cache_disabled(valid_xml, monkeypatch):
+    monkeypatch.setattr(settings, 'METS_VALIDATION_CACHE_TTL', 0)
+    app = create_app()
+
+    async def scenario():
+        client = make_client(app)
+        try:
+            await client.validate(valid_xml, 'a.xml')
+            await client.validate(valid_xml, 'a.xml')
+        finally:
+            await client.close()
+
+    asyncio.run(scenario())
+
+    assert served(app) == 2
+
+
+def test_concurrent_validations_share_one_request(valid_xml):
+    app = create_app(latency_ms=50)
+
+    async def scenario():
+        client = make_client(app)
+        try:
+            responses = await asyncio.gather(
+                *(client.validate(valid_xml, f'{n}.xml') for n in range(5)),
+                client.validate(INVALID_XML, 'other.xml')
+            )
+            assert not client._inflight
+        finally:
+            await client.close()
+        return responses
+
+    responses = asyncio.run(scenario())
+
+    assert all(response is responses[0] for response in responses[:5])
+    assert responses[5].status_code == 412
+    assert served(app) == 2
+
+
+def test_cancelled_caller_does_not_cancel_shared_request(valid_xml):
+    app = create_app(latency_ms=50)
+
+    async def scenario():
+        client = make_client(app)
+        try:
+            impatient = asyncio.ensure_future(client.validate(valid_xml, 'a.xml'))
+            patient = asyncio.ensure_future(client.validate(valid_xml, 'a.xml'))
+            await asyncio.sleep(0.01)
+            impatient.cancel()
+            response = await patient
+        finally:
+            await client.close()
+        return response
+
+    assert asyncio.run(scenario()).status_code == 200
+    assert served(app) == 1
+
+
+def test_transport_errors_are_not_cached(valid_xml):
+    app = create_app()
+
+    async def scenario():
+        client = make_client(app, failures=1)
+        try:
+            with pytest.raises(httpx.ConnectError):
+                await client.validate(valid_xml, 'a.xml')
+            assert not client._results
+            assert not client._inflight
+            return await client.validate(valid_xml, 'a.xml')
+        finally:
+            await client.close()
+
+    assert asyncio.run(scenario()).status_code == 200
+    assert served(app) == 1
+
+
+def test_coalesced_callers_all_see_a_transport_error(valid_xml):
+    app = create_app()
+
+    async def scenario():
+        client = make_client(app, failures=1)
+        try:
+            results = await asyncio.gather(
+                client.validate(valid_xml, 'a.xml'),
+                client.validate(valid_xml, 'b.xml'),
+                return_exceptions=True
+            )
+            retried = await client.validate(valid_xml, 'a.xml')
+        finally:
+            await client.close()
+        return results, retried
+
+    results, retried = asyncio.run(scenario())
+
+    assert all(isinstance(result, httpx.ConnectError) for result in results)
+    assert retried.status_code == 200
+    assert served(app) == 1